@@ -261,6 +261,33 @@ copy(links.join('\n'));
             from scrapy_dlb import scrapy_dlb
             scrapy_dlb(start_page=1, end_title="Dossier.137.2025.1080p.Blu-ray.Remux.AVC.DTS-HD.MA.5.1-HDT")
             logger.info("=" * 255)
+        case 617:
+            logger.info(r"同时抓取多个站点，共享全局并发上限，总耗时接近最慢的站点")
+            logger.info(r"先更新各站点 cookie，mp 需要人工过验证码，不放入批量运行")
+            logger.info("=" * 255)
+            from scrapy_all import SiteJob, run_sites_concurrently
+            from scrapy_bds import scrapy_bds
+            from scrapy_dhd import scrapy_dhd, dhd_to_log
+            from scrapy_dlb import scrapy_dlb
+            from scrapy_hde import scrapy_hde
+            from scrapy_mt import scrapy_mt
+            from scrapy_onk import scrapy_onk
+            from scrapy_rls import scrapy_rls
+            from scrapy_sk import scrapy_sk
+            jobs = [
+                SiteJob("SK", scrapy_sk, max_workers=16),
+                SiteJob("RLS", scrapy_rls, max_workers=8),
+                SiteJob("HDE", scrapy_hde, max_workers=16),
+                SiteJob("DLB", scrapy_dlb, max_workers=16),
+                SiteJob("DHD", scrapy_dhd, max_workers=16),
+                SiteJob("BDS", scrapy_bds),
+                SiteJob("MT", scrapy_mt),
+                SiteJob("ONK", scrapy_onk, max_workers=8),
+            ]
+            run_sites_concurrently(jobs, total_workers=64, report_seconds=60)
+            logger.info("-" * 255)
+            dhd_to_log()
+            logger.info("=" * 255)
 
         case 701:
             logger.info("整理导演目录，在导演目录生成导演别名和代表链接的空文件")
@@ -505,6 +532,16 @@ copy(links.join('\n'));
                 logger.error("发现错误文件名")
                 for i in result_list:
                     logger.warning(i)
+        case 810:
+            logger.info(r"批量生成视频截图，来源文件一行一个根目录，例如镜像目录和归档磁盘")
+            logger.info(r"跳过截图比视频新的文件，进度记录在清单中，中断后重新运行会接着处理")
+            logger.info("=" * 255)
+            from my_module import read_file_to_list
+            from batch_video_contact import batch_video_contact
+            source_file = r'config/!00.txt'
+            roots = [i for i in read_file_to_list(source_file) if i]
+            batch_video_contact(roots)
+            logger.info("=" * 255)
 
 
         case _:
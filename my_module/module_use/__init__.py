@@ -1,13 +1,17 @@
 """
 第三方模块使用函数
 """
+from .build_http_session import build_http_session
+from .build_httpx_client import build_httpx_client
 from .config_get import config_get
 from .config_read import config_read
 from .config_write import config_write
+from .http_record_replay import disable_http_transport, enable_http_record, enable_http_replay, install_http_transport
 from .langconv_chs_to_cht import langconv_chs_to_cht
 from .langconv_cht_to_chs import langconv_cht_to_chs
 from .logging_config import logging_config
 from .ssh_test import ssh_test
 from .mysql_query import mysql_query
 from .mysql_query_with_ssh import mysql_query_with_ssh
+from .parse_html import build_strainer, parse_html
 from .track_calls_and_time import track_calls_and_time
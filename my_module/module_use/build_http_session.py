@@ -0,0 +1,108 @@
+"""
+这是一个Python文件，包含抓取脚本共用的 HTTP 会话工厂 `build_http_session`。
+
+各抓取脚本原本各自创建 `requests.Session`，或者直接调用 `requests.get`，连接池大小和线程数也不对应，
+长时间运行时频繁重新建立 TCP + TLS 连接。`build_http_session` 统一创建带连接池的会话：
+
+- 每个主机一个连接池，连接池容量按调用方的并发数设置，线程数再多也不会因为池满而丢弃连接；
+- 底层套接字开启 TCP keep-alive，长时间空闲的连接不会被中间设备悄悄断开；
+- 代理、重试策略、默认请求头和证书校验沿用各脚本原来的设置。
+
+需要 HTTP/2 时使用 `build_httpx_client`。
+
+:author: assassing
+:contact: https://github.com/hxz393
+:copyright: Copyright 2027, hxz393. 保留所有权利。
+"""
+import socket
+from typing import Callable, Dict, List, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+MIN_POOL_SIZE = 10  # 连接池容量下限，与 requests 默认值一致
+KEEPALIVE_IDLE_SECONDS = 60  # 连接空闲多久后开始发送 keep-alive 探测
+KEEPALIVE_INTERVAL_SECONDS = 20  # keep-alive 探测间隔
+KEEPALIVE_PROBE_COUNT = 5  # 连续失败多少次探测后判定连接断开
+
+SESSION_HOOKS: List[Callable[[requests.Session], requests.Session]] = []  # 会话创建后依次调用，例如挂载录制回放适配器
+
+
+def get_keepalive_socket_options() -> list:
+    """
+    返回开启 TCP keep-alive 的套接字选项，平台不支持的细分选项会跳过。
+
+    :return: urllib3 连接使用的套接字选项列表
+    :rtype: list
+    """
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    for name, value in (
+            ("TCP_KEEPIDLE", KEEPALIVE_IDLE_SECONDS),
+            ("TCP_KEEPINTVL", KEEPALIVE_INTERVAL_SECONDS),
+            ("TCP_KEEPCNT", KEEPALIVE_PROBE_COUNT),
+    ):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return options
+
+
+class KeepAliveHTTPAdapter(HTTPAdapter):
+    """开启 TCP keep-alive 的 `HTTPAdapter`，代理连接同样生效。"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs.setdefault("socket_options", get_keepalive_socket_options())
+        super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        proxy_kwargs.setdefault("socket_options", get_keepalive_socket_options())
+        return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+
+def build_http_session(
+        pool_size: int = MIN_POOL_SIZE,
+        *,
+        proxies: Optional[Dict[str, str]] = None,
+        max_retries: Union[Retry, int] = 0,
+        headers: Optional[Dict[str, str]] = None,
+        verify: bool = True,
+        pool_from: Optional[requests.Session] = None,
+) -> requests.Session:
+    """
+    创建带连接池和 TCP keep-alive 的 `requests.Session`。
+
+    :param pool_size: 调用方的并发数，用作每个主机连接池的容量，最少为 10
+    :type pool_size: int
+    :param proxies: 会话默认代理，例如 {'http': 'http://127.0.0.1:7890', 'https': 'http://127.0.0.1:7890'}
+    :type proxies: Optional[Dict[str, str]]
+    :param max_retries: 传给 `HTTPAdapter` 的重试策略
+    :type max_retries: Union[Retry, int]
+    :param headers: 会话默认请求头，会合并到 requests 的默认请求头上
+    :type headers: Optional[Dict[str, str]]
+    :param verify: 是否校验证书，单次请求传入的 verify 参数优先
+    :type verify: bool
+    :param pool_from: 复用这个会话的连接池，新会话只单独保存 Cookie，适合每个任务需要独立登录状态的场景
+    :type pool_from: Optional[requests.Session]
+    :return: 配置好的会话
+    :rtype: requests.Session
+    """
+    pool_size = max(pool_size, MIN_POOL_SIZE)
+    session = requests.Session()
+    if proxies:
+        session.proxies = dict(proxies)
+    if headers:
+        session.headers.update(headers)
+    session.verify = verify
+    if pool_from is not None:
+        for prefix in ("http://", "https://"):
+            session.mount(prefix, pool_from.get_adapter(prefix))
+    else:
+        adapter = KeepAliveHTTPAdapter(max_retries=max_retries, pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+    for hook in SESSION_HOOKS:
+        session = hook(session)
+    return session
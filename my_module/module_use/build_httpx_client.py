@@ -0,0 +1,68 @@
+"""
+这是一个Python文件，包含一个函数 `build_httpx_client`，用于创建支持 HTTP/2 的 `httpx` 客户端。
+
+与 `build_http_session` 对应：连接池容量按并发数设置，空闲连接保持较长时间以便长时间运行时复用。
+开启 `http2` 后，同一主机的并发请求复用一条连接多路传输，需要额外安装 `httpx[http2]`。
+`httpx` 只在调用时导入，没有安装时不影响其他函数的使用。
+
+:author: assassing
+:contact: https://github.com/hxz393
+:copyright: Copyright 2027, hxz393. 保留所有权利。
+"""
+from typing import Any, Dict, Optional
+
+from .build_http_session import MIN_POOL_SIZE
+
+KEEPALIVE_EXPIRY_SECONDS = 300  # 空闲连接保留秒数
+
+
+def build_httpx_client(
+        pool_size: int = MIN_POOL_SIZE,
+        *,
+        http2: bool = False,
+        proxy: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None,
+        verify: bool = True,
+        timeout: Optional[float] = None,
+        async_client: bool = False,
+) -> Any:
+    """
+    创建带连接池的 `httpx.Client` 或 `httpx.AsyncClient`。
+
+    :param pool_size: 调用方的并发数，用作连接池容量，最少为 10
+    :type pool_size: int
+    :param http2: 是否启用 HTTP/2，需要安装 `httpx[http2]`
+    :type http2: bool
+    :param proxy: 代理地址，例如 'http://127.0.0.1:7890'
+    :type proxy: Optional[str]
+    :param headers: 默认请求头
+    :type headers: Optional[Dict[str, str]]
+    :param verify: 是否校验证书
+    :type verify: bool
+    :param timeout: 默认超时秒数，为 None 时使用 httpx 默认值
+    :type timeout: Optional[float]
+    :param async_client: 为 True 时返回 `httpx.AsyncClient`
+    :type async_client: bool
+    :return: 配置好的客户端
+    :rtype: Union[httpx.Client, httpx.AsyncClient]
+    """
+    import httpx
+
+    pool_size = max(pool_size, MIN_POOL_SIZE)
+    client_kwargs = {
+        "http2": http2,
+        "headers": headers,
+        "verify": verify,
+        "follow_redirects": True,
+        "limits": httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+        ),
+    }
+    if proxy:
+        client_kwargs["proxy"] = proxy
+    if timeout is not None:
+        client_kwargs["timeout"] = timeout
+    client_class = httpx.AsyncClient if async_client else httpx.Client
+    return client_class(**client_kwargs)
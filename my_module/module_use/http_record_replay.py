@@ -0,0 +1,266 @@
+"""
+这是一个Python文件，提供 HTTP 请求的录制与回放，用于离线测试抓取脚本的吞吐。
+
+抓取脚本依赖带 Cookie 和 Cloudflare 的真实站点，解析和并发流水线的性能改动很难复现。
+这里提供两个 `requests` 适配器：
+
+- `RecordingHTTPAdapter`：正常发送请求，同时把请求和响应追加写入 gzip 压缩的 JSON Lines 归档；
+- `ReplayHTTPAdapter`：不访问网络，按“方法 + 地址 + 请求体摘要”从归档中取出响应，可以设置模拟延迟。
+
+调用 `enable_http_record` / `enable_http_replay` 后，之后由 `build_http_session` 创建的会话都会自动挂上对应适配器。
+抓取脚本在导入时就创建会话，所以要先开启录制或回放，再导入脚本::
+
+    from my_module import enable_http_replay
+    enable_http_replay('bench/hde.jsonl.gz', latency=0.2)
+    import scrapy_hde
+
+没有通过 `build_http_session` 创建的会话，可以用 `install_http_transport` 手动挂载。
+
+:author: assassing
+:contact: https://github.com/hxz393
+:copyright: Copyright 2027, hxz393. 保留所有权利。
+"""
+import base64
+import gzip
+import hashlib
+import io
+import json
+import logging
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPResponse
+
+from .build_http_session import SESSION_HOOKS
+
+logger = logging.getLogger(__name__)
+
+SKIPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding")  # 录制的是解压后的内容，这些头不再准确
+
+_TRANSPORT: Optional[Tuple[str, "HttpArchive", float, float]] = None  # 当前生效的 (模式, 归档, 延迟, 抖动)
+
+
+def get_request_key(method: str, url: str, body) -> str:
+    """
+    生成请求的匹配键。
+
+    :param method: 请求方法
+    :type method: str
+    :param url: 完整请求地址
+    :type url: str
+    :param body: 请求体，流式请求体不参与匹配
+    :return: 匹配键
+    :rtype: str
+    """
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    digest = hashlib.sha1(body).hexdigest() if isinstance(body, bytes) else ""
+    return f"{method.upper()} {url} {digest}"
+
+
+class HttpArchive:
+    """
+    录制归档，每行一条 JSON 记录，按 gzip 分段追加写入，录制中途退出也不会丢失已写入的记录。
+
+    回放时同一个请求有多条记录就按录制顺序依次返回，用完后一直返回最后一条。
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: 归档文件路径，例如 'bench/hde.jsonl.gz'
+        :type path: str
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._records: Optional[Dict[str, List[dict]]] = None
+        self._cursors: Dict[str, int] = {}
+
+    def append(self, record: dict) -> None:
+        """
+        追加一条记录。
+
+        :param record: 记录内容
+        :type record: dict
+        :return: 无
+        """
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(line)
+
+    def load(self) -> Dict[str, List[dict]]:
+        """
+        读取归档并按匹配键分组，只读取一次。
+
+        :return: 匹配键到记录列表的映射
+        :rtype: Dict[str, List[dict]]
+        """
+        with self._lock:
+            if self._records is None:
+                records: Dict[str, List[dict]] = {}
+                with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            record = json.loads(line)
+                            records.setdefault(record["key"], []).append(record)
+                self._records = records
+            return self._records
+
+    def find(self, key: str) -> Optional[dict]:
+        """
+        取出下一条匹配的记录。
+
+        :param key: 匹配键
+        :type key: str
+        :return: 记录，归档中没有这个请求时返回 None
+        :rtype: Optional[dict]
+        """
+        records = self.load().get(key)
+        if not records:
+            return None
+        with self._lock:
+            index = self._cursors.get(key, 0)
+            self._cursors[key] = index + 1
+        return records[min(index, len(records) - 1)]
+
+
+class RecordingHTTPAdapter(HTTPAdapter):
+    """正常发送请求，并把每次的请求和响应写入归档。流式响应会被完整读入内存后再录制。"""
+
+    def __init__(self, archive: HttpArchive, adapter: HTTPAdapter):
+        """
+        :param archive: 录制归档
+        :type archive: HttpArchive
+        :param adapter: 实际发送请求的适配器，沿用它的连接池和重试设置
+        :type adapter: HTTPAdapter
+        """
+        super().__init__()
+        self.archive = archive
+        self.adapter = adapter
+
+    def send(self, request, **kwargs):
+        response = self.adapter.send(request, **kwargs)
+        self.archive.append({
+            "key": get_request_key(request.method, request.url, request.body),
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {k: v for k, v in response.headers.items() if k.lower() not in SKIPPED_HEADERS},
+            "content": base64.b64encode(response.content).decode("ascii"),
+            "elapsed": response.elapsed.total_seconds(),
+        })
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+class ReplayHTTPAdapter(HTTPAdapter):
+    """不访问网络，从归档中取出响应。"""
+
+    def __init__(self, archive: HttpArchive, latency: float = 0.0, jitter: float = 0.0):
+        """
+        :param archive: 录制归档
+        :type archive: HttpArchive
+        :param latency: 每个请求固定等待的秒数，模拟网络延迟
+        :type latency: float
+        :param jitter: 在固定延迟上再随机增加 0 到 jitter 秒
+        :type jitter: float
+        """
+        super().__init__()
+        self.archive = archive
+        self.latency = latency
+        self.jitter = jitter
+
+    def send(self, request, **kwargs):
+        key = get_request_key(request.method, request.url, request.body)
+        record = self.archive.find(key)
+        if record is None:
+            raise requests.ConnectionError(f"回放归档中没有这个请求：{key}", request=request)
+
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+        raw = HTTPResponse(
+            body=io.BytesIO(base64.b64decode(record["content"])),
+            headers=record["headers"],
+            status=record["status"],
+            reason=record["reason"],
+            preload_content=False,
+            decode_content=False,
+        )
+        return self.build_response(request, raw)
+
+
+def install_http_transport(session: requests.Session) -> requests.Session:
+    """
+    按当前的录制或回放设置，给会话挂上对应适配器。没有开启时原样返回。
+
+    :param session: 要挂载的会话
+    :type session: requests.Session
+    :return: 同一个会话
+    :rtype: requests.Session
+    """
+    if _TRANSPORT is None:
+        return session
+
+    mode, archive, latency, jitter = _TRANSPORT
+    for prefix in ("http://", "https://"):
+        adapter = session.get_adapter(prefix)
+        if isinstance(adapter, (RecordingHTTPAdapter, ReplayHTTPAdapter)):
+            continue
+        if mode == "record":
+            session.mount(prefix, RecordingHTTPAdapter(archive, adapter))
+        else:
+            session.mount(prefix, ReplayHTTPAdapter(archive, latency, jitter))
+    return session
+
+
+def enable_http_record(path: str) -> None:
+    """
+    开启录制，之后创建的会话会把请求和响应追加写入归档。
+
+    :param path: 归档文件路径
+    :type path: str
+    :return: 无
+    """
+    global _TRANSPORT
+    _TRANSPORT = ("record", HttpArchive(path), 0.0, 0.0)
+    if install_http_transport not in SESSION_HOOKS:
+        SESSION_HOOKS.append(install_http_transport)
+    logger.info(f"HTTP 录制已开启：{path}")
+
+
+def enable_http_replay(path: str, latency: float = 0.0, jitter: float = 0.0) -> None:
+    """
+    开启回放，之后创建的会话不再访问网络，只从归档中返回响应。
+
+    :param path: 归档文件路径
+    :type path: str
+    :param latency: 每个请求固定等待的秒数
+    :type latency: float
+    :param jitter: 在固定延迟上再随机增加 0 到 jitter 秒
+    :type jitter: float
+    :return: 无
+    """
+    global _TRANSPORT
+    _TRANSPORT = ("replay", HttpArchive(path), latency, jitter)
+    if install_http_transport not in SESSION_HOOKS:
+        SESSION_HOOKS.append(install_http_transport)
+    logger.info(f"HTTP 回放已开启：{path}，延迟 {latency}s + 抖动 {jitter}s")
+
+
+def disable_http_transport() -> None:
+    """
+    关闭录制或回放，之后创建的会话恢复直接访问网络。已创建的会话不受影响。
+
+    :return: 无
+    """
+    global _TRANSPORT
+    _TRANSPORT = None
+    if install_http_transport in SESSION_HOOKS:
+        SESSION_HOOKS.remove(install_http_transport)
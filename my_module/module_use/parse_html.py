@@ -0,0 +1,76 @@
+"""
+这是一个Python文件，包含抓取脚本共用的 HTML 解析入口 `parse_html`。
+
+各解析函数原本直接调用 `BeautifulSoup(text, 'html.parser')`，纯 Python 实现的 html.parser 是最慢的建树方式。
+`parse_html` 返回的仍是 `BeautifulSoup` 对象，`select` / `find` / `get_text` 等写法和 CSS 选择器都不用改，
+只是把底层解析器换成 C 实现的 lxml，同样的页面建树要快好几倍：
+
+- 安装了 lxml 时默认使用 lxml，否则回退到 html.parser；
+- 各脚本用配置项 ``html_parser`` 单独切换，某个站点的页面在两种解析器下结果不一致时，可以只把这个站点切回 html.parser；
+- 列表页只需要其中一个容器时，传入 `build_strainer` 生成的过滤条件，只为匹配的节点及其子树建树，
+  页头、脚本和侧栏在解析时直接跳过，耗时和内存峰值都会下降。
+
+:author: assassing
+:contact: https://github.com/hxz393
+:copyright: Copyright 2027, hxz393. 保留所有权利。
+"""
+import importlib.util
+import re
+from typing import Optional, Union
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+HTML_PARSERS = ("lxml", "html.parser")  # 支持的解析器，按速度从快到慢排列
+
+
+def get_default_html_parser() -> str:
+    """
+    返回当前环境可用的最快解析器。
+
+    :return: 解析器名称
+    :rtype: str
+    """
+    return "lxml" if importlib.util.find_spec("lxml") is not None else "html.parser"
+
+
+DEFAULT_HTML_PARSER = get_default_html_parser()
+
+
+def build_strainer(name: str, class_name: Optional[str] = None, **attrs) -> SoupStrainer:
+    """
+    生成只保留指定节点的过滤条件，匹配节点的整棵子树都会保留。
+
+    解析过程中 class 还是原始字符串，``SoupStrainer(class_="a")`` 匹配不到 ``class="a b"``，
+    这里按空白分隔的单个类名匹配，和 CSS 选择器 ``.a`` 的含义一致。
+
+    :param name: 标签名
+    :type name: str
+    :param class_name: 需要包含的单个类名
+    :type class_name: Optional[str]
+    :param attrs: 其他属性条件，例如 ``id="archive-content"``
+    :return: 过滤条件
+    :rtype: SoupStrainer
+    """
+    if class_name:
+        attrs["class"] = re.compile(rf"(?:^|\s){re.escape(class_name)}(?:\s|$)")
+    return SoupStrainer(name, attrs=attrs)
+
+
+def parse_html(markup: Union[str, bytes], parser: Optional[str] = None, parse_only: Optional[SoupStrainer] = None) -> BeautifulSoup:
+    """
+    解析 HTML 文本。
+
+    :param markup: HTML 文本或字节串
+    :type markup: Union[str, bytes]
+    :param parser: 解析器名称，为空时使用 `DEFAULT_HTML_PARSER`
+    :type parser: Optional[str]
+    :param parse_only: 只解析匹配的节点，为空时解析整个文档
+    :type parse_only: Optional[SoupStrainer]
+    :return: 解析后的文档
+    :rtype: BeautifulSoup
+    :raise ValueError: 解析器名称不受支持时抛出
+    """
+    parser = parser or DEFAULT_HTML_PARSER
+    if parser not in HTML_PARSERS:
+        raise ValueError(f"不支持的 HTML 解析器：{parser}，可选 {', '.join(HTML_PARSERS)}")
+    return BeautifulSoup(markup, parser, parse_only=parse_only)
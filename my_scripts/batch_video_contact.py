@@ -0,0 +1,228 @@
+"""
+批量为整个影片库生成视频截图。
+
+整理流程只在处理单个电影目录时调用 ``ensure_movie_screenshots``；镜像和归档目录里已有的几千部电影
+需要补截图或重新生成时，用这里的 ``batch_video_contact`` 遍历根目录：
+
+- 同名 ``_s.jpg`` 存在且修改时间不早于视频时跳过，只处理缺少截图或截图过期的视频；
+- 用线程池并发生成，线程数默认取 CPU 核数，最多 4 个，每个视频先用 ``generate_video_contact``，失败再用 mtn 兜底。
+  每张截图都要整张网格常驻内存，4K 视频一张就有几百 MB，所以批量时不再开启单张截图内的并行抽帧；
+- 重新生成过期截图时，旧截图先改名备份，生成失败就恢复，不会丢掉原有截图；
+  上次运行在生成途中被中断留下的备份视为截图未完成，下次运行先恢复备份再重新生成；
+- 每处理完一个视频就向清单文件追加一行 JSON 并立即写盘。中断后再次运行时，已完成的视频按截图时间跳过，
+  清单里记录失败且文件没有变化的视频也直接跳过，不会在坏文件上反复耗时，加上 ``retry_failed`` 可以重试。
+
+:author: assassing
+:contact: https://github.com/hxz393
+:copyright: Copyright 2027, hxz393. 保留所有权利。
+"""
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Optional
+
+from video_tools import CONFIG, VIDEO_EXTENSION_SET, generate_video_contact, generate_video_contact_mtn
+
+logger = logging.getLogger(__name__)
+
+BATCH_CONTACT_WORKERS = CONFIG.get('contact_batch_workers') or min(4, os.cpu_count() or 1)  # 批量截图并发数，留空时取 CPU 核数，最多 4 个
+BATCH_CONTACT_MANIFEST = CONFIG.get('contact_batch_manifest', 'cache/video_contact_manifest.jsonl')  # 批量截图进度清单
+BATCH_CONTACT_REPORT_EVERY = 50  # 每完成多少个视频输出一次进度
+
+
+def get_contact_sheet_path(video_path: str) -> str:
+    """
+    返回视频对应的截图路径。
+
+    :param video_path: 视频文件路径
+    :return: 同名 ``_s.jpg`` 路径
+    """
+    return os.path.splitext(video_path)[0] + "_s.jpg"
+
+
+def get_contact_backup_path(video_path: str) -> str:
+    """
+    返回重新生成截图时旧截图的备份路径。
+
+    :param video_path: 视频文件路径
+    :return: 截图路径加 ``.bak`` 后缀
+    """
+    return get_contact_sheet_path(video_path) + ".bak"
+
+
+def get_video_identity(video_path: str) -> Optional[dict]:
+    """
+    读取视频大小和修改时间，用于判断清单记录是否仍然对应同一个文件。
+
+    :param video_path: 视频文件路径
+    :return: 包含 ``size`` 和 ``mtime_ns`` 的字典；文件无法访问时返回 ``None``
+    """
+    try:
+        stat = os.stat(video_path)
+    except OSError:
+        return None
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def is_contact_sheet_fresh(video_path: str) -> bool:
+    """
+    判断截图是否存在且不早于视频。留有备份时说明上次生成被中断，截图可能不完整，视为过期。
+
+    :param video_path: 视频文件路径
+    :return: 截图存在、修改时间不早于视频且没有遗留备份时返回 ``True``
+    """
+    if os.path.exists(get_contact_backup_path(video_path)):
+        return False
+    try:
+        return os.stat(get_contact_sheet_path(video_path)).st_mtime_ns >= os.stat(video_path).st_mtime_ns
+    except OSError:
+        return False
+
+
+def find_stale_videos(root: str) -> list[str]:
+    """
+    递归查找缺少截图或截图过期的视频，按路径排序。
+
+    :param root: 根目录
+    :return: 需要生成截图的视频路径列表
+    """
+    videos = []
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names.sort(key=str.casefold)
+        for file_name in sorted(file_names, key=str.casefold):
+            if os.path.splitext(file_name)[1].lower() not in VIDEO_EXTENSION_SET:
+                continue
+            video_path = os.path.join(dir_path, file_name)
+            if not is_contact_sheet_fresh(video_path):
+                videos.append(video_path)
+    return videos
+
+
+def load_manifest(path: str) -> dict[str, dict]:
+    """
+    读取清单文件，同一视频保留最后一条记录。最后一行写到一半时忽略该行。
+
+    :param path: 清单文件路径
+    :return: 规范化视频路径到记录的映射
+    """
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"清单中有损坏的记录，已忽略：{line.strip()[:100]}")
+                continue
+            records[os.path.normcase(record["video"])] = record
+    return records
+
+
+def render_contact_sheet(video_path: str) -> Optional[str]:
+    """
+    为单个视频生成截图，失败时用 mtn 兜底。已有的过期截图先备份，全部失败时恢复。
+
+    :param video_path: 视频文件路径
+    :return: 失败时返回错误信息，成功返回 ``None``
+    """
+    sheet_path = get_contact_sheet_path(video_path)
+    backup_path = get_contact_backup_path(video_path)
+    if os.path.exists(backup_path):
+        # 上次生成被中断，当前截图可能只写了一半，先换回旧截图
+        os.replace(backup_path, sheet_path)
+    if os.path.exists(sheet_path):
+        os.replace(sheet_path, backup_path)
+    else:
+        backup_path = None
+
+    error = None
+    try:
+        generate_video_contact(video_path, frame_workers=0)
+    except Exception as e:
+        error = f"生成缩略图失败: {e}"
+        logger.warning(f"{video_path} {error}")
+    if not os.path.exists(sheet_path):
+        generate_video_contact_mtn(video_path)
+
+    if os.path.exists(sheet_path):
+        if backup_path:
+            os.remove(backup_path)
+        return None
+    if backup_path:
+        os.replace(backup_path, sheet_path)
+    return error or "生成缩略图失败"
+
+
+def batch_video_contact(
+        roots: Iterable[str],
+        *,
+        manifest_path: str = BATCH_CONTACT_MANIFEST,
+        workers: int = BATCH_CONTACT_WORKERS,
+        retry_failed: bool = False,
+) -> dict[str, int]:
+    """
+    遍历根目录，为缺少截图或截图过期的视频并发生成截图，进度写入清单。
+
+    :param roots: 根目录列表
+    :param manifest_path: 清单文件路径
+    :param workers: 并发数
+    :param retry_failed: 是否重试清单中记录失败且文件未变化的视频
+    :return: 各状态的视频数量
+    """
+    manifest = load_manifest(manifest_path)
+    counts = {"done": 0, "failed": 0, "skipped": 0}
+    pending = []
+    for root in roots:
+        for video_path in find_stale_videos(root):
+            video_path = os.path.abspath(video_path)
+            record = manifest.get(os.path.normcase(video_path))
+            identity = get_video_identity(video_path)
+            if (
+                    not retry_failed
+                    and record
+                    and record["status"] == "failed"
+                    and identity
+                    and record["size"] == identity["size"]
+                    and record["mtime_ns"] == identity["mtime_ns"]
+            ):
+                counts["skipped"] += 1
+                continue
+            pending.append((video_path, identity))
+    logger.info(f"待生成截图 {len(pending)} 个，跳过之前失败的 {counts['skipped']} 个")
+    if not pending:
+        return counts
+
+    manifest_dir = os.path.dirname(manifest_path)
+    if manifest_dir:
+        os.makedirs(manifest_dir, exist_ok=True)
+    started_at = time.monotonic()
+    with open(manifest_path, "a", encoding="utf-8") as manifest_file, ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(render_contact_sheet, video_path): (video_path, identity) for video_path, identity in pending}
+        try:
+            for future in as_completed(futures):
+                video_path, identity = futures.pop(future)
+                try:
+                    error = future.result()
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                status = "failed" if error else "done"
+                counts[status] += 1
+                if error:
+                    logger.error(f"截图失败：{video_path}：{error}")
+                record = {"video": video_path, "status": status, **(identity or {"size": None, "mtime_ns": None}), "error": error, "finished_at": time.time()}
+                manifest_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                manifest_file.flush()
+
+                finished = counts["done"] + counts["failed"]
+                if finished % BATCH_CONTACT_REPORT_EVERY == 0:
+                    logger.info(f"截图进度 {finished}/{len(pending)}，用时 {time.monotonic() - started_at:.0f} 秒")
+        except BaseException:
+            # 中断时取消还没开始的任务，已完成的记录都已写入清单
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+    logger.info(f"截图完成 {counts['done']} 个，失败 {counts['failed']} 个，用时 {time.monotonic() - started_at:.0f} 秒")
+    return counts
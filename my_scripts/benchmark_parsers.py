@@ -0,0 +1,242 @@
+"""
+各站点页面解析函数的离线基准测试。
+
+单元测试只用几行内联 HTML 校验结果，测不出整页解析的耗时。这里用 ``tests_main/fixtures/parsers``
+下保存的整页样本（gzip 压缩，文件名以站点和页面类型开头），对每个解析函数逐页测量：
+
+- 单页耗时：重复运行 ``--repeat`` 次，取中位数和最小值；
+- 内存分配：用 ``tracemalloc`` 单独运行一次，记录解析过程中的内存峰值。
+
+加上 ``--save-baseline`` 把结果存成基线，之后用 ``--baseline`` 对比，
+耗时或内存峰值超过基线 ``--threshold`` 比例时列出退化项并以非零状态退出。
+基线与机器相关，请在同一台机器上保存和对比。
+
+样本页面可以直接替换成站点上另存的页面，只要保持文件名前缀不变。
+
+用法::
+
+    python my_scripts/benchmark_parsers.py --repeat 20 --save-baseline parser_baseline.json
+    python my_scripts/benchmark_parsers.py --repeat 20 --baseline parser_baseline.json --threshold 0.25
+
+:author: assassing
+:contact: https://github.com/hxz393
+:copyright: Copyright 2027, hxz393. 保留所有权利。
+"""
+import argparse
+import gzip
+import importlib
+import json
+import logging
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from types import ModuleType, SimpleNamespace
+from typing import Any, Callable, Mapping
+
+logger = logging.getLogger(__name__)
+
+FIXTURE_DIR = Path(__file__).resolve().parents[1] / "tests_main" / "fixtures" / "parsers"  # 样本页面目录
+MIN_REGRESSION_MS = 0.5  # 耗时增加不足这个毫秒数时视为计时抖动，不判为退化
+
+
+@dataclass(frozen=True)
+class ParserCase:
+    """
+    一个解析函数的基准用例。
+
+    ``argument`` 决定样本文本的传入方式：``response`` 包装成带 ``text`` 属性的响应对象，
+    ``text`` 直接传入，``lines`` 按行拆分后传入。
+    """
+    name: str
+    module: str
+    function: str
+    fixture: str
+    argument: str = "response"
+
+    def build_call(self, module: ModuleType, text: str) -> Callable[[], Any]:
+        """返回对一页样本调用解析函数的无参函数，参数转换不计入耗时。"""
+        func = getattr(module, self.function)
+        if self.argument == "response":
+            arg = SimpleNamespace(text=text)
+        elif self.argument == "lines":
+            arg = text.splitlines()
+        elif self.argument == "text":
+            arg = text
+        else:
+            raise ValueError(f"未知的参数方式：{self.argument}")
+        return lambda: func(arg)
+
+
+PARSER_CASES = (
+    ParserCase("sk_list", "scrapy_sk", "parse_sk_response", "sk_list"),  # 逐行调用 parse_sk_row
+    ParserCase("mp_list", "scrapy_mp", "parse_mp_response", "mp_list"),  # 逐条调用 parse_mp_article
+    ParserCase("mp_format_text", "scrapy_mp", "format_mp_text", "mp_detail", "text"),
+    ParserCase("mp_release_sizes", "scrapy_mp", "fill_mp_release_sizes", "mp_detail", "lines"),
+    ParserCase("hde_list", "scrapy_hde", "parse_hde_response", "hde_list"),  # 逐条调用 parse_hde_item
+    ParserCase("dhd_list", "scrapy_dhd", "parse_dhd_response", "dhd_list", "text"),
+    ParserCase("dhd_dl_url", "scrapy_dhd", "extract_dl_url", "dhd_detail", "text"),
+)
+
+
+def find_fixture_pages(fixture_dir: Path, prefix: str) -> list[Path]:
+    """列出以 ``prefix`` 开头的样本页面，按文件名排序。"""
+    return sorted(path for path in fixture_dir.glob(f"{prefix}*") if path.is_file())
+
+
+def read_fixture_page(path: Path) -> str:
+    """读取样本页面，``.gz`` 结尾的文件先解压。"""
+    if path.suffix == ".gz":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return f.read()
+    return path.read_text(encoding="utf-8")
+
+
+def count_items(result: Any) -> int:
+    """统计解析结果的条目数，用于发现样本页面和解析函数不再匹配。"""
+    if isinstance(result, str):
+        return int(bool(result))
+    if isinstance(result, (list, tuple, dict)):
+        return len(result)
+    return int(result is not None)
+
+
+def measure_parser_call(call: Callable[[], Any], repeat: int) -> dict[str, float]:
+    """重复运行 ``repeat`` 次取耗时，再单独运行一次记录内存峰值。"""
+    durations = []
+    result = None
+    for _ in range(max(repeat, 1)):
+        started_at = time.perf_counter()
+        result = call()
+        durations.append(time.perf_counter() - started_at)
+
+    # tracemalloc 会显著拖慢运行，单独跑一次，不影响计时
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    tracemalloc.clear_traces()
+    base_size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    call()
+    _, peak_size = tracemalloc.get_traced_memory()
+    if not was_tracing:
+        tracemalloc.stop()
+
+    return {
+        "items": count_items(result),
+        "median_ms": round(statistics.median(durations) * 1000, 3),
+        "min_ms": round(min(durations) * 1000, 3),
+        "peak_kib": round((peak_size - base_size) / 1024, 1),
+    }
+
+
+def run_parser_benchmark(
+        cases: tuple[ParserCase, ...] = PARSER_CASES,
+        *,
+        fixture_dir: Path = FIXTURE_DIR,
+        repeat: int = 10,
+        modules: Mapping[str, ModuleType] | None = None,
+) -> list[dict]:
+    """
+    对每个用例的每页样本测量一次，返回结果列表。
+
+    ``modules`` 为空时按用例里的模块名导入站点脚本；样本缺失或解析结果为空时直接报错，
+    避免站点改版后基准还在测一个什么都没解析出来的页面。
+    """
+    modules = dict(modules or {})
+    results = []
+    for case in cases:
+        module = modules.get(case.module)
+        if module is None:
+            module = modules[case.module] = importlib.import_module(case.module)
+        pages = find_fixture_pages(fixture_dir, case.fixture)
+        if not pages:
+            raise FileNotFoundError(f"{case.name} 缺少样本页面：{fixture_dir / case.fixture}*")
+        for page in pages:
+            measurement = measure_parser_call(case.build_call(module, read_fixture_page(page)), repeat)
+            if not measurement["items"]:
+                raise ValueError(f"{case.name} 在样本 {page.name} 上没有解析出结果，样本或解析函数需要更新")
+            results.append({"case": case.name, "page": page.name, **measurement})
+    return results
+
+
+def get_result_key(result: Mapping) -> str:
+    """基线里每条结果的键。"""
+    return f"{result['case']}/{result['page']}"
+
+
+def load_baseline(path: str) -> dict[str, dict]:
+    """读取基线文件。"""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, results: list[dict]) -> None:
+    """把本次结果保存为基线。"""
+    baseline = {get_result_key(result): {k: result[k] for k in ("median_ms", "peak_kib")} for result in results}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def find_regressions(results: list[dict], baseline: Mapping[str, Mapping], threshold: float) -> list[str]:
+    """
+    对比基线，返回退化说明列表。
+
+    耗时需要同时超过比例阈值和 ``MIN_REGRESSION_MS`` 才算退化；基线中没有的页面不参与对比。
+    """
+    regressions = []
+    for result in results:
+        key = get_result_key(result)
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        old_ms, new_ms = previous["median_ms"], result["median_ms"]
+        if new_ms > old_ms * (1 + threshold) and new_ms - old_ms >= MIN_REGRESSION_MS:
+            regressions.append(f"{key} 耗时 {old_ms}ms -> {new_ms}ms")
+        old_kib, new_kib = previous["peak_kib"], result["peak_kib"]
+        if new_kib > old_kib * (1 + threshold):
+            regressions.append(f"{key} 内存峰值 {old_kib}KiB -> {new_kib}KiB")
+    return regressions
+
+
+def format_benchmark_table(results: list[dict]) -> list[str]:
+    """把测量结果整理成对齐的文本表格。"""
+    columns = ("case", "page", "items", "median_ms", "min_ms", "peak_kib")
+    widths = {column: max(len(column), *(len(str(result[column])) for result in results)) for column in columns}
+    lines = ["  ".join(column.rjust(widths[column]) for column in columns)]
+    for result in results:
+        lines.append("  ".join(str(result[column]).rjust(widths[column]) for column in columns))
+    return lines
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """解析命令行参数。"""
+    parser = argparse.ArgumentParser(description="页面解析函数离线基准测试")
+    parser.add_argument("--repeat", type=int, default=10, help="每页重复运行次数")
+    parser.add_argument("--cases", nargs="+", choices=[case.name for case in PARSER_CASES], help="只运行指定用例")
+    parser.add_argument("--fixtures", type=Path, default=FIXTURE_DIR, help="样本页面目录")
+    parser.add_argument("--baseline", default=None, help="对比用的基线文件")
+    parser.add_argument("--save-baseline", default=None, help="把本次结果保存为基线文件")
+    parser.add_argument("--threshold", type=float, default=0.25, help="允许的退化比例")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args = parse_args()
+    selected_cases = tuple(case for case in PARSER_CASES if not args.cases or case.name in args.cases)
+    benchmark_results = run_parser_benchmark(selected_cases, fixture_dir=args.fixtures, repeat=args.repeat)
+    for table_line in format_benchmark_table(benchmark_results):
+        logger.info(table_line)
+    if args.save_baseline:
+        save_baseline(args.save_baseline, benchmark_results)
+        logger.info(f"基线已保存：{args.save_baseline}")
+    if args.baseline:
+        found_regressions = find_regressions(benchmark_results, load_baseline(args.baseline), args.threshold)
+        for regression in found_regressions:
+            logger.error(f"解析退化：{regression}")
+        if found_regressions:
+            sys.exit(1)
+        logger.info(f"没有超过 {args.threshold:.0%} 的退化")
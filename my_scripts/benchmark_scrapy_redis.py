@@ -0,0 +1,293 @@
+"""
+``scrapy_redis`` 队列引擎的离线基准测试。
+
+默认使用 ``fakeredis[lua]`` 在进程内模拟 Redis，也可以通过 ``--redis-url`` 指向本地启动的
+``redis-server``。worker 只按配置的耗时分布睡眠并按失败率抛出异常，不访问任何站点，
+用于在改动 ``drain_queue`` / ``push_items_to_queue`` 前后对比吞吐、Redis 往返次数和尾延迟。
+
+用法::
+
+    python my_scripts/benchmark_scrapy_redis.py --items 2000 --workers 1 8 32 64 --latency-ms 20
+
+:author: assassing
+:contact: https://github.com/hxz393
+:copyright: Copyright 2027, hxz393. 保留所有权利。
+"""
+import argparse
+import logging
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable
+
+import redis
+
+from scrapy_redis import (
+    QueueMetrics,
+    RetryPolicy,
+    drain_queue,
+    push_items_to_queue,
+    serialize_payload,
+)
+
+try:
+    import fakeredis
+except ImportError:  # pragma: no cover - 由依赖安装状态决定
+    fakeredis = None
+
+logger = logging.getLogger(__name__)
+queue_logger = logging.getLogger(f"{__name__}.queue")  # drain_queue 的日志，运行时只保留严重错误
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+
+class SyntheticTaskError(RuntimeError):
+    """合成 worker 按失败率抛出的异常。"""
+
+
+@dataclass(frozen=True)
+class SyntheticWorkload:
+    """
+    合成 worker 的耗时和失败分布。
+
+    ``latency_ms`` 为平均耗时；``uniform`` 在 ``[0, 2 * latency_ms]`` 间均匀分布，
+    ``lognormal`` 以 ``latency_sigma`` 控制长尾，``fixed`` 为固定耗时。
+    """
+    latency_ms: float = 20.0
+    distribution: str = "lognormal"
+    latency_sigma: float = 0.5
+    failure_rate: float = 0.0
+    seed: int = 0
+
+    def build_worker(self) -> Callable[[dict], None]:
+        """返回按本分布睡眠、按失败率抛出异常的 worker。"""
+        if self.distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"未知的耗时分布：{self.distribution}")
+        rng = random.Random(self.seed)
+        lock = threading.Lock()
+        mean_seconds = self.latency_ms / 1000
+
+        def synthetic_worker(_info: dict) -> None:
+            with lock:
+                if self.distribution == "fixed":
+                    seconds = mean_seconds
+                elif self.distribution == "uniform":
+                    seconds = rng.uniform(0, 2 * mean_seconds)
+                else:
+                    # 让对数正态分布的均值等于 latency_ms
+                    mu = -self.latency_sigma ** 2 / 2
+                    seconds = mean_seconds * rng.lognormvariate(mu, self.latency_sigma)
+                failed = rng.random() < self.failure_rate
+            time.sleep(seconds)
+            if failed:
+                raise SyntheticTaskError("synthetic failure")
+
+        return synthetic_worker
+
+
+class CountingRedis:
+    """统计命令数和网络往返次数的 Redis 客户端代理；管道按一次往返、多条命令计数。"""
+
+    def __init__(self, redis_client: redis.Redis):
+        self._redis_client = redis_client
+        self._lock = threading.Lock()
+        self.round_trips = 0
+        self.commands = 0
+
+    def record(self, commands: int) -> None:
+        """记录一次往返及其中的命令数。"""
+        with self._lock:
+            self.round_trips += 1
+            self.commands += commands
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._redis_client, name)
+        if not callable(attr):
+            return attr
+        if name == "pipeline":
+            return lambda *args, **kwargs: CountingPipeline(attr(*args, **kwargs), self)
+
+        def counted_command(*args, **kwargs):
+            self.record(1)
+            return attr(*args, **kwargs)
+
+        return counted_command
+
+
+class CountingPipeline:
+    """``CountingRedis`` 使用的管道代理。"""
+
+    def __init__(self, pipeline, counter: CountingRedis):
+        self._pipeline = pipeline
+        self._counter = counter
+
+    def __getattr__(self, name: str):
+        return getattr(self._pipeline, name)
+
+    def execute(self, *args, **kwargs):
+        self._counter.record(len(self._pipeline.command_stack))
+        return self._pipeline.execute(*args, **kwargs)
+
+
+def get_benchmark_redis(redis_url: str | None = None) -> redis.Redis:
+    """返回基准测试用的 Redis 客户端：指定 URL 时连接本地服务，否则使用进程内 fakeredis。"""
+    if redis_url:
+        return redis.Redis.from_url(redis_url, decode_responses=True)
+    if fakeredis is None:
+        raise RuntimeError("未安装 fakeredis[lua]，请安装或通过 --redis-url 指定本地 redis-server")
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def run_drain_benchmark(
+        redis_client: redis.Redis,
+        *,
+        item_count: int,
+        max_workers: int,
+        workload: SyntheticWorkload,
+        lease_seconds: float | None = None,
+        retry_policy_enabled: bool = False,
+) -> dict[str, float]:
+    """
+    入队 ``item_count`` 个合成任务并用 ``drain_queue`` 消费，返回一轮的测量结果。
+
+    ``efficiency`` 为实际吞吐与理想吞吐（``max_workers`` / 平均耗时）之比，用于观察队列开销。
+    """
+    prefix = f"benchmark:scrapy_redis:{uuid.uuid4().hex}"
+    keys = {name: f"{prefix}:{name}" for name in ("seen", "pending", "processing", "failed", "retry")}
+    counter = CountingRedis(redis_client)
+    items = [{"id": str(index), "url": f"https://bench.example/{index}"} for index in range(item_count)]
+
+    push_started_at = time.perf_counter()
+    push_items_to_queue(
+        counter,
+        items,
+        seen_key=keys["seen"],
+        pending_key=keys["pending"],
+        unique_value=lambda item: item["id"],
+        serializer=serialize_payload,
+    )
+    push_seconds = time.perf_counter() - push_started_at
+    push_round_trips = counter.round_trips
+
+    # 传入自己的收集器并关闭写出，开启 metrics_enabled 时基准结果也不会写进指标哈希和 .prom 文件
+    metrics = QueueMetrics(f"BENCH-{max_workers}")
+    retry_policy = RetryPolicy(keys["retry"], max_attempts=3, base_delay=0.01, poll_seconds=0.01) if retry_policy_enabled else None
+    drain_started_at = time.perf_counter()
+    try:
+        counts = drain_queue(
+            counter,
+            pending_key=keys["pending"],
+            processing_key=keys["processing"],
+            failed_key=keys["failed"],
+            max_workers=max_workers,
+            worker=workload.build_worker(),
+            logger=queue_logger,
+            queue_label=f"BENCH-{max_workers}",
+            identify_item=lambda info: info["url"],
+            lease_seconds=lease_seconds,
+            retry_policy=retry_policy,
+            metrics=metrics,
+            publish_metrics=False,
+        )
+    finally:
+        drain_seconds = time.perf_counter() - drain_started_at
+        redis_client.delete(*keys.values(), f"{keys['processing']}:leases")
+
+    summary = metrics.summarize()
+    ideal_throughput = max_workers / (workload.latency_ms / 1000) if workload.latency_ms else float("inf")
+    throughput = counts["processed"] / drain_seconds if drain_seconds else 0.0
+    return {
+        "max_workers": max_workers,
+        "items": item_count,
+        "processed": counts["processed"],
+        "failed": counts["failed"],
+        "push_per_second": round(item_count / push_seconds, 1) if push_seconds else 0.0,
+        "push_round_trips": push_round_trips,
+        "drain_seconds": round(drain_seconds, 3),
+        "tasks_per_second": round(throughput, 1),
+        "efficiency": round(throughput / ideal_throughput, 3) if ideal_throughput != float("inf") else 0.0,
+        "task_p50_ms": round(summary["task_p50_seconds"] * 1000, 1),
+        "task_p95_ms": round(summary["task_p95_seconds"] * 1000, 1),
+        "task_p99_ms": round(summary["task_p99_seconds"] * 1000, 1),
+        "redis_round_trips": counter.round_trips - push_round_trips,
+        "redis_commands": counter.commands,
+        "redis_seconds": summary.get("redis_seconds", 0.0),
+    }
+
+
+def run_benchmark_suite(
+        *,
+        worker_counts: list[int],
+        item_count: int,
+        workload: SyntheticWorkload,
+        redis_url: str | None = None,
+        lease_seconds: float | None = None,
+        retry_policy_enabled: bool = False,
+) -> list[dict[str, float]]:
+    """对每个 ``max_workers`` 设置各跑一轮，并输出对比表格。"""
+    redis_client = get_benchmark_redis(redis_url)
+    results = [
+        run_drain_benchmark(
+            redis_client,
+            item_count=item_count,
+            max_workers=max_workers,
+            workload=workload,
+            lease_seconds=lease_seconds,
+            retry_policy_enabled=retry_policy_enabled,
+        )
+        for max_workers in worker_counts
+    ]
+    for line in format_benchmark_table(results):
+        logger.info(line)
+    return results
+
+
+def format_benchmark_table(results: list[dict[str, float]]) -> list[str]:
+    """把测量结果整理成对齐的文本表格。"""
+    columns = (
+        "max_workers", "tasks_per_second", "efficiency", "task_p50_ms", "task_p95_ms", "task_p99_ms",
+        "redis_round_trips", "redis_commands", "redis_seconds", "push_per_second",
+    )
+    widths = {column: max(len(column), *(len(str(result[column])) for result in results)) for column in columns}
+    lines = ["  ".join(column.rjust(widths[column]) for column in columns)]
+    for result in results:
+        lines.append("  ".join(str(result[column]).rjust(widths[column]) for column in columns))
+    return lines
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """解析命令行参数。"""
+    parser = argparse.ArgumentParser(description="scrapy_redis 队列引擎离线基准测试")
+    parser.add_argument("--items", type=int, default=2000, help="每轮入队的任务数")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32, 64], help="要对比的 max_workers")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="worker 平均耗时（毫秒）")
+    parser.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal", help="耗时分布")
+    parser.add_argument("--sigma", type=float, default=0.5, help="对数正态分布的 sigma")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="worker 失败概率")
+    parser.add_argument("--lease-seconds", type=float, default=None, help="启用租约模式")
+    parser.add_argument("--retry", action="store_true", help="启用 Redis 延迟重试")
+    parser.add_argument("--redis-url", default=None, help="本地 redis-server 地址，默认使用 fakeredis")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    queue_logger.setLevel(logging.CRITICAL)
+    args = parse_args()
+    run_benchmark_suite(
+        worker_counts=args.workers,
+        item_count=args.items,
+        workload=SyntheticWorkload(
+            latency_ms=args.latency_ms,
+            distribution=args.distribution,
+            latency_sigma=args.sigma,
+            failure_rate=args.failure_rate,
+            seed=args.seed,
+        ),
+        redis_url=args.redis_url,
+        lease_seconds=args.lease_seconds,
+        retry_policy_enabled=args.retry,
+    )
@@ -1,16 +1,23 @@
 """
 Google Drive 下载辅助函数。
+
+``download_gd_url`` 把整个文件读进内存，适合 NZB 这类小文件；
+``stream_gd_url`` 边下边写 ``.part`` 文件，中断后用 Range 请求续传，内存占用与文件大小无关；
+传入 ``segments`` 后，大文件按字节区间拆成多段并发下载，适合单连接很慢的代理线路。
 """
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 import html
 import re
+import time
 from pathlib import Path
 from urllib.parse import urlencode
 
 import requests
-from requests.adapters import HTTPAdapter
 from retrying import retry
 
+from my_module import build_http_session
+
 DEFAULT_HEADERS = {
     "User-Agent": "Mozilla/5.0",
     "Accept": "*/*",
@@ -28,6 +35,12 @@ FILE_ID_PATTERNS = [
     re.compile(r"[?&]id=([A-Za-z0-9_-]+)", re.IGNORECASE),
 ]
 VALID_NZB_MARKERS = (b"<?xml", b"<!doctype nzb", b"<nzb")
+SNIFF_SIZE = 2048  # 判断文件类型只看开头这么多字节
+STREAM_CHUNK_SIZE = 1024 * 1024  # 流式下载每次写盘的块大小
+STREAM_MAX_ATTEMPTS = 5  # 流式下载中断后最多续传几次
+STREAM_RETRY_SECONDS = 5  # 续传前等待秒数
+SEGMENT_MIN_SIZE = 8 * 1024 * 1024  # 分段下载时每段至少这么大，小文件直接单连接下载
+CONTENT_RANGE_RE = re.compile(r"bytes\s+(?:(\d+)-\d+|\*)/(\d+|\*)", re.IGNORECASE)
 
 requests.packages.urllib3.disable_warnings()
 SESSION_POOL_SIZE = 50
@@ -42,16 +55,18 @@ class DownloadedGdFile:
     suggested_suffix: str
 
 
+@dataclass(frozen=True)
+class StreamedGdFile:
+    drive_name: str | None
+    path: Path
+    size: int
+    content_type: str
+    suggested_suffix: str
+
 
 def build_session(pool_size: int = SESSION_POOL_SIZE) -> requests.Session:
     """创建较大的通用连接池，避免多线程下载时频繁丢连接。"""
-    pool_size = max(pool_size, 10)
-    client = requests.Session()
-    client.proxies = dict(SESSION_PROXIES)
-    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
-    client.mount("http://", adapter)
-    client.mount("https://", adapter)
-    return client
+    return build_http_session(pool_size, proxies=SESSION_PROXIES)
 
 
 session = build_session()
@@ -231,3 +246,245 @@ def download_gd_url(gd_url: str) -> DownloadedGdFile:
         content_type=content_type,
         suggested_suffix=infer_download_suffix(drive_name, payload, content_type),
     )
+
+
+@retry(stop_max_attempt_number=5, wait_random_min=15000, wait_random_max=20000)
+def open_binary_stream(url: str, referer: str | None = None, offset: int = 0) -> requests.Response:
+    """以流式方式打开下载链接，``offset`` 大于 0 时带上 Range 请求头从断点继续。"""
+    headers = dict(DEFAULT_HEADERS)
+    if referer:
+        headers["Referer"] = referer
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+
+    response = session.get(url, timeout=90, verify=False, headers=headers, stream=True)
+    # 416 表示断点已经到文件末尾，上次只差改名
+    if response.status_code == 416 and offset:
+        return response
+    if response.status_code not in (200, 206):
+        response.close()
+        raise RuntimeError(f"下载失败，HTTP {response.status_code}")
+    return response
+
+
+def open_drive_download_stream(download_url: str, referer: str, offset: int = 0) -> tuple[requests.Response, str | None]:
+    """打开 Drive 下载流，遇到大文件告警页时提交确认表单后重新打开。只有 HTML 响应才读取正文。"""
+    response = open_binary_stream(download_url, referer=referer, offset=offset)
+    if response.status_code == 416 or "text/html" not in response.headers.get("Content-Type", "").lower():
+        return response, None
+
+    text = response.text
+    response.close()
+    if "Virus scan warning" not in text and "can't scan this file for viruses" not in text:
+        raise RuntimeError("下载结果是 HTML 页面，不是有效文件")
+
+    confirm_url = build_confirm_download_url(text)
+    if not confirm_url:
+        raise RuntimeError("Google Drive 告警页缺少确认下载表单")
+
+    name_match = re.search(
+        r'<span class="uc-name-size"><a [^>]+>([^<]+)</a>',
+        text,
+        re.IGNORECASE,
+    )
+    warning_name = html.unescape(name_match.group(1)).strip() if name_match else None
+    return open_binary_stream(confirm_url, referer=referer, offset=offset), warning_name
+
+
+def get_stream_total_size(response: requests.Response, offset: int) -> int | None:
+    """从响应头推算文件总大小，服务器没有给出时返回 None。"""
+    if response.status_code in (206, 416):
+        match = CONTENT_RANGE_RE.search(response.headers.get("Content-Range", ""))
+        if not match:
+            raise RuntimeError("续传响应缺少 Content-Range")
+        if response.status_code == 206 and int(match.group(1) or -1) != offset:
+            raise RuntimeError(f"续传位置不符，请求 {offset}，返回 {match.group(1)}")
+        return None if match.group(2) == "*" else int(match.group(2))
+
+    content_length = response.headers.get("Content-Length")
+    if content_length and not response.headers.get("Content-Encoding"):
+        return int(content_length)
+    return None
+
+
+def write_stream_to_part(response: requests.Response, part_path: Path, offset: int) -> None:
+    """把响应按块写入 ``.part`` 文件。206 时追加，200 说明不支持续传，从头重写，416 说明已经下完。"""
+    if response.status_code == 416:
+        return
+    mode = "ab" if offset and response.status_code == 206 else "wb"
+    with part_path.open(mode) as f:
+        for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            if chunk:
+                f.write(chunk)
+
+
+def read_file_head(path: Path, size: int = SNIFF_SIZE) -> bytes:
+    """读取文件开头用于判断类型。"""
+    with path.open("rb") as f:
+        return f.read(size)
+
+
+def stream_gd_url(gd_url: str, part_path: str | Path, segments: int = 1) -> StreamedGdFile:
+    """
+    流式下载单个 Google Drive 地址到 ``part_path``。
+
+    ``part_path`` 已存在时从它的末尾续传；传输中断时按 Range 续传，最多 ``STREAM_MAX_ATTEMPTS`` 次。
+    ``segments`` 大于 1、文件总大小已知且足够大时改用分段并发下载，服务器拒绝 Range 时退回单连接。
+    分段下载只在从头开始时启用，已有 ``.part`` 文件时仍按单连接续传。
+    下载完成后校验大小，并只用文件开头判断是否 HTML 和建议后缀。调用方负责把 ``.part`` 文件改成最终文件名。
+    """
+    part_path = Path(part_path)
+    file_id = extract_drive_file_id(gd_url)
+    view_url = normalize_drive_view_url(gd_url, file_id)
+    view_response = get_binary_response(view_url)
+    drive_name, download_url = extract_drive_metadata(view_response.text, file_id)
+
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    response, warning_name = open_drive_download_stream(download_url, view_url, offset)
+    if warning_name:
+        drive_name = warning_name
+    # 416 响应的类型描述的是错误页，不是文件本身
+    content_type = response.headers.get("Content-Type", "") if response.status_code != 416 else ""
+    # 告警页确认后的直链会跳转，续传时直接请求最终地址
+    resume_url = response.url
+    total_size = None
+
+    if segments > 1 and not offset and response.status_code == 200:
+        total_size = get_stream_total_size(response, offset)
+        if total_size is not None and total_size >= SEGMENT_MIN_SIZE * 2:
+            response.close()
+            if download_segments(resume_url, view_url, part_path, total_size, segments):
+                return build_streamed_file(drive_name, part_path, content_type, total_size)
+            # 服务器不支持 Range，重新打开单连接下载
+            response = open_binary_stream(resume_url, referer=view_url)
+
+    for attempt in range(1, STREAM_MAX_ATTEMPTS + 1):
+        try:
+            size = get_stream_total_size(response, offset)
+            total_size = size if size is not None else total_size
+            write_stream_to_part(response, part_path, offset)
+            break
+        except requests.RequestException:
+            if attempt == STREAM_MAX_ATTEMPTS:
+                raise
+        finally:
+            response.close()
+
+        time.sleep(STREAM_RETRY_SECONDS)
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        response = open_binary_stream(resume_url, referer=view_url, offset=offset)
+
+    return build_streamed_file(drive_name, part_path, content_type, total_size)
+
+
+def build_streamed_file(drive_name: str | None, part_path: Path, content_type: str, total_size: int | None) -> StreamedGdFile:
+    """校验下载完成的 ``.part`` 文件，并根据文件开头推断后缀。"""
+    size = part_path.stat().st_size
+    if total_size is not None and size != total_size:
+        raise RuntimeError(f"下载大小不符，应为 {total_size} 字节，实际 {size} 字节")
+
+    head = read_file_head(part_path)
+    try:
+        ensure_download_payload(head, content_type)
+    except RuntimeError:
+        part_path.unlink(missing_ok=True)
+        raise
+
+    return StreamedGdFile(
+        drive_name=drive_name,
+        path=part_path,
+        size=size,
+        content_type=content_type,
+        suggested_suffix=infer_download_suffix(drive_name, head, content_type),
+    )
+
+
+class RangeNotSupportedError(RuntimeError):
+    """服务器对 Range 请求返回了完整文件。"""
+
+
+def split_byte_ranges(total_size: int, segments: int) -> list[tuple[int, int]]:
+    """把 ``[0, total_size)`` 平均拆成若干闭区间，段数受 ``SEGMENT_MIN_SIZE`` 限制。"""
+    segments = max(1, min(segments, total_size // SEGMENT_MIN_SIZE))
+    step = -(-total_size // segments)
+    return [(start, min(start + step, total_size) - 1) for start in range(0, total_size, step)]
+
+
+def download_segment(url: str, referer: str, segment_path: Path, start: int, end: int) -> None:
+    """
+    下载 ``[start, end]`` 字节区间并写到 ``segment_path`` 的对应位置。
+
+    中途断开时从本段已写入的位置继续请求，最多 ``STREAM_MAX_ATTEMPTS`` 次。
+    """
+    position = start
+    for attempt in range(1, STREAM_MAX_ATTEMPTS + 1):
+        headers = dict(DEFAULT_HEADERS)
+        headers["Referer"] = referer
+        headers["Range"] = f"bytes={position}-{end}"
+        try:
+            with session.get(url, timeout=90, verify=False, headers=headers, stream=True) as response:
+                if response.status_code == 200:
+                    raise RangeNotSupportedError("服务器不支持 Range 请求")
+                if response.status_code != 206:
+                    raise RuntimeError(f"分段下载失败，HTTP {response.status_code}")
+                match = CONTENT_RANGE_RE.search(response.headers.get("Content-Range", ""))
+                if not match or int(match.group(1) or -1) != position:
+                    raise RuntimeError(f"分段位置不符，请求 {position}，返回 {response.headers.get('Content-Range')}")
+                with segment_path.open("r+b") as f:
+                    f.seek(position)
+                    for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                        data = chunk[:end + 1 - position]
+                        f.write(data)
+                        position += len(data)
+                        if position > end:
+                            break
+        except requests.RequestException:
+            if attempt == STREAM_MAX_ATTEMPTS:
+                raise
+            time.sleep(STREAM_RETRY_SECONDS)
+            continue
+
+        if position != end + 1:
+            raise RuntimeError(f"分段大小不符，区间 {start}-{end}，实际写到 {position - 1}")
+        return
+
+
+def get_segment_path(part_path: Path) -> Path:
+    """分段下载使用的临时文件，与单连接续传的 ``.part`` 文件分开。"""
+    return part_path.with_name(f"{part_path.name}.segments")
+
+
+def download_segments(url: str, referer: str, part_path: Path, total_size: int, segments: int) -> bool:
+    """
+    按字节区间并发下载整个文件。先把单独的临时文件预分配到完整大小，各段写入各自的位置，
+    全部成功后才改名为 ``part_path``。
+
+    预分配的文件中间可能有空洞，不能按文件大小续传。中断时只留下临时文件，
+    下次运行时 ``part_path`` 不存在，会重新分段下载并覆盖临时文件，不会被当成已下完的 ``.part``。
+
+    :return: 成功时返回 True；服务器不支持 Range 时删除临时文件并返回 False，由调用方改用单连接
+    """
+    ranges = split_byte_ranges(total_size, segments)
+    segment_path = get_segment_path(part_path)
+    with segment_path.open("wb") as f:
+        f.truncate(total_size)
+
+    with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+        futures = [executor.submit(download_segment, url, referer, segment_path, start, end) for start, end in ranges]
+        try:
+            for future in futures:
+                future.result()
+        except RangeNotSupportedError:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+            segment_path.unlink(missing_ok=True)
+            return False
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+            segment_path.unlink(missing_ok=True)
+            raise
+    segment_path.replace(part_path)
+    return True
@@ -0,0 +1,110 @@
+"""
+在同一进程内并发运行多个站点抓取流程。
+
+各站点访问的是不同主机，逐个运行时总耗时是所有站点之和；这里每个站点占一个线程同时运行，
+总耗时接近最慢的那个站点。所有站点共享一个 ``WorkerBudget``：``total_workers`` 限制同时执行的
+详情任务总数（也就是同时占用的连接数），``SiteJob.max_workers`` 再为单个站点设置上限。
+走 ``drain_queue`` 的站点（包括 onk）自动受预算约束，bds 自己的详情线程池通过 ``apply_worker_budget`` 接入；
+mt 逐页顺序请求，同一时间只占一个连接，不登记预算。
+站点调用 ``sys.exit`` 时（例如 rls 遇到 403）记为中止，不影响其他站点。
+运行期间按 ``report_seconds`` 输出一次全站进度，结束后输出汇总。
+
+:author: assassing
+:contact: https://github.com/hxz393
+:copyright: Copyright 2027, hxz393. 保留所有权利。
+"""
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from scrapy_redis import WorkerBudget, use_worker_budget
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOTAL_WORKERS = 64  # 所有站点合计的并发任务上限
+DEFAULT_REPORT_SECONDS = 60.0  # 全站进度输出间隔秒数
+
+
+@dataclass(frozen=True)
+class SiteJob:
+    """一个站点的抓取入口，``max_workers`` 为空时只受全局上限约束。"""
+    name: str
+    run: Callable[[], Any]
+    max_workers: int | None = None
+
+
+def run_site_job(job: SiteJob, budget: WorkerBudget) -> dict[str, Any]:
+    """在预算约束下运行单个站点，异常和 ``SystemExit`` 不向外抛出，记录在结果中。"""
+    started_at = time.monotonic()
+    logger.info(f"{job.name} 开始运行")
+    try:
+        with use_worker_budget(budget, job.name, job.max_workers):
+            job.run()
+    except SystemExit as e:
+        logger.error(f"{job.name} 运行中止：{e}")
+        return {"name": job.name, "status": "aborted", "seconds": time.monotonic() - started_at, "error": repr(e)}
+    except Exception as e:
+        logger.error(f"{job.name} 运行失败：{e!r}")
+        return {"name": job.name, "status": "failed", "seconds": time.monotonic() - started_at, "error": repr(e)}
+
+    logger.info(f"{job.name} 运行完成")
+    return {"name": job.name, "status": "success", "seconds": time.monotonic() - started_at, "error": None}
+
+
+def format_budget_progress(budget: WorkerBudget, running: list[str]) -> str:
+    """把各站点执行中和已完成的任务数整理成一行进度。"""
+    snapshot = budget.get_snapshot()
+    active_total = sum(stats["active"] for stats in snapshot.values())
+    parts = [
+        f"{name} 执行中 {stats['active']} / 已完成 {stats['completed']}"
+        for name, stats in sorted(snapshot.items())
+    ]
+    return (
+            f"全站进度：运行中站点 {len(running)} 个，占用并发 {active_total}/{budget.total_workers}"
+            + (f"；{'，'.join(parts)}" if parts else "")
+    )
+
+
+def log_site_summary(results: list[dict[str, Any]], budget: WorkerBudget, elapsed: float) -> None:
+    """输出所有站点的耗时、完成任务数和状态汇总。"""
+    snapshot = budget.get_snapshot()
+    logger.info(f"全部站点结束，总耗时 {elapsed:.1f} 秒")
+    for result in sorted(results, key=lambda item: item["seconds"], reverse=True):
+        completed = snapshot.get(result["name"], {}).get("completed", 0)
+        line = f"{result['name']}：{result['status']}，耗时 {result['seconds']:.1f} 秒，完成任务 {completed} 条"
+        if result["error"]:
+            logger.error(f"{line}，错误：{result['error']}")
+        else:
+            logger.info(line)
+
+
+def run_sites_concurrently(
+        jobs: list[SiteJob],
+        *,
+        total_workers: int = DEFAULT_TOTAL_WORKERS,
+        report_seconds: float = DEFAULT_REPORT_SECONDS,
+) -> list[dict[str, Any]]:
+    """
+    每个站点一个线程同时运行，共享 ``total_workers`` 的全局并发预算。
+
+    单个站点失败不影响其他站点，返回按完成顺序排列的运行结果。
+    """
+    if not jobs:
+        return []
+
+    budget = WorkerBudget(total_workers)
+    results = []
+    started_at = time.monotonic()
+    with ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="site") as executor:
+        future_to_job = {executor.submit(run_site_job, job, budget): job for job in jobs}
+        not_done = set(future_to_job)
+        while not_done:
+            done, not_done = wait(not_done, timeout=report_seconds, return_when=FIRST_COMPLETED)
+            results.extend(future.result() for future in done)
+            if not_done:
+                logger.info(format_budget_progress(budget, [future_to_job[future].name for future in not_done]))
+
+    log_site_summary(results, budget, time.monotonic() - started_at)
+    return results
@@ -16,12 +16,11 @@ from urllib.parse import urljoin
 
 import requests
 from bs4 import BeautifulSoup
-from requests.adapters import HTTPAdapter
 from retrying import retry
 from urllib3.util.retry import Retry
 
-from my_module import read_json_to_dict, sanitize_filename, update_json_config
-from scrapy_redis import get_redis_client
+from my_module import build_http_session, read_json_to_dict, sanitize_filename, update_json_config
+from scrapy_redis import apply_worker_budget, get_redis_client
 
 CONFIG_PATH = 'config/scrapy_bds.json'
 CONFIG = read_json_to_dict(CONFIG_PATH)  # 配置文件
@@ -57,11 +56,11 @@ def create_retry_strategy() -> Retry:
 
 
 retry_strategy = create_retry_strategy()
-adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=8, pool_maxsize=16)
-session = requests.Session()
-session.proxies = {"http": "http://127.0.0.1:7890", "https": "http://127.0.0.1:7890", }
-session.mount("http://", adapter)
-session.mount("https://", adapter)
+session = build_http_session(
+    THREAD_NUMBER,
+    proxies={"http": "http://127.0.0.1:7890", "https": "http://127.0.0.1:7890"},
+    max_retries=retry_strategy,
+)
 
 
 def get_previous_day(date_str: str) -> str:
@@ -212,11 +211,13 @@ def process_all(all_results: list[dict], max_workers: int = 5, redis_client=None
     if redis_client is None:
         redis_client = get_redis_client()
 
+    # 批量运行多个站点时，详情请求同样占用全局并发名额
+    worker, max_workers = apply_worker_budget(lambda item: read_thread(item, redis_client), max_workers)
     results: list[str] = []
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         # 提交所有任务
         future_to_item = {
-            executor.submit(read_thread, item, redis_client): item
+            executor.submit(worker, item): item
             for item in all_results
         }
         # 按完成顺序收集结果或捕获异常
@@ -13,13 +13,15 @@ import time
 
 import redis
 import requests
-from bs4 import BeautifulSoup
 from retrying import retry
 
-from my_module import read_json_to_dict, sanitize_filename, write_list_to_file, update_json_config, read_file_to_list
+from my_module import build_http_session, build_strainer, parse_html, read_json_to_dict, sanitize_filename, write_list_to_file, update_json_config, read_file_to_list
 from scrapy_redis import (
+    RetryPolicy,
+    build_seen_bloom,
     drain_queue,
     get_redis_client,
+    measure_phase,
     push_items_to_queue,
     serialize_payload,
 )
@@ -39,31 +41,46 @@ DHD_COOKIE = CONFIG['dhd_cookie']  # 用户甜甜
 REQUEST_HEAD = CONFIG['request_head']  # 请求头
 OUTPUT_DIR = CONFIG['output_dir']  # 输出目录
 THREAD_NUMBER = CONFIG['thread_number']  # 并发数
+HTML_PARSER = CONFIG.get('html_parser')  # 页面解析器，留空时优先用 lxml
+PARTIAL_PARSE = CONFIG.get('partial_parse', True)  # 列表页只解析目标容器，页面结构变化时可关闭改为整页解析
+DHD_LIST_STRAINER = build_strainer('div', 'topic-visited') if PARTIAL_PARSE else None  # 列表页只保留帖子块
+RETRY_IN_QUEUE = CONFIG.get('retry_in_queue', False)  # 详情页失败改由 Redis 延迟重试
+RETRY_MAX_ATTEMPTS = CONFIG.get('retry_max_attempts', 5)  # 延迟重试次数上限
 
 REDIS_PENDING_KEY = CONFIG.get('redis_pending_key', 'dhd_pending')  # 待处理队列
 REDIS_PROCESSING_KEY = CONFIG.get('redis_processing_key', 'dhd_processing')  # 处理中队列
 REDIS_SEEN_KEY = CONFIG.get('redis_seen_key', 'dhd_seen')  # 已入队帖子集合
+SEEN_BLOOM = build_seen_bloom(CONFIG)  # 可选的布隆过滤器 seen 存储，未配置时使用 set
+REDIS_RETRY_KEY = CONFIG.get('redis_retry_key', 'dhd_retry')  # 延迟重试队列
 
 REQUEST_HEAD["Cookie"] = DHD_COOKIE  # 请求头加入认证
+session = build_http_session(THREAD_NUMBER)  # 列表页和详情页共用的连接池
 
 
-@retry(stop_max_attempt_number=15, wait_random_min=1000, wait_random_max=5000)
-def get_dhd_response(url: str) -> str:
+def request_dhd_page(url: str) -> str:
     """
-    请求 URL 并返回响应文本。
+    单次请求 URL 并返回响应文本，不做重试。
     """
-    response = requests.get(url, headers=REQUEST_HEAD, timeout=15, verify=False)
+    response = session.get(url, headers=REQUEST_HEAD, timeout=15, verify=False)
     if response.status_code != 200:
         raise Exception(f"请求失败，状态码：{response.status_code}：{url}")
     response.encoding = 'gbk'
     return response.text
 
 
+@retry(stop_max_attempt_number=15, wait_random_min=1000, wait_random_max=5000)
+def get_dhd_response(url: str) -> str:
+    """
+    请求 URL 并返回响应文本。
+    """
+    return request_dhd_page(url)
+
+
 def parse_dhd_response(response_text: str) -> list:
     """
     解析列表页面 HTML，返回帖子结果列表。
     """
-    soup = BeautifulSoup(response_text, 'html.parser')
+    soup = parse_html(response_text, HTML_PARSER, DHD_LIST_STRAINER)
     results = []
 
     # 查找所有代表电影信息的 div 元素，避免依赖 class 顺序或额外 class 是否存在
@@ -98,7 +115,9 @@ def working_dhd(info: dict) -> None:
     """
     name = info["name"]
     url = info["url"]
-    response_text = get_dhd_response(url)
+    with measure_phase("http"):
+        # 延迟重试模式下失败直接交给队列，避免在线程里等待
+        response_text = request_dhd_page(url) if RETRY_IN_QUEUE else get_dhd_response(url)
     imdb = extract_imdb_id(response_text)
     dl_url = extract_dl_url(response_text)
     content = [url, dl_url]
@@ -107,7 +126,8 @@ def working_dhd(info: dict) -> None:
     file_name = file_name.replace("/", "｜").replace("\\", "｜")
     file_name = sanitize_filename(file_name).strip()
     file_path = os.path.join(OUTPUT_DIR, file_name)
-    write_list_to_file(file_path, content)
+    with measure_phase("disk"):
+        write_list_to_file(file_path, content)
 
 
 def fetch_dhd_batch(start_page: int, pages_per_batch: int = 1, max_batch_attempts: int = 5) -> list:
@@ -170,6 +190,7 @@ def enqueue_dhd_posts(start_page: int = 1, redis_client: redis.Redis | None = No
                     "url": item["url"],
                 }
             ),
+            bloom=SEEN_BLOOM,
         )
         logger.info(f"第 {start_page} 页新增 {len(new_list)} 条，入队 {enqueued_count} 条")
 
@@ -180,6 +201,13 @@ def enqueue_dhd_posts(start_page: int = 1, redis_client: redis.Redis | None = No
     update_json_config(CONFIG_PATH, "newest_id", max_id)
 
 
+def build_dhd_retry_policy() -> RetryPolicy | None:
+    """开启 ``retry_in_queue`` 时返回延迟重试策略。"""
+    if not RETRY_IN_QUEUE:
+        return None
+    return RetryPolicy(REDIS_RETRY_KEY, max_attempts=RETRY_MAX_ATTEMPTS)
+
+
 def drain_dhd_queue(redis_client: redis.Redis | None = None) -> None:
     """从 Redis 队列中取帖子，使用多线程访问详情页并写出 .dhd 文件。"""
     if redis_client is None:
@@ -195,6 +223,7 @@ def drain_dhd_queue(redis_client: redis.Redis | None = None) -> None:
         queue_label="DHD",
         identify_item=lambda info: info["url"],
         progress_every=100,
+        retry_policy=build_dhd_retry_policy(),
     )
 
 
@@ -238,7 +267,7 @@ def rename_file(filename: str) -> str:
 
 def extract_dl_url(txt: str) -> str:
     """获取下载地址"""
-    soup = BeautifulSoup(txt, 'html.parser')
+    soup = parse_html(txt, HTML_PARSER)
     span_tag = soup.find("span", attrs={"style": "white-space: nowrap"})
     download_link = ""
     if span_tag:
@@ -301,39 +330,38 @@ def process_dhd_file(file_path: str, directory: str) -> None:
     3. 下载种子文件，并转换为磁链
     4. 回写磁链到 .log 文件，并删除临时种子文件
     """
-    # 每个线程创建自己的 requests.Session，并在任务结束后关闭
-    with requests.Session() as session:
-        # 构造 torrent 文件保存路径
-        torrent_path = os.path.join(directory, os.path.basename(file_path).replace(".dhd", ".torrent"))
-
-        dl_url = get_dhd_download_url(session, file_path)
-        if not dl_url:
-            return
-
-        # 下载种子文件并转换为磁链。坏种子时最多重试 3 次。
-        magnet = ""
-        for attempt in range(1, 4):
-            try:
-                get_dhd_torrent(session, dl_url, torrent_path)
-                magnet = torrent_to_magnet(torrent_path)
-                if not magnet:
-                    raise ValueError("转换磁链失败")
-                break
-            except Exception as e:
-                if os.path.exists(torrent_path):
-                    os.remove(torrent_path)
-                if attempt == 3:
-                    logger.error(f"文件 {file_path}: 连续 3 次下载到无效种子，已放弃: {e}")
-                    return
-                logger.warning(f"文件 {file_path}: 第 {attempt}/3 次下载到无效种子，重试下载: {e}")
-
-        # 回写磁链到 .log 文件，并删除原始 dhd 文件和临时 torrent 文件
-        new_file_path = file_path.replace(".dhd", ".log")
-        if not write_list_to_file(new_file_path, [magnet]):
-            logger.error(f"文件 {file_path}: 写入日志文件失败")
-            return
-        os.remove(file_path)
-        os.remove(torrent_path)
+    # 各线程共用模块级 session 的连接池，不再为每个文件新建连接
+    # 构造 torrent 文件保存路径
+    torrent_path = os.path.join(directory, os.path.basename(file_path).replace(".dhd", ".torrent"))
+
+    dl_url = get_dhd_download_url(session, file_path)
+    if not dl_url:
+        return
+
+    # 下载种子文件并转换为磁链。坏种子时最多重试 3 次。
+    magnet = ""
+    for attempt in range(1, 4):
+        try:
+            get_dhd_torrent(session, dl_url, torrent_path)
+            magnet = torrent_to_magnet(torrent_path)
+            if not magnet:
+                raise ValueError("转换磁链失败")
+            break
+        except Exception as e:
+            if os.path.exists(torrent_path):
+                os.remove(torrent_path)
+            if attempt == 3:
+                logger.error(f"文件 {file_path}: 连续 3 次下载到无效种子，已放弃: {e}")
+                return
+            logger.warning(f"文件 {file_path}: 第 {attempt}/3 次下载到无效种子，重试下载: {e}")
+
+    # 回写磁链到 .log 文件，并删除原始 dhd 文件和临时 torrent 文件
+    new_file_path = file_path.replace(".dhd", ".log")
+    if not write_list_to_file(new_file_path, [magnet]):
+        logger.error(f"文件 {file_path}: 写入日志文件失败")
+        return
+    os.remove(file_path)
+    os.remove(torrent_path)
 
     logger.info(f"文件 {file_path}: 转换完成")
 
@@ -9,11 +9,14 @@
 - ``end_titles``: 分页抓取时用于判断“已经追到旧数据”的截止标题列表。
   正常跑完一轮后，脚本会把首次访问页的前两个标题写回这里，供下次运行使用。
 - ``thread_number`` / ``max_workers``: 详情页并发抓取线程数，未提供时默认 ``20``。
+- ``prefetch_pages``: 可选，列表页并发预取页数，默认 ``1`` 即逐页请求。
+- ``drain_while_scanning``: 可选，为 ``true`` 时列表扫描期间同时消费详情队列。
+- ``html_parser``: 可选，页面解析器，``lxml`` 或 ``html.parser``，留空时优先用 ``lxml``。
 
 主流程：
 1. 先顺序翻页，把新列表项写入 Redis 待处理队列。
 2. 再从 Redis 队列中并发抓取详情页并写出 ``.dlb`` 文件。
-3. 当列表页中出现任一截止标题时停止翻页。
+3. 当列表页中出现任一截止标题，或某页与上一轮完成时指纹相同时停止翻页。
 4. 只有列表扫描完成且详情任务全部成功清空后，才回写新的 ``end_titles``。
 
 :author: assassing
@@ -23,17 +26,17 @@
 import logging
 import os
 import re
-from typing import Dict, Iterable, List
+from typing import Callable, Dict, Iterable, List
 
 import redis
 import requests
 from bs4 import BeautifulSoup
-from requests.adapters import HTTPAdapter
 from retrying import retry
 from urllib3.util.retry import Retry
 
-from my_module import normalize_release_title_for_filename, read_json_to_dict, sanitize_filename, update_json_config, write_list_to_file
-from scrapy_redis import deserialize_payload, drain_queue, get_redis_client, push_items_to_queue, serialize_payload
+from my_module import build_http_session, normalize_release_title_for_filename, parse_html, read_json_to_dict, sanitize_filename, update_json_config, write_list_to_file
+from scrapy_redis import build_seen_bloom, get_redis_client, run_scan_and_drain, serialize_payload
+from scrapy_site import SiteSpec, drain_site_queue, enqueue_site_posts, finalize_site_run, recover_site_processing_when_pending_is_empty
 
 CONFIG_PATH = 'config/scrapy_dlb.json'
 CONFIG = read_json_to_dict(CONFIG_PATH)  # 配置文件
@@ -44,6 +47,7 @@ DLB_COOKIE = CONFIG['dlb_cookie']  # 用户甜甜
 REQUEST_HEAD = CONFIG['request_head']  # 请求头
 REQUEST_HEAD["Cookie"] = DLB_COOKIE  # 请求头加入认证
 THREAD_NUMBER = CONFIG.get('thread_number', CONFIG.get('max_workers', 20))
+HTML_PARSER = CONFIG.get('html_parser')  # 页面解析器，留空时优先用 lxml
 
 LEGACY_END_TITLE = "Tawai.A.voice.from.the.forest.2017.1080p.BluRay.REMUX.AVC.DTS-HD.MA.5.1-EPSiLON – 22.4 GB"
 END_TITLES_KEEP_COUNT = 2
@@ -51,9 +55,13 @@ END_TITLES_KEEP_COUNT = 2
 REDIS_PENDING_KEY = CONFIG.get('redis_pending_key', 'dlb_pending')  # 待处理队列
 REDIS_PROCESSING_KEY = CONFIG.get('redis_processing_key', 'dlb_processing')  # 处理中队列
 REDIS_SEEN_KEY = CONFIG.get('redis_seen_key', 'dlb_seen')  # 已入队项目集合
+SEEN_BLOOM = build_seen_bloom(CONFIG)  # 可选的布隆过滤器 seen 存储，未配置时使用 set
 REDIS_SCAN_PAGE_KEY = CONFIG.get('redis_scan_page_key', 'dlb_scan_page')  # 列表扫描断点页码
 REDIS_SCAN_COMPLETE_KEY = CONFIG.get('redis_scan_complete_key', 'dlb_scan_complete')  # 列表扫描完成标记
 REDIS_NEXT_END_TITLES_KEY = CONFIG.get('redis_next_end_titles_key', 'dlb_next_end_titles')  # 下一轮截止标题
+REDIS_PAGE_FINGERPRINT_KEY = CONFIG.get('redis_page_fingerprint_key', 'dlb_page_fingerprints')  # 已完成列表页指纹，跨轮次保留
+PREFETCH_PAGES = CONFIG.get('prefetch_pages', 1)  # 列表页并发预取页数，1 表示逐页请求
+DRAIN_WHILE_SCANNING = CONFIG.get('drain_while_scanning', False)  # 列表扫描期间同时消费详情队列
 
 REQUEST_TIMEOUT_SECONDS = 30
 BLOCKED_PAGE_MIN_LENGTH = 10000
@@ -80,13 +88,8 @@ def build_retry_strategy() -> Retry:
 
 
 def build_dlb_session() -> requests.Session:
-    """创建带连接池、重试和代理配置的会话。"""
-    adapter = HTTPAdapter(max_retries=build_retry_strategy(), pool_connections=20, pool_maxsize=40)
-    request_session = requests.Session()
-    request_session.proxies = SESSION_PROXIES.copy()
-    request_session.mount("http://", adapter)
-    request_session.mount("https://", adapter)
-    return request_session
+    """创建连接池与详情并发数匹配、带重试和代理配置的会话。"""
+    return build_http_session(THREAD_NUMBER, proxies=SESSION_PROXIES, max_retries=build_retry_strategy())
 
 
 session = build_dlb_session()
@@ -134,6 +137,40 @@ def serialize_dlb_post(result_item: Dict[str, str]) -> str:
     )
 
 
+def save_next_end_titles(state: Dict[str, List[str]]) -> None:
+    """把首次访问页的前几个标题写回配置，作为下一轮的截止标题。"""
+    update_json_config(CONFIG_PATH, "end_titles", state["titles"])
+
+
+def build_dlb_site(end_titles: List[str] | None = None) -> SiteSpec:
+    """描述 DLB 的列表页、入队方式和详情 worker，交给 ``scrapy_site`` 引擎执行。"""
+    return SiteSpec(
+        label="DLB",
+        logger=logger,
+        pending_key=REDIS_PENDING_KEY,
+        processing_key=REDIS_PROCESSING_KEY,
+        seen_key=REDIS_SEEN_KEY,
+        scan_page_key=REDIS_SCAN_PAGE_KEY,
+        scan_complete_key=REDIS_SCAN_COMPLETE_KEY,
+        next_state_key=REDIS_NEXT_END_TITLES_KEY,
+        build_page_url=build_dlb_page_url,
+        fetch_page=get_dlb_response,
+        parse_page=parse_dlb_response,
+        unique_value=lambda item: item["link"],
+        serializer=serialize_dlb_post,
+        should_stop=lambda result_list: should_stop_scrapy(result_list, end_titles or []),
+        select_next_state=lambda result_list: {"titles": select_next_end_titles(result_list)},
+        commit_next_state=save_next_end_titles,
+        worker=visit_dlb_url,
+        identify_item=lambda info: info["link"],
+        max_workers=THREAD_NUMBER,
+        bloom=SEEN_BLOOM,
+        page_fingerprint_key=REDIS_PAGE_FINGERPRINT_KEY,
+        prefetch_pages=PREFETCH_PAGES,
+        drain_while_scanning=DRAIN_WHILE_SCANNING,
+    )
+
+
 def enqueue_dlb_posts(start_page: int = 1, redis_client: redis.Redis | None = None) -> None:
     """顺序翻页，收集新帖子并写入 Redis 待处理队列。"""
     if redis_client is None:
@@ -143,82 +180,27 @@ def enqueue_dlb_posts(start_page: int = 1, redis_client: redis.Redis | None = No
     if not end_titles:
         raise ValueError("至少需要提供一个截止标题")
 
-    if redis_client.get(REDIS_SCAN_COMPLETE_KEY) == "1":
-        logger.info("DLB 列表扫描已完成，跳过入队阶段")
-        return
-
-    saved_page = redis_client.get(REDIS_SCAN_PAGE_KEY)
-    current_page = int(saved_page) if saved_page is not None else start_page
-    if saved_page is None:
-        redis_client.set(REDIS_SCAN_PAGE_KEY, str(current_page))
-    else:
-        logger.info(f"DLB 从第 {current_page} 页继续扫描")
-
-    while True:
-        logger.info(f"抓取第 {current_page} 页")
-        response = get_dlb_response(build_dlb_page_url(current_page))
-        result_list = parse_dlb_response(response)
-        logger.info(f"共 {len(result_list)} 个结果")
-
-        if redis_client.get(REDIS_NEXT_END_TITLES_KEY) is None:
-            redis_client.set(
-                REDIS_NEXT_END_TITLES_KEY,
-                serialize_payload({"titles": select_next_end_titles(result_list)}),
-            )
-
-        enqueued_count = push_items_to_queue(
-            redis_client,
-            result_list,
-            seen_key=REDIS_SEEN_KEY,
-            pending_key=REDIS_PENDING_KEY,
-            unique_value=lambda item: item["link"],
-            serializer=serialize_dlb_post,
-        )
-        logger.info(f"第 {current_page} 页解析 {len(result_list)} 条，入队 {enqueued_count} 条")
-
-        if should_stop_scrapy(result_list, end_titles):
-            redis_client.set(REDIS_SCAN_COMPLETE_KEY, "1")
-            redis_client.set(REDIS_SCAN_PAGE_KEY, str(current_page + 1))
-            logger.info("DLB 列表扫描完成")
-            break
-
-        current_page += 1
-        redis_client.set(REDIS_SCAN_PAGE_KEY, str(current_page))
-        logger.warning("-" * 255)
+    enqueue_site_posts(build_dlb_site(end_titles), redis_client, start_page=start_page)
 
 
 def recover_dlb_processing_when_pending_is_empty(redis_client: redis.Redis) -> int:
     """启动时若待处理为空但处理中有残留，则回退到待处理并继续运行。"""
-    if redis_client.llen(REDIS_PENDING_KEY) or not redis_client.llen(REDIS_PROCESSING_KEY):
-        return 0
-
-    recovered_count = 0
-    while True:
-        payload = redis_client.rpoplpush(REDIS_PROCESSING_KEY, REDIS_PENDING_KEY)
-        if not payload:
-            break
-        recovered_count += 1
+    return recover_site_processing_when_pending_is_empty(build_dlb_site(), redis_client)
 
-    logger.warning(f"DLB 检测到待处理为空但处理中残留 {recovered_count} 条，已回退到待处理队列并继续运行")
-    return recovered_count
 
+def drain_dlb_queue(
+        redis_client: redis.Redis | None = None,
+        producer_active: Callable[[], bool] | None = None,
+) -> None:
+    """
+    从 Redis 队列中取帖子，使用多线程访问详情页并写出 ``.dlb`` 文件。
 
-def drain_dlb_queue(redis_client: redis.Redis | None = None) -> None:
-    """从 Redis 队列中取帖子，使用多线程访问详情页并写出 ``.dlb`` 文件。"""
+    ``producer_active`` 由 ``run_scan_and_drain`` 传入，列表扫描未结束时队列暂空也继续等待。
+    """
     if redis_client is None:
         redis_client = get_redis_client()
 
-    drain_queue(
-        redis_client,
-        pending_key=REDIS_PENDING_KEY,
-        processing_key=REDIS_PROCESSING_KEY,
-        max_workers=THREAD_NUMBER,
-        worker=visit_dlb_url,
-        logger=logger,
-        queue_label="DLB",
-        identify_item=lambda info: info["link"],
-        recover_processing_on_start=False,
-    )
+    drain_site_queue(build_dlb_site(), redis_client, producer_active=producer_active)
 
 
 def finalize_dlb_run(redis_client: redis.Redis | None = None) -> None:
@@ -226,33 +208,7 @@ def finalize_dlb_run(redis_client: redis.Redis | None = None) -> None:
     if redis_client is None:
         redis_client = get_redis_client()
 
-    if redis_client.get(REDIS_SCAN_COMPLETE_KEY) != "1":
-        logger.info("DLB 列表扫描尚未完成，暂不回写 end_titles")
-        return
-
-    pending_count = redis_client.llen(REDIS_PENDING_KEY)
-    if pending_count:
-        logger.info("DLB 队列仍有未完成任务，暂不回写 end_titles")
-        return
-
-    processing_count = redis_client.llen(REDIS_PROCESSING_KEY)
-    if processing_count:
-        logger.warning(f"DLB 待处理已空，但处理中仍有 {processing_count} 条，已保留处理中队列，请直接重跑")
-        return
-
-    next_titles_payload = redis_client.get(REDIS_NEXT_END_TITLES_KEY)
-    if not next_titles_payload:
-        logger.warning("DLB 未记录新的 end_titles，跳过配置更新")
-        return
-
-    update_json_config(CONFIG_PATH, "end_titles", deserialize_payload(next_titles_payload)["titles"])
-    redis_client.delete(
-        REDIS_PENDING_KEY,
-        REDIS_PROCESSING_KEY,
-        REDIS_SCAN_PAGE_KEY,
-        REDIS_SCAN_COMPLETE_KEY,
-        REDIS_NEXT_END_TITLES_KEY,
-    )
+    finalize_site_run(build_dlb_site(), redis_client)
 
 
 def scrapy_dlb(start_page: int = 1) -> None:
@@ -261,8 +217,11 @@ def scrapy_dlb(start_page: int = 1) -> None:
     redis_client = get_redis_client()
     try:
         recover_dlb_processing_when_pending_is_empty(redis_client)
-        enqueue_dlb_posts(start_page=start_page, redis_client=redis_client)
-        drain_dlb_queue(redis_client=redis_client)
+        run_scan_and_drain(
+            lambda: enqueue_dlb_posts(start_page=start_page, redis_client=redis_client),
+            lambda **kwargs: drain_dlb_queue(redis_client=redis_client, **kwargs),
+            overlap=DRAIN_WHILE_SCANNING,
+        )
     finally:
         finalize_dlb_run(redis_client=redis_client)
 
@@ -286,7 +245,7 @@ def get_dlb_response(url: str, request_session: requests.Session | None = None)
 
 def parse_dlb_response(response: requests.Response) -> List[Dict[str, str]]:
     """解析 DLB 单页列表，输出 ``title/link/size`` 字典列表。"""
-    soup = BeautifulSoup(response.text, "html.parser")
+    soup = parse_html(response.text, HTML_PARSER)
     results = []
 
     for block in soup.select("div.movies_block"):
@@ -341,9 +300,8 @@ def build_dlb_output_filename(result_item: Dict[str, str], imdb_id: str) -> str:
 def visit_dlb_url(result_item: Dict[str, str]) -> None:
     """访问详情页并写出对应的 ``.dlb`` 文件。"""
     url = result_item["link"]
-    detail_session = build_dlb_session()
-    response = get_dlb_response(url, request_session=detail_session)
-    soup = BeautifulSoup(response.text, 'lxml')
+    response = get_dlb_response(url)
+    soup = parse_html(response.text, HTML_PARSER)
     imdb_id = extract_dlb_imdb_id(soup)
     path = os.path.join(OUTPUT_DIR, build_dlb_output_filename(result_item, imdb_id))
     write_list_to_file(path, [url])
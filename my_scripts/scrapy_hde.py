@@ -11,11 +11,15 @@
 - ``request_timeout_seconds``: 单次 HTTP 请求超时秒数。
 - ``retry_max_attempts`` / ``retry_wait_min_ms`` / ``retry_wait_max_ms``:
   ``get_hde_response`` 的重试参数。
+- ``prefetch_pages``: 可选，列表页并发预取页数，默认 ``1`` 即逐页请求。
+- ``drain_while_scanning``: 可选，为 ``true`` 时列表扫描期间同时消费详情队列。
+- ``html_parser``: 可选，页面解析器，``lxml`` 或 ``html.parser``，留空时优先用 ``lxml``。
+- ``partial_parse``: 可选，默认 ``true``，列表页只解析条目块；页面结构变化导致解析不到条目时可设为 ``false``。
 
 主流程：
 1. 先顺序翻页，把新列表项写入 Redis 待处理队列。
 2. 再从 Redis 队列中并发抓取详情页并写出 ``.rls`` 文件。
-3. 当列表页中出现任一截止标题时停止翻页。
+3. 当列表页中出现任一截止标题，或某页与上一轮完成时指纹相同时停止翻页。
 4. 只有列表扫描完成且详情任务全部成功清空后，才回写新的 ``end_titles``。
 
 :author: assassing
@@ -25,18 +29,18 @@
 import logging
 import os
 import re
-from typing import Dict, Iterable, List
+from typing import Callable, Dict, Iterable, List
 from urllib.parse import urljoin, urlparse
 
 import redis
 import requests
 from bs4 import BeautifulSoup
-from requests.adapters import HTTPAdapter
 from retrying import retry
 from urllib3.util.retry import Retry
 
-from my_module import normalize_release_title_for_filename, read_json_to_dict, sanitize_filename, update_json_config, write_list_to_file
-from scrapy_redis import deserialize_payload, drain_queue, get_redis_client, push_items_to_queue, serialize_payload
+from my_module import build_http_session, build_strainer, normalize_release_title_for_filename, parse_html, read_json_to_dict, sanitize_filename, update_json_config, write_list_to_file
+from scrapy_redis import build_seen_bloom, get_redis_client, run_scan_and_drain, serialize_payload
+from scrapy_site import SiteSpec, drain_site_queue, enqueue_site_posts, finalize_site_run, recover_site_processing_when_pending_is_empty
 from sort_movie_ops import extract_imdb_id_from_links
 
 logger = logging.getLogger(__name__)
@@ -54,14 +58,21 @@ REQUEST_TIMEOUT_SECONDS = CONFIG['request_timeout_seconds']
 RETRY_MAX_ATTEMPTS = CONFIG['retry_max_attempts']
 RETRY_WAIT_MIN_MS = CONFIG['retry_wait_min_ms']
 RETRY_WAIT_MAX_MS = CONFIG['retry_wait_max_ms']
+HTML_PARSER = CONFIG.get('html_parser')  # 页面解析器，留空时优先用 lxml
+PARTIAL_PARSE = CONFIG.get('partial_parse', True)  # 列表页只解析目标容器，页面结构变化时可关闭改为整页解析
+HDE_LIST_STRAINER = build_strainer('div', 'fit') if PARTIAL_PARSE else None  # 列表页只保留条目块
 END_TITLES_KEEP_COUNT = 2
 
 REDIS_PENDING_KEY = CONFIG.get('redis_pending_key', 'hde_pending')  # 待处理队列
 REDIS_PROCESSING_KEY = CONFIG.get('redis_processing_key', 'hde_processing')  # 处理中队列
 REDIS_SEEN_KEY = CONFIG.get('redis_seen_key', 'hde_seen')  # 已入队项目集合
+SEEN_BLOOM = build_seen_bloom(CONFIG)  # 可选的布隆过滤器 seen 存储，未配置时使用 set
 REDIS_SCAN_PAGE_KEY = CONFIG.get('redis_scan_page_key', 'hde_scan_page')  # 列表扫描断点页码
 REDIS_SCAN_COMPLETE_KEY = CONFIG.get('redis_scan_complete_key', 'hde_scan_complete')  # 列表扫描完成标记
 REDIS_NEXT_END_TITLES_KEY = CONFIG.get('redis_next_end_titles_key', 'hde_next_end_titles')  # 下一轮截止标题
+REDIS_PAGE_FINGERPRINT_KEY = CONFIG.get('redis_page_fingerprint_key', 'hde_page_fingerprints')  # 已完成列表页指纹，跨轮次保留
+PREFETCH_PAGES = CONFIG.get('prefetch_pages', 1)  # 列表页并发预取页数，1 表示逐页请求
+DRAIN_WHILE_SCANNING = CONFIG.get('drain_while_scanning', False)  # 列表扫描期间同时消费详情队列
 
 SIZE_WITH_DASH_PATTERN = re.compile(r"\s[–-]\s*([\d.]+\s*(?:GB|MB|TB))\s*$")
 TRAILING_SIZE_PATTERN = re.compile(r"([\d.]+\s*(?:GB|MB|TB))\s*$")
@@ -84,14 +95,14 @@ def build_retry_strategy() -> Retry:
     )
 
 
-def build_hde_session() -> requests.Session:
-    """创建带连接池、重试和代理配置的会话。"""
-    adapter = HTTPAdapter(max_retries=build_retry_strategy(), pool_connections=20, pool_maxsize=40)
-    request_session = requests.Session()
-    request_session.proxies = SESSION_PROXIES.copy()
-    request_session.mount("http://", adapter)
-    request_session.mount("https://", adapter)
-    return request_session
+def build_hde_session(pool_from: requests.Session | None = None) -> requests.Session:
+    """创建带连接池、重试和代理配置的会话；传入 ``pool_from`` 时复用其连接池，只隔离 Cookie。"""
+    return build_http_session(
+        DEFAULT_MAX_WORKERS,
+        proxies=SESSION_PROXIES,
+        max_retries=build_retry_strategy(),
+        pool_from=pool_from,
+    )
 
 
 session = build_hde_session()
@@ -139,6 +150,40 @@ def serialize_hde_post(result_item: Dict[str, str]) -> str:
     )
 
 
+def save_next_end_titles(state: Dict[str, List[str]]) -> None:
+    """把首次访问页的前几个标题写回配置，作为下一轮的截止标题。"""
+    update_json_config(CONFIG_PATH, "end_titles", state["titles"])
+
+
+def build_hde_site(end_titles: List[str] | None = None) -> SiteSpec:
+    """描述 HDE 的列表页、入队方式和详情 worker，交给 ``scrapy_site`` 引擎执行。"""
+    return SiteSpec(
+        label="HDE",
+        logger=logger,
+        pending_key=REDIS_PENDING_KEY,
+        processing_key=REDIS_PROCESSING_KEY,
+        seen_key=REDIS_SEEN_KEY,
+        scan_page_key=REDIS_SCAN_PAGE_KEY,
+        scan_complete_key=REDIS_SCAN_COMPLETE_KEY,
+        next_state_key=REDIS_NEXT_END_TITLES_KEY,
+        build_page_url=build_hde_page_url,
+        fetch_page=get_hde_response,
+        parse_page=parse_hde_response,
+        unique_value=lambda item: item["url"],
+        serializer=serialize_hde_post,
+        should_stop=lambda result_list: should_stop_scrapy(result_list, end_titles or []),
+        select_next_state=lambda result_list: {"titles": select_next_end_titles(result_list)},
+        commit_next_state=save_next_end_titles,
+        worker=visit_hde_url,
+        identify_item=lambda info: info["url"],
+        max_workers=DEFAULT_MAX_WORKERS,
+        bloom=SEEN_BLOOM,
+        page_fingerprint_key=REDIS_PAGE_FINGERPRINT_KEY,
+        prefetch_pages=PREFETCH_PAGES,
+        drain_while_scanning=DRAIN_WHILE_SCANNING,
+    )
+
+
 def enqueue_hde_posts(start_page: int = 1, redis_client: redis.Redis | None = None) -> None:
     """顺序翻页，收集新帖子并写入 Redis 待处理队列。"""
     if redis_client is None:
@@ -148,82 +193,27 @@ def enqueue_hde_posts(start_page: int = 1, redis_client: redis.Redis | None = No
     if not end_titles:
         raise ValueError("至少需要提供一个截止标题")
 
-    if redis_client.get(REDIS_SCAN_COMPLETE_KEY) == "1":
-        logger.info("HDE 列表扫描已完成，跳过入队阶段")
-        return
-
-    saved_page = redis_client.get(REDIS_SCAN_PAGE_KEY)
-    current_page = int(saved_page) if saved_page is not None else start_page
-    if saved_page is None:
-        redis_client.set(REDIS_SCAN_PAGE_KEY, str(current_page))
-    else:
-        logger.info(f"HDE 从第 {current_page} 页继续扫描")
-
-    while True:
-        logger.info(f"抓取第 {current_page} 页")
-        response = get_hde_response(build_hde_page_url(current_page))
-        result_list = parse_hde_response(response)
-        logger.info(f"共 {len(result_list)} 个结果")
-
-        if redis_client.get(REDIS_NEXT_END_TITLES_KEY) is None:
-            redis_client.set(
-                REDIS_NEXT_END_TITLES_KEY,
-                serialize_payload({"titles": select_next_end_titles(result_list)}),
-            )
-
-        enqueued_count = push_items_to_queue(
-            redis_client,
-            result_list,
-            seen_key=REDIS_SEEN_KEY,
-            pending_key=REDIS_PENDING_KEY,
-            unique_value=lambda item: item["url"],
-            serializer=serialize_hde_post,
-        )
-        logger.info(f"第 {current_page} 页解析 {len(result_list)} 条，入队 {enqueued_count} 条")
-
-        if should_stop_scrapy(result_list, end_titles):
-            redis_client.set(REDIS_SCAN_COMPLETE_KEY, "1")
-            redis_client.set(REDIS_SCAN_PAGE_KEY, str(current_page + 1))
-            logger.info("HDE 列表扫描完成")
-            break
-
-        current_page += 1
-        redis_client.set(REDIS_SCAN_PAGE_KEY, str(current_page))
-        logger.warning("-" * 255)
+    enqueue_site_posts(build_hde_site(end_titles), redis_client, start_page=start_page)
 
 
 def recover_hde_processing_when_pending_is_empty(redis_client: redis.Redis) -> int:
     """启动时若待处理为空但处理中有残留，则回退到待处理并继续运行。"""
-    if redis_client.llen(REDIS_PENDING_KEY) or not redis_client.llen(REDIS_PROCESSING_KEY):
-        return 0
-
-    recovered_count = 0
-    while True:
-        payload = redis_client.rpoplpush(REDIS_PROCESSING_KEY, REDIS_PENDING_KEY)
-        if not payload:
-            break
-        recovered_count += 1
+    return recover_site_processing_when_pending_is_empty(build_hde_site(), redis_client)
 
-    logger.warning(f"HDE 检测到待处理为空但处理中残留 {recovered_count} 条，已回退到待处理队列并继续运行")
-    return recovered_count
 
+def drain_hde_queue(
+        redis_client: redis.Redis | None = None,
+        producer_active: Callable[[], bool] | None = None,
+) -> None:
+    """
+    从 Redis 队列中取帖子，使用多线程访问详情页并写出 ``.rls`` 文件。
 
-def drain_hde_queue(redis_client: redis.Redis | None = None) -> None:
-    """从 Redis 队列中取帖子，使用多线程访问详情页并写出 ``.rls`` 文件。"""
+    ``producer_active`` 由 ``run_scan_and_drain`` 传入，列表扫描未结束时队列暂空也继续等待。
+    """
     if redis_client is None:
         redis_client = get_redis_client()
 
-    drain_queue(
-        redis_client,
-        pending_key=REDIS_PENDING_KEY,
-        processing_key=REDIS_PROCESSING_KEY,
-        max_workers=DEFAULT_MAX_WORKERS,
-        worker=visit_hde_url,
-        logger=logger,
-        queue_label="HDE",
-        identify_item=lambda info: info["url"],
-        recover_processing_on_start=False,
-    )
+    drain_site_queue(build_hde_site(), redis_client, producer_active=producer_active)
 
 
 def finalize_hde_run(redis_client: redis.Redis | None = None) -> None:
@@ -231,33 +221,7 @@ def finalize_hde_run(redis_client: redis.Redis | None = None) -> None:
     if redis_client is None:
         redis_client = get_redis_client()
 
-    if redis_client.get(REDIS_SCAN_COMPLETE_KEY) != "1":
-        logger.info("HDE 列表扫描尚未完成，暂不回写 end_titles")
-        return
-
-    pending_count = redis_client.llen(REDIS_PENDING_KEY)
-    if pending_count:
-        logger.info("HDE 队列仍有未完成任务，暂不回写 end_titles")
-        return
-
-    processing_count = redis_client.llen(REDIS_PROCESSING_KEY)
-    if processing_count:
-        logger.warning(f"HDE 待处理已空，但处理中仍有 {processing_count} 条，已保留处理中队列，请直接重跑")
-        return
-
-    next_titles_payload = redis_client.get(REDIS_NEXT_END_TITLES_KEY)
-    if not next_titles_payload:
-        logger.warning("HDE 未记录新的 end_titles，跳过配置更新")
-        return
-
-    update_json_config(CONFIG_PATH, "end_titles", deserialize_payload(next_titles_payload)["titles"])
-    redis_client.delete(
-        REDIS_PENDING_KEY,
-        REDIS_PROCESSING_KEY,
-        REDIS_SCAN_PAGE_KEY,
-        REDIS_SCAN_COMPLETE_KEY,
-        REDIS_NEXT_END_TITLES_KEY,
-    )
+    finalize_site_run(build_hde_site(), redis_client)
 
 
 def scrapy_hde(start_page: int = 1) -> None:
@@ -266,8 +230,11 @@ def scrapy_hde(start_page: int = 1) -> None:
     redis_client = get_redis_client()
     try:
         recover_hde_processing_when_pending_is_empty(redis_client)
-        enqueue_hde_posts(start_page=start_page, redis_client=redis_client)
-        drain_hde_queue(redis_client=redis_client)
+        run_scan_and_drain(
+            lambda: enqueue_hde_posts(start_page=start_page, redis_client=redis_client),
+            lambda **kwargs: drain_hde_queue(redis_client=redis_client, **kwargs),
+            overlap=DRAIN_WHILE_SCANNING,
+        )
     finally:
         finalize_hde_run(redis_client=redis_client)
 
@@ -310,7 +277,7 @@ def post_hde_response(url: str, payload: List[tuple[str, str]], session: request
 
 def parse_hde_response(response: requests.Response) -> list:
     """解析 HDE 单页列表，输出 ``title/url/size`` 字典列表。"""
-    soup = BeautifulSoup(response.text, "lxml")
+    soup = parse_html(response.text, HTML_PARSER, HDE_LIST_STRAINER)
     results = []
     for fit in soup.select("div.fit.item"):
         result_item = parse_hde_item(fit)
@@ -354,9 +321,9 @@ def visit_hde_url(result_item: dict):
     """
     url = result_item["url"]
     logger.info(f"访问 {url}")
-    detail_session = build_hde_session()
+    detail_session = build_hde_session(pool_from=session)
     response = get_hde_response(url, session=detail_session)
-    soup = BeautifulSoup(response.text, 'lxml')
+    soup = parse_html(response.text, HTML_PARSER)
     result_item["imdb"] = extract_imdb_id_from_links(a["href"] for a in soup.find_all("a", href=True)) or ""
     soup = unlock_hde_protected_soup(url, soup, detail_session)
     content = build_hde_output_content(url, result_item["imdb"], soup)
@@ -396,7 +363,7 @@ def unlock_hde_protected_soup(url: str, soup: BeautifulSoup, session: requests.S
         return soup
 
     response = post_hde_response(url, payload, session)
-    return BeautifulSoup(response.text, "lxml")
+    return parse_html(response.text, HTML_PARSER)
 
 
 def build_hde_output_content(url: str, imdb_id: str, soup: BeautifulSoup) -> List[str]:
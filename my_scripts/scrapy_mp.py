@@ -8,24 +8,38 @@
 import logging
 import os
 import re
+from typing import Callable
 
 import redis
 import requests
-from bs4 import BeautifulSoup
 from bs4.element import Tag
 from retrying import retry
 
 from my_module import (
+    build_http_session,
+    build_strainer,
     normalize_release_title_for_filename,
+    parse_html,
     read_json_to_dict,
     sanitize_filename,
     write_list_to_file,
 )
 from scrapy_redis import (
+    THROTTLE_STATUS_CODES,
+    AdaptiveConcurrencyLimiter,
+    RetryPolicy,
+    ThrottledError,
+    build_page_fingerprint,
+    commit_page_fingerprints,
     deserialize_payload,
     drain_queue,
     get_redis_client,
+    is_page_processed,
+    move_processing_to_pending,
+    prefetch_pages,
+    run_scan_and_drain,
     serialize_payload,
+    stage_page_fingerprint,
 )
 
 logger = logging.getLogger(__name__)
@@ -39,13 +53,23 @@ MP_COOKIE = CONFIG['mp_cookie']  # 用户甜甜
 REQUEST_HEAD = CONFIG['request_head']  # 请求头
 OUTPUT_DIR = CONFIG['output_dir']  # 输出目录
 THREAD_NUMBER = CONFIG.get('thread_number', 35)  # 线程数
+ADAPTIVE_CONCURRENCY = CONFIG.get('adaptive_concurrency', False)  # 是否按站点响应自适应调整并发
+LATENCY_TARGET = CONFIG.get('latency_target')  # 自适应并发的详情任务耗时目标秒数
+HTML_PARSER = CONFIG.get('html_parser')  # 页面解析器，留空时优先用 lxml
+PARTIAL_PARSE = CONFIG.get('partial_parse', True)  # 列表页只解析目标容器，页面结构变化时可关闭改为整页解析
+MP_LIST_STRAINER = build_strainer('div', id='archive-content') if PARTIAL_PARSE else None  # 列表页只保留条目容器
+PREFETCH_PAGES = CONFIG.get('prefetch_pages', 1)  # 列表页并发预取页数，1 表示逐页请求
+DRAIN_WHILE_SCANNING = CONFIG.get('drain_while_scanning', False)  # 列表扫描期间同时消费详情队列
 
 REDIS_PENDING_KEY = CONFIG.get('redis_pending_key', 'mp_pending')  # 待处理队列
 REDIS_PROCESSING_KEY = CONFIG.get('redis_processing_key', 'mp_processing')  # 处理中队列
+REDIS_RETRY_KEY = CONFIG.get('redis_retry_key', 'mp_retry')  # 自适应并发时被限流详情页的延迟重试队列
 REDIS_SCAN_PAGE_KEY = CONFIG.get('redis_scan_page_key', 'mp_scan_page')  # 列表扫描断点页码
 REDIS_SCAN_COMPLETE_KEY = CONFIG.get('redis_scan_complete_key', 'mp_scan_complete')  # 列表扫描完成标记
+REDIS_PAGE_FINGERPRINT_KEY = CONFIG.get('redis_page_fingerprint_key', 'mp_page_fingerprints')  # 已完成列表页指纹，跨轮次保留
 
 REQUEST_HEAD["Cookie"] = MP_COOKIE  # 请求头加入认证
+session = build_http_session(THREAD_NUMBER + PREFETCH_PAGES)  # 列表页和详情页共用的连接池，录制回放也经由这里
 
 
 class MpCloudflareError(RuntimeError):
@@ -107,7 +131,7 @@ def request_mp_page(url: str, *, allow_not_found: bool = False) -> requests.Resp
     """请求 MP 页面；命中 Cloudflare 时直接停止，等待人工处理后重跑。"""
     headers = dict(REQUEST_HEAD)
     headers["Cookie"] = MP_COOKIE
-    response = requests.get(url, headers=headers, timeout=20)
+    response = session.get(url, headers=headers, timeout=20)
     response.encoding = 'utf-8'
     if is_mp_cloudflare_challenge(response):
         verification_url = MP_VERIFICATION_URL or url
@@ -117,6 +141,8 @@ def request_mp_page(url: str, *, allow_not_found: bool = False) -> requests.Resp
 
     if response.status_code == 404 and allow_not_found:
         return response
+    if response.status_code in THROTTLE_STATUS_CODES:
+        raise ThrottledError(f"请求被限流，重试 {response.status_code}：{url}", response.status_code)
     if response.status_code != 200:
         raise Exception(f"请求失败，重试 {response.status_code}：{url}")
     return response
@@ -143,8 +169,11 @@ def scrapy_mp(start_page, end) -> None:
     redis_client = get_redis_client()
     try:
         recover_mp_processing_when_pending_is_empty(redis_client)
-        enqueue_mp_posts(start_page=start_page, end=end, redis_client=redis_client)
-        drain_mp_queue(redis_client=redis_client)
+        run_scan_and_drain(
+            lambda: enqueue_mp_posts(start_page=start_page, end=end, redis_client=redis_client),
+            lambda **kwargs: drain_mp_queue(redis_client=redis_client, **kwargs),
+            overlap=DRAIN_WHILE_SCANNING,
+        )
     finally:
         finalize_mp_run(redis_client=redis_client)
 
@@ -189,8 +218,23 @@ def split_new_mp_items(result_list: list[dict], queued_links: set[str]) -> tuple
     return new_items, page_unique_links
 
 
+def fetch_mp_page(page_no: int) -> tuple[requests.Response, list[dict]]:
+    """抓取并解析单个 MP 列表页。"""
+    logger.info(f"抓取第 {page_no} 页")
+    response = get_mp_response(f"{MP_MOVIE_URL}{page_no}/")
+    result_list = parse_mp_response(response)
+    if not result_list:
+        raise RuntimeError("MP 列表页解析结果为空，网站结构可能已变更")
+    return response, result_list
+
+
 def enqueue_mp_posts(start_page: int = 0, end=None, redis_client: redis.Redis | None = None) -> None:
-    """顺序翻页，收集新帖子并写入 Redis 待处理队列。"""
+    """
+    顺序翻页，收集新帖子并写入 Redis 待处理队列。
+
+    遇到与上一轮完成时指纹相同的列表页即停止，优先使用响应的 ETag / Last-Modified。
+    ``prefetch_pages`` 大于 1 时并发预取后面的列表页，入队和断点仍按页码顺序提交。
+    """
     if redis_client is None:
         redis_client = get_redis_client()
     scan_state = prepare_mp_enqueue_scan(
@@ -202,13 +246,13 @@ def enqueue_mp_posts(start_page: int = 0, end=None, redis_client: redis.Redis |
         return
     current_page, end_urls, queued_links, matched_end_urls = scan_state
 
-    while True:
-        logger.info(f"抓取第 {current_page} 页")
-        url = f"{MP_MOVIE_URL}{current_page}/"
-        response = get_mp_response(url)
-        result_list = parse_mp_response(response)
-        if not result_list:
-            raise RuntimeError("MP 列表页解析结果为空，网站结构可能已变更")
+    for current_page, (response, result_list) in prefetch_pages(fetch_mp_page, current_page, PREFETCH_PAGES):
+        fingerprint = build_page_fingerprint((item["link"] for item in result_list), response.headers)
+        if is_page_processed(redis_client, REDIS_PAGE_FINGERPRINT_KEY, current_page, fingerprint):
+            redis_client.set(REDIS_SCAN_COMPLETE_KEY, "1")
+            redis_client.set(REDIS_SCAN_PAGE_KEY, str(current_page + 1))
+            logger.info(f"第 {current_page} 页与上一轮相同，之后的页面都已处理过，MP 列表扫描完成")
+            break
 
         new_items, page_unique_links = split_new_mp_items(result_list, queued_links)
 
@@ -221,6 +265,7 @@ def enqueue_mp_posts(start_page: int = 0, end=None, redis_client: redis.Redis |
         enqueued_count = len(new_items)
         skipped_count = len(result_list) - enqueued_count
         queued_links.update(page_unique_links)
+        stage_page_fingerprint(redis_client, REDIS_PAGE_FINGERPRINT_KEY, current_page, fingerprint)
         matched_end_urls.update(item["link"] for item in result_list if item["link"] in end_urls)
         logger.info(
             f"第 {current_page} 页解析 {len(result_list)} 条，入队 {enqueued_count} 条，跳过重复 {skipped_count} 条，"
@@ -233,21 +278,17 @@ def enqueue_mp_posts(start_page: int = 0, end=None, redis_client: redis.Redis |
             logger.info("MP 列表扫描完成")
             break
 
-        current_page += 1
-        redis_client.set(REDIS_SCAN_PAGE_KEY, str(current_page))
+        redis_client.set(REDIS_SCAN_PAGE_KEY, str(current_page + 1))
         logger.info("-" * 80)
 
 
 def recover_mp_processing_queue(redis_client: redis.Redis) -> int:
     """将处理中队列中的残留任务恢复回待处理队列，留待下次重跑。"""
-    recovered_count = 0
-    while True:
-        payload = redis_client.rpoplpush(REDIS_PROCESSING_KEY, REDIS_PENDING_KEY)
-        if not payload:
-            break
-        recovered_count += 1
-
-    return recovered_count
+    return move_processing_to_pending(
+        redis_client,
+        processing_key=REDIS_PROCESSING_KEY,
+        pending_key=REDIS_PENDING_KEY,
+    )
 
 
 def recover_mp_processing_when_pending_is_empty(redis_client: redis.Redis) -> int:
@@ -260,8 +301,33 @@ def recover_mp_processing_when_pending_is_empty(redis_client: redis.Redis) -> in
     return recovered_count
 
 
-def drain_mp_queue(redis_client: redis.Redis | None = None) -> None:
-    """从 Redis 队列中取帖子，使用多线程访问详情页并写出 .rare 文件。"""
+def build_mp_concurrency_limiter() -> AdaptiveConcurrencyLimiter | None:
+    """开启 ``adaptive_concurrency`` 时返回以 ``thread_number`` 为上限的并发控制器。"""
+    if not ADAPTIVE_CONCURRENCY:
+        return None
+    return AdaptiveConcurrencyLimiter(
+        max_limit=THREAD_NUMBER,
+        latency_target=LATENCY_TARGET,
+        is_throttled=lambda exc: isinstance(exc, ThrottledError),
+    )
+
+
+def build_mp_retry_policy() -> RetryPolicy | None:
+    """开启 ``adaptive_concurrency`` 时，被限流的详情页交给 Redis 延迟重试，不在线程内反复请求。"""
+    if not ADAPTIVE_CONCURRENCY:
+        return None
+    return RetryPolicy(REDIS_RETRY_KEY)
+
+
+def drain_mp_queue(
+        redis_client: redis.Redis | None = None,
+        producer_active: Callable[[], bool] | None = None,
+) -> None:
+    """
+    从 Redis 队列中取帖子，使用多线程访问详情页并写出 .rare 文件。
+
+    ``producer_active`` 由 ``run_scan_and_drain`` 传入，列表扫描未结束时队列暂空也继续等待。
+    """
     if redis_client is None:
         redis_client = get_redis_client()
 
@@ -276,6 +342,9 @@ def drain_mp_queue(redis_client: redis.Redis | None = None) -> None:
         identify_item=lambda info: info["link"],
         abort_on_exception=lambda exc: isinstance(exc, MpCloudflareError),
         recover_processing_on_start=False,
+        retry_policy=build_mp_retry_policy(),
+        concurrency_limiter=build_mp_concurrency_limiter(),
+        producer_active=producer_active,
     )
 
 
@@ -300,6 +369,11 @@ def finalize_mp_run(redis_client: redis.Redis | None = None) -> None:
         )
         return
 
+    if redis_client.zcard(REDIS_RETRY_KEY):
+        logger.info("MP 延迟重试队列仍有任务，暂不清理扫描状态")
+        return
+
+    commit_page_fingerprints(redis_client, REDIS_PAGE_FINGERPRINT_KEY)
     redis_client.delete(REDIS_SCAN_PAGE_KEY, REDIS_SCAN_COMPLETE_KEY)
 
 
@@ -319,9 +393,27 @@ def get_mp_response(url: str) -> requests.Response:
     return request_mp_page(url)
 
 
+def should_retry_mp_detail_request(exc: Exception) -> bool:
+    """开启自适应并发时，限流异常直接抛给队列，由并发控制器收缩并发后再延迟重试。"""
+    if ADAPTIVE_CONCURRENCY and isinstance(exc, ThrottledError):
+        return False
+    return should_retry_mp_request(exc)
+
+
+@retry(
+    stop_max_attempt_number=15,
+    wait_random_min=1000,
+    wait_random_max=10000,
+    retry_on_exception=should_retry_mp_detail_request,
+)
+def get_mp_detail_response(url: str) -> requests.Response:
+    """详情页请求流程"""
+    return request_mp_page(url)
+
+
 def parse_mp_response(response: requests.Response) -> list:
     """解析流程"""
-    soup = BeautifulSoup(response.text, 'html.parser')
+    soup = parse_html(response.text, HTML_PARSER, MP_LIST_STRAINER)
     container = soup.find('div', id='archive-content')
     results = []
     if not container:
@@ -507,7 +599,7 @@ def format_mp_text(text: str) -> str:
 
 def parse_mp_detail(response: requests.Response, result_item: dict):
     """解析详情页，返回输出文件名和正文内容。"""
-    soup = BeautifulSoup(response.text, "html.parser")
+    soup = parse_html(response.text, HTML_PARSER)
     # 提取编号
     cf = soup.find('div', class_='custom_fields2')
     if not cf:
@@ -551,7 +643,7 @@ def visit_mp_url(result_item: dict):
     """访问详情页"""
     url = result_item["link"]
     logger.info(f"访问 {url}")
-    response = get_mp_response(url)
+    response = get_mp_detail_response(url)
     result_dict = parse_mp_detail(response, result_item)
     if not isinstance(result_dict, dict):
         raise TypeError(f"MP 详情解析结果类型无效：{url}")
@@ -11,11 +11,11 @@ import re
 from datetime import date, datetime, timedelta
 
 import requests
-from requests.adapters import HTTPAdapter
 from retrying import retry
 from urllib3.util.retry import Retry
 
 from my_module import (
+    build_http_session,
     format_size,
     normalize_release_title_for_filename,
     read_json_to_dict,
@@ -58,11 +58,10 @@ def create_retry_strategy() -> Retry:
 
 
 retry_strategy = create_retry_strategy()
-adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=8, pool_maxsize=16)
-session = requests.Session()
-session.proxies = {"http": "http://127.0.0.1:7890", "https": "http://127.0.0.1:7890", }
-session.mount("http://", adapter)
-session.mount("https://", adapter)
+session = build_http_session(
+    proxies={"http": "http://127.0.0.1:7890", "https": "http://127.0.0.1:7890"},
+    max_retries=retry_strategy,
+)
 
 
 def get_previous_day(date_str: str) -> str:
@@ -12,11 +12,11 @@ import re
 from pathlib import Path
 
 import requests
-from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 from retrying import retry
 
 from my_module import (
+    build_http_session,
     normalize_release_title_for_filename,
     read_file_to_list,
     read_json_to_dict,
@@ -24,11 +24,13 @@ from my_module import (
     update_json_config,
     write_list_to_file,
 )
-from gd_downloader import download_gd_url, extract_drive_urls
+from gd_downloader import extract_drive_urls, stream_gd_url
 from scrapy_redis import (
     drain_queue,
     get_redis_client,
+    prefetch_pages,
     recover_processing_queue,
+    run_scan_and_drain,
     serialize_payload,
 )
 from sort_movie_ops import extract_imdb_id
@@ -43,6 +45,9 @@ ONK_COOKIE = CONFIG['onk_cookie']  # 用户甜甜
 REQUEST_HEAD = CONFIG['request_head']  # 请求头
 END_TIME = CONFIG.get('end_time', '2026-03-25')  # 截止日期
 THREAD_NUMBER = CONFIG.get('thread_number', 20)  # 详情页并发数
+DOWNLOAD_SEGMENTS = CONFIG.get('download_segments', 1)  # Drive 大文件分段并发数，1 表示单连接
+PREFETCH_PAGES = CONFIG.get('prefetch_pages', 1)  # 列表页并发预取页数，1 表示逐页请求
+DRAIN_WHILE_SCANNING = CONFIG.get('drain_while_scanning', False)  # 列表扫描期间同时消费详情队列
 REQUEST_HEAD["Cookie"] = ONK_COOKIE  # 请求头加入认证
 
 START_URL = ONK_URL + "/forums/{fid}/page-{page}?order=post_date&direction=desc"
@@ -57,12 +62,7 @@ requests.packages.urllib3.disable_warnings()
 
 def build_session(pool_size: int) -> requests.Session:
     """创建连接池容量与当前并发相匹配的 Session。"""
-    pool_size = max(pool_size, 10)
-    client = requests.Session()
-    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
-    client.mount("http://", adapter)
-    client.mount("https://", adapter)
-    return client
+    return build_http_session(pool_size)
 
 
 session = build_session(THREAD_NUMBER)
@@ -125,8 +125,11 @@ def scrapy_onk() -> None:
     stop_date = datetime.datetime.strptime(get_current_end_time(), "%Y-%m-%d")
     try:
         recover_onk_processing_when_pending_is_empty(redis_client)
-        enqueue_onk_posts(stop_date, redis_client=redis_client)
-        drain_onk_queue(redis_client=redis_client)
+        run_scan_and_drain(
+            lambda: enqueue_onk_posts(stop_date, redis_client=redis_client),
+            lambda **kwargs: drain_onk_queue(redis_client=redis_client, **kwargs),
+            overlap=DRAIN_WHILE_SCANNING,
+        )
     finally:
         finalize_onk_run(redis_client=redis_client)
 
@@ -186,7 +189,11 @@ def enqueue_onk_page_results(result_list: list[dict], redis_client) -> int:
 
 
 def enqueue_onk_posts(stop_date: datetime.datetime, redis_client=None) -> None:
-    """顺序扫描所有栏目，把新帖子统一写入 Redis 待处理队列。"""
+    """
+    顺序扫描所有栏目，把新帖子统一写入 Redis 待处理队列。
+
+    ``prefetch_pages`` 大于 1 时并发预取同一栏目后面的列表页，入队仍按页码顺序进行。
+    """
     if redis_client is None:
         redis_client = get_redis_client()
 
@@ -195,10 +202,12 @@ def enqueue_onk_posts(stop_date: datetime.datetime, redis_client=None) -> None:
         return
 
     for group_name, group_id in GROUP_DICT.items():
-        start_page = 1
-        while True:
+        for start_page, (results, stop) in prefetch_pages(
+                lambda page, fid=group_id: parse_forum_page(fid, page, stop_date),
+                1,
+                PREFETCH_PAGES,
+        ):
             logger.info(f"爬取栏目 {group_name} ，爬取页面 {start_page} …")
-            results, stop = parse_forum_page(group_id, start_page, stop_date)
             if not results:
                 logger.info(f"栏目 {group_name} 没有爬取结果")
                 break
@@ -208,7 +217,6 @@ def enqueue_onk_posts(stop_date: datetime.datetime, redis_client=None) -> None:
             logger.info("-" * 255)
             if stop:
                 break
-            start_page += 1
         logger.info("-" * 255)
 
     redis_client.set(REDIS_SCAN_COMPLETE_KEY, "1")
@@ -434,8 +442,12 @@ def recover_onk_processing_when_pending_is_empty(redis_client) -> int:
     return recovered_count
 
 
-def drain_onk_queue(redis_client=None) -> None:
-    """从 Redis 队列中取帖子，使用多线程访问详情页并下载同名文件。"""
+def drain_onk_queue(redis_client=None, producer_active=None) -> None:
+    """
+    从 Redis 队列中取帖子，使用多线程访问详情页并下载同名文件。
+
+    ``producer_active`` 由 ``run_scan_and_drain`` 传入，列表扫描未结束时队列暂空也继续等待。
+    """
     if redis_client is None:
         redis_client = get_redis_client()
 
@@ -449,6 +461,7 @@ def drain_onk_queue(redis_client=None) -> None:
         queue_label="ONK",
         identify_item=lambda info: info["url"],
         recover_processing_on_start=False,
+        producer_active=producer_active,
     )
 
 
@@ -461,9 +474,11 @@ def download_drive_artifact(drive_url: str, onk_path: str, artifact_index: int =
         logger.info(f"已存在 {existing_output.name}，跳过 {artifact_base_name}")
         return str(existing_output)
 
-    download_result = download_gd_url(drive_url)
+    # 先写到 .part. 文件，下完再改名；中断后下次从这个文件末尾续传
+    part_path = onk_file.with_name(f"{artifact_base_name}.part.download")
+    download_result = stream_gd_url(drive_url, part_path, segments=DOWNLOAD_SEGMENTS)
     output_path = onk_file.with_name(f"{artifact_base_name}{download_result.suggested_suffix}")
-    output_path.write_bytes(download_result.payload)
+    download_result.path.replace(output_path)
     logger.info(f"{onk_file.name} -> {output_path.name}")
     return str(output_path)
 
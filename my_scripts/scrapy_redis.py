@@ -5,9 +5,22 @@
 :contact: https://github.com/hxz393
 :copyright: Copyright 2027, hxz393. 保留所有权利。
 """
+import asyncio
+import contextvars
+import functools
+import hashlib
+import inspect
 import json
-from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
-from typing import Callable
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterable, Iterator, Mapping, cast
+from urllib.parse import urlsplit
 
 import redis
 from my_module import read_json_to_dict
@@ -18,6 +31,15 @@ CONFIG = read_json_to_dict(CONFIG_PATH)  # Redis 配置文件
 REDIS_HOST = CONFIG['redis_host']  # Redis 主机
 REDIS_PORT = CONFIG.get('redis_port', 6379)  # Redis 端口
 REDIS_DB = CONFIG.get('redis_db', 0)  # Redis DB
+LEASE_SECONDS = CONFIG.get('lease_seconds')  # processing 任务租约秒数，为空时不启用租约
+RETRY_ATTEMPT_FIELD = '_retry_attempt'  # 延迟重试次数写入任务字典的字段名
+THROTTLE_STATUS_CODES = (429, 503)  # 视为站点限流的 HTTP 状态码
+METRICS_ENABLED = CONFIG.get('metrics_enabled', False)  # 是否为每次队列消费收集吞吐和耗时指标
+METRICS_KEY_PREFIX = CONFIG.get('metrics_key_prefix', 'scrapy_metrics')  # 指标 Redis 哈希的键前缀
+METRICS_HISTORY_SIZE = CONFIG.get('metrics_history_size', 50)  # 每个队列保留的历史运行指标条数
+METRICS_DIR = CONFIG.get('metrics_dir')  # Prometheus 文本格式指标输出目录，为空时不写文件
+METRICS_QUANTILES = (0.5, 0.95, 0.99)  # 任务耗时分位数
+PRODUCER_POLL_SECONDS = 0.5  # 边扫描边消费时，队列暂空后等待列表扫描补充任务的轮询间隔
 
 PUSH_ITEMS_TO_QUEUE_LUA = """
 local enqueued = 0
@@ -32,6 +54,863 @@ end
 return enqueued
 """
 
+# 布隆位图脚本共用的开头：ARGV[1] / ARGV[2] 为哈希个数和位数，最后一个 KEY 记录位图建立时的参数。
+# 位图已存在且参数不同时拒绝执行，否则同一个值会落到不同的位上，去重结果全部失效。
+BLOOM_PARAMS_CHECK_LUA = """
+local hash_count = tonumber(ARGV[1])
+local use_set = redis.call('TYPE', KEYS[1])['ok'] == 'set'
+if not use_set then
+    local params_key = KEYS[#KEYS]
+    local saved = redis.call('HMGET', params_key, 'hash_count', 'bit_count')
+    if redis.call('EXISTS', KEYS[1]) == 0 or not saved[1] then
+        redis.call('HSET', params_key, 'hash_count', ARGV[1], 'bit_count', ARGV[2])
+    elseif saved[1] ~= ARGV[1] or saved[2] ~= ARGV[2] then
+        return redis.error_reply(
+            'bloom params mismatch for ' .. KEYS[1] .. ': bitmap has k=' .. saved[1] .. ' m=' .. saved[2]
+            .. ', config has k=' .. ARGV[1] .. ' m=' .. ARGV[2]
+        )
+    end
+end
+"""
+
+PUSH_ITEMS_TO_BLOOM_QUEUE_LUA = BLOOM_PARAMS_CHECK_LUA + """
+local enqueued = 0
+for i = 3, #ARGV, hash_count + 2 do
+    local is_new = false
+    if use_set then
+        is_new = redis.call('SADD', KEYS[1], ARGV[i]) == 1
+    else
+        for j = i + 2, i + 1 + hash_count do
+            if redis.call('SETBIT', KEYS[1], ARGV[j], 1) == 0 then
+                is_new = true
+            end
+        end
+    end
+    if is_new then
+        redis.call('RPUSH', KEYS[2], ARGV[i + 1])
+        enqueued = enqueued + 1
+    end
+end
+return enqueued
+"""
+
+ADD_SEEN_VALUES_LUA = BLOOM_PARAMS_CHECK_LUA + """
+local added = {}
+for i = 3, #ARGV, hash_count + 1 do
+    local is_new = 0
+    if use_set then
+        is_new = redis.call('SADD', KEYS[1], ARGV[i])
+    else
+        for j = i + 1, i + hash_count do
+            if redis.call('SETBIT', KEYS[1], ARGV[j], 1) == 0 then
+                is_new = 1
+            end
+        end
+    end
+    added[#added + 1] = is_new
+end
+return added
+"""
+
+CONTAINS_SEEN_VALUES_LUA = BLOOM_PARAMS_CHECK_LUA + """
+local found = {}
+for i = 3, #ARGV, hash_count + 1 do
+    local is_member = 1
+    if use_set then
+        is_member = redis.call('SISMEMBER', KEYS[1], ARGV[i])
+    else
+        for j = i + 1, i + hash_count do
+            if redis.call('GETBIT', KEYS[1], ARGV[j]) == 0 then
+                is_member = 0
+                break
+            end
+        end
+    end
+    found[#found + 1] = is_member
+end
+return found
+"""
+
+CLAIM_PAYLOADS_LUA = """
+local claimed = {}
+local deadline = nil
+if KEYS[3] then
+    local now = redis.call('TIME')
+    deadline = tonumber(now[1]) + tonumber(now[2]) / 1000000 + tonumber(ARGV[2])
+end
+for i = 1, tonumber(ARGV[1]) do
+    local payload = redis.call('RPOPLPUSH', KEYS[1], KEYS[2])
+    if not payload then
+        break
+    end
+    if deadline then
+        redis.call('ZADD', KEYS[3], deadline, payload)
+    end
+    claimed[#claimed + 1] = payload
+end
+return claimed
+"""
+
+RENEW_LEASES_LUA = """
+local now = redis.call('TIME')
+local deadline = tonumber(now[1]) + tonumber(now[2]) / 1000000 + tonumber(ARGV[1])
+local renewed = 0
+for i = 2, #ARGV do
+    renewed = renewed + redis.call('ZADD', KEYS[1], 'XX', 'CH', deadline, ARGV[i])
+end
+return renewed
+"""
+
+REAP_EXPIRED_LEASES_LUA = """
+local now = redis.call('TIME')
+local now_seconds = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now_seconds)
+local reaped = 0
+for _, payload in ipairs(expired) do
+    redis.call('ZREM', KEYS[1], payload)
+    if redis.call('LREM', KEYS[2], 1, payload) > 0 then
+        redis.call('LPUSH', KEYS[3], payload)
+        reaped = reaped + 1
+    end
+end
+return reaped
+"""
+
+RECOVER_UNLEASED_LUA = """
+local now = redis.call('TIME')
+local now_seconds = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local payloads = redis.call('LRANGE', KEYS[2], 0, -1)
+local recovered = 0
+for i = #payloads, 1, -1 do
+    local payload = payloads[i]
+    local deadline = redis.call('ZSCORE', KEYS[1], payload)
+    if not deadline or tonumber(deadline) <= now_seconds then
+        redis.call('ZREM', KEYS[1], payload)
+        redis.call('LREM', KEYS[2], -1, payload)
+        redis.call('LPUSH', KEYS[3], payload)
+        recovered = recovered + 1
+    end
+end
+return recovered
+"""
+
+SCHEDULE_RETRY_LUA = """
+local now = redis.call('TIME')
+local due_at = tonumber(now[1]) + tonumber(now[2]) / 1000000 + tonumber(ARGV[1])
+return redis.call('ZADD', KEYS[1], due_at, ARGV[2])
+"""
+
+PROMOTE_DUE_RETRIES_LUA = """
+local now = redis.call('TIME')
+local now_seconds = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now_seconds)
+for _, payload in ipairs(due) do
+    redis.call('ZREM', KEYS[1], payload)
+    redis.call('RPUSH', KEYS[2], payload)
+end
+return #due
+"""
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Redis 侧延迟重试策略。
+
+    失败任务写入 ``retry_key`` 有序集合，分数为下次可执行的时间；
+    ``max_attempts`` 为包含首次执行在内的总次数，与 ``retrying`` 的
+    ``stop_max_attempt_number`` 含义一致；第 n 次重试的等待时间为 ``base_delay * 2 ** (n - 1)``，最多 ``max_delay`` 秒。
+    """
+    retry_key: str
+    max_attempts: int = 5
+    base_delay: float = 5.0
+    max_delay: float = 300.0
+    poll_seconds: float = 1.0
+
+    def get_delay(self, attempt: int) -> float:
+        """返回第 ``attempt`` 次重试前的等待秒数。"""
+        return min(self.base_delay * 2 ** (attempt - 1), self.max_delay)
+
+
+class ThrottledError(RuntimeError):
+    """站点返回限流状态码时抛出，供并发控制器收缩并发。"""
+
+    def __init__(self, message: str, status_code: int | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def is_throttle_error(exc: BaseException) -> bool:
+    """判断异常是否代表站点限流：``ThrottledError`` 或响应状态码为 429 / 503。"""
+    if isinstance(exc, ThrottledError):
+        return True
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None) in THROTTLE_STATUS_CODES
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    按主机划分的 AIMD 并发控制器。
+
+    每个主机独立维护并发上限，初始为 ``initial_limit``，范围为 ``[min_limit, max_limit]``：
+
+    - 任务成功且耗时不超过 ``latency_target`` 时加性增长，每完成约一个窗口的任务上限加 ``increase_step``；
+    - 命中 ``is_throttled`` 或耗时超标时乘以 ``decrease_factor``，在收缩之前已发出的任务再失败不会重复收缩；
+    - 普通失败既不增长也不收缩。
+
+    内部加锁，可以在多个 ``drain_queue`` 之间共享同一个实例。
+    """
+
+    def __init__(
+            self,
+            *,
+            max_limit: int,
+            min_limit: int = 1,
+            initial_limit: int | None = None,
+            increase_step: float = 1.0,
+            decrease_factor: float = 0.5,
+            latency_target: float | None = None,
+            is_throttled: Callable[[BaseException], bool] = is_throttle_error,
+            poll_seconds: float = 0.1,
+    ):
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError(f"并发上限范围无效：min_limit={min_limit}，max_limit={max_limit}")
+        if not 0 < decrease_factor < 1:
+            raise ValueError(f"decrease_factor 必须在 0 和 1 之间：{decrease_factor}")
+        if initial_limit is None:
+            initial_limit = max(min_limit, max_limit // 2)
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.initial_limit = min(max(initial_limit, min_limit), max_limit)
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+        self.is_throttled = is_throttled
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._limits: dict[str, float] = {}
+        self._in_flight: dict[str, int] = {}
+        self._last_decrease: dict[str, float] = {}
+
+    @staticmethod
+    def get_host(target: str) -> str:
+        """从 URL 中取主机名；不是 URL 时原样作为分组键。"""
+        return urlsplit(target).hostname or target
+
+    def get_limit(self, host: str) -> int:
+        """返回主机当前的并发上限。"""
+        with self._lock:
+            return int(self._limits.get(host, self.initial_limit))
+
+    def get_limits(self) -> dict[str, int]:
+        """返回所有已出现主机的并发上限。"""
+        with self._lock:
+            return {host: int(limit) for host, limit in self._limits.items()}
+
+    def try_acquire(self, host: str) -> float | None:
+        """占用主机的一个并发名额，成功时返回开始时间，名额已满时返回 ``None``。"""
+        with self._lock:
+            in_flight = self._in_flight.get(host, 0)
+            if in_flight >= int(self._limits.get(host, self.initial_limit)):
+                return None
+            self._in_flight[host] = in_flight + 1
+            return time.monotonic()
+
+    def release(self, host: str, started_at: float, error: BaseException | None = None) -> None:
+        """释放名额，并根据任务结果和耗时调整主机并发上限。"""
+        now = time.monotonic()
+        congested = (error is not None and self.is_throttled(error)) or (
+                self.latency_target is not None and now - started_at > self.latency_target
+        )
+        with self._lock:
+            self._in_flight[host] -= 1
+            limit = self._limits.setdefault(host, float(self.initial_limit))
+            if congested:
+                if started_at >= self._last_decrease.get(host, float("-inf")):
+                    self._limits[host] = max(float(self.min_limit), limit * self.decrease_factor)
+                    self._last_decrease[host] = now
+            elif error is None:
+                self._limits[host] = min(float(self.max_limit), limit + self.increase_step / limit)
+
+
+class WorkerBudget:
+    """
+    同一进程内多个站点共享的全局并发预算。
+
+    ``total_workers`` 限制所有队列同时执行的任务数，也就同时限制了并发占用的连接数。
+    站点通过 ``use_worker_budget`` 登记后，``drain_queue`` / ``drain_queue_async`` 会把自身并发
+    收紧到站点上限以内，并让每个任务先占用一个全局名额再执行。内部加锁，可跨线程共享。
+    """
+
+    def __init__(self, total_workers: int, *, poll_seconds: float = 0.05):
+        if total_workers < 1:
+            raise ValueError(f"total_workers 至少为 1：{total_workers}")
+        self.total_workers = total_workers
+        self.poll_seconds = poll_seconds
+        self._semaphore = threading.BoundedSemaphore(total_workers)
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict[str, int]] = {}
+
+    def _mark_started(self, site: str) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(site, {"active": 0, "completed": 0})
+            stats["active"] += 1
+
+    def acquire(self, site: str) -> None:
+        """阻塞直到拿到一个全局名额。"""
+        self._semaphore.acquire()
+        self._mark_started(site)
+
+    def try_acquire(self, site: str) -> bool:
+        """尝试拿一个全局名额，名额已满时立即返回 ``False``。"""
+        if not self._semaphore.acquire(blocking=False):
+            return False
+        self._mark_started(site)
+        return True
+
+    def release(self, site: str) -> None:
+        """归还名额并记一次完成。"""
+        with self._lock:
+            stats = self._stats[site]
+            stats["active"] -= 1
+            stats["completed"] += 1
+        self._semaphore.release()
+
+    def get_snapshot(self) -> dict[str, dict[str, int]]:
+        """返回各站点当前执行中和已完成的任务数。"""
+        with self._lock:
+            return {site: dict(stats) for site, stats in self._stats.items()}
+
+
+@dataclass(frozen=True)
+class SiteBudget:
+    """单个站点在 ``WorkerBudget`` 中的份额，``max_workers`` 为空时只受全局上限约束。"""
+    budget: WorkerBudget
+    site: str
+    max_workers: int | None = None
+
+    def get_max_workers(self, max_workers: int) -> int:
+        """把队列自身的并发数收紧到站点上限和全局上限以内。"""
+        limits = [max_workers, self.budget.total_workers]
+        if self.max_workers:
+            limits.append(self.max_workers)
+        return max(1, min(limits))
+
+    def wrap_worker(self, worker: Callable[[dict], Any]) -> Callable[[dict], Any]:
+        """包装 worker：执行前占用全局名额，结束后归还，返回值原样传出。协程 worker 轮询等待，不阻塞事件循环。"""
+        budget = self.budget
+        site = self.site
+        if inspect.iscoroutinefunction(worker):
+            @functools.wraps(worker)
+            async def budgeted_async_worker(info: dict) -> Any:
+                while not budget.try_acquire(site):
+                    await asyncio.sleep(budget.poll_seconds)
+                try:
+                    return await worker(info)
+                finally:
+                    budget.release(site)
+
+            return budgeted_async_worker
+
+        @functools.wraps(worker)
+        def budgeted_worker(info: dict) -> Any:
+            budget.acquire(site)
+            try:
+                return worker(info)
+            finally:
+                budget.release(site)
+
+        return budgeted_worker
+
+
+_CURRENT_BUDGET: contextvars.ContextVar = contextvars.ContextVar("scrapy_redis_budget", default=None)
+
+
+@contextmanager
+def use_worker_budget(budget: WorkerBudget, site: str, max_workers: int | None = None) -> Iterator[SiteBudget]:
+    """在当前上下文内让队列消费受 ``budget`` 约束，用于多站点并发运行。"""
+    site_budget = SiteBudget(budget, site, max_workers)
+    token = _CURRENT_BUDGET.set(site_budget)
+    try:
+        yield site_budget
+    finally:
+        _CURRENT_BUDGET.reset(token)
+
+
+def apply_worker_budget(worker: Callable[[dict], Any], max_workers: int) -> tuple[Callable[[dict], Any], int]:
+    """
+    在 ``use_worker_budget`` 中运行时，把并发数收紧到站点和全局上限以内，并包装 ``worker`` 占用全局名额。
+
+    ``drain_queue`` / ``drain_queue_async`` 内部使用；不走队列、自己开线程池的站点也用它接入预算。
+    不在 ``use_worker_budget`` 中时原样返回。
+    """
+    site_budget = _CURRENT_BUDGET.get()
+    if site_budget is None:
+        return worker, max_workers
+    return site_budget.wrap_worker(worker), site_budget.get_max_workers(max_workers)
+
+
+_CURRENT_METRICS: contextvars.ContextVar = contextvars.ContextVar("scrapy_redis_metrics", default=None)
+
+
+def get_quantile(sorted_values: list[float], quantile: float) -> float:
+    """按最近秩法取已排序序列的分位数，空序列返回 0。"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(quantile * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+class QueueMetrics:
+    """
+    单次队列消费的指标收集器。
+
+    记录每个任务的 worker 耗时（用于计算分位数）、Redis 命令耗时，以及 worker 内部通过
+    ``measure_phase`` 标记的分段耗时（如 ``http`` / ``disk``）。内部加锁，可在线程池中使用。
+    """
+
+    def __init__(self, queue_label: str):
+        self.queue_label = queue_label
+        self.started_at = time.monotonic()
+        self.finished_at: float | None = None
+        self.counts: dict[str, int] = {}
+        self.task_seconds: list[float] = []
+        self.phase_seconds: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record_task(self, seconds: float) -> None:
+        """记录单个任务的 worker 耗时。"""
+        with self._lock:
+            self.task_seconds.append(seconds)
+
+    def record_phase(self, phase: str, seconds: float) -> None:
+        """累加某个分段的耗时。"""
+        with self._lock:
+            self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def measure(self, phase: str) -> Iterator[None]:
+        """统计 ``with`` 块的耗时并计入 ``phase``。"""
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(phase, time.perf_counter() - started_at)
+
+    def wrap_worker(self, worker: Callable[[dict], Awaitable[None] | None]) -> Callable[[dict], Awaitable[None] | None]:
+        """包装 worker：记录任务耗时，并让 ``measure_phase`` 在任务内生效。"""
+        if inspect.iscoroutinefunction(worker):
+            @functools.wraps(worker)
+            async def timed_async_worker(info: dict) -> None:
+                token = _CURRENT_METRICS.set(self)
+                started_at = time.perf_counter()
+                try:
+                    await worker(info)
+                finally:
+                    self.record_task(time.perf_counter() - started_at)
+                    _CURRENT_METRICS.reset(token)
+
+            return timed_async_worker
+
+        @functools.wraps(worker)
+        def timed_worker(info: dict) -> None:
+            token = _CURRENT_METRICS.set(self)
+            started_at = time.perf_counter()
+            try:
+                worker(info)
+            finally:
+                self.record_task(time.perf_counter() - started_at)
+                _CURRENT_METRICS.reset(token)
+
+        return timed_worker
+
+    def wrap_redis(self, redis_client: redis.Redis) -> redis.Redis:
+        """返回统计命令耗时的 Redis 客户端代理。"""
+        return cast(redis.Redis, TimedRedis(redis_client, self))
+
+    def finish(self, counts: dict[str, int]) -> None:
+        """记录最终计数和结束时间。"""
+        self.counts = dict(counts)
+        self.finished_at = time.monotonic()
+
+    def summarize(self) -> dict[str, float]:
+        """返回可直接写入 Redis 哈希的扁平指标字典。"""
+        with self._lock:
+            task_seconds = sorted(self.task_seconds)
+            phase_seconds = dict(self.phase_seconds)
+        finished_at = self.finished_at if self.finished_at is not None else time.monotonic()
+        elapsed = finished_at - self.started_at
+        processed = self.counts.get("processed", len(task_seconds))
+        summary = {
+            "elapsed_seconds": round(elapsed, 3),
+            "processed": processed,
+            "success": self.counts.get("success", 0),
+            "failed": self.counts.get("failed", 0),
+            "retried": self.counts.get("retried", 0),
+            "tasks_per_second": round(processed / elapsed, 3) if elapsed > 0 else 0.0,
+        }
+        for quantile in METRICS_QUANTILES:
+            summary[f"task_p{int(quantile * 100)}_seconds"] = round(get_quantile(task_seconds, quantile), 3)
+        for phase, seconds in sorted(phase_seconds.items()):
+            summary[f"{phase}_seconds"] = round(seconds, 3)
+        return summary
+
+    def to_prometheus(self) -> str:
+        """按 Prometheus 文本格式输出指标。"""
+        summary = self.summarize()
+        label = self.queue_label.replace("\\", "\\\\").replace('"', '\\"')
+        lines = [
+            "# TYPE scrapy_queue_tasks_total counter",
+            *(
+                f'scrapy_queue_tasks_total{{queue="{label}",result="{result}"}} {summary[result]}'
+                for result in ("processed", "success", "failed", "retried")
+            ),
+            "# TYPE scrapy_queue_tasks_per_second gauge",
+            f'scrapy_queue_tasks_per_second{{queue="{label}"}} {summary["tasks_per_second"]}',
+            "# TYPE scrapy_queue_task_seconds summary",
+            *(
+                f'scrapy_queue_task_seconds{{queue="{label}",quantile="{quantile}"}} '
+                f'{summary[f"task_p{int(quantile * 100)}_seconds"]}'
+                for quantile in METRICS_QUANTILES
+            ),
+            "# TYPE scrapy_queue_phase_seconds_total counter",
+            *(
+                f'scrapy_queue_phase_seconds_total{{queue="{label}",phase="{key[:-len("_seconds")]}"}} {value}'
+                for key, value in summary.items()
+                if key.endswith("_seconds") and key != "elapsed_seconds" and not key.startswith("task_p")
+            ),
+            "# TYPE scrapy_queue_elapsed_seconds gauge",
+            f'scrapy_queue_elapsed_seconds{{queue="{label}"}} {summary["elapsed_seconds"]}',
+        ]
+        return "\n".join(lines) + "\n"
+
+
+class TimedRedis:
+    """统计命令耗时的 Redis 客户端代理；``pipeline()`` 返回的管道在 ``execute`` 时计时。"""
+
+    def __init__(self, redis_client: redis.Redis, metrics: QueueMetrics):
+        self._redis_client = redis_client
+        self._metrics = metrics
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._redis_client, name)
+        if not callable(attr):
+            return attr
+        if name == "pipeline":
+            return lambda *args, **kwargs: TimedPipeline(attr(*args, **kwargs), self._metrics)
+
+        @functools.wraps(attr)
+        def timed_command(*args, **kwargs):
+            with self._metrics.measure("redis"):
+                return attr(*args, **kwargs)
+
+        return timed_command
+
+
+class TimedPipeline:
+    """``TimedRedis`` 使用的管道代理，只在真正发出请求的 ``execute`` 时计时。"""
+
+    def __init__(self, pipeline, metrics: QueueMetrics):
+        self._pipeline = pipeline
+        self._metrics = metrics
+
+    def __getattr__(self, name: str):
+        return getattr(self._pipeline, name)
+
+    def execute(self, *args, **kwargs):
+        with self._metrics.measure("redis"):
+            return self._pipeline.execute(*args, **kwargs)
+
+
+@contextmanager
+def measure_phase(phase: str) -> Iterator[None]:
+    """
+    在 worker 内标记一段耗时，如 ``with measure_phase("http"):``。
+
+    只在启用指标的 ``drain_queue`` / ``drain_queue_async`` 任务中生效，否则不做任何事。
+    """
+    metrics = _CURRENT_METRICS.get()
+    if metrics is None:
+        yield
+        return
+    with metrics.measure(phase):
+        yield
+
+
+def build_queue_metrics(queue_label: str, metrics: QueueMetrics | None) -> QueueMetrics | None:
+    """返回调用方传入的收集器；未传入且配置开启 ``metrics_enabled`` 时新建一个。"""
+    if metrics is None and METRICS_ENABLED:
+        return QueueMetrics(queue_label)
+    return metrics
+
+
+def publish_queue_metrics(redis_client: redis.Redis, metrics: QueueMetrics, *, logger) -> dict[str, float]:
+    """
+    输出结束汇总，并把指标写入 Redis。
+
+    最近一次运行写入哈希 ``{metrics_key_prefix}:{queue_label}``，历史运行以 JSON 追加到
+    ``{metrics_key_prefix}:{queue_label}:history``；配置了 ``metrics_dir`` 时再写一份
+    Prometheus 文本文件，便于 node_exporter 的 textfile 收集器读取。
+    """
+    summary = metrics.summarize()
+    phase_text = "，".join(
+        f"{key[:-len('_seconds')]} {value:.1f} 秒"
+        for key, value in summary.items()
+        if key.endswith("_seconds") and key != "elapsed_seconds" and not key.startswith("task_p")
+    )
+    logger.info(
+        f"{metrics.queue_label} 队列指标：耗时 {summary['elapsed_seconds']:.1f} 秒，"
+        f"{summary['tasks_per_second']:.2f} 条/秒，任务耗时 p50 {summary['task_p50_seconds']:.2f} 秒 / "
+        f"p95 {summary['task_p95_seconds']:.2f} 秒 / p99 {summary['task_p99_seconds']:.2f} 秒"
+        + (f"，{phase_text}" if phase_text else "")
+    )
+
+    metrics_key = f"{METRICS_KEY_PREFIX}:{metrics.queue_label}"
+    record = {**summary, "finished_at": round(time.time(), 3)}
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.delete(metrics_key)
+    pipe.hset(metrics_key, mapping=record)
+    pipe.lpush(f"{metrics_key}:history", json.dumps(record, sort_keys=True))
+    pipe.ltrim(f"{metrics_key}:history", 0, METRICS_HISTORY_SIZE - 1)
+    pipe.execute()
+
+    if METRICS_DIR:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        metrics_path = os.path.join(METRICS_DIR, f"{metrics.queue_label.lower()}.prom")
+        temp_path = f"{metrics_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write(metrics.to_prometheus())
+        os.replace(temp_path, metrics_path)
+    return summary
+
+
+@dataclass(frozen=True)
+class BloomFilter:
+    """
+    基于 Redis 位图的 seen 集合参数。
+
+    按预计元素数 ``capacity`` 和误判率 ``error_rate`` 计算位数和哈希个数，
+    同样 100 万条 URL 在 0.1% 误判率下约占 1.8 MB，而 set 需要上百 MB。
+    误判只会让极少量新任务被当作已见过而跳过，不会重复入队。
+    位图建立时的位数和哈希个数记在 ``{seen_key}:bloom`` 哈希里，之后修改了容量或误判率，
+    读写已有位图时直接报错，需要改回原配置，或删除 seen 键后重新积累。
+    """
+    capacity: int
+    error_rate: float = 0.001
+
+    @property
+    def bit_count(self) -> int:
+        """位图总位数，不超过 Redis 字符串上限 2^32。"""
+        bits = math.ceil(-self.capacity * math.log(self.error_rate) / math.log(2) ** 2)
+        return min(max(bits, 8), 2 ** 32)
+
+    @property
+    def hash_count(self) -> int:
+        """每个元素占用的位数。"""
+        return max(1, round(self.bit_count / self.capacity * math.log(2)))
+
+    def get_offsets(self, value: str) -> list[int]:
+        """用双重哈希计算 ``value`` 对应的位偏移。"""
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        first_hash = int.from_bytes(digest[:8], "little")
+        second_hash = int.from_bytes(digest[8:], "little") | 1
+        return [(first_hash + index * second_hash) % self.bit_count for index in range(self.hash_count)]
+
+
+def build_seen_bloom(config: dict) -> BloomFilter | None:
+    """按站点配置的 ``seen_bloom_capacity`` / ``seen_bloom_error_rate`` 创建布隆过滤器，未配置时返回 ``None``。"""
+    capacity = config.get('seen_bloom_capacity')
+    if not capacity:
+        return None
+    return BloomFilter(capacity, config.get('seen_bloom_error_rate', 0.001))
+
+
+def get_bloom_params_key(seen_key: str) -> str:
+    """返回记录布隆位图位数和哈希个数的哈希键名。"""
+    return f"{seen_key}:bloom"
+
+
+def build_seen_args(values: list[str], bloom: BloomFilter) -> list:
+    """把 seen 值整理成 Lua 参数：哈希个数和位数，然后每个值后跟它的位偏移。"""
+    args: list = [bloom.hash_count, bloom.bit_count]
+    for value in values:
+        args.extend((value, *bloom.get_offsets(value)))
+    return args
+
+
+def add_seen_values(
+        redis_client: redis.Redis,
+        seen_key: str,
+        values: list[str],
+        *,
+        bloom: BloomFilter | None = None,
+) -> list[bool]:
+    """
+    把值写入 seen 存储，返回每个值是否是新值。
+
+    ``seen_key`` 已是 set 时始终按 set 写入，否则使用 ``bloom`` 位图；两者都没有时新建 set。
+    """
+    if not values:
+        return []
+    if bloom is None:
+        pipe = redis_client.pipeline(transaction=False)
+        for value in values:
+            pipe.sadd(seen_key, value)
+        return [bool(added) for added in pipe.execute()]
+    added = redis_client.eval(ADD_SEEN_VALUES_LUA, 2, seen_key, get_bloom_params_key(seen_key), *build_seen_args(values, bloom))
+    return [bool(flag) for flag in added]
+
+
+def contains_seen_values(
+        redis_client: redis.Redis,
+        seen_key: str,
+        values: list[str],
+        *,
+        bloom: BloomFilter | None = None,
+) -> list[bool]:
+    """批量判断值是否已在 seen 存储中，兼容 set 和布隆过滤器两种存储。"""
+    if not values:
+        return []
+    if bloom is None:
+        return [bool(found) for found in redis_client.smismember(seen_key, values)]
+    found = redis_client.eval(CONTAINS_SEEN_VALUES_LUA, 2, seen_key, get_bloom_params_key(seen_key), *build_seen_args(values, bloom))
+    return [bool(flag) for flag in found]
+
+
+def migrate_seen_set_to_bloom(
+        redis_client: redis.Redis,
+        seen_key: str,
+        *,
+        bloom: BloomFilter,
+        batch_size: int = 1000,
+) -> int:
+    """把已有的 seen set 转成布隆过滤器位图，完成后原子替换原键，返回迁移的元素数。"""
+    if redis_client.type(seen_key) != "set":
+        return 0
+    temp_key = f"{seen_key}:bloom_migrating"
+    redis_client.delete(temp_key, get_bloom_params_key(temp_key))
+    migrated_count = 0
+    batch: list[str] = []
+    for value in redis_client.sscan_iter(seen_key, count=batch_size):
+        batch.append(value)
+        if len(batch) >= batch_size:
+            add_seen_values(redis_client, temp_key, batch, bloom=bloom)
+            migrated_count += len(batch)
+            batch = []
+    if batch:
+        add_seen_values(redis_client, temp_key, batch, bloom=bloom)
+        migrated_count += len(batch)
+    if migrated_count:
+        redis_client.rename(temp_key, seen_key)
+        redis_client.rename(get_bloom_params_key(temp_key), get_bloom_params_key(seen_key))
+    return migrated_count
+
+
+def build_page_fingerprint(unique_values: Iterable[str], headers: Mapping[str, str] | None = None) -> str:
+    """
+    生成列表页指纹。
+
+    响应带 ``ETag`` / ``Last-Modified`` 时直接使用，否则用页内帖子唯一值集合的哈希，与帖子顺序无关。
+    """
+    if headers:
+        for name in ("ETag", "Last-Modified"):
+            if headers.get(name):
+                return f"{name.lower()}:{headers[name]}"
+    digest = hashlib.blake2b("\n".join(sorted(unique_values)).encode("utf-8"), digest_size=16).hexdigest()
+    return f"ids:{digest}"
+
+
+def get_fingerprint_staging_key(fingerprint_key: str) -> str:
+    """本轮扫描暂存指纹的哈希键。"""
+    return f"{fingerprint_key}:next"
+
+
+def is_page_processed(redis_client: redis.Redis, fingerprint_key: str, page: int, fingerprint: str) -> bool:
+    """
+    判断列表页与之前某轮完成时是否相同。
+
+    列表按发布时间倒序排列，新帖子会把旧帖子往后挤，所以某一页没变说明这页之前没有新帖子，
+    这一页和之后的页面在上一轮都已经处理过，可以直接结束扫描。
+    """
+    return redis_client.hget(fingerprint_key, str(page)) == fingerprint
+
+
+def stage_page_fingerprint(redis_client: redis.Redis, fingerprint_key: str, page: int, fingerprint: str) -> None:
+    """记录本轮扫描到的页面指纹，等详情全部完成后再由 ``commit_page_fingerprints`` 生效。"""
+    redis_client.hset(get_fingerprint_staging_key(fingerprint_key), str(page), fingerprint)
+
+
+def commit_page_fingerprints(redis_client: redis.Redis, fingerprint_key: str) -> int:
+    """本轮任务全部完成后，把暂存指纹合并进正式指纹，返回合并的页数。正式指纹跨轮次保留。"""
+    staging_key = get_fingerprint_staging_key(fingerprint_key)
+    staged = cast(dict[str, str], redis_client.hgetall(staging_key))
+    pipe = redis_client.pipeline()
+    if staged:
+        pipe.hset(fingerprint_key, mapping=staged)
+    pipe.delete(staging_key)
+    pipe.execute()
+    return len(staged)
+
+
+def prefetch_pages(fetch_page: Callable[[int], Any], start_page: int, prefetch: int = 1) -> Iterator[tuple[int, Any]]:
+    """
+    从 ``start_page`` 开始逐页返回 ``(页码, fetch_page(页码))``。
+
+    ``prefetch`` 大于 1 时用后台线程同时请求后面 ``prefetch`` 页，结果仍按页码顺序交给调用方，
+    调用方照旧逐页入队、写断点、判断停止条件。调用方停止迭代时取消还没开始的请求，
+    已经发出的请求结果直接丢弃。某页请求出错时，前面的页面照常返回，轮到该页时才抛出异常。
+    """
+    if prefetch <= 1:
+        page = start_page
+        while True:
+            yield page, fetch_page(page)
+            page += 1
+
+    executor = ThreadPoolExecutor(max_workers=prefetch, thread_name_prefix="prefetch")
+    futures: deque[tuple[int, Future]] = deque()
+    next_page = start_page
+    try:
+        while True:
+            while len(futures) < prefetch:
+                futures.append((next_page, executor.submit(fetch_page, next_page)))
+                next_page += 1
+            page, future = futures.popleft()
+            yield page, future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_scan_and_drain(scan: Callable[[], None], drain: Callable[..., Any], *, overlap: bool = False) -> Any:
+    """
+    执行列表扫描和队列消费，返回 ``drain`` 的结果。
+
+    ``overlap`` 为假时先扫描再消费，与原流程相同。为真时扫描放到后台线程，当前线程立即开始消费，
+    ``drain`` 会收到 ``producer_active`` 参数，队列暂空时只要扫描还在进行就继续等待新任务。
+    扫描出错时，消费照常处理完已入队的任务后再抛出扫描的异常；消费先出错时，等扫描线程结束后再抛出。
+    """
+    if not overlap:
+        scan()
+        return drain()
+
+    errors: list[BaseException] = []
+
+    def run_scan() -> None:
+        try:
+            scan()
+        except BaseException as exc:
+            errors.append(exc)
+
+    context = contextvars.copy_context()
+    thread = threading.Thread(target=context.run, args=(run_scan,), name="scan", daemon=True)
+    thread.start()
+    try:
+        result = drain(producer_active=thread.is_alive)
+    finally:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return result
+
 
 def get_redis_client() -> redis.Redis:
     """按统一配置创建 Redis 客户端。"""
@@ -61,14 +940,34 @@ def push_items_to_queue(
         pending_key: str,
         unique_value: Callable[[dict], str],
         serializer: Callable[[dict], str] = serialize_payload,
+        bloom: BloomFilter | None = None,
 ) -> int:
     """
     将新任务写入 Redis 队列，并使用 set 做去重。
     返回本次真正入队的任务数量。
+
+    传入 ``bloom`` 时改用布隆过滤器位图去重，``seen_key`` 仍是 set 时继续按 set 处理，
+    清理或迁移后自动切换。已有位图的参数与 ``bloom`` 不一致时抛出 ``redis.ResponseError``，不会写入。
     """
     if not items:
         return 0
 
+    if bloom is not None:
+        bloom_args: list = [bloom.hash_count, bloom.bit_count]
+        for item in items:
+            value = unique_value(item)
+            bloom_args.extend((value, serializer(item), *bloom.get_offsets(value)))
+        return int(
+            redis_client.eval(
+                PUSH_ITEMS_TO_BLOOM_QUEUE_LUA,
+                3,
+                seen_key,
+                pending_key,
+                get_bloom_params_key(seen_key),
+                *bloom_args,
+            )
+        )
+
     args: list[str] = []
     for item in items:
         args.extend((unique_value(item), serializer(item)))
@@ -84,21 +983,60 @@ def push_items_to_queue(
     )
 
 
-def recover_processing_queue(
+def get_lease_key(processing_key: str) -> str:
+    """返回 processing 队列对应的租约有序集合键名，分数为租约到期时间。"""
+    return f"{processing_key}:leases"
+
+
+def move_processing_to_pending(
         redis_client: redis.Redis,
         *,
         processing_key: str,
         pending_key: str,
-        logger,
-        queue_label: str,
+        lease_seconds: float | None = LEASE_SECONDS,
 ) -> int:
-    """将中断时残留在 processing 队列中的任务恢复回 pending 队列。"""
+    """
+    把 processing 中无人处理的任务移回 pending，返回移动数量。
+
+    未启用租约时整体回退；启用租约后只回退租约已过期或没有租约的任务，
+    其他消费者正在处理的任务保持不动。
+    """
+    if lease_seconds:
+        return int(
+            redis_client.eval(
+                RECOVER_UNLEASED_LUA,
+                3,
+                get_lease_key(processing_key),
+                processing_key,
+                pending_key,
+            )
+        )
+
     recovered_count = 0
     while True:
         payload = redis_client.rpoplpush(processing_key, pending_key)
         if not payload:
             break
         recovered_count += 1
+    return recovered_count
+
+
+def recover_processing_queue(
+        redis_client: redis.Redis,
+        *,
+        processing_key: str,
+        pending_key: str,
+        logger,
+        queue_label: str,
+        lease_seconds: float | None = LEASE_SECONDS,
+) -> int:
+    """将中断时残留在 processing 队列中的任务恢复回 pending 队列。"""
+    recovered_count = move_processing_to_pending(
+        redis_client,
+        processing_key=processing_key,
+        pending_key=pending_key,
+        lease_seconds=lease_seconds,
+    )
 
     if recovered_count:
         logger.warning(f"恢复 {recovered_count} 条未完成的 {queue_label} 任务回待处理队列")
@@ -106,11 +1044,141 @@ def recover_processing_queue(
     return recovered_count
 
 
+def renew_leases(redis_client: redis.Redis, *, processing_key: str, payloads: list[str], lease_seconds: float) -> int:
+    """为仍在处理中的任务续租，已被回收的任务不会重新获得租约。"""
+    if not payloads:
+        return 0
+    return int(redis_client.eval(RENEW_LEASES_LUA, 1, get_lease_key(processing_key), lease_seconds, *payloads))
+
+
+def reap_expired_leases(redis_client: redis.Redis, *, processing_key: str, pending_key: str) -> int:
+    """把租约已过期的任务从 processing 移回 pending，返回回收数量。"""
+    return int(
+        redis_client.eval(
+            REAP_EXPIRED_LEASES_LUA,
+            3,
+            get_lease_key(processing_key),
+            processing_key,
+            pending_key,
+        )
+    )
+
+
+def maintain_leases(
+        redis_client: redis.Redis,
+        *,
+        pending_key: str,
+        processing_key: str,
+        payloads: list[str],
+        lease_seconds: float,
+        logger,
+        queue_label: str,
+) -> None:
+    """心跳：续租本进程的在途任务，并回收其他消费者遗留的过期任务。"""
+    renew_leases(redis_client, processing_key=processing_key, payloads=payloads, lease_seconds=lease_seconds)
+    reaped_count = reap_expired_leases(redis_client, processing_key=processing_key, pending_key=pending_key)
+    if reaped_count:
+        logger.warning(f"{queue_label} 回收 {reaped_count} 条租约过期的任务回待处理队列")
+
+
 def pop_next_payload(redis_client: redis.Redis, *, pending_key: str, processing_key: str) -> str | None:
     """从 pending 队列中取出一个任务，并移动到 processing 队列。"""
     return redis_client.rpoplpush(pending_key, processing_key)
 
 
+def claim_payloads(
+        redis_client: redis.Redis,
+        *,
+        pending_key: str,
+        processing_key: str,
+        count: int,
+        lease_seconds: float | None = None,
+) -> list[str]:
+    """在一次 Lua 调用中把最多 ``count`` 个任务从 pending 移动到 processing，按需同时登记租约。"""
+    if count <= 0:
+        return []
+    if lease_seconds:
+        claimed = redis_client.eval(
+            CLAIM_PAYLOADS_LUA,
+            3,
+            pending_key,
+            processing_key,
+            get_lease_key(processing_key),
+            count,
+            lease_seconds,
+        )
+    else:
+        claimed = redis_client.eval(CLAIM_PAYLOADS_LUA, 2, pending_key, processing_key, count)
+    return list(claimed)
+
+
+def acknowledge_payloads(
+        redis_client: redis.Redis,
+        *,
+        processing_key: str,
+        payloads: list[str],
+        released: list[str] | None = None,
+        lease_seconds: float | None = None,
+) -> None:
+    """
+    用一个 pipeline 把已结束的任务批量移出 processing 队列。
+
+    启用租约时同时释放 ``released`` 中任务的租约；保留在 processing 中的失败任务
+    失去租约后，会在下次启动恢复时回到 pending。
+    """
+    release_leases = bool(lease_seconds and released)
+    if not payloads and not release_leases:
+        return
+    pipe = redis_client.pipeline(transaction=False)
+    for payload in payloads:
+        pipe.lrem(processing_key, 1, payload)
+    if release_leases:
+        pipe.zrem(get_lease_key(processing_key), *released)
+    pipe.execute()
+    payloads.clear()
+    if released is not None:
+        released.clear()
+
+
+def get_task_attempt(info: dict) -> int:
+    """读取任务已经历的延迟重试次数。"""
+    return int(info.get(RETRY_ATTEMPT_FIELD, 0))
+
+
+def schedule_task_retry(redis_client: redis.Redis, *, retry_policy: RetryPolicy, info: dict) -> float:
+    """把失败任务写入延迟重试队列，返回本次等待秒数。"""
+    attempt = get_task_attempt(info) + 1
+    delay = retry_policy.get_delay(attempt)
+    retry_payload = serialize_payload({**info, RETRY_ATTEMPT_FIELD: attempt})
+    redis_client.eval(SCHEDULE_RETRY_LUA, 1, retry_policy.retry_key, delay, retry_payload)
+    return delay
+
+
+def promote_due_retries(redis_client: redis.Redis, *, retry_key: str, pending_key: str) -> int:
+    """把已到期的重试任务移回 pending 队列尾部，使其优先被领取。"""
+    return int(redis_client.eval(PROMOTE_DUE_RETRIES_LUA, 2, retry_key, pending_key))
+
+
+def get_next_retry_wait(redis_client: redis.Redis, *, retry_policy: RetryPolicy) -> float | None:
+    """返回距离最早一个重试任务到期的秒数，没有重试任务时返回 ``None``。"""
+    earliest = redis_client.zrange(retry_policy.retry_key, 0, 0, withscores=True)
+    if not earliest:
+        return None
+    seconds, microseconds = redis_client.time()
+    now_seconds = seconds + microseconds / 1_000_000
+    return min(max(earliest[0][1] - now_seconds, 0.0), retry_policy.max_delay)
+
+
+def get_wait_timeout(lease_seconds: float | None, retry_policy: RetryPolicy | None) -> float | None:
+    """计算等待任务完成时的超时，以便按时心跳续租和提升到期的重试任务。"""
+    intervals = []
+    if lease_seconds:
+        intervals.append(lease_seconds / 3)
+    if retry_policy is not None:
+        intervals.append(retry_policy.poll_seconds)
+    return min(intervals) if intervals else None
+
+
 def prepare_queue_drain(
         redis_client: redis.Redis,
         *,
@@ -119,8 +1187,11 @@ def prepare_queue_drain(
         logger,
         queue_label: str,
         recover_processing_on_start: bool,
+        lease_seconds: float | None = None,
+        retry_policy: RetryPolicy | None = None,
+        waiting_for_producer: bool = False,
 ) -> int:
-    """准备消费队列：按需恢复 processing，并返回当前待处理数量。"""
+    """准备消费队列：按需恢复 processing，并返回当前待处理数量（含尚未到期的重试任务）。"""
     if recover_processing_on_start:
         recover_processing_queue(
             redis_client,
@@ -128,48 +1199,139 @@ def prepare_queue_drain(
             pending_key=pending_key,
             logger=logger,
             queue_label=queue_label,
+            lease_seconds=lease_seconds,
         )
+    elif lease_seconds:
+        reaped_count = reap_expired_leases(redis_client, processing_key=processing_key, pending_key=pending_key)
+        if reaped_count:
+            logger.warning(f"{queue_label} 回收 {reaped_count} 条租约过期的任务回待处理队列")
 
     initial_pending_count = redis_client.llen(pending_key)
+    if retry_policy is not None:
+        initial_pending_count += redis_client.zcard(retry_policy.retry_key)
     if initial_pending_count == 0:
-        logger.info(f"{queue_label} 队列为空，没有待处理任务")
+        if waiting_for_producer:
+            logger.info(f"{queue_label} 队列暂时为空，等待列表扫描入队")
+        else:
+            logger.info(f"{queue_label} 队列为空，没有待处理任务")
         return 0
 
     logger.info(f"{queue_label} 队列开始处理：待处理 {initial_pending_count} 条")
     return initial_pending_count
 
 
-def submit_pending_tasks(
+def claim_pending_tasks(
         redis_client: redis.Redis,
-        executor: ThreadPoolExecutor,
-        future_to_task: dict,
         *,
         pending_key: str,
         processing_key: str,
-        max_workers: int,
-        worker: Callable[[dict], None],
+        limit: int,
         logger,
         queue_label: str,
-) -> Exception | None:
-    """尽可能把 pending 队列中的任务提交给线程池。"""
-    while len(future_to_task) < max_workers:
-        payload = pop_next_payload(
-            redis_client,
-            pending_key=pending_key,
-            processing_key=processing_key,
-        )
-        if not payload:
-            break
+        lease_seconds: float | None = None,
+) -> tuple[list[tuple[str, dict]], Exception | None]:
+    """批量领取最多 ``limit`` 个任务，返回已反序列化的任务和反序列化异常。"""
+    payloads = claim_payloads(
+        redis_client,
+        pending_key=pending_key,
+        processing_key=processing_key,
+        count=limit,
+        lease_seconds=lease_seconds,
+    )
+    tasks: list[tuple[str, dict]] = []
+    for index, payload in enumerate(payloads):
         try:
             info = deserialize_payload(payload)
         except Exception as exc:
             logger.error(f"{queue_label} 任务反序列化失败，已放回待处理队列：{payload!r}，错误：{exc}")
-            redis_client.lpush(pending_key, payload)
-            redis_client.lrem(processing_key, 1, payload)
-            return exc
-        future = executor.submit(worker, info)
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.lpush(pending_key, payload)
+            pipe.lrem(processing_key, 1, payload)
+            # 同批次中尚未提交的任务按原顺序放回 pending 尾部，不再继续领取。
+            unclaimed_payloads = payloads[index + 1:]
+            for unclaimed_payload in reversed(unclaimed_payloads):
+                pipe.rpush(pending_key, unclaimed_payload)
+                pipe.lrem(processing_key, 1, unclaimed_payload)
+            if lease_seconds:
+                pipe.zrem(get_lease_key(processing_key), payload, *unclaimed_payloads)
+            pipe.execute()
+            return tasks, exc
+        tasks.append((payload, info))
+    return tasks, None
+
+
+def submit_pending_tasks(
+        redis_client: redis.Redis,
+        start_task: Callable[[dict], Any],
+        future_to_task: dict,
+        *,
+        pending_key: str,
+        processing_key: str,
+        max_workers: int,
+        logger,
+        queue_label: str,
+        lease_seconds: float | None = None,
+        concurrency_limiter: AdaptiveConcurrencyLimiter | None = None,
+        identify_item: Callable[[dict], str] | None = None,
+        deferred: list[tuple[str, dict]] | None = None,
+        future_slots: dict[Any, tuple[str, float]] | None = None,
+) -> Exception | None:
+    """
+    尽可能把 pending 队列中的任务交给 ``start_task`` 启动。
+
+    ``start_task`` 接收任务信息，返回线程池的 ``Future`` 或协程的 ``asyncio.Task``，
+    ``drain_queue`` 和 ``drain_queue_async`` 共用这里的领取与限流逻辑。
+    配置 ``concurrency_limiter`` 时，所属主机名额已满的任务暂存在 ``deferred`` 中，
+    仍留在 processing 队列，有名额后优先提交；已提交任务的名额记录在 ``future_slots``。
+    """
+    waiting = deferred if deferred is not None else []
+    tasks, exc = claim_pending_tasks(
+        redis_client,
+        pending_key=pending_key,
+        processing_key=processing_key,
+        limit=max_workers - len(future_to_task) - len(waiting),
+        logger=logger,
+        queue_label=queue_label,
+        lease_seconds=lease_seconds,
+    )
+    candidates = waiting + tasks
+    waiting.clear()
+    for payload, info in candidates:
+        if concurrency_limiter is not None:
+            host = concurrency_limiter.get_host(identify_item(info))
+            started_at = concurrency_limiter.try_acquire(host)
+            if started_at is None:
+                waiting.append((payload, info))
+                continue
+            future = start_task(info)
+            future_slots[future] = (host, started_at)
+        else:
+            future = start_task(info)
         future_to_task[future] = (payload, info)
-    return None
+    return exc
+
+
+def requeue_deferred_tasks(
+        redis_client: redis.Redis,
+        *,
+        pending_key: str,
+        processing_key: str,
+        deferred: list[tuple[str, dict]],
+        lease_seconds: float | None = None,
+) -> None:
+    """把尚未提交的暂存任务按原顺序放回 pending 尾部。"""
+    if not deferred:
+        return
+    payloads = [payload for payload, _info in deferred]
+    redis_client.rpush(pending_key, *reversed(payloads))
+    acknowledge_payloads(
+        redis_client,
+        processing_key=processing_key,
+        payloads=payloads,
+        released=list(payloads),
+        lease_seconds=lease_seconds,
+    )
+    deferred.clear()
 
 
 def handle_task_failure(
@@ -226,6 +1388,94 @@ def log_queue_progress(
     )
 
 
+def settle_finished_task(
+        redis_client: redis.Redis,
+        *,
+        pending_key: str,
+        processing_key: str,
+        failed_key: str | None,
+        payload: str,
+        info: dict,
+        error: BaseException | None,
+        counts: dict[str, int],
+        acknowledged: list[str],
+        in_flight_count: int,
+        progress_every: int | None,
+        logger,
+        queue_label: str,
+        identify_item: Callable[[dict], str],
+        abort_on_exception: Callable[[Exception], bool] | None,
+        fatal_exception: Exception | None,
+        retry_policy: RetryPolicy | None = None,
+) -> Exception | None:
+    """
+    记录单个已结束任务的结果，并返回新的致命异常状态。
+
+    需要移出 processing 的 payload 追加到 ``acknowledged``，由调用方批量提交。
+    配置了 ``retry_policy`` 时，普通失败在重试次数用尽前会进入延迟重试队列。
+    """
+    if error is not None and not isinstance(error, Exception):
+        redis_client.lrem(processing_key, 1, payload)
+        raise error
+
+    counts["processed"] += 1
+    remove_from_processing = True
+    if error is None:
+        counts["success"] += 1
+    elif (
+            retry_policy is not None
+            and fatal_exception is None
+            and get_task_attempt(info) + 1 < retry_policy.max_attempts
+            and not (abort_on_exception and abort_on_exception(error))
+    ):
+        delay = schedule_task_retry(redis_client, retry_policy=retry_policy, info=info)
+        counts["retried"] += 1
+        logger.warning(
+            f"抓取出错：{identify_item(info)}，错误：{error}，"
+            f"{delay:g} 秒后第 {get_task_attempt(info) + 1} 次重试"
+        )
+    else:
+        fatal_exception, failed_delta, remove_from_processing = handle_task_failure(
+            redis_client,
+            pending_key=pending_key,
+            failed_key=failed_key,
+            payload=payload,
+            info=info,
+            exc=error,
+            logger=logger,
+            queue_label=queue_label,
+            identify_item=identify_item,
+            abort_on_exception=abort_on_exception,
+            fatal_exception=fatal_exception,
+        )
+        counts["failed"] += failed_delta
+    if remove_from_processing:
+        acknowledged.append(payload)
+
+    log_queue_progress(
+        redis_client,
+        pending_key=pending_key,
+        in_flight_count=in_flight_count,
+        processed_count=counts["processed"],
+        success_count=counts["success"],
+        failed_count=counts["failed"],
+        progress_every=progress_every,
+        logger=logger,
+        queue_label=queue_label,
+    )
+    return fatal_exception
+
+
+def log_queue_summary(counts: dict[str, int], *, logger, queue_label: str) -> dict[str, int]:
+    """输出队列处理完成日志，并返回统计结果。"""
+    retried_text = f"，延迟重试 {counts['retried']} 次" if counts.get("retried") else ""
+    logger.info(
+        f"{queue_label} 队列处理完成：总计 {counts['processed']} 条，成功 {counts['success']} 条，"
+        f"失败 {counts['failed']} 条{retried_text}"
+    )
+    return {"processed": counts["processed"], "success": counts["success"], "failed": counts["failed"]}
+
+
 def drain_queue(
         redis_client: redis.Redis,
         *,
@@ -240,12 +1490,38 @@ def drain_queue(
         progress_every: int | None = None,
         abort_on_exception: Callable[[Exception], bool] | None = None,
         recover_processing_on_start: bool = True,
+        lease_seconds: float | None = LEASE_SECONDS,
+        retry_policy: RetryPolicy | None = None,
+        concurrency_limiter: AdaptiveConcurrencyLimiter | None = None,
+        metrics: QueueMetrics | None = None,
+        publish_metrics: bool = True,
+        producer_active: Callable[[], bool] | None = None,
 ) -> dict[str, int]:
     """
     从 Redis 队列中取任务，使用线程池持续消费。
 
     ``failed_key`` 为 ``None`` 时，失败任务会保留在 ``processing`` 队列中。
+    ``lease_seconds`` 非空时启用租约：领取任务时登记到期时间，运行中按心跳续租，
+    启动恢复只回收过期任务，因此多个进程或主机可以同时消费同一个队列。
+    ``retry_policy`` 非空时，普通失败不在线程内等待重试，而是写入 Redis 延迟重试队列，
+    到期后回到 pending，线程始终处理新的任务。
+    ``concurrency_limiter`` 非空时，按 ``identify_item`` 返回的 URL 主机限制同时执行的任务数，
+    ``max_workers`` 只作为上限。
+    ``metrics`` 非空或配置开启 ``metrics_enabled`` 时收集吞吐、任务耗时分位数和 Redis / 分段耗时，
+    处理完成后输出汇总并写入 Redis，见 ``publish_queue_metrics``；``publish_metrics`` 为假时只收集不写出，
+    由调用方自行读取 ``metrics``，例如基准测试不应覆盖生产队列的指标。
+    在 ``use_worker_budget`` 中运行时，``max_workers`` 再收紧到站点和全局并发预算以内。
+    ``producer_active`` 非空时，列表扫描仍在进行（返回真）期间队列暂空也不退出，
+    每隔 ``PRODUCER_POLL_SECONDS`` 检查新入队的任务，见 ``run_scan_and_drain``。
     """
+    metrics = build_queue_metrics(queue_label, metrics)
+    metrics_client = redis_client
+    if metrics is not None:
+        redis_client = metrics.wrap_redis(redis_client)
+        worker = metrics.wrap_worker(worker)
+    worker, max_workers = apply_worker_budget(worker, max_workers)
+
+    producer_running = producer_active is not None and producer_active()
     initial_pending_count = prepare_queue_drain(
         redis_client,
         pending_key=pending_key,
@@ -253,78 +1529,308 @@ def drain_queue(
         logger=logger,
         queue_label=queue_label,
         recover_processing_on_start=recover_processing_on_start,
+        lease_seconds=lease_seconds,
+        retry_policy=retry_policy,
+        waiting_for_producer=producer_running,
     )
-    if initial_pending_count == 0:
+    if initial_pending_count == 0 and not producer_running:
         return {"processed": 0, "success": 0, "failed": 0}
 
-    processed_count = 0
-    success_count = 0
-    failed_count = 0
+    counts = {"processed": 0, "success": 0, "failed": 0, "retried": 0}
+    acknowledged: list[str] = []
+    released: list[str] = []
+    heartbeat_interval = lease_seconds / 3 if lease_seconds else None
+    next_heartbeat = time.monotonic() + heartbeat_interval if heartbeat_interval else None
+    wait_timeout = get_wait_timeout(lease_seconds, retry_policy)
     fatal_exception: Exception | None = None
+    deferred: list[tuple[str, dict]] = []
+    future_slots: dict[Future, tuple[str, float]] = {}
 
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         future_to_task = {}
 
         while True:
+            # 在领取任务之前读取扫描状态，扫描刚好在领取之后结束时还会再领取一轮
+            producer_running = fatal_exception is None and producer_active is not None and producer_active()
+            if fatal_exception is None and retry_policy is not None:
+                promote_due_retries(redis_client, retry_key=retry_policy.retry_key, pending_key=pending_key)
             if fatal_exception is None:
                 fatal_exception = submit_pending_tasks(
                     redis_client,
-                    executor,
+                    functools.partial(executor.submit, worker),
                     future_to_task,
                     pending_key=pending_key,
                     processing_key=processing_key,
                     max_workers=max_workers,
-                    worker=worker,
                     logger=logger,
                     queue_label=queue_label,
+                    lease_seconds=lease_seconds,
+                    concurrency_limiter=concurrency_limiter,
+                    identify_item=identify_item,
+                    deferred=deferred,
+                    future_slots=future_slots,
+                )
+            else:
+                requeue_deferred_tasks(
+                    redis_client,
+                    pending_key=pending_key,
+                    processing_key=processing_key,
+                    deferred=deferred,
+                    lease_seconds=lease_seconds,
                 )
 
+            # 心跳放在等待分支之前，只有延后任务在等并发名额时也要续租，避免被其他消费者回收
+            if next_heartbeat is not None and time.monotonic() >= next_heartbeat:
+                maintain_leases(
+                    redis_client,
+                    pending_key=pending_key,
+                    processing_key=processing_key,
+                    payloads=[payload for payload, _info in [*future_to_task.values(), *deferred]],
+                    lease_seconds=lease_seconds,
+                    logger=logger,
+                    queue_label=queue_label,
+                )
+                next_heartbeat = time.monotonic() + heartbeat_interval
+
             if not future_to_task:
-                break
+                retry_wait = None
+                if deferred:
+                    # 共享的并发控制器名额被其他队列占满，稍后再试
+                    retry_wait = concurrency_limiter.poll_seconds
+                elif fatal_exception is None and retry_policy is not None:
+                    retry_wait = get_next_retry_wait(redis_client, retry_policy=retry_policy)
+                if producer_running:
+                    retry_wait = min(retry_wait, PRODUCER_POLL_SECONDS) if retry_wait is not None else PRODUCER_POLL_SECONDS
+                if retry_wait is None:
+                    break
+                time.sleep(retry_wait)
+                continue
 
-            done, _ = wait(tuple(future_to_task), return_when=FIRST_COMPLETED)
-            for future in done:
-                payload, info = future_to_task.pop(future)
-                processed_count += 1
-                remove_from_processing = True
-                try:
-                    future.result()
-                    success_count += 1
-                except Exception as exc:
-                    fatal_exception, failed_delta, remove_from_processing = handle_task_failure(
+            timeout = min(wait_timeout or PRODUCER_POLL_SECONDS, PRODUCER_POLL_SECONDS) if producer_running else wait_timeout
+            done, _ = wait(tuple(future_to_task), timeout=timeout, return_when=FIRST_COMPLETED)
+            try:
+                for future in done:
+                    payload, info = future_to_task.pop(future)
+                    released.append(payload)
+                    if future in future_slots:
+                        host, started_at = future_slots.pop(future)
+                        concurrency_limiter.release(host, started_at, future.exception())
+                    fatal_exception = settle_finished_task(
                         redis_client,
                         pending_key=pending_key,
+                        processing_key=processing_key,
                         failed_key=failed_key,
                         payload=payload,
                         info=info,
-                        exc=exc,
+                        error=future.exception(),
+                        counts=counts,
+                        acknowledged=acknowledged,
+                        in_flight_count=len(future_to_task) + len(deferred),
+                        progress_every=progress_every,
                         logger=logger,
                         queue_label=queue_label,
                         identify_item=identify_item,
                         abort_on_exception=abort_on_exception,
                         fatal_exception=fatal_exception,
+                        retry_policy=retry_policy,
                     )
-                    failed_count += failed_delta
-                finally:
-                    if remove_from_processing:
-                        redis_client.lrem(processing_key, 1, payload)
+            finally:
+                acknowledge_payloads(
+                    redis_client,
+                    processing_key=processing_key,
+                    payloads=acknowledged,
+                    released=released,
+                    lease_seconds=lease_seconds,
+                )
+
+        if fatal_exception is not None:
+            raise fatal_exception
+
+    if concurrency_limiter is not None:
+        logger.info(f"{queue_label} 自适应并发上限：{concurrency_limiter.get_limits()}")
+    if metrics is not None:
+        metrics.finish(counts)
+        if publish_metrics:
+            publish_queue_metrics(metrics_client, metrics, logger=logger)
+    return log_queue_summary(counts, logger=logger, queue_label=queue_label)
+
+
+async def drain_queue_async(
+        redis_client: redis.Redis,
+        *,
+        pending_key: str,
+        processing_key: str,
+        failed_key: str | None = None,
+        max_concurrency: int,
+        worker: Callable[[dict], Awaitable[None] | None],
+        logger,
+        queue_label: str,
+        identify_item: Callable[[dict], str],
+        progress_every: int | None = None,
+        abort_on_exception: Callable[[Exception], bool] | None = None,
+        recover_processing_on_start: bool = True,
+        lease_seconds: float | None = LEASE_SECONDS,
+        retry_policy: RetryPolicy | None = None,
+        concurrency_limiter: AdaptiveConcurrencyLimiter | None = None,
+        metrics: QueueMetrics | None = None,
+        publish_metrics: bool = True,
+        producer_active: Callable[[], bool] | None = None,
+) -> dict[str, int]:
+    """
+    ``drain_queue`` 的协程版本：在单个事件循环中同时运行最多 ``max_concurrency`` 个任务。
+
+    pending / processing / failed 队列语义与 ``drain_queue`` 完全一致。
+    ``worker`` 为协程函数时直接调度，普通函数则放到默认线程池执行，便于站点逐个迁移。
+    Redis 命令仍通过同步客户端发出，耗时远小于详情页请求。
+    ``retry_policy``、``concurrency_limiter``、``metrics``、``publish_metrics`` 和 ``producer_active``
+    的含义同 ``drain_queue``。
+    """
+    metrics = build_queue_metrics(queue_label, metrics)
+    metrics_client = redis_client
+    if metrics is not None:
+        redis_client = metrics.wrap_redis(redis_client)
+        worker = metrics.wrap_worker(worker)
+    worker, max_concurrency = apply_worker_budget(worker, max_concurrency)
+
+    producer_running = producer_active is not None and producer_active()
+    initial_pending_count = prepare_queue_drain(
+        redis_client,
+        pending_key=pending_key,
+        processing_key=processing_key,
+        logger=logger,
+        queue_label=queue_label,
+        recover_processing_on_start=recover_processing_on_start,
+        lease_seconds=lease_seconds,
+        retry_policy=retry_policy,
+        waiting_for_producer=producer_running,
+    )
+    if initial_pending_count == 0 and not producer_running:
+        return {"processed": 0, "success": 0, "failed": 0}
+
+    if inspect.iscoroutinefunction(worker):
+        run_worker = worker
+    else:
+        def run_worker(info: dict) -> Awaitable[None]:
+            return asyncio.to_thread(worker, info)
+
+    counts = {"processed": 0, "success": 0, "failed": 0, "retried": 0}
+    acknowledged: list[str] = []
+    released: list[str] = []
+    heartbeat_interval = lease_seconds / 3 if lease_seconds else None
+    next_heartbeat = time.monotonic() + heartbeat_interval if heartbeat_interval else None
+    wait_timeout = get_wait_timeout(lease_seconds, retry_policy)
+    fatal_exception: Exception | None = None
+    deferred: list[tuple[str, dict]] = []
+    task_slots: dict[asyncio.Task, tuple[str, float]] = {}
+    task_to_payload: dict[asyncio.Task, tuple[str, dict]] = {}
+
+    try:
+        while True:
+            producer_running = fatal_exception is None and producer_active is not None and producer_active()
+            if fatal_exception is None and retry_policy is not None:
+                promote_due_retries(redis_client, retry_key=retry_policy.retry_key, pending_key=pending_key)
+            if fatal_exception is None:
+                fatal_exception = submit_pending_tasks(
+                    redis_client,
+                    lambda info: asyncio.ensure_future(run_worker(info)),
+                    task_to_payload,
+                    pending_key=pending_key,
+                    processing_key=processing_key,
+                    max_workers=max_concurrency,
+                    logger=logger,
+                    queue_label=queue_label,
+                    lease_seconds=lease_seconds,
+                    concurrency_limiter=concurrency_limiter,
+                    identify_item=identify_item,
+                    deferred=deferred,
+                    future_slots=task_slots,
+                )
+            else:
+                requeue_deferred_tasks(
+                    redis_client,
+                    pending_key=pending_key,
+                    processing_key=processing_key,
+                    deferred=deferred,
+                    lease_seconds=lease_seconds,
+                )
 
-                log_queue_progress(
+            if next_heartbeat is not None and time.monotonic() >= next_heartbeat:
+                maintain_leases(
                     redis_client,
                     pending_key=pending_key,
-                    in_flight_count=len(future_to_task),
-                    processed_count=processed_count,
-                    success_count=success_count,
-                    failed_count=failed_count,
-                    progress_every=progress_every,
+                    processing_key=processing_key,
+                    payloads=[payload for payload, _info in [*task_to_payload.values(), *deferred]],
+                    lease_seconds=lease_seconds,
                     logger=logger,
                     queue_label=queue_label,
                 )
+                next_heartbeat = time.monotonic() + heartbeat_interval
 
-        if fatal_exception is not None:
-            raise fatal_exception
+            if not task_to_payload:
+                retry_wait = None
+                if deferred:
+                    retry_wait = concurrency_limiter.poll_seconds
+                elif fatal_exception is None and retry_policy is not None:
+                    retry_wait = get_next_retry_wait(redis_client, retry_policy=retry_policy)
+                if producer_running:
+                    retry_wait = min(retry_wait, PRODUCER_POLL_SECONDS) if retry_wait is not None else PRODUCER_POLL_SECONDS
+                if retry_wait is None:
+                    break
+                await asyncio.sleep(retry_wait)
+                continue
 
-    logger.info(
-        f"{queue_label} 队列处理完成：总计 {processed_count} 条，成功 {success_count} 条，失败 {failed_count} 条"
-    )
-    return {"processed": processed_count, "success": success_count, "failed": failed_count}
+            timeout = min(wait_timeout or PRODUCER_POLL_SECONDS, PRODUCER_POLL_SECONDS) if producer_running else wait_timeout
+            done, _ = await asyncio.wait(
+                tuple(task_to_payload),
+                timeout=timeout,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            try:
+                for task in done:
+                    payload, info = task_to_payload.pop(task)
+                    released.append(payload)
+                    if task in task_slots:
+                        host, started_at = task_slots.pop(task)
+                        concurrency_limiter.release(host, started_at, task.exception())
+                    fatal_exception = settle_finished_task(
+                        redis_client,
+                        pending_key=pending_key,
+                        processing_key=processing_key,
+                        failed_key=failed_key,
+                        payload=payload,
+                        info=info,
+                        error=task.exception(),
+                        counts=counts,
+                        acknowledged=acknowledged,
+                        in_flight_count=len(task_to_payload) + len(deferred),
+                        progress_every=progress_every,
+                        logger=logger,
+                        queue_label=queue_label,
+                        identify_item=identify_item,
+                        abort_on_exception=abort_on_exception,
+                        fatal_exception=fatal_exception,
+                        retry_policy=retry_policy,
+                    )
+            finally:
+                acknowledge_payloads(
+                    redis_client,
+                    processing_key=processing_key,
+                    payloads=acknowledged,
+                    released=released,
+                    lease_seconds=lease_seconds,
+                )
+    finally:
+        if task_to_payload:
+            # 异常退出时等待剩余任务收尾，保持与线程池退出时相同的行为。
+            await asyncio.gather(*task_to_payload, return_exceptions=True)
+
+    if fatal_exception is not None:
+        raise fatal_exception
+
+    if concurrency_limiter is not None:
+        logger.info(f"{queue_label} 自适应并发上限：{concurrency_limiter.get_limits()}")
+    if metrics is not None:
+        metrics.finish(counts)
+        if publish_metrics:
+            publish_queue_metrics(metrics_client, metrics, logger=logger)
+    return log_queue_summary(counts, logger=logger, queue_label=queue_label)
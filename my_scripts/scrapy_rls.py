@@ -7,6 +7,14 @@
 - ``foreign_end_titles``: ``foreign-movies`` 流程的截止标题列表。
 - ``movie_end_titles``: ``movies`` 流程的截止标题列表。
 - ``rls_verification_url``: 可选，手动通过 Cloudflare 时使用的验证入口页。
+- ``async_drain``: 可选，为 ``true`` 时详情阶段改用协程消费（``drain_queue_async``）。
+  协程消费使用 ``build_httpx_client`` 创建的客户端，不经过 ``build_http_session``，HTTP 录制回放对它不生效，
+  录制或回放时请保持关闭。
+- ``async_concurrency``: 可选，协程消费时同时进行的详情请求数，默认 200。
+- ``adaptive_concurrency``: 可选，为 ``true`` 时详情消费按站点响应自适应调整并发，
+  线程池消费以 ``thread_number``、协程消费以 ``async_concurrency`` 作为上限；
+  被限流的详情页不在线程内重试，改由 ``redis_retry_key`` 延迟重试队列重新入队。
+- ``latency_target``: 可选，自适应并发的详情任务耗时目标秒数，超出时收缩并发。
 
 主流程：
 1. 先顺序翻页，把两条列表流程的新帖子统一写入 Redis 队列。
@@ -17,19 +25,39 @@
 :contact: https://github.com/hxz393
 :copyright: Copyright 2025, hxz393. 保留所有权利。
 """
+import asyncio
 import logging
 import os
+import random
 import re
 import sys
 import time
 
+import httpx
 import redis
 import requests
 from bs4 import BeautifulSoup
 from retrying import retry
 
-from my_module import normalize_release_title_for_filename, read_json_to_dict, sanitize_filename, update_json_config, write_list_to_file
-from scrapy_redis import deserialize_payload, drain_queue, get_redis_client, push_items_to_queue, serialize_payload
+from my_module import build_http_session, build_httpx_client, normalize_release_title_for_filename, read_json_to_dict, sanitize_filename, update_json_config, write_list_to_file
+from scrapy_redis import (
+    THROTTLE_STATUS_CODES,
+    AdaptiveConcurrencyLimiter,
+    RetryPolicy,
+    ThrottledError,
+    build_page_fingerprint,
+    build_seen_bloom,
+    commit_page_fingerprints,
+    deserialize_payload,
+    drain_queue,
+    drain_queue_async,
+    get_redis_client,
+    is_page_processed,
+    move_processing_to_pending,
+    push_items_to_queue,
+    serialize_payload,
+    stage_page_fingerprint,
+)
 from sort_movie_ops import extract_imdb_id_from_links
 
 logger = logging.getLogger(__name__)
@@ -44,20 +72,32 @@ RLS_COOKIE = CONFIG['rls_cookie']  # 用户甜甜
 REQUEST_HEAD = CONFIG['request_head']  # 请求头
 OUTPUT_DIR = CONFIG['output_dir']  # 输出目录
 THREAD_NUMBER = CONFIG.get('thread_number', CONFIG.get('max_workers', 40))  # 线程数
+ASYNC_DRAIN = CONFIG.get('async_drain', False)  # 详情阶段是否改用协程消费
+ASYNC_CONCURRENCY = CONFIG.get('async_concurrency', 200)  # 协程消费并发数
+ADAPTIVE_CONCURRENCY = CONFIG.get('adaptive_concurrency', False)  # 是否按站点响应自适应调整并发
+LATENCY_TARGET = CONFIG.get('latency_target')  # 自适应并发的详情任务耗时目标秒数
+RETRY_MAX_ATTEMPTS = 150
+RETRY_WAIT_MIN_SECONDS = 1
+RETRY_WAIT_MAX_SECONDS = 10
 END_TITLES_KEEP_COUNT = 2
 MAX_EMPTY_PAGE_RETRIES = 3
 
 REDIS_PENDING_KEY = CONFIG.get('redis_pending_key', 'rls_pending')  # 待处理队列
 REDIS_PROCESSING_KEY = CONFIG.get('redis_processing_key', 'rls_processing')  # 处理中队列
+REDIS_RETRY_KEY = CONFIG.get('redis_retry_key', 'rls_retry')  # 自适应并发时被限流详情页的延迟重试队列
 REDIS_SEEN_KEY = CONFIG.get('redis_seen_key', 'rls_seen')  # 已入队项目集合
+SEEN_BLOOM = build_seen_bloom(CONFIG)  # 可选的布隆过滤器 seen 存储，未配置时使用 set
 REDIS_FOREIGN_SCAN_PAGE_KEY = CONFIG.get('redis_foreign_scan_page_key', 'rls_foreign_scan_page')  # foreign 扫描断点
 REDIS_MOVIE_SCAN_PAGE_KEY = CONFIG.get('redis_movie_scan_page_key', 'rls_movie_scan_page')  # movie 扫描断点
 REDIS_FOREIGN_SCAN_COMPLETE_KEY = CONFIG.get('redis_foreign_scan_complete_key', 'rls_foreign_scan_complete')  # foreign 扫描完成
 REDIS_MOVIE_SCAN_COMPLETE_KEY = CONFIG.get('redis_movie_scan_complete_key', 'rls_movie_scan_complete')  # movie 扫描完成
 REDIS_FOREIGN_NEXT_END_TITLES_KEY = CONFIG.get('redis_foreign_next_end_titles_key', 'rls_foreign_next_end_titles')  # foreign 下一轮截止标题
 REDIS_MOVIE_NEXT_END_TITLES_KEY = CONFIG.get('redis_movie_next_end_titles_key', 'rls_movie_next_end_titles')  # movie 下一轮截止标题
+REDIS_FOREIGN_PAGE_FINGERPRINT_KEY = CONFIG.get('redis_foreign_page_fingerprint_key', 'rls_foreign_page_fingerprints')  # foreign 已完成列表页指纹
+REDIS_MOVIE_PAGE_FINGERPRINT_KEY = CONFIG.get('redis_movie_page_fingerprint_key', 'rls_movie_page_fingerprints')  # movie 已完成列表页指纹
 
 REQUEST_HEAD["Cookie"] = RLS_COOKIE  # 请求头加入认证
+session = build_http_session(THREAD_NUMBER)  # 列表页和详情页共用的连接池，录制回放也经由这里
 
 
 class RlsCloudflareError(RuntimeError):
@@ -96,8 +136,23 @@ def get_current_end_titles(f_mode: bool = True) -> list[str]:
     ]
 
 
+def ensure_next_end_titles(redis_client: redis.Redis, next_titles_key: str, result_list: list[dict]) -> None:
+    """首次拿到有效帖子时，记录下一轮截止标题；首页即与上一轮相同时也要记录，否则收尾无法清理扫描状态。"""
+    if redis_client.get(next_titles_key) is None:
+        redis_client.set(
+            next_titles_key,
+            serialize_payload(
+                {"titles": [item["title"] for item in result_list[:END_TITLES_KEEP_COUNT] if item["title"]]}
+            ),
+        )
+
+
 def enqueue_rls_single_mode(start_page: int, f_mode: bool, redis_client: redis.Redis) -> None:
-    """顺序翻页，把单条列表流程的新帖子写入 Redis 待处理队列。"""
+    """
+    顺序翻页，把单条列表流程的新帖子写入 Redis 待处理队列。
+
+    命中截止标题，或遇到与上一轮完成时指纹相同的列表页时停止。
+    """
     end_titles = get_current_end_titles(f_mode)
     if not end_titles:
         raise ValueError("至少需要提供一个截止标题")
@@ -107,12 +162,14 @@ def enqueue_rls_single_mode(start_page: int, f_mode: bool, redis_client: redis.R
         scan_page_key = REDIS_FOREIGN_SCAN_PAGE_KEY
         scan_complete_key = REDIS_FOREIGN_SCAN_COMPLETE_KEY
         next_titles_key = REDIS_FOREIGN_NEXT_END_TITLES_KEY
+        fingerprint_key = REDIS_FOREIGN_PAGE_FINGERPRINT_KEY
         log_prefix = "RLS foreign"
     else:
         category = "movies"
         scan_page_key = REDIS_MOVIE_SCAN_PAGE_KEY
         scan_complete_key = REDIS_MOVIE_SCAN_COMPLETE_KEY
         next_titles_key = REDIS_MOVIE_NEXT_END_TITLES_KEY
+        fingerprint_key = REDIS_MOVIE_PAGE_FINGERPRINT_KEY
         log_prefix = "RLS movie"
 
     if redis_client.get(scan_complete_key) == "1":
@@ -145,13 +202,13 @@ def enqueue_rls_single_mode(start_page: int, f_mode: bool, redis_client: redis.R
             logger.warning(f"{log_prefix} 第 {current_page} 页解析为空，等待 3 秒后重试")
         logger.info(f"{log_prefix} 共 {len(result_list)} 个结果")
 
-        if redis_client.get(next_titles_key) is None:
-            redis_client.set(
-                next_titles_key,
-                serialize_payload(
-                    {"titles": [item["title"] for item in result_list[:END_TITLES_KEEP_COUNT] if item["title"]]}
-                ),
-            )
+        ensure_next_end_titles(redis_client, next_titles_key, result_list)
+        fingerprint = build_page_fingerprint((item["url"] for item in result_list), response.headers)
+        if is_page_processed(redis_client, fingerprint_key, current_page, fingerprint):
+            redis_client.set(scan_complete_key, "1")
+            redis_client.set(scan_page_key, str(current_page + 1))
+            logger.info(f"{log_prefix} 第 {current_page} 页与上一轮相同，之后的页面都已处理过，列表扫描完成")
+            break
 
         enqueued_count = push_items_to_queue(
             redis_client,
@@ -165,7 +222,9 @@ def enqueue_rls_single_mode(start_page: int, f_mode: bool, redis_client: redis.R
                     "url": item["url"],
                 }
             ),
+            bloom=SEEN_BLOOM,
         )
+        stage_page_fingerprint(redis_client, fingerprint_key, current_page, fingerprint)
         logger.info(f"{log_prefix} 第 {current_page} 页解析 {len(result_list)} 条，入队 {enqueued_count} 条")
 
         if any(item["title"] in end_titles for item in result_list):
@@ -194,21 +253,42 @@ def recover_rls_processing_when_pending_is_empty(redis_client: redis.Redis) -> i
     if redis_client.llen(REDIS_PENDING_KEY) or not redis_client.llen(REDIS_PROCESSING_KEY):
         return 0
 
-    recovered_count = 0
-    while True:
-        payload = redis_client.rpoplpush(REDIS_PROCESSING_KEY, REDIS_PENDING_KEY)
-        if not payload:
-            break
-        recovered_count += 1
+    recovered_count = move_processing_to_pending(
+        redis_client,
+        processing_key=REDIS_PROCESSING_KEY,
+        pending_key=REDIS_PENDING_KEY,
+    )
     logger.warning(f"RLS 检测到待处理为空但处理中残留 {recovered_count} 条，已回退到待处理队列并继续运行")
     return recovered_count
 
 
+def build_rls_concurrency_limiter(max_limit: int = THREAD_NUMBER) -> AdaptiveConcurrencyLimiter | None:
+    """开启 ``adaptive_concurrency`` 时返回以 ``max_limit`` 为上限的并发控制器，默认取 ``thread_number``。"""
+    if not ADAPTIVE_CONCURRENCY:
+        return None
+    return AdaptiveConcurrencyLimiter(
+        max_limit=max_limit,
+        latency_target=LATENCY_TARGET,
+        is_throttled=lambda exc: isinstance(exc, ThrottledError),
+    )
+
+
+def build_rls_retry_policy() -> RetryPolicy | None:
+    """开启 ``adaptive_concurrency`` 时，被限流的详情页交给 Redis 延迟重试，不在线程内反复请求。"""
+    if not ADAPTIVE_CONCURRENCY:
+        return None
+    return RetryPolicy(REDIS_RETRY_KEY)
+
+
 def drain_rls_queue(redis_client: redis.Redis | None = None) -> None:
     """从 Redis 队列中取帖子，使用多线程访问详情页并写出 ``.rls`` 文件。"""
     if redis_client is None:
         redis_client = get_redis_client()
 
+    if ASYNC_DRAIN:
+        asyncio.run(drain_rls_queue_async(redis_client))
+        return
+
     drain_queue(
         redis_client,
         pending_key=REDIS_PENDING_KEY,
@@ -220,9 +300,33 @@ def drain_rls_queue(redis_client: redis.Redis | None = None) -> None:
         identify_item=lambda info: info["url"],
         abort_on_exception=lambda exc: isinstance(exc, RlsCloudflareError),
         recover_processing_on_start=False,
+        retry_policy=build_rls_retry_policy(),
+        concurrency_limiter=build_rls_concurrency_limiter(),
     )
 
 
+async def drain_rls_queue_async(redis_client: redis.Redis) -> None:
+    """协程版详情消费：单个事件循环内并发请求详情页，队列语义、延迟重试和自适应并发与线程池版本一致。"""
+    async with build_httpx_client(ASYNC_CONCURRENCY, headers=REQUEST_HEAD, async_client=True) as client:
+        async def worker(result_item: dict) -> None:
+            await visit_rls_url_async(result_item, client)
+
+        await drain_queue_async(
+            redis_client,
+            pending_key=REDIS_PENDING_KEY,
+            processing_key=REDIS_PROCESSING_KEY,
+            max_concurrency=ASYNC_CONCURRENCY,
+            worker=worker,
+            logger=logger,
+            queue_label="RLS",
+            identify_item=lambda info: info["url"],
+            abort_on_exception=lambda exc: isinstance(exc, RlsCloudflareError),
+            recover_processing_on_start=False,
+            retry_policy=build_rls_retry_policy(),
+            concurrency_limiter=build_rls_concurrency_limiter(ASYNC_CONCURRENCY),
+        )
+
+
 def finalize_rls_run(redis_client: redis.Redis | None = None) -> None:
     """在列表扫描和详情任务都结束后，回写两套 ``end_titles`` 并清理运行状态。"""
     if redis_client is None:
@@ -242,6 +346,10 @@ def finalize_rls_run(redis_client: redis.Redis | None = None) -> None:
         logger.warning(f"RLS 待处理已空，但处理中仍有 {processing_count} 条，已保留处理中队列，请直接重跑")
         return
 
+    if redis_client.zcard(REDIS_RETRY_KEY):
+        logger.info("RLS 延迟重试队列仍有任务，暂不回写 end_titles")
+        return
+
     foreign_titles_payload = redis_client.get(REDIS_FOREIGN_NEXT_END_TITLES_KEY)
     movie_titles_payload = redis_client.get(REDIS_MOVIE_NEXT_END_TITLES_KEY)
     if not foreign_titles_payload or not movie_titles_payload:
@@ -250,6 +358,8 @@ def finalize_rls_run(redis_client: redis.Redis | None = None) -> None:
 
     update_json_config(CONFIG_PATH, "foreign_end_titles", deserialize_payload(foreign_titles_payload)["titles"])
     update_json_config(CONFIG_PATH, "movie_end_titles", deserialize_payload(movie_titles_payload)["titles"])
+    commit_page_fingerprints(redis_client, REDIS_FOREIGN_PAGE_FINGERPRINT_KEY)
+    commit_page_fingerprints(redis_client, REDIS_MOVIE_PAGE_FINGERPRINT_KEY)
     redis_client.delete(
         REDIS_PENDING_KEY,
         REDIS_PROCESSING_KEY,
@@ -281,16 +391,15 @@ def should_retry_rls_request(exc: Exception) -> bool:
     return not isinstance(exc, RlsCloudflareError)
 
 
-@retry(
-    stop_max_attempt_number=150,
-    wait_random_min=1000,
-    wait_random_max=10000,
-    retry_on_exception=should_retry_rls_request,
-)
-def get_rls_response(url: str) -> requests.Response:
-    """请求流程"""
-    response = requests.get(url, timeout=35, headers=REQUEST_HEAD)
-    response.encoding = 'utf-8'
+def should_retry_rls_detail_request(exc: Exception) -> bool:
+    """开启自适应并发时，限流异常直接抛给队列，由并发控制器收缩并发后再延迟重试。"""
+    if ADAPTIVE_CONCURRENCY and isinstance(exc, ThrottledError):
+        return False
+    return should_retry_rls_request(exc)
+
+
+def check_rls_response(response, url: str) -> None:
+    """校验 RLS 响应状态，同步与协程请求共用。"""
     if is_rls_cloudflare_challenge(response):
         verification_url = RLS_VERIFICATION_URL or url
         raise RlsCloudflareError(
@@ -298,12 +407,56 @@ def get_rls_response(url: str) -> requests.Response:
         )
     if response.status_code == 403:
         sys.exit(f"被墙了 {response.status_code}：{url}")
+    elif response.status_code in THROTTLE_STATUS_CODES:
+        raise ThrottledError(f"请求被限流，重试 {response.status_code}：{url}", response.status_code)
     elif response.status_code != 200:
         raise Exception(f"请求失败，重试 {response.status_code}：{url}")
 
+
+@retry(
+    stop_max_attempt_number=RETRY_MAX_ATTEMPTS,
+    wait_random_min=RETRY_WAIT_MIN_SECONDS * 1000,
+    wait_random_max=RETRY_WAIT_MAX_SECONDS * 1000,
+    retry_on_exception=should_retry_rls_request,
+)
+def get_rls_response(url: str) -> requests.Response:
+    """请求流程"""
+    response = session.get(url, timeout=35, headers=REQUEST_HEAD)
+    response.encoding = 'utf-8'
+    check_rls_response(response, url)
+    return response
+
+
+@retry(
+    stop_max_attempt_number=RETRY_MAX_ATTEMPTS,
+    wait_random_min=RETRY_WAIT_MIN_SECONDS * 1000,
+    wait_random_max=RETRY_WAIT_MAX_SECONDS * 1000,
+    retry_on_exception=should_retry_rls_detail_request,
+)
+def get_rls_detail_response(url: str) -> requests.Response:
+    """详情页请求流程"""
+    response = session.get(url, timeout=35, headers=REQUEST_HEAD)
+    response.encoding = 'utf-8'
+    check_rls_response(response, url)
     return response
 
 
+async def get_rls_response_async(client: httpx.AsyncClient, url: str) -> httpx.Response:
+    """协程版详情页请求，重试策略与 ``get_rls_detail_response`` 一致，等待期间不占用事件循环。"""
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            response = await client.get(url, timeout=35)
+            response.encoding = 'utf-8'
+            check_rls_response(response, url)
+            return response
+        except Exception as exc:
+            if not should_retry_rls_detail_request(exc) or attempt >= RETRY_MAX_ATTEMPTS:
+                raise
+        await asyncio.sleep(random.uniform(RETRY_WAIT_MIN_SECONDS, RETRY_WAIT_MAX_SECONDS))
+
+
 def parse_rls_response(response: requests.Response) -> list:
     """解析响应文本"""
     soup = BeautifulSoup(response.text, "html.parser")
@@ -320,12 +473,9 @@ def parse_rls_response(response: requests.Response) -> list:
     return results
 
 
-def visit_rls_url(result_item: dict):
-    """访问详情页"""
-    url = result_item["url"]
-    logger.info(f"访问 {url}")
-    response = get_rls_response(url)
-    soup = BeautifulSoup(response.text, 'lxml')
+def write_rls_detail(result_item: dict, detail_html: str) -> None:
+    """从详情页提取 IMDb 编号并写出 ``.rls`` 文件。"""
+    soup = BeautifulSoup(detail_html, 'lxml')
     imdb_id = extract_imdb_id_from_links(a['href'] for a in soup.find_all('a', href=True)) or ""
 
     result_item["imdb"] = imdb_id
@@ -333,4 +483,20 @@ def visit_rls_url(result_item: dict):
     file_name = sanitize_filename(file_name)
     file_name = f"{file_name} - rls [{imdb_id}].rls"
     path = os.path.join(OUTPUT_DIR, file_name)
-    write_list_to_file(path, [url])
+    write_list_to_file(path, [result_item["url"]])
+
+
+def visit_rls_url(result_item: dict):
+    """访问详情页"""
+    url = result_item["url"]
+    logger.info(f"访问 {url}")
+    response = get_rls_detail_response(url)
+    write_rls_detail(result_item, response.text)
+
+
+async def visit_rls_url_async(result_item: dict, client: httpx.AsyncClient) -> None:
+    """协程版详情页访问。解析和写文件放到线程里执行，避免几百个并发请求的事件循环被同步 IO 卡住。"""
+    url = result_item["url"]
+    logger.info(f"访问 {url}")
+    response = await get_rls_response_async(client, url)
+    await asyncio.to_thread(write_rls_detail, result_item, response.text)
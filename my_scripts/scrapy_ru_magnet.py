@@ -18,11 +18,10 @@ from typing import Optional
 import redis
 import requests
 from lxml import etree
-from requests.adapters import HTTPAdapter
 from retrying import retry
 from urllib3.util.retry import Retry
 
-from my_module import read_json_to_dict, sanitize_filename
+from my_module import build_http_session, read_json_to_dict, sanitize_filename
 
 CONFIG_PATH = 'config/scrapy_ru.json'
 CONFIG = read_json_to_dict(CONFIG_PATH)  # 配置文件
@@ -35,11 +34,19 @@ RU_DIC_TAG = CONFIG['ru_dic_tag']  # 翻译字典
 RU_DIC_GP = CONFIG['ru_dic_gp']  # 翻译字典
 REDIS_HOST = CONFIG['redis_host']  # Redis 主机 IP，没有密码
 REDIS_SET_KEY = CONFIG['redis_set_key']  # Redis 集合键
+SEEN_BLOOM_CAPACITY = CONFIG.get('seen_bloom_capacity')  # 可选的布隆过滤器存储，配置后启用，需要 config/scrapy_redis.json
 THREAD_NUMBER = CONFIG['thread_number']  # 线程数
 MIRROR_PATH = CONFIG['mirror_path']  # 镜像文件夹路径
 
 REQUEST_HEAD["Cookie"] = USER_COOKIE  # 请求头加入认证
 
+if SEEN_BLOOM_CAPACITY:
+    # 只有启用布隆过滤器时才用到 scrapy_redis，未启用时不要求存在它的配置文件
+    from scrapy_redis import add_seen_values, build_seen_bloom, contains_seen_values
+    SEEN_BLOOM = build_seen_bloom(CONFIG)
+else:
+    SEEN_BLOOM = None
+
 logger = logging.getLogger(__name__)
 requests.packages.urllib3.disable_warnings()
 retry_strategy = Retry(
@@ -48,11 +55,11 @@ retry_strategy = Retry(
     method_whitelist=["POST", "GET"],  # 允许重试方法
     backoff_factor=1  # 重试等待间隔（指数增长）
 )
-adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=THREAD_NUMBER, pool_maxsize=THREAD_NUMBER)
-session = requests.Session()
-session.proxies = {"http": "http://127.0.0.1:7890", "https": "http://127.0.0.1:7890",}
-session.mount("http://", adapter)
-session.mount("https://", adapter)
+session = build_http_session(
+    THREAD_NUMBER,
+    proxies={"http": "http://127.0.0.1:7890", "https": "http://127.0.0.1:7890"},
+    max_retries=retry_strategy,
+)
 
 
 def scrapy_ru_magnet(key_word: str, target: str, date_order: str = "2", cache: bool = True) -> None:
@@ -377,13 +384,16 @@ def find_corresponding_name(filename: str, given_name: str) -> Optional[str]:
 
 def bulk_insert_ids(r: redis.Redis, set_key: str, ids: list) -> None:
     """
-    批量将 ID 插入到 Redis 的 Set 中。
+    批量将 ID 插入到 Redis 的 Set 中，配置了布隆过滤器时写入位图。
 
     :param r: redis 客户端
     :param set_key: 保存集合名
     :param ids: 插入 id 列表
     :return: 无
     """
+    if SEEN_BLOOM is not None:
+        add_seen_values(r, set_key, ids, bloom=SEEN_BLOOM)
+        return
     pipe = r.pipeline()
     for i in ids:
         pipe.sadd(set_key, i)
@@ -392,13 +402,15 @@ def bulk_insert_ids(r: redis.Redis, set_key: str, ids: list) -> None:
 
 def bulk_query_ids(r: redis.Redis, set_key: str, ids: list) -> list:
     """
-    批量查询给定的 IDs 是否存在于 Redis 的 Set 中。
+    批量查询给定的 IDs 是否存在于 Redis 的 Set 中，配置了布隆过滤器时查询位图。
 
     :param r: redis 客户端
     :param set_key: 保存集合名
     :param ids: 插入 id 列表
     :return: 返回一个布尔值列表，对应每个 ID 是否存在。
     """
+    if SEEN_BLOOM is not None:
+        return contains_seen_values(r, set_key, ids, bloom=SEEN_BLOOM)
     try:
         # 一次性传入所有要查询的 id
         results = r.smismember(set_key, *ids)
@@ -0,0 +1,260 @@
+"""
+声明式站点抓取引擎。
+
+各站点脚本原本各自实现一遍“翻页入队 → Redis 队列消费 → 收尾回写截止状态”的流程，
+代码大同小异。这里把这套流程收敛成一个引擎，站点只需用 ``SiteSpec`` 描述：
+
+- 列表页：``build_page_url`` / ``fetch_page`` / ``parse_page``；
+- 入队：``unique_value`` / ``serializer``，以及可选的布隆过滤器 ``bloom``；
+- 停止条件：``should_stop``，当前页命中旧数据时返回 ``True``；
+  可选的 ``page_fingerprint_key`` 额外记录列表页指纹，某页与上一轮完成时相同即提前停止；
+- 截止状态：``select_next_state`` 从首次访问页选出下一轮的截止状态，
+  ``commit_next_state`` 在本轮全部完成后把它写回配置；
+- 详情：``worker`` / ``identify_item`` / ``max_workers``，以及可选的重试策略和自适应并发；
+- 流水线：``prefetch_pages`` 并发预取列表页，``drain_while_scanning`` 让详情消费与列表扫描同时进行。
+
+翻页断点、扫描完成标记、队列恢复、并发消费和收尾清理都由引擎负责，
+Redis 中的键与原先各站点脚本保持一致，已有的断点可以直接续跑。
+
+:author: assassing
+:contact: https://github.com/hxz393
+:copyright: Copyright 2027, hxz393. 保留所有权利。
+"""
+import functools
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import redis
+
+from scrapy_redis import (
+    AdaptiveConcurrencyLimiter,
+    BloomFilter,
+    RetryPolicy,
+    build_page_fingerprint,
+    commit_page_fingerprints,
+    deserialize_payload,
+    drain_queue,
+    get_redis_client,
+    is_page_processed,
+    move_processing_to_pending,
+    prefetch_pages,
+    push_items_to_queue,
+    run_scan_and_drain,
+    serialize_payload,
+    stage_page_fingerprint,
+)
+
+
+@dataclass(frozen=True)
+class SiteSpec:
+    """
+    一个站点的抓取描述。
+
+    ``label`` 用于日志和队列标签；``state_name`` 是截止状态在日志中的名称，例如 ``end_titles``。
+    ``page_fingerprint_key`` 非空时按 ``unique_value`` 和响应的 ``ETag`` / ``Last-Modified`` 记录列表页指纹，
+    指纹在本轮全部完成后才生效，见 ``commit_page_fingerprints``。
+    """
+    label: str
+    logger: logging.Logger
+    pending_key: str
+    processing_key: str
+    seen_key: str
+    scan_page_key: str
+    scan_complete_key: str
+    next_state_key: str
+    build_page_url: Callable[[int], str]
+    fetch_page: Callable[[str], Any]
+    parse_page: Callable[[Any], list[dict]]
+    unique_value: Callable[[dict], str]
+    serializer: Callable[[dict], str]
+    should_stop: Callable[[list[dict]], bool]
+    select_next_state: Callable[[list[dict]], dict]
+    commit_next_state: Callable[[dict], None]
+    worker: Callable[[dict], Any]
+    identify_item: Callable[[dict], str]
+    max_workers: int
+    state_name: str = "end_titles"
+    bloom: BloomFilter | None = None
+    retry_policy: RetryPolicy | None = None
+    concurrency_limiter: AdaptiveConcurrencyLimiter | None = None
+    page_fingerprint_key: str | None = None
+    prefetch_pages: int = 1
+    drain_while_scanning: bool = False
+
+
+def get_scan_start_page(site: SiteSpec, redis_client: redis.Redis, start_page: int) -> int:
+    """读取翻页断点；首次运行时写入 ``start_page`` 作为断点。"""
+    saved_page = redis_client.get(site.scan_page_key)
+    if saved_page is None:
+        redis_client.set(site.scan_page_key, str(start_page))
+        return start_page
+
+    site.logger.info(f"{site.label} 从第 {saved_page} 页继续扫描")
+    return int(saved_page)
+
+
+def fetch_site_page(site: SiteSpec, page_no: int) -> tuple[Any, list[dict]]:
+    """抓取并解析单个列表页，同时返回原始响应以便计算页面指纹。"""
+    site.logger.info(f"抓取第 {page_no} 页")
+    response = site.fetch_page(site.build_page_url(page_no))
+    return response, site.parse_page(response)
+
+
+def enqueue_site_posts(site: SiteSpec, redis_client: redis.Redis, start_page: int = 1) -> None:
+    """
+    顺序翻页，收集新条目并写入 Redis 待处理队列，直到 ``should_stop`` 返回 ``True``，
+    或遇到与上一轮完成时指纹相同的列表页。
+
+    ``prefetch_pages`` 大于 1 时并发预取后面的列表页，入队和断点仍按页码顺序提交。
+    """
+    logger = site.logger
+    if redis_client.get(site.scan_complete_key) == "1":
+        logger.info(f"{site.label} 列表扫描已完成，跳过入队阶段")
+        return
+
+    start_page = get_scan_start_page(site, redis_client, start_page)
+    fetch_page = functools.partial(fetch_site_page, site)
+    for current_page, (response, result_list) in prefetch_pages(fetch_page, start_page, site.prefetch_pages):
+        logger.info(f"共 {len(result_list)} 个结果")
+
+        # 先记录下一轮截止状态，首页即与上一轮相同时收尾也能正常清理扫描状态
+        if redis_client.get(site.next_state_key) is None:
+            redis_client.set(site.next_state_key, serialize_payload(site.select_next_state(result_list)))
+
+        fingerprint = None
+        if site.page_fingerprint_key is not None:
+            fingerprint = build_page_fingerprint(
+                (site.unique_value(item) for item in result_list),
+                getattr(response, "headers", None),
+            )
+            if is_page_processed(redis_client, site.page_fingerprint_key, current_page, fingerprint):
+                redis_client.set(site.scan_complete_key, "1")
+                redis_client.set(site.scan_page_key, str(current_page + 1))
+                logger.info(f"第 {current_page} 页与上一轮相同，之后的页面都已处理过，{site.label} 列表扫描完成")
+                break
+
+        enqueued_count = push_items_to_queue(
+            redis_client,
+            result_list,
+            seen_key=site.seen_key,
+            pending_key=site.pending_key,
+            unique_value=site.unique_value,
+            serializer=site.serializer,
+            bloom=site.bloom,
+        )
+        if fingerprint is not None:
+            stage_page_fingerprint(redis_client, site.page_fingerprint_key, current_page, fingerprint)
+        logger.info(f"第 {current_page} 页解析 {len(result_list)} 条，入队 {enqueued_count} 条")
+
+        if site.should_stop(result_list):
+            redis_client.set(site.scan_complete_key, "1")
+            redis_client.set(site.scan_page_key, str(current_page + 1))
+            logger.info(f"{site.label} 列表扫描完成")
+            break
+
+        redis_client.set(site.scan_page_key, str(current_page + 1))
+        logger.warning("-" * 255)
+
+
+def recover_site_processing_when_pending_is_empty(site: SiteSpec, redis_client: redis.Redis) -> int:
+    """启动时若待处理为空但处理中有残留，则回退到待处理并继续运行。"""
+    if redis_client.llen(site.pending_key) or not redis_client.llen(site.processing_key):
+        return 0
+
+    recovered_count = move_processing_to_pending(
+        redis_client,
+        processing_key=site.processing_key,
+        pending_key=site.pending_key,
+    )
+
+    site.logger.warning(f"{site.label} 检测到待处理为空但处理中残留 {recovered_count} 条，已回退到待处理队列并继续运行")
+    return recovered_count
+
+
+def drain_site_queue(
+        site: SiteSpec,
+        redis_client: redis.Redis,
+        producer_active: Callable[[], bool] | None = None,
+) -> dict[str, int]:
+    """
+    从 Redis 队列中取任务，交给站点的 ``worker`` 并发处理。
+
+    ``producer_active`` 由 ``run_scan_and_drain`` 传入，列表扫描未结束时队列暂空也继续等待。
+    """
+    return drain_queue(
+        redis_client,
+        pending_key=site.pending_key,
+        processing_key=site.processing_key,
+        max_workers=site.max_workers,
+        worker=site.worker,
+        logger=site.logger,
+        queue_label=site.label,
+        identify_item=site.identify_item,
+        recover_processing_on_start=False,
+        retry_policy=site.retry_policy,
+        concurrency_limiter=site.concurrency_limiter,
+        producer_active=producer_active,
+    )
+
+
+def finalize_site_run(site: SiteSpec, redis_client: redis.Redis) -> bool:
+    """
+    在列表扫描和详情任务都结束后，提交下一轮截止状态并清理运行状态。
+
+    任一条件未满足时保留现场等待重跑，返回是否完成了收尾。
+    """
+    logger = site.logger
+    if redis_client.get(site.scan_complete_key) != "1":
+        logger.info(f"{site.label} 列表扫描尚未完成，暂不回写 {site.state_name}")
+        return False
+
+    if redis_client.llen(site.pending_key):
+        logger.info(f"{site.label} 队列仍有未完成任务，暂不回写 {site.state_name}")
+        return False
+
+    processing_count = redis_client.llen(site.processing_key)
+    if processing_count:
+        logger.warning(f"{site.label} 待处理已空，但处理中仍有 {processing_count} 条，已保留处理中队列，请直接重跑")
+        return False
+
+    if site.retry_policy is not None and redis_client.zcard(site.retry_policy.retry_key):
+        logger.info(f"{site.label} 延迟重试队列仍有任务，暂不回写 {site.state_name}")
+        return False
+
+    next_state_payload = redis_client.get(site.next_state_key)
+    if not next_state_payload:
+        logger.warning(f"{site.label} 未记录新的 {site.state_name}，跳过配置更新")
+        return False
+
+    site.commit_next_state(deserialize_payload(next_state_payload))
+    if site.page_fingerprint_key is not None:
+        commit_page_fingerprints(redis_client, site.page_fingerprint_key)
+    redis_client.delete(
+        site.pending_key,
+        site.processing_key,
+        site.scan_page_key,
+        site.scan_complete_key,
+        site.next_state_key,
+    )
+    return True
+
+
+def run_site(site: SiteSpec, start_page: int = 1, redis_client: redis.Redis | None = None) -> None:
+    """
+    先翻页入 Redis，再从 Redis 队列中并发抓取详情，最后在 finally 中收尾。
+
+    ``drain_while_scanning`` 为真时详情消费与列表扫描同时进行。
+    """
+    if redis_client is None:
+        redis_client = get_redis_client()
+
+    try:
+        recover_site_processing_when_pending_is_empty(site, redis_client)
+        run_scan_and_drain(
+            lambda: enqueue_site_posts(site, redis_client, start_page=start_page),
+            lambda **kwargs: drain_site_queue(site, redis_client, **kwargs),
+            overlap=site.drain_while_scanning,
+        )
+    finally:
+        finalize_site_run(site, redis_client)
@@ -9,25 +9,36 @@ import logging
 import os
 import re
 from datetime import datetime, timedelta
-from typing import cast
+from typing import Callable, cast
 
 import redis
 import requests
-from bs4 import BeautifulSoup
 from retrying import retry
 
 from my_module import (
+    build_http_session,
+    build_strainer,
     normalize_release_title_for_filename,
+    parse_html,
     read_json_to_dict,
     sanitize_filename,
     update_json_config,
     write_list_to_file,
 )
 from scrapy_redis import (
+    RetryPolicy,
+    build_page_fingerprint,
+    build_seen_bloom,
+    commit_page_fingerprints,
     drain_queue,
     get_redis_client,
+    is_page_processed,
+    measure_phase,
+    prefetch_pages,
     push_items_to_queue,
+    run_scan_and_drain,
     serialize_payload,
+    stage_page_fingerprint,
 )
 from sort_movie_request import get_csfd_response, get_csfd_movie_details
 
@@ -46,16 +57,27 @@ THREAD_NUMBER = CONFIG['thread_number']  # 线程数
 END_DATA = CONFIG['end_data']  # 截止日期
 MAX_EMPTY_PAGES = CONFIG.get('max_empty_pages', 5)  # 连续空页上限
 EXCLUDED_GROUPS = tuple(CONFIG.get('excluded_groups', ['Knihy a Časopisy']))  # 排除分组
+HTML_PARSER = CONFIG.get('html_parser')  # 页面解析器，留空时优先用 lxml
+PARTIAL_PARSE = CONFIG.get('partial_parse', True)  # 列表页只解析目标容器，页面结构变化时可关闭改为整页解析
+SK_LIST_STRAINER = build_strainer('table', 'lista') if PARTIAL_PARSE else None  # 列表页只保留结果表格
+RETRY_IN_QUEUE = CONFIG.get('retry_in_queue', False)  # 详情页失败改由 Redis 延迟重试
+RETRY_MAX_ATTEMPTS = CONFIG.get('retry_max_attempts', 5)  # 延迟重试次数上限
+PREFETCH_PAGES = CONFIG.get('prefetch_pages', 1)  # 列表页并发预取页数，1 表示逐页请求
+DRAIN_WHILE_SCANNING = CONFIG.get('drain_while_scanning', False)  # 列表扫描期间同时消费详情队列
 
 REDIS_PENDING_KEY = CONFIG.get('redis_pending_key', 'sk_pending')  # 待处理队列
 REDIS_PROCESSING_KEY = CONFIG.get('redis_processing_key', 'sk_processing')  # 处理中队列
 REDIS_FAILED_KEY = CONFIG.get('redis_failed_key', 'sk_failed')  # 失败队列
+REDIS_RETRY_KEY = CONFIG.get('redis_retry_key', 'sk_retry')  # 延迟重试队列
 REDIS_SEEN_KEY = CONFIG.get('redis_seen_key', 'sk_seen')  # 已入队项目集合
+SEEN_BLOOM = build_seen_bloom(CONFIG)  # 可选的布隆过滤器 seen 存储，未配置时使用 set
 REDIS_SCAN_PAGE_KEY = CONFIG.get('redis_scan_page_key', 'sk_scan_page')  # 列表扫描断点页码
 REDIS_SCAN_COMPLETE_KEY = CONFIG.get('redis_scan_complete_key', 'sk_scan_complete')  # 列表扫描完成标记
 REDIS_NEXT_END_DATA_KEY = CONFIG.get('redis_next_end_data_key', 'sk_next_end_data')  # 下一轮截止日期
+REDIS_PAGE_FINGERPRINT_KEY = CONFIG.get('redis_page_fingerprint_key', 'sk_page_fingerprints')  # 已完成列表页指纹，跨轮次保留
 
 REQUEST_HEAD["Cookie"] = SK_COOKIE  # 请求头加入认证
+session = build_http_session(THREAD_NUMBER)  # 列表页和详情页共用的连接池
 
 
 def get_previous_day(date_str: str) -> str:
@@ -136,6 +158,7 @@ def enqueue_sk_page_results(redis_client: redis.Redis, result_list: list[dict])
         pending_key=REDIS_PENDING_KEY,
         unique_value=lambda item: item["url"],
         serializer=serialize_sk_post,
+        bloom=SEEN_BLOOM,
     )
 
 
@@ -147,7 +170,12 @@ def mark_scan_complete(redis_client: redis.Redis, current_page: int) -> None:
 
 
 def enqueue_sk_posts(start_page: int = 0, end_data: str | None = None, redis_client: redis.Redis | None = None) -> None:
-    """顺序翻页，收集帖子并写入 Redis 待处理队列。"""
+    """
+    顺序翻页，收集帖子并写入 Redis 待处理队列。
+
+    遇到与上一轮完成时指纹相同的列表页即停止，不必一直翻到截止日期。
+    ``prefetch_pages`` 大于 1 时并发预取后面的列表页，入队和断点仍按页码顺序提交。
+    """
     if end_data is None:
         end_data = get_current_end_data()
     if redis_client is None:
@@ -160,29 +188,50 @@ def enqueue_sk_posts(start_page: int = 0, end_data: str | None = None, redis_cli
     current_page = get_scan_start_page(redis_client, start_page)
 
     empty_page_count = 0
-    while True:
-        result_list = fetch_sk_page(current_page)
+    for current_page, result_list in prefetch_pages(fetch_sk_page, current_page, PREFETCH_PAGES):
         if not result_list:
             empty_page_count += 1
             if empty_page_count >= MAX_EMPTY_PAGES:
                 raise RuntimeError(f"SK 连续 {empty_page_count} 页无有效帖子，已停止扫描")
 
-            current_page = advance_scan_page(redis_client, current_page)
+            advance_scan_page(redis_client, current_page)
             continue
 
         empty_page_count = 0
+        fingerprint = build_page_fingerprint(item["url"] for item in result_list)
+        if is_page_processed(redis_client, REDIS_PAGE_FINGERPRINT_KEY, current_page, fingerprint):
+            logger.info(f"第 {current_page} 页与上一轮相同，之后的页面都已处理过")
+            ensure_next_end_data(redis_client, result_list)
+            mark_scan_complete(redis_client, current_page)
+            break
+
         enqueued_count = enqueue_sk_page_results(redis_client, result_list)
+        stage_page_fingerprint(redis_client, REDIS_PAGE_FINGERPRINT_KEY, current_page, fingerprint)
         logger.info(f"第 {current_page} 页解析 {len(result_list)} 条，入队 {enqueued_count} 条")
 
         if any(result_item["date"] == end_data for result_item in result_list):
             mark_scan_complete(redis_client, current_page)
             break
 
-        current_page = advance_scan_page(redis_client, current_page)
+        advance_scan_page(redis_client, current_page)
 
 
-def drain_sk_queue(redis_client: redis.Redis | None = None) -> None:
-    """从 Redis 队列中取帖子，使用多线程访问详情页并写出 .sk 文件。"""
+def build_sk_retry_policy() -> RetryPolicy | None:
+    """开启 ``retry_in_queue`` 时返回延迟重试策略。"""
+    if not RETRY_IN_QUEUE:
+        return None
+    return RetryPolicy(REDIS_RETRY_KEY, max_attempts=RETRY_MAX_ATTEMPTS)
+
+
+def drain_sk_queue(
+        redis_client: redis.Redis | None = None,
+        producer_active: Callable[[], bool] | None = None,
+) -> None:
+    """
+    从 Redis 队列中取帖子，使用多线程访问详情页并写出 .sk 文件。
+
+    ``producer_active`` 由 ``run_scan_and_drain`` 传入，列表扫描未结束时队列暂空也继续等待。
+    """
     if redis_client is None:
         redis_client = get_redis_client()
 
@@ -196,6 +245,8 @@ def drain_sk_queue(redis_client: redis.Redis | None = None) -> None:
         logger=logger,
         queue_label="SK",
         identify_item=lambda info: info["url"],
+        retry_policy=build_sk_retry_policy(),
+        producer_active=producer_active,
     )
 
 
@@ -208,7 +259,11 @@ def finalize_sk_run(redis_client: redis.Redis | None = None) -> None:
         logger.info("SK 列表扫描尚未完成，暂不回写 end_data")
         return
 
-    if redis_client.llen(REDIS_PENDING_KEY) or redis_client.llen(REDIS_PROCESSING_KEY):
+    if (
+            redis_client.llen(REDIS_PENDING_KEY)
+            or redis_client.llen(REDIS_PROCESSING_KEY)
+            or redis_client.zcard(REDIS_RETRY_KEY)
+    ):
         logger.info("SK 队列仍有未完成任务，暂不回写 end_data")
         return
 
@@ -218,6 +273,7 @@ def finalize_sk_run(redis_client: redis.Redis | None = None) -> None:
         return
 
     update_json_config(CONFIG_PATH, "end_data", next_end_data)
+    commit_page_fingerprints(redis_client, REDIS_PAGE_FINGERPRINT_KEY)
     redis_client.delete(
         REDIS_PENDING_KEY,
         REDIS_PROCESSING_KEY,
@@ -238,15 +294,17 @@ def scrapy_sk(start_page: int = 0) -> None:
     """
     logger.info("抓取 sk 站点发布信息")
     redis_client = get_redis_client()
-    enqueue_sk_posts(start_page=start_page, redis_client=redis_client)
-    drain_sk_queue(redis_client=redis_client)
+    run_scan_and_drain(
+        lambda: enqueue_sk_posts(start_page=start_page, redis_client=redis_client),
+        lambda **kwargs: drain_sk_queue(redis_client=redis_client, **kwargs),
+        overlap=DRAIN_WHILE_SCANNING,
+    )
     finalize_sk_run(redis_client=redis_client)
 
 
-@retry(stop_max_attempt_number=15, wait_random_min=1000, wait_random_max=10000)
-def get_sk_response(url: str) -> requests.Response:
-    """请求流程"""
-    response = requests.get(url, headers=REQUEST_HEAD, timeout=20)
+def request_sk_page(url: str) -> requests.Response:
+    """单次请求，不做重试。"""
+    response = session.get(url, headers=REQUEST_HEAD, timeout=20)
     response.encoding = 'utf-8'
     if response.status_code != 200:
         raise Exception(f"请求失败，重试 {response.status_code}：{url}")
@@ -254,6 +312,12 @@ def get_sk_response(url: str) -> requests.Response:
     return response
 
 
+@retry(stop_max_attempt_number=15, wait_random_min=1000, wait_random_max=10000)
+def get_sk_response(url: str) -> requests.Response:
+    """请求流程"""
+    return request_sk_page(url)
+
+
 def extract_sk_row_links(td) -> dict | None:
     """从 SK 列表项中提取分组、详情页链接和标题。"""
     link_snapshot = inspect_sk_row_links(td)
@@ -322,10 +386,11 @@ def parse_sk_row(td) -> dict | None:
 
 def parse_sk_response(response: requests.Response) -> list:
     """解析流程"""
-    if is_sk_filtered_empty_page(response.text):
+    soup = parse_html(response.text, HTML_PARSER, SK_LIST_STRAINER)
+    # 过滤提示可能在结果表格之外，表格里没有详情链接时再整页检查
+    if not soup.select_one('a[href^="details.php?name"]') and is_sk_filtered_empty_page(response.text):
         return []
 
-    soup = BeautifulSoup(response.text, "html.parser")
     rows = soup.select("table.lista table.lista td.lista")
     if not rows:
         raise RuntimeError("未找到 SK 列表项，网站结构可能已变更")
@@ -341,7 +406,7 @@ def parse_sk_response(response: requests.Response) -> list:
 
 def is_sk_filtered_empty_page(html: str) -> bool:
     """识别账户过滤导致的已知空页提示。"""
-    soup = BeautifulSoup(html, "html.parser")
+    soup = parse_html(html, HTML_PARSER)
     if soup.select_one('a[href^="details.php?name"]'):
         return False
 
@@ -359,7 +424,7 @@ def is_sk_excluded_group(group: str) -> bool:
 
 def is_sk_excluded_groups_only_page(html: str) -> bool:
     """识别仅包含排除分组帖子的页面。"""
-    soup = BeautifulSoup(html, "html.parser")
+    soup = parse_html(html, HTML_PARSER, SK_LIST_STRAINER)
     rows = soup.select("table.lista table.lista td.lista")
     detail_row_count = 0
 
@@ -398,7 +463,7 @@ def extract_sk_row_size_date(td) -> dict | None:
 
 def extract_csfd_url_from_sk_detail(detail_html: str) -> str | None:
     """从 SK 详情页 HTML 中提取 CSFD 链接。"""
-    soup = BeautifulSoup(detail_html, 'lxml')
+    soup = parse_html(detail_html, HTML_PARSER)
     img = soup.select_one('a[itemprop="sameAs"] > img[src="/torrent/images/csfd.png"]')
     if not img or not img.parent:
         return None
@@ -435,12 +500,16 @@ def visit_sk_url(result_item: dict):
     """访问详情页"""
     url = result_item["url"]
     logger.info(f"访问 {url}")
-    response = get_sk_response(url)
+    with measure_phase("http"):
+        # 延迟重试模式下失败直接交给队列，避免在线程里等待
+        response = request_sk_page(url) if RETRY_IN_QUEUE else get_sk_response(url)
     csfd_url = extract_csfd_url_from_sk_detail(response.text)
     if not csfd_url:
         raise RuntimeError(f"未找到 CSFD 链接：{url}")
 
-    csfd_data = get_normalized_csfd_data(csfd_url)
+    with measure_phase("http"):
+        csfd_data = get_normalized_csfd_data(csfd_url)
     file_name = build_sk_output_filename(result_item, csfd_data)
     path = os.path.join(OUTPUT_DIR, file_name)
-    write_list_to_file(path, [url])
+    with measure_phase("disk"):
+        write_list_to_file(path, [url])
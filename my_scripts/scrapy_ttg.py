@@ -10,10 +10,9 @@ import os
 import re
 
 import requests
-from bs4 import BeautifulSoup
 from retrying import retry
 
-from my_module import normalize_release_title_for_filename, read_json_to_dict, sanitize_filename, update_json_config, write_list_to_file
+from my_module import build_http_session, normalize_release_title_for_filename, parse_html, read_json_to_dict, sanitize_filename, update_json_config, write_list_to_file
 
 logger = logging.getLogger(__name__)
 requests.packages.urllib3.disable_warnings()
@@ -27,8 +26,10 @@ NEWEST_ID = CONFIG['newest_id']  # 最新 id
 TTG_COOKIE = CONFIG['ttg_cookie']  # 用户甜甜
 REQUEST_HEAD = CONFIG['request_head']  # 请求头
 OUTPUT_DIR = CONFIG['output_dir']  # 输出目录
+HTML_PARSER = CONFIG.get('html_parser')  # 页面解析器，留空时优先用 lxml
 
 REQUEST_HEAD["Cookie"] = TTG_COOKIE  # 请求头加入认证
+session = build_http_session()  # 复用连接，翻页时不再每次重新握手
 
 
 def scrapy_ttg() -> None:
@@ -71,7 +72,7 @@ def filter_by_id(movie_list: list) -> list:
 @retry(stop_max_attempt_number=15, wait_random_min=1000, wait_random_max=10000)
 def get_ttg_response(url: str) -> requests.Response:
     """请求流程"""
-    response = requests.get(url, headers=REQUEST_HEAD, timeout=30)
+    response = session.get(url, headers=REQUEST_HEAD, timeout=30)
     response.encoding = 'utf-8'
     if response.status_code != 200:
         raise Exception(f"请求失败，重试 {response.status_code}：{url}")
@@ -81,7 +82,7 @@ def get_ttg_response(url: str) -> requests.Response:
 
 def parse_ttg_response(response: requests.Response) -> list:
     """解析整页 TTG 响应。"""
-    soup = BeautifulSoup(response.text, "html.parser")
+    soup = parse_html(response.text, HTML_PARSER)
 
     # 定位 id 为 torrent_table 的 table
     table = soup.find("table", id="torrent_table")
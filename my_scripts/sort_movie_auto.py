@@ -5,18 +5,19 @@
 :contact: https://github.com/hxz393
 :copyright: Copyright 2026, hxz393. 保留所有权利。
 """
+import concurrent.futures
 import logging
 import os
 import re
 import shutil
 import sys
 import time
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Optional
 
-from bs4 import BeautifulSoup
 
-from my_module import read_file_to_list, read_json_to_dict, sanitize_filename, write_dict_to_json
+from my_module import parse_html, read_file_to_list, read_json_to_dict, sanitize_filename, write_dict_to_json
 from sort_movie_mysql import insert_movie_record_to_mysql, query_imdb_title_metadata
 from sort_movie_ops import (
     CONFIG as OPS_CONFIG,
@@ -34,6 +35,7 @@ from sort_movie_ops import (
 )
 from video_tools import VIDEO_EXTENSIONS, generate_video_contact, generate_video_contact_mtn, get_video_probe
 from sort_movie_request import (
+    HTML_PARSER,
     get_douban_response,
     get_douban_search_details,
     check_kpk_for_better_quality,
@@ -86,6 +88,22 @@ OPTIONAL_MOVIE_INFO_FIELDS = {
     "pubdate",
 }
 REQUIRED_MOVIE_INFO_FIELDS = ("director", "directors", "duration", "quality", "source")
+AUTO_PIPELINE = OPS_CONFIG.get("auto_pipeline", False)  # 多个目录分阶段并行整理，关闭时逐个目录串行处理
+PIPELINE_WORKERS = {
+    "metadata": 4,
+    "probe": 2,
+    "screenshot": max(1, (os.cpu_count() or 2) // 2),
+} | OPS_CONFIG.get("auto_pipeline_workers", {})  # 各阶段线程数；改名入库始终在主线程逐个执行
+
+
+@dataclass
+class MovieFolderJob:
+    """单个电影目录在各整理阶段之间传递的状态。"""
+    path: str
+    movie_ids: dict = field(default_factory=dict)
+    tv: bool = False
+    movie_info: Optional[dict] = None
+    video_probe: Optional[dict] = None
 
 
 def sort_movie_auto(path: str) -> None:
@@ -102,6 +120,10 @@ def sort_movie_auto(path: str) -> None:
         logger.error(f"目录下没有子文件夹 {path}")
         return
 
+    if AUTO_PIPELINE:
+        run_sort_movie_pipeline(folders, path)
+        return
+
     for folder in folders:
         process_movie_folder(folder, path)
 
@@ -115,25 +137,11 @@ def process_movie_folder(folder: str, source_root: str) -> None:
     :return: 无
     """
     logger.info(f"{time.strftime('%Y-%m-%d %H:%M:%S')} 开始处理：{folder}")
-    logger.info("-" * 25 + "步骤：搜索电影" + "-" * 25)
-    result = prepare_movie_folder_markers(folder)
-    if result:
-        _error_code, error_message = result
-        logger.error(error_message)
-        handle_failed_movie_folder(folder, source_root)
-        logger.warning("=" * 255)
-        return
-
-    # 先将子目录中的文件提升到当前电影目录根部
-    try:
-        move_all_files_to_root(folder)
-    except Exception:
-        logger.exception(f"打平目录失败：{folder}")
+    if not prepare_movie_folder(folder):
         handle_failed_movie_folder(folder, source_root)
         logger.warning("=" * 255)
         return
 
-    time.sleep(0.1)
     logger.info("-" * 25 + "步骤：抓取电影信息" + "-" * 25)
     try:
         sort_success, failed_or_final_path = sort_movie(folder)
@@ -142,9 +150,85 @@ def process_movie_folder(folder: str, source_root: str) -> None:
         sort_success, failed_or_final_path = False, folder
     if not sort_success:
         handle_failed_movie_folder(failed_or_final_path, source_root)
-    time.sleep(0.1)
     logger.warning("=" * 255)
-    time.sleep(0.1)
+
+
+def run_sort_movie_pipeline(folders: list[str], source_root: str) -> None:
+    """
+    分阶段并行整理多个电影目录。
+
+    搜索和抓取元数据、读取视频信息、生成截图三个阶段各用一个有界线程池，目录完成一个阶段就进入下一阶段，
+    不同目录的网络请求、ffprobe 和截图渲染可以同时进行。改名、落盘和入库仍在主线程逐个执行，
+    ``apply_sort_movie_transaction`` 的单目录回滚不变。任一阶段失败的目录照常移到检验目录；
+    豆瓣验证页等导致的退出会取消还没开始的任务，等进行中的任务结束后继续向上抛出。
+
+    :param folders: 电影目录列表
+    :param source_root: 当前批处理根目录，一般是导演目录
+    :return: 无
+    """
+    stages = (
+        ("metadata", lambda job: prepare_movie_folder(job.path) and fetch_movie_metadata(job)),
+        ("probe", probe_movie_video),
+        ("screenshot", render_movie_screenshots),
+    )
+    executors = [
+        concurrent.futures.ThreadPoolExecutor(max_workers=max(1, int(PIPELINE_WORKERS[name])), thread_name_prefix=f"sort_movie_{name}")
+        for name, _stage in stages
+    ]
+    pending: dict[concurrent.futures.Future, tuple[int, MovieFolderJob]] = {}
+
+    def submit(stage_index: int, job: MovieFolderJob) -> None:
+        pending[executors[stage_index].submit(stages[stage_index][1], job)] = (stage_index, job)
+
+    try:
+        for folder in folders:
+            logger.info(f"{time.strftime('%Y-%m-%d %H:%M:%S')} 开始处理：{folder}")
+            submit(0, MovieFolderJob(folder.strip()))
+
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                stage_index, job = pending.pop(future)
+                try:
+                    success = future.result()
+                    if success and stage_index == len(stages) - 1:
+                        success = commit_movie_folder(job)
+                except Exception:
+                    logger.exception(f"整理电影失败：{job.path}")
+                    success = False
+
+                if success and stage_index < len(stages) - 1:
+                    submit(stage_index + 1, job)
+                    continue
+                if not success:
+                    handle_failed_movie_folder(job.path, source_root)
+                logger.warning("=" * 255)
+    finally:
+        for executor in executors:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def prepare_movie_folder(folder: str) -> bool:
+    """
+    补齐编号文件并打平子目录。
+
+    :param folder: 当前电影目录
+    :return: 可以继续整理时返回 ``True``
+    """
+    logger.info("-" * 25 + "步骤：搜索电影" + "-" * 25)
+    result = prepare_movie_folder_markers(folder)
+    if result:
+        _error_code, error_message = result
+        logger.error(error_message)
+        return False
+
+    # 先将子目录中的文件提升到当前电影目录根部
+    try:
+        move_all_files_to_root(folder)
+    except Exception:
+        logger.exception(f"打平目录失败：{folder}")
+        return False
+    return True
 
 
 def sort_movie(path: str) -> SortMovieResult:
@@ -154,44 +238,85 @@ def sort_movie(path: str) -> SortMovieResult:
     :param path: 待整理的电影目录路径
     :return: ``(是否成功, 当前电影目录路径)``
     """
-    path = path.strip()
-    if not os.path.exists(path):
+    job = MovieFolderJob(path.strip())
+    success = (
+            fetch_movie_metadata(job)
+            and probe_movie_video(job)
+            and render_movie_screenshots(job)
+            and commit_movie_folder(job)
+    )
+    return success, job.path
+
+
+def fetch_movie_metadata(job: MovieFolderJob) -> bool:
+    """
+    读取目录中的编号并抓取线上元数据。
+
+    :param job: 目录整理状态
+    :return: 可以继续整理时返回 ``True``
+    """
+    if not os.path.exists(job.path):
         logger.error("目录不存在")
-        return False, path
+        return False
 
     # 只要没有任何 ID，就直接拒绝继续处理和入库
-    movie_ids = scan_ids(path)
-    if all(value is None for value in movie_ids.values()):
+    job.movie_ids = scan_ids(job.path)
+    if all(value is None for value in job.movie_ids.values()):
         logger.error("没有找到任何 ID")
-        return False, path
+        return False
 
     # TMDB 电视剧编号以 ``tv`` 后缀标记，这里据此自动切换抓取模式
-    tv = bool(movie_ids["tmdb"] and movie_ids["tmdb"].endswith("tv"))
-    movie_info = build_empty_movie_info()
-    fill_movie_info(movie_ids, movie_info, tv)
+    job.tv = bool(job.movie_ids["tmdb"] and job.movie_ids["tmdb"].endswith("tv"))
+    job.movie_info = build_empty_movie_info()
+    fill_movie_info(job.movie_ids, job.movie_info, job.tv)
+    return True
 
-    # 读取本地视频文件的基础信息
-    video_probe = get_video_probe(path)
-    if not video_probe:
-        return False, path
-    file_info = video_probe["file_info"]
-    screenshot_result = ensure_movie_screenshots(path, video_probe)
+
+def probe_movie_video(job: MovieFolderJob) -> bool:
+    """
+    读取本地视频文件的基础信息。
+
+    :param job: 目录整理状态
+    :return: 可以继续整理时返回 ``True``
+    """
+    job.video_probe = get_video_probe(job.path)
+    return bool(job.video_probe)
+
+
+def render_movie_screenshots(job: MovieFolderJob) -> bool:
+    """
+    确保目录中每个视频都有缩略图。
+
+    :param job: 目录整理状态
+    :return: 可以继续整理时返回 ``True``
+    """
+    screenshot_result = ensure_movie_screenshots(job.path, job.video_probe)
     if screenshot_result:
         logger.error(screenshot_result)
-        return False, path
+        return False
+    return True
+
+
+def commit_movie_folder(job: MovieFolderJob) -> bool:
+    """
+    合并信息、生成目录名，并执行带回滚的改名、落盘和入库。
 
+    :param job: 目录整理状态，完成后 ``path`` 更新为当前目录路径
+    :return: 整理成功时返回 ``True``
+    """
     try:
         # 合并线上元数据、编号信息和本地视频信息
-        movie_dict = merged_dict(path, movie_info, movie_ids, file_info)
+        movie_dict = merged_dict(job.path, job.movie_info, job.movie_ids, job.video_probe["file_info"])
     except DownloadLinkError as e:
         logger.error(e)
-        return False, path
+        return False
     # 根据整理规则生成新目录名
-    folder_name = build_movie_folder_name(path, movie_dict)
+    folder_name = build_movie_folder_name(job.path, movie_dict)
     if not folder_name:
-        return False, path
-    new_path = os.path.join(os.path.dirname(path), sanitize_filename(folder_name))
-    return apply_sort_movie_transaction(path, new_path, movie_dict)
+        return False
+    new_path = os.path.join(os.path.dirname(job.path), sanitize_filename(folder_name))
+    success, job.path = apply_sort_movie_transaction(job.path, new_path, movie_dict)
+    return success
 
 
 def prepare_movie_folder_markers(path: str) -> Optional[PrepareFolderError]:
@@ -597,7 +722,7 @@ def get_douban_movie_info(movie_id: str, movie_info: dict) -> None:
     if not response:
         return
 
-    soup = BeautifulSoup(response.text, 'html.parser')
+    soup = parse_html(response.text, HTML_PARSER)
     info_div = soup.find("div", id="info")
     if not info_div:
         sys.exit(f"豆瓣页面解析失败")
@@ -887,9 +1012,7 @@ def apply_sort_movie_transaction(path: str, new_path: str, movie_dict: dict) ->
         write_dict_to_json(os.path.join(current_path, "movie_info.json5"), movie_dict)
         created_file_names.update(get_created_file_names(current_path, original_file_names))
 
-        time.sleep(0.1)
         logger.info("-" * 25 + "步骤：检查校验信息" + "-" * 25)
-        time.sleep(0.1)
         check_result = check_movie(current_path)
         if check_result:
             logger.error(check_result)
@@ -901,7 +1024,6 @@ def apply_sort_movie_transaction(path: str, new_path: str, movie_dict: dict) ->
         created_file_names.update(get_created_file_names(current_path, original_file_names))
 
         insert_movie_record_to_mysql(current_path)
-        time.sleep(0.1)
         logger.info(f"旧名：{path}")
         logger.info(f"新名：{current_path}")
         return True, current_path
@@ -0,0 +1,334 @@
+"""
+电影信息请求的本地磁盘缓存。
+
+``sort_movie_auto`` 回滚重试目录、``sort_movie_director`` 反复检查导演时，
+会对同一批编号重复请求 TMDB、豆瓣、CSFD、科普库和 Jackett，白白消耗限流额度。
+这里把请求结果按“端点 + 请求参数”的哈希值存到磁盘：
+
+- 每个端点单独设置有效期，过期后重新请求；
+- 缓存总大小有上限，超出时按最近访问时间淘汰最旧的条目；
+- 响应带 ``ETag`` / ``Last-Modified`` 时，过期后先发条件请求，服务器返回 304 就继续使用本地内容；
+- ``bypass`` 为真时完全绕过缓存，直接请求网络。
+
+HTTP 响应用 ``cached_get`` 缓存，第三方库返回的数据用 ``cached_result`` 装饰器缓存。
+
+:author: assassing
+:contact: https://github.com/hxz393
+:copyright: Copyright 2027, hxz393. 保留所有权利。
+"""
+import base64
+import functools
+import gzip
+import hashlib
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600  # 未单独配置的端点使用的有效期
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 缓存目录大小上限
+EVICT_RATIO = 0.9  # 淘汰时清理到上限的多少比例，避免每次写入都触发淘汰
+ENTRY_SUFFIX = ".json.gz"
+
+
+def to_json_data(value: Any) -> Any:
+    """
+    ``json.dumps`` 的 ``default`` 回调，把 tmdbv3api 的 ``AsObj`` 还原成原始 JSON。
+
+    :param value: 无法直接序列化的对象
+    :return: 可序列化的数据
+    """
+    raw = getattr(value, "_json", None)
+    if raw is not None:
+        return raw
+    raise TypeError(f"无法缓存的数据类型：{type(value).__name__}")
+
+
+class ResponseCache:
+    """
+    按请求哈希寻址的磁盘缓存，线程安全。
+
+    每个条目是一个 gzip 压缩的 JSON 文件，文件修改时间记录最近一次访问，用于 LRU 淘汰。
+    """
+
+    def __init__(
+            self,
+            root: str,
+            *,
+            ttl: Optional[dict[str, float]] = None,
+            default_ttl: float = DEFAULT_TTL_SECONDS,
+            max_bytes: int = DEFAULT_MAX_BYTES,
+            bypass: bool = False,
+    ):
+        """
+        :param root: 缓存目录，第一次写入时创建
+        :param ttl: 端点名称到有效期秒数的映射
+        :param default_ttl: 未在 ``ttl`` 中配置的端点使用的有效期
+        :param max_bytes: 缓存目录大小上限，小于等于 0 表示不限制
+        :param bypass: 是否绕过缓存
+        """
+        self.root = root
+        self.ttl = dict(ttl or {})
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+
+    def get_entry_path(self, endpoint: str, key: str) -> str:
+        """
+        返回条目文件路径，按哈希前两位分目录，避免单个目录文件过多。
+
+        :param endpoint: 端点名称
+        :param key: 请求参数组成的键
+        :return: 条目文件路径
+        """
+        digest = hashlib.sha256(f"{endpoint}\n{key}".encode("utf-8")).hexdigest()
+        return os.path.join(self.root, digest[:2], f"{digest}{ENTRY_SUFFIX}")
+
+    def is_fresh(self, entry: dict) -> bool:
+        """
+        判断条目是否仍在有效期内。
+
+        :param entry: 缓存条目
+        :return: 未过期时返回 True
+        """
+        ttl = self.ttl.get(entry["endpoint"], self.default_ttl)
+        return time.time() - entry["stored_at"] < ttl
+
+    def get(self, endpoint: str, key: str) -> Optional[dict]:
+        """
+        读取缓存条目，不判断是否过期。命中时刷新访问时间。
+
+        :param endpoint: 端点名称
+        :param key: 请求参数组成的键
+        :return: 缓存条目，未命中或绕过缓存时返回 None
+        """
+        if self.bypass:
+            return None
+        path = self.get_entry_path(endpoint, key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"缓存条目损坏，已忽略：{path}，{e}")
+            with self._lock:
+                self.remove_entry(path)
+            return None
+        return entry
+
+    def put(self, endpoint: str, key: str, entry: dict) -> None:
+        """
+        写入缓存条目，写入后按需淘汰旧条目。
+
+        :param endpoint: 端点名称
+        :param key: 请求参数组成的键
+        :param entry: 条目内容，``endpoint`` / ``key`` / ``stored_at`` 会自动补上
+        :return: 无
+        """
+        if self.bypass:
+            return
+        entry = {**entry, "endpoint": endpoint, "key": key, "stored_at": time.time()}
+        data = gzip.compress(json.dumps(entry, ensure_ascii=False, default=to_json_data).encode("utf-8"))
+        path = self.get_entry_path(endpoint, key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            if self._total_bytes is not None:
+                self._total_bytes += len(data) - old_size
+            self.evict()
+
+    def refresh(self, entry: dict) -> None:
+        """
+        条件请求返回 304 后重新计时，内容不变。
+
+        :param entry: 缓存条目
+        :return: 无
+        """
+        self.put(entry["endpoint"], entry["key"], entry)
+
+    def remove_entry(self, path: str) -> None:
+        """
+        删除一个条目文件，文件已不存在时忽略。调用方需持有锁。
+
+        :param path: 条目文件路径
+        :return: 无
+        """
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        if self._total_bytes is not None:
+            self._total_bytes -= size
+
+    def list_entries(self) -> list[tuple[float, int, str]]:
+        """
+        列出所有条目文件。
+
+        :return: (最近访问时间, 文件大小, 路径) 列表
+        """
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for dir_path, _dir_names, file_names in os.walk(self.root):
+            for file_name in file_names:
+                if not file_name.endswith(ENTRY_SUFFIX):
+                    continue
+                path = os.path.join(dir_path, file_name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self) -> int:
+        """
+        缓存超过上限时，从最久未访问的条目开始删除，直到低于上限的 90%。
+        调用方需持有锁。
+
+        :return: 删除的条目数量
+        """
+        if self.max_bytes <= 0:
+            return 0
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _mtime, size, _path in self.list_entries())
+        if self._total_bytes <= self.max_bytes:
+            return 0
+
+        target = self.max_bytes * EVICT_RATIO
+        removed = 0
+        for _mtime, _size, path in sorted(self.list_entries()):
+            if self._total_bytes <= target:
+                break
+            self.remove_entry(path)
+            removed += 1
+        logger.debug(f"缓存超过上限，淘汰 {removed} 个条目")
+        return removed
+
+
+def build_response_entry(response: requests.Response) -> dict:
+    """
+    把 HTTP 响应转换为缓存条目。
+
+    :param response: 状态码为 200 的响应
+    :return: 缓存条目
+    """
+    return {
+        "url": response.url,
+        "status_code": response.status_code,
+        "encoding": response.encoding,
+        "headers": {k: v for k, v in response.headers.items() if k.lower() in ("content-type", "etag", "last-modified")},
+        "content": base64.b64encode(response.content).decode("ascii"),
+    }
+
+
+def build_cached_response(entry: dict) -> requests.Response:
+    """
+    从缓存条目还原 HTTP 响应。
+
+    :param entry: 缓存条目
+    :return: 响应对象
+    """
+    response = requests.Response()
+    response.url = entry["url"]
+    response.status_code = entry["status_code"]
+    response.encoding = entry["encoding"]
+    response.headers.update(entry["headers"])
+    response._content = base64.b64decode(entry["content"])
+    return response
+
+
+def cached_get(
+        cache: ResponseCache,
+        session: requests.Session,
+        endpoint: str,
+        url: str,
+        *,
+        cacheable: Optional[Callable[[requests.Response], bool]] = None,
+        **kwargs,
+) -> requests.Response:
+    """
+    带缓存的 ``session.get``。
+
+    只缓存状态码为 200 且通过 ``cacheable`` 检查的响应，其他响应原样返回，由调用方照旧处理。
+    条目过期后如果带有 ``ETag`` / ``Last-Modified``，先发条件请求，返回 304 时沿用本地内容。
+
+    :param cache: 缓存实例
+    :param session: 发请求用的会话
+    :param endpoint: 端点名称，决定有效期
+    :param url: 请求地址
+    :param cacheable: 额外的检查函数，例如排除验证页
+    :param kwargs: 传给 ``session.get`` 的其他参数
+    :return: 响应对象
+    """
+    key = json.dumps([url, kwargs.get("params")], sort_keys=True, ensure_ascii=False, default=str)
+    entry = cache.get(endpoint, key)
+    if entry and cache.is_fresh(entry):
+        return build_cached_response(entry)
+
+    if entry:
+        validators = {}
+        headers = {k.lower(): v for k, v in entry["headers"].items()}
+        if "etag" in headers:
+            validators["If-None-Match"] = headers["etag"]
+        if "last-modified" in headers:
+            validators["If-Modified-Since"] = headers["last-modified"]
+        if validators:
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), **validators}
+
+    response = session.get(url, **kwargs)
+    if entry and response.status_code == 304:
+        cache.refresh(entry)
+        return build_cached_response(entry)
+    if response.status_code == 200 and (cacheable is None or cacheable(response)):
+        cache.put(endpoint, key, build_response_entry(response))
+    return response
+
+
+def cached_result(cache: ResponseCache, endpoint: str) -> Callable:
+    """
+    缓存函数返回值的装饰器，适用于返回 JSON 数据的查询函数。
+
+    按绑定后的参数生成键，返回 None 或空值时不缓存。装饰器要放在 ``@retry`` 外层，命中时不进入重试。
+
+    :param cache: 缓存实例
+    :param endpoint: 端点名称，决定有效期
+    :return: 装饰器
+    """
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = json.dumps(bound.arguments, sort_keys=True, ensure_ascii=False, default=str)
+            entry = cache.get(endpoint, key)
+            if entry and cache.is_fresh(entry):
+                return entry["data"]
+
+            result = func(*args, **kwargs)
+            if result:
+                cache.put(endpoint, key, {"data": result})
+            return result
+
+        return wrapper
+
+    return decorator
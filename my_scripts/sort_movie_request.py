@@ -18,13 +18,13 @@ from typing import Optional, cast
 
 import requests
 import xmltodict as xmltodict
-from bs4 import BeautifulSoup
 from retrying import retry
 from tmdbv3api import TMDb, Movie, TV, Person
 from tmdbv3api.as_obj import AsObj
 from tmdbv3api.exceptions import TMDbException
 
-from my_module import read_json_to_dict
+from my_module import build_http_session, parse_html, read_json_to_dict
+from sort_movie_cache import ResponseCache, cached_get, cached_result
 
 logger = logging.getLogger(__name__)
 requests.packages.urllib3.disable_warnings()
@@ -54,6 +54,25 @@ KPK_HEADER = CONFIG['kpk_header']  # 科普库请求头
 
 JACKETT_SEARCH_URL = CONFIG['jackett_search_url']  # jackett 搜索地址
 JACKETT_API_KEY = CONFIG['jackett_api_key']  # jackett api 密钥
+HTML_PARSER = CONFIG.get('html_parser')  # 页面解析器，留空时优先用 lxml
+
+CACHE_TTL = {
+    "tmdb_search": 7 * 24 * 3600,
+    "tmdb_movie": 7 * 24 * 3600,
+    "tmdb_director_movies": 24 * 3600,
+    "douban": 3 * 24 * 3600,
+    "csfd": 7 * 24 * 3600,
+    "kpk_search": 12 * 3600,
+    "jackett": 3600,
+} | CONFIG.get('cache_ttl', {})  # 各端点缓存有效期，单位秒
+
+session = build_http_session()  # TMDB / 豆瓣 / CSFD 等站点共用的连接池
+RESPONSE_CACHE = ResponseCache(
+    CONFIG.get('cache_path', 'cache/sort_movie_request'),  # 缓存目录
+    ttl=CACHE_TTL,
+    max_bytes=CONFIG.get('cache_max_mb', 512) * 1024 * 1024,  # 缓存大小上限
+    bypass=CONFIG.get('cache_bypass', False),  # 是否绕过缓存
+)
 
 TMDB = TMDb()
 TMDB.api_key = TMDB_KEY
@@ -69,7 +88,7 @@ def get_tmdb_search_response(search_id: str) -> Optional[dict]:
     """
     logger.info(f"搜索 TMDB：{search_id}")
     url = f"{TMDB_URL}/find/{search_id}?external_source=imdb_id"
-    r = requests.get(url, timeout=10, verify=False, headers=TMDB_HEADERS)
+    r = cached_get(RESPONSE_CACHE, session, "tmdb_search", url, timeout=10, verify=False, headers=TMDB_HEADERS)
     if r.status_code == 403:
         logger.error("TMDB 拒绝访问：状态码 %s", r.status_code)
         sys.exit(f"TMDB 拒绝访问 {r.status_code}：{url}")
@@ -80,6 +99,7 @@ def get_tmdb_search_response(search_id: str) -> Optional[dict]:
     return r.json()
 
 
+@cached_result(RESPONSE_CACHE, "tmdb_movie")
 @retry(stop_max_attempt_number=50, wait_random_min=1000, wait_random_max=5000)
 def get_tmdb_movie_details(movie_id: str, tv: bool = False) -> Optional[dict]:
     """
@@ -121,6 +141,7 @@ def get_tmdb_director_details(director_id: str) -> AsObj:
     return person.details(director_id)
 
 
+@cached_result(RESPONSE_CACHE, "tmdb_director_movies")
 @retry(stop_max_attempt_number=50, wait_random_min=300, wait_random_max=3000)
 def get_tmdb_director_movies(director_id: str) -> AsObj:
     """
@@ -150,7 +171,7 @@ def get_tmdb_movie_cover(poster_path: str, target_path: str) -> None:
     image_url = f"{TMDB_IMAGE_URL}{poster_path}"
 
     # 下载图片
-    image_response = requests.get(image_url, timeout=60, verify=False, headers=TMDB_HEADERS)
+    image_response = session.get(image_url, timeout=60, verify=False, headers=TMDB_HEADERS)
     if image_response.status_code == 200:
         with open(target_path, 'wb') as f:
             f.write(image_response.content)
@@ -174,7 +195,10 @@ def get_csfd_response(url: str) -> requests.Response:
     :return: 成功时返回响应
     """
     try:
-        response = requests.get(
+        response = cached_get(
+            RESPONSE_CACHE,
+            session,
+            "csfd",
             url,
             timeout=15,
             verify=False,
@@ -205,7 +229,7 @@ def get_csfd_movie_details(r: requests.Response) -> Optional[dict]:
     :return: 解析成功时返回数据字典
     """
     # 解析内容
-    soup = BeautifulSoup(r.text, 'html.parser')
+    soup = parse_html(r.text, HTML_PARSER)
     # 1) 国家、年份、时长
     origin_div = soup.find('div', class_='origin')
     parts = [s.rstrip(',') for s in origin_div.stripped_strings]
@@ -271,7 +295,17 @@ def get_douban_response(db_id: str, query_type: str) -> Optional[requests.Respon
     else:
         raise ValueError(f"未知的豆瓣请求类型：{query_type}")
 
-    response = requests.get(url, timeout=10, verify=False, headers=DOUBAN_HEADER)
+    # 验证页状态码也是 200，不能缓存
+    response = cached_get(
+        RESPONSE_CACHE,
+        session,
+        "douban",
+        url,
+        cacheable=lambda r: r.text.find("登录跳转") == -1,
+        timeout=10,
+        verify=False,
+        headers=DOUBAN_HEADER,
+    )
     logger.debug(response.text)
     if response.status_code == 403:
         sys.exit(f"豆瓣拒绝访问，状态码：{response.status_code}，退出程序")
@@ -295,7 +329,7 @@ def get_douban_search_details(r: requests.Response) -> Optional[str]:
     :return: 解析成功时返回唯一目标 URL，无法唯一确定时返回 None
     """
     # 解析内容
-    soup = BeautifulSoup(r.text, 'html.parser')
+    soup = parse_html(r.text, HTML_PARSER)
     # 检查是否有搜索框，如果弹验证不会出现这个 div
     result_div = soup.find("div", class_="search-result")
     if not result_div:
@@ -339,6 +373,7 @@ def get_douban_search_details(r: requests.Response) -> Optional[str]:
         return
 
 
+@cached_result(RESPONSE_CACHE, "jackett")
 @retry(stop_max_attempt_number=50, wait_random_min=300, wait_random_max=6000)
 def get_jackett_search_response(search_id: str) -> list:
     """
@@ -348,7 +383,7 @@ def get_jackett_search_response(search_id: str) -> list:
     :return: 成功时返回响应
     """
     url = f"{JACKETT_SEARCH_URL}/api/v2.0/indexers/all/results/torznab/api?apikey={JACKETT_API_KEY}&q={search_id}"
-    response = requests.get(url, timeout=30, verify=False, allow_redirects=True)
+    response = session.get(url, timeout=30, verify=False, allow_redirects=True)
     if response.status_code == 403:
         sys.exit(f"Jackett 拒绝访问，状态码：{response.status_code}，退出程序")
     if not response:
@@ -375,6 +410,7 @@ def get_jackett_search_response(search_id: str) -> list:
         raise Exception(f"Jackett XML 解析失败！")
 
 
+@cached_result(RESPONSE_CACHE, "kpk_search")
 @retry(stop_max_attempt_number=50, wait_random_min=1300, wait_random_max=9000)
 def get_kpk_search_response(search_id: str) -> Optional[list]:
     """
@@ -388,7 +424,7 @@ def get_kpk_search_response(search_id: str) -> Optional[list]:
         "kw": search_id,
         "callback": "jQuery112305981342517550043_1742472456793",
     }
-    response = requests.get(url, timeout=10, verify=False, headers=KPK_HEADER, params=params)
+    response = session.get(url, timeout=10, verify=False, headers=KPK_HEADER, params=params)
     if response.status_code == 403:
         sys.exit(f"科普库拒绝访问，状态码：{response.status_code}，退出程序")
     if response.status_code != 200:
@@ -425,7 +461,7 @@ def get_kpk_page_details(page_id: str) -> dict:
     :return: 成功时返回下载信息字典
     """
     url = f"{KPK_PAGE_URL}/{page_id}"
-    response = requests.get(url, timeout=15, verify=False, headers=KPK_HEADER)
+    response = session.get(url, timeout=15, verify=False, headers=KPK_HEADER)
     if response.status_code == 403:
         sys.exit(f"科普库拒绝访问，状态码：{response.status_code}，退出程序")
     if response.status_code != 200:
@@ -433,7 +469,7 @@ def get_kpk_page_details(page_id: str) -> dict:
 
     # 创建一个默认字典来存放结果
     result_dict = defaultdict(list)
-    soup = BeautifulSoup(response.text, 'html.parser')
+    soup = parse_html(response.text, HTML_PARSER)
     # 获取所有指定class的h2元素
     for h2_tag in soup.find_all('h2', class_='uk-text-bold uk-text-muted'):
         # 查找当前h2之后的第一个table
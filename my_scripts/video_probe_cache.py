@@ -0,0 +1,216 @@
+"""
+视频探测结果的本地缓存。
+
+``extract_video_probe`` 每次都要跑一遍 ffprobe 和 MediaInfo，生成截图时还会再读一次视频流元数据。
+目录回滚后重新整理、或者批量补截图时，同一个几十 GB 的文件会在慢速硬盘上被反复探测。
+这里把探测输出存进本地 SQLite 数据库，按文件身份寻址，同一个文件只探测一次：
+
+- 先按“路径 + 大小 + 修改时间”查找，命中时不读取文件内容；
+- 查不到时再按“大小 + 文件头尾各 64 KiB 的哈希”查找，文件被改名或移动到别的目录后仍能命中，
+  命中后更新记录里的路径，下次直接按路径命中；
+- 文件大小或头尾内容变化后哈希不同，视为新文件重新探测。
+
+探测失败（返回 None）的结果不缓存。缓存读写出错时只记录警告，照常执行探测；
+数据库无法创建（例如缓存路径落在普通文件下）时本次运行不再使用缓存。
+
+:author: assassing
+:contact: https://github.com/hxz393
+:copyright: Copyright 2027, hxz393. 保留所有权利。
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_CHUNK_BYTES = 64 * 1024  # 计算文件指纹时读取的文件头尾字节数
+SQLITE_TIMEOUT_SECONDS = 30  # 多个进程同时写入时等待锁的秒数
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS probe_cache (
+    kind TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    PRIMARY KEY (kind, fingerprint)
+);
+CREATE INDEX IF NOT EXISTS probe_cache_path ON probe_cache (kind, path, size, mtime_ns);
+"""
+
+
+def normalize_path(path: str | os.PathLike) -> str:
+    """
+    统一路径写法，Windows 下不区分大小写。
+
+    :param path: 文件路径
+    :return: 规范化后的绝对路径
+    """
+    return os.path.normcase(os.path.abspath(os.fspath(path)))
+
+
+def get_file_fingerprint(path: str | os.PathLike, size: int) -> str:
+    """
+    用文件大小和头尾各 ``FINGERPRINT_CHUNK_BYTES`` 字节计算文件指纹，大文件也只读取很少的数据。
+
+    :param path: 文件路径
+    :param size: 文件大小
+    :return: 十六进制哈希值
+    """
+    digest = hashlib.sha256(str(size).encode("ascii"))
+    with open(path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_CHUNK_BYTES))
+        if size > FINGERPRINT_CHUNK_BYTES * 2:
+            f.seek(-FINGERPRINT_CHUNK_BYTES, os.SEEK_END)
+            digest.update(f.read(FINGERPRINT_CHUNK_BYTES))
+        elif size > FINGERPRINT_CHUNK_BYTES:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class ProbeCache:
+    """
+    按文件身份寻址的探测结果缓存，线程安全。
+
+    数据库在第一次使用时创建；``db_path`` 为空或 ``bypass`` 为真时完全不读写缓存。
+    """
+
+    def __init__(self, db_path: Optional[str], *, bypass: bool = False):
+        """
+        :param db_path: SQLite 数据库文件路径，为空时不缓存
+        :param bypass: 是否绕过缓存
+        """
+        self.db_path = db_path
+        self.bypass = bypass or not db_path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        返回数据库连接，第一次调用时建库建表。调用方需持有锁。
+        建库失败时关闭缓存，之后的 ``cached`` 直接探测，不再反复尝试。
+
+        :return: 数据库连接
+        """
+        if self._conn is None:
+            try:
+                db_dir = os.path.dirname(self.db_path)
+                if db_dir:
+                    os.makedirs(db_dir, exist_ok=True)
+                conn = sqlite3.connect(self.db_path, timeout=SQLITE_TIMEOUT_SECONDS, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+            except OSError:
+                self.bypass = True
+                raise
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        """
+        关闭数据库连接。
+
+        :return: 无
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get(self, kind: str, path: str | os.PathLike) -> tuple[Optional[Any], Optional[dict]]:
+        """
+        查找文件的缓存结果。
+
+        :param kind: 探测类型，例如 ``ffprobe``、``mediainfo_codec``
+        :param path: 文件路径
+        :return: (缓存数据, 文件身份)；未命中时数据为 None，文件无法读取时文件身份也为 None
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None, None
+        identity = {"path": normalize_path(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "fingerprint": None}
+
+        with self._lock:
+            conn = self.connect()
+            row = conn.execute(
+                "SELECT data FROM probe_cache WHERE kind = ? AND path = ? AND size = ? AND mtime_ns = ?",
+                (kind, identity["path"], identity["size"], identity["mtime_ns"]),
+            ).fetchone()
+        if row:
+            return json.loads(row[0]), identity
+
+        try:
+            identity["fingerprint"] = get_file_fingerprint(path, stat.st_size)
+        except OSError:
+            return None, None
+        with self._lock:
+            conn = self.connect()
+            row = conn.execute(
+                "SELECT data FROM probe_cache WHERE kind = ? AND fingerprint = ?",
+                (kind, identity["fingerprint"]),
+            ).fetchone()
+            if row:
+                # 文件改名、移动或修改时间变化，但内容没变，记下新位置
+                conn.execute(
+                    "UPDATE probe_cache SET path = ?, mtime_ns = ? WHERE kind = ? AND fingerprint = ?",
+                    (identity["path"], identity["mtime_ns"], kind, identity["fingerprint"]),
+                )
+                conn.commit()
+        return (json.loads(row[0]) if row else None), identity
+
+    def put(self, kind: str, identity: dict, data: Any) -> None:
+        """
+        写入探测结果，同一文件的旧结果会被覆盖。
+
+        :param kind: 探测类型
+        :param identity: ``get`` 返回的文件身份
+        :param data: 可序列化为 JSON 的探测结果
+        :return: 无
+        """
+        if identity["fingerprint"] is None:
+            identity["fingerprint"] = get_file_fingerprint(identity["path"], identity["size"])
+        with self._lock:
+            conn = self.connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO probe_cache (kind, fingerprint, path, size, mtime_ns, data, stored_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, identity["fingerprint"], identity["path"], identity["size"], identity["mtime_ns"], json.dumps(data, ensure_ascii=False), time.time()),
+            )
+            conn.commit()
+
+    def cached(self, kind: str, path: str | os.PathLike, probe: Callable[[], Any]) -> Any:
+        """
+        命中缓存时直接返回，否则调用 ``probe`` 探测并写入缓存。
+
+        :param kind: 探测类型
+        :param path: 文件路径
+        :param probe: 实际执行探测的无参函数，返回 None 表示失败
+        :return: 探测结果
+        """
+        if self.bypass:
+            return probe()
+
+        identity = None
+        try:
+            data, identity = self.get(kind, path)
+        except (sqlite3.Error, OSError, ValueError) as e:
+            logger.warning(f"读取探测缓存失败，直接探测：{path}: {e}")
+            data = None
+        if data is not None:
+            logger.debug(f"探测缓存命中：{kind} {path}")
+            return data
+
+        data = probe()
+        if data is not None and identity is not None:
+            try:
+                self.put(kind, identity, data)
+            except (sqlite3.Error, OSError, TypeError, ValueError) as e:
+                logger.warning(f"写入探测缓存失败：{path}: {e}")
+        return data
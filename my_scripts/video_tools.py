@@ -5,6 +5,7 @@
 :contact: https://github.com/hxz393
 :copyright: Copyright 2026, hxz393. 保留所有权利。
 """
+import concurrent.futures
 import contextlib
 import io
 import json
@@ -20,6 +21,7 @@ from PIL import Image, ImageDraw, ImageFont
 from moviepy import VideoFileClip
 
 from my_module import read_json_to_dict
+from video_probe_cache import ProbeCache
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +34,12 @@ FFPROBE_PATH = CONFIG['ffprobe_path']  # ffprobe 路径
 FFMPEG_PATH = CONFIG.get('ffmpeg_path') or (str(Path(FFPROBE_PATH).with_name("ffmpeg.exe")) if FFPROBE_PATH else "ffmpeg")  # ffmpeg 路径
 MTN_PATH = CONFIG['mtn_path']  # mtn 路径
 MEDIAINFO_PATH = CONFIG['mediainfo_path']  # mediainfo 路径
+VIDEO_CONTACT_RENDERER = CONFIG.get('video_contact_renderer', 'ffmpeg')  # 截图方式：ffmpeg 一次调用抽帧拼图，moviepy 逐帧抽取
+VIDEO_CONTACT_FRAME_WORKERS = CONFIG.get('video_contact_frame_workers', 0)  # moviepy 方式并行抽帧的线程数，0 或 1 时在同一解码器中逐帧抽取
+PROBE_CACHE = ProbeCache(
+    CONFIG.get('probe_cache_path', 'cache/video_probe.sqlite3'),  # 探测结果缓存数据库，留空时不缓存
+    bypass=CONFIG.get('probe_cache_bypass', False),  # 是否绕过探测缓存
+)
 
 # 编译正则，从文件名中提取信息
 RE_VIDEO_NAME = re.compile(
@@ -48,6 +56,7 @@ RE_VIDEO_NAME = re.compile(
 
 FFPROBE_TIMEOUT_SECONDS = 60
 FFMPEG_TIMEOUT_SECONDS = 120
+FFMPEG_CONTACT_TIMEOUT_SECONDS = 300
 MEDIAINFO_TIMEOUT_SECONDS = 60
 MTN_TIMEOUT_SECONDS = 120
 VIDEO_CONTACT_COLUMNS = 4
@@ -167,19 +176,27 @@ def get_largest_file(path_str: str | os.PathLike) -> Optional[str]:
     return largest_file_path
 
 
-def extract_video_probe(filepath: str | os.PathLike) -> Optional[dict]:
+def run_ffprobe(filepath: str | os.PathLike) -> dict:
     """
-    使用 ffprobe 和 MediaInfo 提取单个视频文件的整理字段和视频流元数据。
+    读取视频文件的容器和全部流的 ffprobe 元数据，结果按文件身份缓存，同一文件只运行一次 ffprobe。
 
     :param filepath: 视频文件路径
-    :return: 包含 ``video_path``、``file_info``、``video_stream`` 和 ``format`` 的探测结果
+    :return: ffprobe JSON 数据
+    :raises subprocess.TimeoutExpired: ffprobe 执行超时
+    :raises OSError: ffprobe 无法启动
+    :raises RuntimeError: ffprobe 返回错误或输出不是 JSON
     """
     filepath = os.fspath(filepath)
-    logger.info(f"获取视频信息：{os.path.basename(filepath)}")
-    _dirname, filename = os.path.split(filepath)
-    file_info = {"source": "", "resolution": "", "codec": "", "bitrate": ""}
+    return PROBE_CACHE.cached("ffprobe", filepath, lambda: read_ffprobe_json(filepath))
+
+
+def read_ffprobe_json(filepath: str) -> dict:
+    """
+    运行 ffprobe 并解析 JSON 输出，不经过缓存。
 
-    # 构造并运行 ffprobe 命令。
+    :param filepath: 视频文件路径
+    :return: ffprobe JSON 数据
+    """
     cmd = [
         FFPROBE_PATH,
         "-v", "quiet",
@@ -188,34 +205,52 @@ def extract_video_probe(filepath: str | os.PathLike) -> Optional[dict]:
         "-show_streams",
         filepath
     ]
+    result = subprocess.run(
+        cmd,
+        capture_output=True,
+        text=True,
+        encoding='utf-8',
+        errors='replace',
+        timeout=FFPROBE_TIMEOUT_SECONDS,
+    )
+    if getattr(result, "returncode", 0) != 0:
+        stderr = (getattr(result, "stderr", "") or "").strip()
+        raise RuntimeError(f"ffprobe 返回错误：{stderr}")
+
     try:
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            errors='replace',
-            timeout=FFPROBE_TIMEOUT_SECONDS,
-        )
+        data = json.loads(result.stdout or "")
+    except json.JSONDecodeError as e:
+        raise RuntimeError("ffprobe JSON 解析失败") from e
+    if not isinstance(data, dict):
+        raise RuntimeError("ffprobe JSON 结构错误")
+    return data
+
+
+def extract_video_probe(filepath: str | os.PathLike) -> Optional[dict]:
+    """
+    使用 ffprobe 和 MediaInfo 提取单个视频文件的整理字段和视频流元数据。
+
+    :param filepath: 视频文件路径
+    :return: 包含 ``video_path``、``file_info``、``video_stream`` 和 ``format`` 的探测结果
+    """
+    filepath = os.fspath(filepath)
+    logger.info(f"获取视频信息：{os.path.basename(filepath)}")
+    _dirname, filename = os.path.split(filepath)
+    file_info = {"source": "", "resolution": "", "codec": "", "bitrate": ""}
+
+    try:
+        data = run_ffprobe(filepath)
     except subprocess.TimeoutExpired:
         logger.exception(f"ffprobe 执行超时：{filepath}")
         return None
     except OSError:
         logger.exception(f"ffprobe 执行失败：{filepath}")
         return None
-
-    if getattr(result, "returncode", 0) != 0:
-        stderr = (getattr(result, "stderr", "") or "").strip()
-        logger.error(f"ffprobe 解析失败：{filepath}: {stderr}")
-        return None
-
-    # 解析 JSON。通常第一个视频流在 streams[0]，也可能有音频流排在前面，需要过滤。
-    try:
-        data = json.loads(result.stdout or "")
-    except json.JSONDecodeError:
-        logger.error(f"ffprobe JSON 解析失败：{filepath}")
+    except RuntimeError as e:
+        logger.error(f"ffprobe 解析失败：{filepath}: {e}")
         return None
 
+    # 通常第一个视频流在 streams[0]，也可能有音频流排在前面，需要过滤。
     streams = data.get("streams") or []
     video_stream = next(
         (stream for stream in streams if isinstance(stream, dict) and stream.get("codec_type") == "video"),
@@ -255,7 +290,7 @@ def extract_video_probe(filepath: str | os.PathLike) -> Optional[dict]:
     codec_tag_string = str(video_stream.get("codec_tag_string") or "未知编码器")
     codec_name = str(video_stream.get("codec_name") or "未知编码器")
     try:
-        codec_detail = check_video_codec(filepath)
+        codec_detail = PROBE_CACHE.cached("mediainfo_codec", filepath, lambda: check_video_codec(filepath))
     except Exception as e:
         logger.warning(f"MediaInfo 编码解析失败，回退到 ffprobe：{filepath}: {e}")
         codec_detail = None
@@ -549,47 +584,21 @@ def get_video_contact_text_bbox(draw: Any, text: str, font: Any, stroke_width: i
 
 def get_video_contact_stream_metadata(video_path: str | os.PathLike) -> dict:
     """
-    读取首个视频流的 ffprobe 元数据。
+    读取首个视频流的 ffprobe 元数据，与 ``extract_video_probe`` 共用探测缓存。
 
     :param video_path: 视频文件路径
     :return: 首个视频流元数据；读取失败时返回空字典
     """
     video_path = os.fspath(video_path)
-    cmd = [
-        FFPROBE_PATH,
-        "-v", "quiet",
-        "-print_format", "json",
-        "-show_streams",
-        "-select_streams", "v:0",
-        video_path,
-    ]
     try:
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            encoding="utf-8",
-            errors="replace",
-            timeout=FFPROBE_TIMEOUT_SECONDS,
-        )
+        data = run_ffprobe(video_path)
     except subprocess.TimeoutExpired:
         logger.warning(f"ffprobe 读取视频流元数据超时：{video_path}")
         return {}
-    except OSError as e:
+    except (OSError, RuntimeError) as e:
         logger.warning(f"ffprobe 读取视频流元数据失败：{video_path}: {e}")
         return {}
 
-    if getattr(result, "returncode", 0) != 0:
-        stderr = (getattr(result, "stderr", "") or "").strip()
-        logger.warning(f"ffprobe 读取视频流元数据失败：{video_path}: {stderr}")
-        return {}
-
-    try:
-        data = json.loads(result.stdout or "")
-    except json.JSONDecodeError:
-        logger.warning(f"ffprobe 视频流元数据 JSON 解析失败：{video_path}")
-        return {}
-
     streams = data.get("streams") or []
     stream = next(
         (item for item in streams if isinstance(item, dict) and item.get("codec_type") in (None, "video")),
@@ -631,6 +640,18 @@ def extract_video_contact_hdr_frame(video_path: str | os.PathLike, seconds: floa
     :param seconds: 抽帧时间点，单位秒
     :return: 已转换为 RGB 的 Pillow 图像
     """
+    return extract_video_contact_seek_frame(video_path, seconds, VIDEO_CONTACT_HDR_TONEMAP_FILTER)
+
+
+def extract_video_contact_seek_frame(video_path: str | os.PathLike, seconds: float, video_filter: Optional[str] = None) -> Any:
+    """
+    使用 ffmpeg 在输入端跳转到时间点附近的关键帧，只解码一帧并转为 Pillow 图像。
+
+    :param video_path: 视频文件路径
+    :param seconds: 抽帧时间点，单位秒
+    :param video_filter: 额外的 ffmpeg 视频滤镜，例如 HDR tone mapping
+    :return: 已转换为 RGB 的 Pillow 图像
+    """
     video_path = os.fspath(video_path)
     cmd = [
         FFMPEG_PATH,
@@ -638,7 +659,7 @@ def extract_video_contact_hdr_frame(video_path: str | os.PathLike, seconds: floa
         "-ss", f"{seconds:.3f}",
         "-i", video_path,
         "-frames:v", "1",
-        "-vf", VIDEO_CONTACT_HDR_TONEMAP_FILTER,
+        *(["-vf", video_filter] if video_filter else []),
         "-f", "image2pipe",
         "-vcodec", "png",
         "-",
@@ -651,18 +672,60 @@ def extract_video_contact_hdr_frame(video_path: str | os.PathLike, seconds: floa
             timeout=FFMPEG_TIMEOUT_SECONDS,
         )
     except subprocess.TimeoutExpired as e:
-        raise RuntimeError(f"ffmpeg HDR 抽帧超时: {seconds:.3f}s") from e
+        raise RuntimeError(f"ffmpeg 抽帧超时: {seconds:.3f}s") from e
     except OSError as e:
-        raise RuntimeError(f"ffmpeg HDR 抽帧启动失败: {e}") from e
+        raise RuntimeError(f"ffmpeg 抽帧启动失败: {e}") from e
 
     if result.returncode != 0 or not result.stdout:
         stderr = result.stderr.decode("utf-8", errors="replace").strip()
-        raise RuntimeError(f"ffmpeg HDR 抽帧失败: {seconds:.3f}s {stderr}")
+        raise RuntimeError(f"ffmpeg 抽帧失败: {seconds:.3f}s {stderr}")
 
     try:
         return Image.open(io.BytesIO(result.stdout)).convert("RGB")
     except Exception as e:
-        raise RuntimeError(f"ffmpeg HDR 抽帧图像解析失败: {seconds:.3f}s") from e
+        raise RuntimeError(f"ffmpeg 抽帧图像解析失败: {seconds:.3f}s") from e
+
+
+def extract_video_contact_cell(video_path: str, seconds: float, size: tuple[int, int], hdr_video: bool) -> Any:
+    """
+    线程池中执行的单格抽帧：用 ffmpeg 快速跳转抽取一帧，缩放到单格尺寸。
+
+    :param video_path: 视频文件路径
+    :param seconds: 抽帧时间点，单位秒
+    :param size: 单格显示尺寸
+    :param hdr_video: 是否需要 HDR 到 SDR 转换
+    :return: 单格 Pillow 图像
+    """
+    frame = extract_video_contact_seek_frame(video_path, seconds, VIDEO_CONTACT_HDR_TONEMAP_FILTER if hdr_video else None)
+    return frame.resize(size, Image.Resampling.LANCZOS)
+
+
+def paste_video_contact_cells_parallel(
+        grid_image: Any,
+        video_path: str,
+        times: list[float],
+        size: tuple[int, int],
+        hdr_video: bool,
+        workers: int,
+) -> None:
+    """
+    用线程池并行抽取各格画面，完成一格就贴到预先分配的网格上，不在内存里攒下全部帧。
+    解码都在 ffmpeg 子进程里完成，线程只等待子进程输出，不必每张截图都新建进程池。
+
+    :param grid_image: 预先分配的网格图像
+    :param video_path: 视频文件路径
+    :param times: 截图时间点，单位秒
+    :param size: 单格显示尺寸
+    :param hdr_video: 是否需要 HDR 到 SDR 转换
+    :param workers: 并行抽帧数
+    :return: 无返回值
+    """
+    cell_width, cell_height = size
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(workers, len(times))) as executor:
+        futures = {executor.submit(extract_video_contact_cell, video_path, t, size, hdr_video): idx for idx, t in enumerate(times)}
+        for future in concurrent.futures.as_completed(futures):
+            idx = futures.pop(future)
+            grid_image.paste(future.result(), ((idx % VIDEO_CONTACT_COLUMNS) * cell_width, (idx // VIDEO_CONTACT_COLUMNS) * cell_height))
 
 
 def extract_video_contact_clip_frame(clip: Any, seconds: float) -> Any:
@@ -678,7 +741,13 @@ def extract_video_contact_clip_frame(clip: Any, seconds: float) -> Any:
     return Image.fromarray(raw_frame.astype('uint8'))
 
 
-def draw_video_contact_timestamp(frame: Any, seconds: float, font: Any, font_size: int) -> Any:
+def draw_video_contact_timestamp(
+        frame: Any,
+        seconds: float,
+        font: Any,
+        font_size: int,
+        box: Optional[tuple[int, int, int, int]] = None,
+) -> Any:
     """
     在单帧右下角绘制黑底白字时间戳。
 
@@ -686,9 +755,10 @@ def draw_video_contact_timestamp(frame: Any, seconds: float, font: Any, font_siz
     :param seconds: 当前帧对应的视频秒数
     :param font: Pillow 字体对象
     :param font_size: 字号
+    :param box: 帧在图像中的位置 ``(left, top, width, height)``；未提供时整张图像就是这一帧
     :return: 已绘制时间戳的图像对象
     """
-    frame_width, frame_height = frame.size
+    left, top, frame_width, frame_height = box or (0, 0, *frame.size)
     timestamp = format_video_contact_timestamp(seconds)
     draw = ImageDraw.Draw(frame, "RGBA")
     padding_x = max(6, font_size // 6)
@@ -699,10 +769,10 @@ def draw_video_contact_timestamp(frame: Any, seconds: float, font: Any, font_siz
     text_left, text_top, text_right, text_bottom = get_video_contact_text_bbox(draw, timestamp, font, stroke_width)
     text_width = text_right - text_left
     text_height = text_bottom - text_top
-    x2 = max(0, frame_width - margin_x)
-    y2 = max(0, frame_height - margin_y)
-    x1 = max(0, x2 - text_width - padding_x * 2)
-    y1 = max(0, y2 - text_height - padding_y * 2)
+    x2 = left + max(0, frame_width - margin_x)
+    y2 = top + max(0, frame_height - margin_y)
+    x1 = max(left, x2 - text_width - padding_x * 2)
+    y1 = max(top, y2 - text_height - padding_y * 2)
     draw.rectangle((x1, y1, x2, y2), fill=VIDEO_CONTACT_TIMESTAMP_BG_COLOR)
     draw.text(
         (x1 + padding_x - text_left, y1 + padding_y - text_top),
@@ -715,23 +785,208 @@ def draw_video_contact_timestamp(frame: Any, seconds: float, font: Any, font_siz
     return frame
 
 
-def generate_video_contact(video_path: str | os.PathLike, video_info: Optional[dict] = None, video_stream: Optional[dict] = None) -> None:
+def get_video_contact_times(duration: float) -> list[float]:
+    """
+    按网格格数均匀取截图时间点，跳过片头和片尾。
+
+    :param duration: 视频时长，单位秒
+    :return: 时间点列表，单位秒
+    """
+    total_images = VIDEO_CONTACT_COLUMNS * VIDEO_CONTACT_ROWS
+    return [duration * (i + 1) / (total_images + 1) for i in range(total_images)]
+
+
+def resolve_video_contact_probe(video_path: str, video_info: Optional[dict], video_stream: Optional[dict]) -> tuple[dict, Optional[dict]]:
+    """
+    补齐截图需要的视频信息字段和视频流元数据，调用方已传入的部分直接复用。
+
+    :param video_path: 视频文件路径
+    :param video_info: 已有视频信息字段
+    :param video_stream: 已有视频流元数据
+    :return: (视频信息字段, 视频流元数据)；读取失败时分别为空字典和 None
+    """
+    file_info = video_info or {}
+    if video_info is None or video_stream is None:
+        try:
+            video_probe = extract_video_probe(video_path) or {}
+        except Exception as e:
+            logger.warning(f"{video_path} 获取视频探测信息失败: {e}")
+            video_probe = {}
+        if video_info is None:
+            file_info = video_probe.get("file_info") or {}
+        if video_stream is None:
+            video_stream = video_probe.get("video_stream")
+    return file_info, video_stream
+
+
+def build_video_contact_ffmpeg_command(video_path: str, times: list[float], width: int, height: int, hdr_video: bool) -> list[str]:
+    """
+    构造一次抽取全部截图帧并拼成网格的 ffmpeg 命令。
+
+    每个时间点作为一路输入，在输入端跳到最近的关键帧，只解码一帧；
+    各路缩放（HDR 先 tone-map）后用 ``xstack`` 拼成网格，以 RGB 原始像素输出到标准输出。
+
+    :param video_path: 视频文件路径
+    :param times: 截图时间点，单位秒
+    :param width: 单格显示宽度
+    :param height: 单格显示高度
+    :param hdr_video: 是否需要 HDR 到 SDR 转换
+    :return: 命令参数列表
+    """
+    cmd = [FFMPEG_PATH, "-v", "error", "-nostdin"]
+    for t in times:
+        cmd += ["-noaccurate_seek", "-ss", f"{t:.3f}", "-i", video_path]
+
+    cell_filter = f"{VIDEO_CONTACT_HDR_TONEMAP_FILTER}," if hdr_video else ""
+    cell_filter += f"scale={width}:{height}:flags=lanczos,setsar=1,format=rgb24"
+    filters = [f"[{i}:v:0]trim=end_frame=1,setpts=PTS-STARTPTS,{cell_filter}[c{i}]" for i in range(len(times))]
+    layout = "|".join(f"{(i % VIDEO_CONTACT_COLUMNS) * width}_{(i // VIDEO_CONTACT_COLUMNS) * height}" for i in range(len(times)))
+    filters.append("".join(f"[c{i}]" for i in range(len(times))) + f"xstack=inputs={len(times)}:layout={layout}[grid]")
+
+    cmd += [
+        "-filter_complex", ";".join(filters),
+        "-map", "[grid]",
+        "-frames:v", "1",
+        "-f", "rawvideo",
+        "-pix_fmt", "rgb24",
+        "-",
+    ]
+    return cmd
+
+
+def render_video_contact_ffmpeg(video_path: str, output_path: str, file_info: dict, video_stream: Optional[dict]) -> None:
+    """
+    用一次 ffmpeg 调用抽帧、缩放、tone-map 和拼图，再在成品网格上一次画完全部时间戳。
+
+    视频尺寸和时长取自 ffprobe 元数据，不打开 MoviePy 解码器。
+
+    :param video_path: 视频文件路径
+    :param output_path: 输出图片路径
+    :param file_info: 视频信息字段，提供 ``dar``
+    :param video_stream: 首个视频流的 ffprobe 元数据
+    :return: 无返回值
+    """
+    stream = video_stream or get_video_contact_stream_metadata(video_path)
+    try:
+        storage_height = int(stream.get("height") or 0)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"视频高度无效: {stream.get('height')}") from e
+    if storage_height <= 0:
+        raise ValueError(f"视频高度无效: {storage_height}")
+
+    dar = file_info.get("dar")
+    if not dar:
+        try:
+            dar = int(stream.get("width") or 0) / storage_height
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"视频宽度无效: {stream.get('width')}") from e
+    try:
+        dar = float(dar)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"视频 DAR 无效: {dar}") from e
+    display_width, display_height = int(storage_height * dar), storage_height
+    if display_width <= 0:
+        raise ValueError(f"缩略图尺寸无效: {display_width}x{display_height}")
+
+    duration = stream.get("duration")
+    if not duration:
+        try:
+            duration = (run_ffprobe(video_path).get("format") or {}).get("duration")
+        except (subprocess.TimeoutExpired, OSError, RuntimeError) as e:
+            raise ValueError(f"视频时长读取失败: {e}") from e
+    try:
+        duration = float(duration)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"视频时长无效: {duration}") from e
+    if duration <= 0:
+        raise ValueError(f"视频时长无效: {duration}")
+
+    times = get_video_contact_times(duration)
+    cmd = build_video_contact_ffmpeg_command(video_path, times, display_width, display_height, is_hdr_video(video_path, stream))
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=FFMPEG_CONTACT_TIMEOUT_SECONDS)
+    except subprocess.TimeoutExpired as e:
+        raise RuntimeError("ffmpeg 拼图超时") from e
+    except OSError as e:
+        raise RuntimeError(f"ffmpeg 拼图启动失败: {e}") from e
+
+    grid_size = (VIDEO_CONTACT_COLUMNS * display_width, VIDEO_CONTACT_ROWS * display_height)
+    if result.returncode != 0 or len(result.stdout) != grid_size[0] * grid_size[1] * 3:
+        stderr = result.stderr.decode("utf-8", errors="replace").strip()
+        raise RuntimeError(f"ffmpeg 拼图失败: {stderr or f'输出 {len(result.stdout)} 字节'}")
+
+    grid_image = Image.frombytes("RGB", grid_size, result.stdout)
+    del result
+    timestamp_font_size = max(VIDEO_CONTACT_TIMESTAMP_MIN_FONT_SIZE, display_height // VIDEO_CONTACT_TIMESTAMP_FONT_DIVISOR)
+    timestamp_font = load_video_contact_timestamp_font(timestamp_font_size)
+    for idx, t in enumerate(times):
+        col, row = idx % VIDEO_CONTACT_COLUMNS, idx // VIDEO_CONTACT_COLUMNS
+        box = (col * display_width, row * display_height, display_width, display_height)
+        draw_video_contact_timestamp(grid_image, t, timestamp_font, timestamp_font_size, box)
+    grid_image.save(output_path)
+
+
+def generate_video_contact(
+        video_path: str | os.PathLike,
+        video_info: Optional[dict] = None,
+        video_stream: Optional[dict] = None,
+        *,
+        frame_workers: Optional[int] = None,
+) -> None:
     """
     从视频中均匀抽取 16 帧，按 4x4 生成带时间戳的同名 ``_s.jpg`` 网格缩略图。
 
-    函数优先使用调用方传入或 ``extract_video_probe`` 解析出的 DAR 修正截图显示宽高比；
-    如果 DAR 不可用，则退回 ``VideoFileClip.aspect_ratio``。HDR 视频会使用
-    ffmpeg tone mapping 抽帧后再拼图，避免截图发灰。调用方负责在失败时使用
-    mtn 兜底，并检查输出文件是否实际存在。
+    函数优先使用调用方传入或 ``extract_video_probe`` 解析出的 DAR 修正截图显示宽高比。
+    默认用 ffmpeg 一次调用完成抽帧、tone-map 和拼图；ffmpeg 拼图失败或配置为 ``moviepy`` 时，
+    改用 MoviePy 逐帧抽取，HDR 视频逐帧调用 ffmpeg tone mapping，避免截图发灰。
+    调用方负责在失败时使用 mtn 兜底，并检查输出文件是否实际存在。
 
     :param video_path: 视频文件路径
     :param video_info: 已有视频信息字段；提供时复用其中的 ``dar``
     :param video_stream: 已有视频流元数据；提供时复用其 HDR 色彩字段
+    :param frame_workers: MoviePy 方式并行抽帧数，为空时使用 ``video_contact_frame_workers`` 配置
     :return: 无返回值
     """
     video_path = os.fspath(video_path)
     logger.info(f"生成缩略图 {os.path.basename(video_path)}")
     output_path = os.path.splitext(video_path)[0] + "_s.jpg"
+    file_info, video_stream = resolve_video_contact_probe(video_path, video_info, video_stream)
+    if VIDEO_CONTACT_RENDERER == "ffmpeg":
+        try:
+            render_video_contact_ffmpeg(video_path, output_path, file_info, video_stream)
+        except (RuntimeError, ValueError) as e:
+            logger.warning(f"ffmpeg 拼图失败，退回 MoviePy：{video_path}: {e}")
+        else:
+            if not os.path.exists(output_path):
+                logger.warning(f"未生成视频缩略图: {output_path}")
+            return
+    generate_video_contact_moviepy(video_path, output_path, file_info, video_stream, frame_workers=frame_workers)
+
+
+def generate_video_contact_moviepy(
+        video_path: str,
+        output_path: str,
+        file_info: dict,
+        video_stream: Optional[dict],
+        *,
+        frame_workers: Optional[int] = None,
+) -> None:
+    """
+    用 MoviePy 逐帧抽取截图并用 Pillow 拼图。
+
+    DAR 不可用时退回 ``VideoFileClip.aspect_ratio``；HDR 视频逐帧调用 ffmpeg tone mapping，
+    单帧失败后整张改用 MoviePy 抽帧。配置了 ``video_contact_frame_workers`` 时，
+    各格改由线程池并行调用 ffmpeg 快速跳转抽帧，失败后再逐帧抽取。
+
+    :param video_path: 视频文件路径
+    :param output_path: 输出图片路径
+    :param file_info: 视频信息字段，提供 ``dar``
+    :param video_stream: 首个视频流元数据，用于判断 HDR
+    :param frame_workers: 并行抽帧数，为空时使用 ``video_contact_frame_workers`` 配置
+    :return: 无返回值
+    """
+    if frame_workers is None:
+        frame_workers = VIDEO_CONTACT_FRAME_WORKERS
     clip = None
     try:
         # clip = VideoFileClip(video_path)
@@ -749,19 +1004,6 @@ def generate_video_contact(video_path: str | os.PathLike, video_info: Optional[d
         if storage_height <= 0:
             raise ValueError(f"视频高度无效: {storage_height}")
 
-        file_info = video_info or {}
-        resolved_video_stream = video_stream
-        if video_info is None or video_stream is None:
-            try:
-                video_probe = extract_video_probe(video_path) or {}
-            except Exception as e:
-                logger.warning(f"{video_path} 获取视频探测信息失败: {e}")
-                video_probe = {}
-            if video_info is None:
-                file_info = video_probe.get("file_info") or {}
-            if video_stream is None:
-                resolved_video_stream = video_probe.get("video_stream")
-
         dar = file_info.get("dar") or getattr(clip, "aspect_ratio", 0)
         try:
             dar = float(dar)
@@ -784,32 +1026,41 @@ def generate_video_contact(video_path: str | os.PathLike, video_info: Optional[d
             raise ValueError(f"视频时长无效: {clip.duration}")
 
         cols, rows = VIDEO_CONTACT_COLUMNS, VIDEO_CONTACT_ROWS
-        total_images = cols * rows
-        times = [duration * (i + 1) / (total_images + 1) for i in range(total_images)]
+        times = get_video_contact_times(duration)
         timestamp_font_size = max(VIDEO_CONTACT_TIMESTAMP_MIN_FONT_SIZE, display_height // VIDEO_CONTACT_TIMESTAMP_FONT_DIVISOR)
         timestamp_font = load_video_contact_timestamp_font(timestamp_font_size)
-        hdr_video = is_hdr_video(video_path, resolved_video_stream)
+        hdr_video = is_hdr_video(video_path, video_stream)
 
-        images = []
-        for t in times:
-            if hdr_video:
-                try:
-                    frame = extract_video_contact_hdr_frame(video_path, t)
-                except RuntimeError as e:
-                    logger.warning(f"HDR tone mapping 抽帧失败，退回 MoviePy：{video_path}: {e}")
-                    hdr_video = False
+        # 先分配好整张网格，每抽出一帧就缩放后贴上去，不保留全部帧。
+        grid_image = Image.new('RGB', (cols * display_width, rows * display_height))
+        pasted = False
+        if frame_workers > 1:
+            try:
+                paste_video_contact_cells_parallel(grid_image, video_path, times, (display_width, display_height), hdr_video, frame_workers)
+                pasted = True
+            except (RuntimeError, OSError) as e:
+                logger.warning(f"并行抽帧失败，退回逐帧抽取：{video_path}: {e}")
+
+        if not pasted:
+            for idx, t in enumerate(times):
+                if hdr_video:
+                    try:
+                        frame = extract_video_contact_hdr_frame(video_path, t)
+                    except RuntimeError as e:
+                        logger.warning(f"HDR tone mapping 抽帧失败，退回 MoviePy：{video_path}: {e}")
+                        hdr_video = False
+                        frame = extract_video_contact_clip_frame(clip, t)
+                else:
                     frame = extract_video_contact_clip_frame(clip, t)
-            else:
-                frame = extract_video_contact_clip_frame(clip, t)
-            # 缩放到正确的显示尺寸（DAR）
-            frame = frame.resize((display_width, display_height), Image.Resampling.LANCZOS)
-            frame = draw_video_contact_timestamp(frame, t, timestamp_font, timestamp_font_size)
-            images.append(frame)
+                # 缩放到正确的显示尺寸（DAR）
+                frame = frame.resize((display_width, display_height), Image.Resampling.LANCZOS)
+                col, row = idx % cols, idx // cols
+                grid_image.paste(frame, (col * display_width, row * display_height))
 
-        grid_image = Image.new('RGB', (cols * display_width, rows * display_height))
-        for idx, img in enumerate(images):
+        for idx, t in enumerate(times):
             col, row = idx % cols, idx // cols
-            grid_image.paste(img, (col * display_width, row * display_height))
+            box = (col * display_width, row * display_height, display_width, display_height)
+            draw_video_contact_timestamp(grid_image, t, timestamp_font, timestamp_font_size, box)
 
         grid_image.save(output_path)
         if not os.path.exists(output_path):
@@ -0,0 +1,66 @@
+"""
+针对 ``my_module.module_use.build_http_session`` 的测试。
+"""
+
+import importlib.util
+import socket
+import unittest
+import uuid
+from pathlib import Path
+
+MODULE_PATH = Path(__file__).resolve().parents[2] / "my_module" / "module_use" / "build_http_session.py"
+
+
+def load_build_http_session():
+    """按文件路径加载，避免导入 ``my_module`` 包时依赖 Windows 专用模块。"""
+    spec = importlib.util.spec_from_file_location(f"build_http_session_test_{uuid.uuid4().hex}", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestBuildHttpSession(unittest.TestCase):
+    """验证会话的连接池、代理和连接池共享。"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.module = load_build_http_session()
+
+    def test_pool_size_follows_worker_count(self):
+        """连接池容量等于并发数，低于下限时取下限。"""
+        session = self.module.build_http_session(32)
+        adapter = session.get_adapter("https://example.com")
+
+        self.assertIsInstance(adapter, self.module.KeepAliveHTTPAdapter)
+        self.assertEqual(adapter._pool_connections, 32)
+        self.assertEqual(adapter._pool_maxsize, 32)
+        self.assertEqual(self.module.build_http_session(2).get_adapter("http://x")._pool_maxsize, 10)
+
+    def test_session_keeps_proxies_headers_and_verify(self):
+        """代理、默认请求头和证书校验写入会话。"""
+        proxies = {"http": "http://127.0.0.1:7890", "https": "http://127.0.0.1:7890"}
+        session = self.module.build_http_session(proxies=proxies, headers={"Cookie": "a=1"}, verify=False)
+
+        self.assertEqual(session.proxies, proxies)
+        self.assertEqual(session.headers["Cookie"], "a=1")
+        self.assertFalse(session.verify)
+
+    def test_pool_from_shares_adapter_but_not_cookies(self):
+        """复用连接池的会话使用同一个适配器，Cookie 互不影响。"""
+        base = self.module.build_http_session(16)
+        child = self.module.build_http_session(pool_from=base)
+        child.cookies.set("sid", "child")
+
+        self.assertIs(child.get_adapter("https://example.com"), base.get_adapter("https://example.com"))
+        self.assertIsNone(base.cookies.get("sid"))
+
+    def test_keepalive_socket_option_is_enabled(self):
+        """连接池管理器带有 SO_KEEPALIVE 套接字选项。"""
+        adapter = self.module.build_http_session().get_adapter("https://example.com")
+
+        socket_options = adapter.poolmanager.connection_pool_kw["socket_options"]
+        self.assertIn((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1), socket_options)
+
+
+if __name__ == "__main__":
+    unittest.main()
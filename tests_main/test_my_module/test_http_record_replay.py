@@ -0,0 +1,153 @@
+"""
+针对 ``my_module.module_use.http_record_replay`` 的测试。
+
+用假的底层适配器代替网络，验证录制写入归档、回放按顺序返回响应，以及会话工厂自动挂载适配器。
+"""
+
+import importlib.util
+import io
+import sys
+import tempfile
+import time
+import types
+import unittest
+import uuid
+from pathlib import Path
+from unittest.mock import patch
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPResponse
+
+MODULE_DIR = Path(__file__).resolve().parents[2] / "my_module" / "module_use"
+
+
+def load_http_record_replay():
+    """
+    把 ``build_http_session`` 和 ``http_record_replay`` 加载到一个临时包里。
+
+    直接导入 ``my_module`` 会依赖 Windows 专用模块，这里只加载这两个文件，保留它们之间的相对导入。
+    """
+    package_name = f"module_use_test_{uuid.uuid4().hex}"
+    package = types.ModuleType(package_name)
+    package.__path__ = [str(MODULE_DIR)]
+    modules = {package_name: package}
+    with patch.dict(sys.modules, modules):
+        for name in ("build_http_session", "http_record_replay"):
+            spec = importlib.util.spec_from_file_location(f"{package_name}.{name}", MODULE_DIR / f"{name}.py")
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[spec.name] = module
+            spec.loader.exec_module(module)
+            modules[name] = module
+    return modules["build_http_session"], modules["http_record_replay"]
+
+
+class FakeNetworkAdapter(HTTPAdapter):
+    """按地址返回固定内容的底层适配器，记录被调用的次数。"""
+
+    def __init__(self, pages: dict):
+        super().__init__()
+        self.pages = pages
+        self.calls = 0
+
+    def send(self, request, **kwargs):
+        self.calls += 1
+        raw = HTTPResponse(
+            body=io.BytesIO(self.pages[request.url].encode("utf-8")),
+            headers={"Content-Type": "text/html; charset=utf-8"},
+            status=200,
+            reason="OK",
+            preload_content=False,
+        )
+        return self.build_response(request, raw)
+
+
+class TestHttpRecordReplay(unittest.TestCase):
+    """验证录制和回放。"""
+
+    def setUp(self):
+        self.session_module, self.module = load_http_record_replay()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.archive_path = str(Path(self.temp_dir.name) / "site.jsonl.gz")
+
+    def tearDown(self):
+        self.module.disable_http_transport()
+        self.temp_dir.cleanup()
+
+    def record(self, pages: dict, urls: list[str]) -> FakeNetworkAdapter:
+        """用假网络录制一组请求。"""
+        network = FakeNetworkAdapter(pages)
+        session = requests.Session()
+        session.mount("https://", network)
+        self.module.enable_http_record(self.archive_path)
+        self.module.install_http_transport(session)
+        for url in urls:
+            session.get(url)
+        self.module.disable_http_transport()
+        return network
+
+    def test_replay_serves_recorded_responses_without_network(self):
+        """回放时内容与录制一致，并且不再调用底层适配器。"""
+        network = self.record({"https://example.com/list?page=1": "第一页"}, ["https://example.com/list?page=1"])
+
+        self.module.enable_http_replay(self.archive_path)
+        session = self.session_module.build_http_session()
+        response = session.get("https://example.com/list", params={"page": 1})
+
+        self.assertEqual(network.calls, 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, "第一页")
+        self.assertIsInstance(session.get_adapter("https://example.com"), self.module.ReplayHTTPAdapter)
+
+    def test_repeated_request_replays_in_recorded_order(self):
+        """同一个地址录制多次时依次返回，用完后停在最后一条。"""
+        pages = {"https://example.com/a": "v1"}
+        network = FakeNetworkAdapter(pages)
+        session = requests.Session()
+        session.mount("https://", network)
+        self.module.enable_http_record(self.archive_path)
+        self.module.install_http_transport(session)
+        session.get("https://example.com/a")
+        pages["https://example.com/a"] = "v2"
+        session.get("https://example.com/a")
+
+        self.module.enable_http_replay(self.archive_path)
+        replay = self.session_module.build_http_session()
+
+        self.assertEqual([replay.get("https://example.com/a").text for _ in range(3)], ["v1", "v2", "v2"])
+
+    def test_missing_request_raises_connection_error(self):
+        """归档里没有的请求按网络错误处理，脚本原有的重试逻辑照常生效。"""
+        self.record({"https://example.com/a": "a"}, ["https://example.com/a"])
+
+        self.module.enable_http_replay(self.archive_path)
+        session = self.session_module.build_http_session()
+
+        with self.assertRaises(requests.ConnectionError):
+            session.get("https://example.com/b")
+
+    def test_replay_latency_and_streaming(self):
+        """回放延迟生效，流式读取也能拿到完整内容。"""
+        self.record({"https://example.com/file": "x" * 1000}, ["https://example.com/file"])
+
+        self.module.enable_http_replay(self.archive_path, latency=0.05)
+        session = self.session_module.build_http_session()
+        start = time.perf_counter()
+        response = session.get("https://example.com/file", stream=True)
+        body = b"".join(response.iter_content(chunk_size=128))
+
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+        self.assertEqual(body, b"x" * 1000)
+
+    def test_disable_restores_network_sessions(self):
+        """关闭后新建的会话不再挂载录制回放适配器。"""
+        self.module.enable_http_replay(self.archive_path)
+        self.module.disable_http_transport()
+
+        session = self.session_module.build_http_session()
+
+        self.assertIsInstance(session.get_adapter("https://example.com"), self.session_module.KeepAliveHTTPAdapter)
+
+
+if __name__ == "__main__":
+    unittest.main()
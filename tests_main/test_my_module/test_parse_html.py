@@ -0,0 +1,90 @@
+"""
+针对 ``my_module.module_use.parse_html`` 的测试。
+
+验证默认解析器选择、解析器校验、只解析目标容器，以及两种解析器下选择器结果一致。
+"""
+
+import importlib.util
+import unittest
+import uuid
+from pathlib import Path
+from unittest.mock import patch
+
+from bs4 import BeautifulSoup
+
+MODULE_PATH = Path(__file__).resolve().parents[2] / "my_module" / "module_use" / "parse_html.py"
+
+PAGE_HTML = """
+<html><head><title>列表页</title></head><body>
+<table><tr class="row"><td><a href="/t/1/">Movie &amp; Title</a></td><td>1 GB</td></tr>
+<tr class="row"><td><a href="/t/2/">Další Film</a></td><td>2 GB</td></tr></table>
+</body></html>
+"""
+
+
+def load_parse_html():
+    """按文件路径加载模块，避免导入依赖 Windows 的 ``my_module`` 包。"""
+    spec = importlib.util.spec_from_file_location(f"parse_html_test_{uuid.uuid4().hex}", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestParseHtml(unittest.TestCase):
+    """验证解析入口。"""
+
+    def setUp(self):
+        self.module = load_parse_html()
+
+    def test_default_parser_prefers_lxml(self):
+        """安装了 lxml 时默认使用 lxml，没有安装时回退到 html.parser。"""
+        self.assertEqual(self.module.get_default_html_parser(), "lxml")
+        with patch.object(self.module.importlib.util, "find_spec", return_value=None):
+            self.assertEqual(self.module.get_default_html_parser(), "html.parser")
+
+    def test_empty_parser_uses_default(self):
+        """不指定解析器时使用默认解析器，返回的仍是 BeautifulSoup 对象。"""
+        soup = self.module.parse_html(PAGE_HTML)
+
+        self.assertIsInstance(soup, BeautifulSoup)
+        self.assertEqual(soup.builder.NAME, self.module.DEFAULT_HTML_PARSER)
+
+    def test_unknown_parser_raises_value_error(self):
+        """拼错的解析器名称直接报错，不会静默换成别的解析器。"""
+        with self.assertRaises(ValueError):
+            self.module.parse_html(PAGE_HTML, "html5")
+
+    def test_selectors_match_across_parsers(self):
+        """两种解析器下 CSS 选择器和文本提取结果一致。"""
+        results = {}
+        for parser in self.module.HTML_PARSERS:
+            soup = self.module.parse_html(PAGE_HTML, parser)
+            results[parser] = [
+                (a["href"], a.get_text(strip=True), row.select_one("td:nth-of-type(2)").get_text())
+                for row in soup.select("tr.row")
+                for a in row.select("a[href]")
+            ]
+
+        self.assertEqual(results["lxml"][0], ("/t/1/", "Movie & Title", "1 GB"))
+        self.assertEqual(results["lxml"], results["html.parser"])
+
+    def test_strainer_keeps_only_matching_subtrees(self):
+        """按单个类名过滤，多类名的节点也能匹配，匹配节点的子树完整保留，其余部分不建树。"""
+        markup = (
+            '<html><head><script>var a = 1;</script></head><body><div class="nav">菜单</div>'
+            '<div class="topic media topic-visited"><div class="title"><a href="1_11.html">帖子</a></div></div>'
+            '<div class="topicx">相似类名</div></body></html>'
+        )
+        strainer = self.module.build_strainer("div", "topic-visited")
+
+        for parser in self.module.HTML_PARSERS:
+            soup = self.module.parse_html(markup, parser, strainer)
+
+            self.assertEqual([a["href"] for a in soup.select("div.topic.media.topic-visited div.title a")], ["1_11.html"], parser)
+            self.assertIsNone(soup.find("script"), parser)
+            self.assertNotIn("菜单", soup.get_text(), parser)
+            self.assertNotIn("相似类名", soup.get_text(), parser)
+
+
+if __name__ == "__main__":
+    unittest.main()
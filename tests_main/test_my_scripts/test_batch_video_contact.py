@@ -0,0 +1,164 @@
+"""
+针对 ``my_scripts.batch_video_contact`` 的测试。
+
+用临时目录模拟影片库，假截图函数只写出截图文件，验证过期判断、清单续跑、失败跳过和旧截图恢复。
+"""
+
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import types
+import unittest
+import uuid
+from pathlib import Path
+from unittest.mock import patch
+
+MODULE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "batch_video_contact.py"
+
+
+def load_batch_video_contact():
+    """注入假的 ``video_tools`` 后按文件路径加载模块。"""
+    fake_video_tools = types.ModuleType("video_tools")
+    fake_video_tools.CONFIG = {}
+    fake_video_tools.VIDEO_EXTENSION_SET = {".mkv", ".mp4"}
+    fake_video_tools.generate_video_contact = lambda _video_path, **_kwargs: None
+    fake_video_tools.generate_video_contact_mtn = lambda _video_path: None
+
+    spec = importlib.util.spec_from_file_location(f"batch_video_contact_test_{uuid.uuid4().hex}", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    with patch.dict(sys.modules, {"video_tools": fake_video_tools}):
+        spec.loader.exec_module(module)
+    return module
+
+
+class TestBatchVideoContact(unittest.TestCase):
+    """验证批量截图流程。"""
+
+    def setUp(self):
+        self.module = load_batch_video_contact()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name) / "mirror"
+        self.manifest = str(Path(self.temp_dir.name) / "cache" / "manifest.jsonl")
+        self.rendered = []
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def make_video(self, relative: str, sheet_age: float | None = None) -> Path:
+        """创建视频文件；``sheet_age`` 不为空时创建截图，正数表示截图比视频新，负数表示更旧。"""
+        video = self.root / relative
+        video.parent.mkdir(parents=True, exist_ok=True)
+        video.write_bytes(b"video")
+        if sheet_age is not None:
+            sheet = video.with_name(f"{video.stem}_s.jpg")
+            sheet.write_text("old", encoding="utf-8")
+            video_mtime = video.stat().st_mtime
+            os.utime(sheet, (video_mtime + sheet_age, video_mtime + sheet_age))
+        return video
+
+    def fake_generate(self, video_path: str, *, frame_workers: int | None = None) -> None:
+        """名字中带 bad 的视频生成失败，其余写出截图。批量生成时不应再开启单张截图内的并行抽帧。"""
+        self.assertEqual(frame_workers, 0)
+        self.rendered.append(Path(video_path).name)
+        if "bad" in video_path:
+            raise RuntimeError("moov atom not found")
+        Path(self.module.get_contact_sheet_path(video_path)).write_text("new", encoding="utf-8")
+
+    def run_batch(self, **kwargs) -> dict:
+        """用假截图函数运行一次批量生成。"""
+        self.rendered = []
+        with patch.object(self.module, "generate_video_contact", side_effect=self.fake_generate), patch.object(self.module.logger, "warning"), patch.object(self.module.logger, "error"):
+            return self.module.batch_video_contact([str(self.root)], manifest_path=self.manifest, workers=2, **kwargs)
+
+    def test_default_workers_are_capped(self):
+        """未配置并发数时取 CPU 核数，但最多 4 个。"""
+        for cpu_count, expected in ((32, 4), (2, 2), (None, 1)):
+            with patch("os.cpu_count", return_value=cpu_count):
+                self.assertEqual(load_batch_video_contact().BATCH_CONTACT_WORKERS, expected)
+
+    def test_find_stale_videos_skips_fresh_sheets_and_other_files(self):
+        """只返回缺少截图或截图比视频旧的视频，非视频文件和截图本身不计入。"""
+        self.make_video("A/Movie A.mkv")
+        self.make_video("B/Movie B.MP4", sheet_age=10)
+        self.make_video("C/Movie C.mkv", sheet_age=-10)
+        (self.root / "A" / "Movie A.nfo").write_text("nfo", encoding="utf-8")
+
+        stale = [Path(path).name for path in self.module.find_stale_videos(str(self.root))]
+
+        self.assertEqual(stale, ["Movie A.mkv", "Movie C.mkv"])
+
+    def test_interrupted_run_resumes_and_skips_known_failures(self):
+        """再次运行时跳过已完成的视频和文件未变化的失败视频，视频变化或要求重试时重新处理。"""
+        self.make_video("A/Movie A.mkv")
+        bad = self.make_video("B/bad.mkv")
+
+        self.assertEqual(self.run_batch(), {"done": 1, "failed": 1, "skipped": 0})
+        self.assertEqual(sorted(self.rendered), ["Movie A.mkv", "bad.mkv"])
+        with open(self.manifest, encoding="utf-8") as f:
+            records = {Path(record["video"]).name: record for record in map(json.loads, f)}
+        self.assertEqual(records["Movie A.mkv"]["status"], "done")
+        self.assertEqual(records["bad.mkv"]["status"], "failed")
+        self.assertIn("moov atom", records["bad.mkv"]["error"])
+
+        self.assertEqual(self.run_batch(), {"done": 0, "failed": 0, "skipped": 1})
+        self.assertEqual(self.rendered, [])
+
+        self.assertEqual(self.run_batch(retry_failed=True)["failed"], 1)
+        self.assertEqual(self.rendered, ["bad.mkv"])
+
+        bad.write_bytes(b"video, downloaded again")
+        self.run_batch()
+        self.assertEqual(self.rendered, ["bad.mkv"])
+
+    def test_failed_regeneration_keeps_previous_sheet(self):
+        """过期截图重新生成失败时恢复旧截图，成功时替换并删除备份。"""
+        bad = self.make_video("B/bad.mkv", sheet_age=-10)
+        good = self.make_video("A/Movie A.mkv", sheet_age=-10)
+
+        self.run_batch()
+
+        self.assertEqual(bad.with_name("bad_s.jpg").read_text(encoding="utf-8"), "old")
+        self.assertEqual(good.with_name("Movie A_s.jpg").read_text(encoding="utf-8"), "new")
+        self.assertEqual(sorted(path.name for path in self.root.rglob("*.bak")), [])
+
+    def test_backup_left_by_interrupted_run_is_restored(self):
+        """上次在生成途中中断留下备份时，即使截图看起来是新的也重新生成；生成失败则恢复旧截图。"""
+        for name in ("Movie A", "bad"):
+            video = self.make_video(f"{name}/{name}.mkv", sheet_age=10)
+            sheet = video.with_name(f"{name}_s.jpg")
+            sheet.write_text("partial", encoding="utf-8")
+            Path(f"{sheet}.bak").write_text("old", encoding="utf-8")
+
+        self.assertEqual(self.run_batch(), {"done": 1, "failed": 1, "skipped": 0})
+
+        self.assertEqual((self.root / "Movie A" / "Movie A_s.jpg").read_text(encoding="utf-8"), "new")
+        self.assertEqual((self.root / "bad" / "bad_s.jpg").read_text(encoding="utf-8"), "old")
+        self.assertEqual(list(self.root.rglob("*.bak")), [])
+
+    def test_mtn_fallback_counts_as_done(self):
+        """主截图函数失败但 mtn 生成了截图时记为完成。"""
+        self.make_video("B/bad.mkv")
+
+        def fake_mtn(video_path):
+            Path(self.module.get_contact_sheet_path(video_path)).write_text("mtn", encoding="utf-8")
+
+        with patch.object(self.module, "generate_video_contact_mtn", side_effect=fake_mtn):
+            counts = self.run_batch()
+
+        self.assertEqual(counts, {"done": 1, "failed": 0, "skipped": 0})
+
+    def test_truncated_manifest_line_is_ignored(self):
+        """中断时写了一半的最后一行不影响读取其他记录。"""
+        Path(self.manifest).parent.mkdir(parents=True)
+        Path(self.manifest).write_text('{"video": "a.mkv", "status": "done"}\n{"video": "b.mk', encoding="utf-8")
+
+        with patch.object(self.module.logger, "warning"):
+            records = self.module.load_manifest(self.manifest)
+
+        self.assertEqual(list(records), [os.path.normcase("a.mkv")])
+
+
+if __name__ == "__main__":
+    unittest.main()
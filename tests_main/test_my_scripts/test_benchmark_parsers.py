@@ -0,0 +1,131 @@
+"""
+针对 ``my_scripts.benchmark_parsers`` 的测试。
+
+用假的站点模块和临时样本目录跑极小规模的基准，验证样本读取、测量结果、基线对比和退化判断，不关心具体耗时。
+"""
+
+import gzip
+import importlib.util
+import tempfile
+import types
+import unittest
+import uuid
+from pathlib import Path
+
+MODULE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "benchmark_parsers.py"
+
+
+def load_benchmark_parsers():
+    """按文件路径加载基准模块，站点模块由测试直接传入。"""
+    spec = importlib.util.spec_from_file_location(f"benchmark_parsers_test_{uuid.uuid4().hex}", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_fake_site_module() -> types.ModuleType:
+    """构造带两个解析函数的假站点模块。"""
+    module = types.ModuleType("scrapy_fake")
+    module.parse_fake_response = lambda response: response.text.split(",")
+    module.count_fake_lines = lambda lines: [line for line in lines if line]
+    return module
+
+
+class TestRunParserBenchmark(unittest.TestCase):
+    """验证逐页测量。"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.module = load_benchmark_parsers()
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.fixture_dir = Path(self.temp_dir.name)
+        self.modules = {"scrapy_fake": build_fake_site_module()}
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_each_fixture_page_is_measured(self):
+        """同一前缀的每个样本各测一次，压缩和未压缩的样本都能读取，参数按用例方式传入。"""
+        (self.fixture_dir / "fake_list_1.html").write_text("a,b,c", encoding="utf-8")
+        with gzip.open(self.fixture_dir / "fake_list_2.html.gz", "wt", encoding="utf-8") as f:
+            f.write("a,b")
+        (self.fixture_dir / "fake_text.txt").write_text("x\n\ny\n", encoding="utf-8")
+        cases = (
+            self.module.ParserCase("fake_list", "scrapy_fake", "parse_fake_response", "fake_list"),
+            self.module.ParserCase("fake_lines", "scrapy_fake", "count_fake_lines", "fake_text", "lines"),
+        )
+
+        results = self.module.run_parser_benchmark(cases, fixture_dir=self.fixture_dir, repeat=2, modules=self.modules)
+
+        self.assertEqual(
+            [(result["case"], result["page"], result["items"]) for result in results],
+            [
+                ("fake_list", "fake_list_1.html", 3),
+                ("fake_list", "fake_list_2.html.gz", 2),
+                ("fake_lines", "fake_text.txt", 2),
+            ],
+        )
+        for result in results:
+            self.assertGreaterEqual(result["median_ms"], result["min_ms"])
+            self.assertGreaterEqual(result["peak_kib"], 0)
+
+    def test_missing_or_unparsed_fixture_raises(self):
+        """缺少样本或样本上解析不出结果时直接报错。"""
+        cases = (self.module.ParserCase("fake_lines", "scrapy_fake", "count_fake_lines", "fake_text", "lines"),)
+
+        with self.assertRaises(FileNotFoundError):
+            self.module.run_parser_benchmark(cases, fixture_dir=self.fixture_dir, repeat=1, modules=self.modules)
+
+        (self.fixture_dir / "fake_text.txt").write_text("\n\n", encoding="utf-8")
+        with self.assertRaisesRegex(ValueError, "fake_text.txt"):
+            self.module.run_parser_benchmark(cases, fixture_dir=self.fixture_dir, repeat=1, modules=self.modules)
+
+    def test_default_cases_have_fixture_pages(self):
+        """内置用例在仓库样本目录里都有对应的样本页面。"""
+        for case in self.module.PARSER_CASES:
+            self.assertTrue(self.module.find_fixture_pages(self.module.FIXTURE_DIR, case.fixture), case.name)
+
+
+class TestFindRegressions(unittest.TestCase):
+    """验证基线对比。"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.module = load_benchmark_parsers()
+
+    def test_regressions_beyond_threshold_are_reported(self):
+        """耗时和内存峰值超过阈值时报告退化，微小的耗时抖动和基线外的页面不报告。"""
+        results = [
+            {"case": "slow", "page": "a.html", "median_ms": 13.0, "peak_kib": 100.0},
+            {"case": "jitter", "page": "a.html", "median_ms": 0.3, "peak_kib": 10.0},
+            {"case": "memory", "page": "a.html", "median_ms": 5.0, "peak_kib": 200.0},
+            {"case": "new", "page": "a.html", "median_ms": 99.0, "peak_kib": 999.0},
+        ]
+        baseline = {
+            "slow/a.html": {"median_ms": 10.0, "peak_kib": 100.0},
+            "jitter/a.html": {"median_ms": 0.1, "peak_kib": 10.0},
+            "memory/a.html": {"median_ms": 5.0, "peak_kib": 100.0},
+        }
+
+        regressions = self.module.find_regressions(results, baseline, threshold=0.25)
+
+        self.assertEqual(len(regressions), 2)
+        self.assertIn("slow/a.html 耗时", regressions[0])
+        self.assertIn("memory/a.html 内存峰值", regressions[1])
+
+    def test_saved_baseline_round_trips(self):
+        """保存的基线读回后与原结果对比没有退化。"""
+        results = [{"case": "sk_list", "page": "sk_list.html.gz", "items": 3, "median_ms": 1.5, "min_ms": 1.2, "peak_kib": 42.0}]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = str(Path(temp_dir) / "baseline.json")
+            self.module.save_baseline(path, results)
+            baseline = self.module.load_baseline(path)
+
+        self.assertEqual(baseline, {"sk_list/sk_list.html.gz": {"median_ms": 1.5, "peak_kib": 42.0}})
+        self.assertEqual(self.module.find_regressions(results, baseline, threshold=0.0), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+"""
+针对 ``my_scripts.benchmark_scrapy_redis`` 的测试。
+
+只跑极小规模的基准，验证合成 worker、命令计数和结果表格，不关心具体耗时。
+"""
+
+import copy
+import importlib.util
+import os
+import sys
+import tempfile
+import types
+import unittest
+import uuid
+from pathlib import Path
+from unittest.mock import patch
+
+try:
+    import fakeredis
+except ImportError:  # pragma: no cover - 由依赖安装状态决定
+    fakeredis = None
+
+MODULE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "benchmark_scrapy_redis.py"
+REDIS_HELPER_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "scrapy_redis.py"
+
+
+def load_benchmark_scrapy_redis():
+    """在隔离依赖环境中加载基准模块，``scrapy_redis`` 使用真实实现。"""
+    helper_config = {"redis_host": "127.0.0.1"}
+    fake_my_module = types.ModuleType("my_module")
+    fake_my_module.read_json_to_dict = lambda _path: copy.deepcopy(helper_config)
+
+    helper_spec = importlib.util.spec_from_file_location(
+        f"scrapy_redis_test_{uuid.uuid4().hex}",
+        REDIS_HELPER_PATH,
+    )
+    helper_module = importlib.util.module_from_spec(helper_spec)
+    with patch.dict(sys.modules, {"my_module": fake_my_module}):
+        helper_spec.loader.exec_module(helper_module)
+
+    spec = importlib.util.spec_from_file_location(
+        f"benchmark_scrapy_redis_test_{uuid.uuid4().hex}",
+        MODULE_PATH,
+    )
+    module = importlib.util.module_from_spec(spec)
+    with patch.dict(sys.modules, {"my_module": fake_my_module, "scrapy_redis": helper_module}):
+        spec.loader.exec_module(module)
+    module._scrapy_redis = helper_module
+    return module
+
+
+class TestSyntheticWorkload(unittest.TestCase):
+    """验证合成 worker 的分布配置。"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.module = load_benchmark_scrapy_redis()
+
+    def test_build_worker_rejects_unknown_distribution(self):
+        """未知的耗时分布应直接报错。"""
+        with self.assertRaisesRegex(ValueError, "pareto"):
+            self.module.SyntheticWorkload(distribution="pareto").build_worker()
+
+    def test_build_worker_fails_at_configured_rate(self):
+        """失败率为 1 时每次都抛出合成异常，为 0 时从不失败。"""
+        failing_worker = self.module.SyntheticWorkload(latency_ms=0, distribution="fixed", failure_rate=1).build_worker()
+        passing_worker = self.module.SyntheticWorkload(latency_ms=0, distribution="fixed").build_worker()
+
+        with self.assertRaises(self.module.SyntheticTaskError):
+            failing_worker({})
+        self.assertIsNone(passing_worker({}))
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis[lua] is not installed")
+class TestRunDrainBenchmark(unittest.TestCase):
+    """用 fakeredis 跑一轮极小的基准。"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.module = load_benchmark_scrapy_redis()
+
+    def test_run_drain_benchmark_reports_throughput_and_redis_usage(self):
+        """结果应覆盖全部任务，统计 Redis 往返和命令数，并清理基准键。"""
+        redis_client = self.module.get_benchmark_redis()
+
+        result = self.module.run_drain_benchmark(
+            redis_client,
+            item_count=40,
+            max_workers=4,
+            workload=self.module.SyntheticWorkload(latency_ms=1, failure_rate=0.25, seed=7),
+        )
+
+        self.assertEqual(result["processed"], 40)
+        self.assertGreater(result["failed"], 0)
+        self.assertEqual(result["push_round_trips"], 1)
+        self.assertGreater(result["redis_round_trips"], 0)
+        self.assertGreaterEqual(result["redis_commands"], result["redis_round_trips"])
+        self.assertGreater(result["tasks_per_second"], 0)
+        self.assertLessEqual(result["task_p50_ms"], result["task_p99_ms"])
+        self.assertEqual(redis_client.keys("benchmark:*"), [])
+
+    def test_run_drain_benchmark_never_publishes_queue_metrics(self):
+        """开启 ``metrics_enabled`` 时基准结果仍只在本地汇总，不写指标哈希和 .prom 文件。"""
+        redis_client = self.module.get_benchmark_redis()
+        scrapy_redis = self.module._scrapy_redis
+
+        with tempfile.TemporaryDirectory() as metrics_dir, \
+                patch.object(scrapy_redis, "METRICS_ENABLED", True), patch.object(scrapy_redis, "METRICS_DIR", metrics_dir):
+            result = self.module.run_drain_benchmark(
+                redis_client,
+                item_count=10,
+                max_workers=2,
+                workload=self.module.SyntheticWorkload(latency_ms=0, distribution="fixed"),
+            )
+
+            self.assertEqual(os.listdir(metrics_dir), [])
+        self.assertEqual(result["processed"], 10)
+        self.assertEqual(redis_client.keys(f"{scrapy_redis.METRICS_KEY_PREFIX}:*"), [])
+
+    def test_format_benchmark_table_aligns_columns(self):
+        """表格每行宽度一致，首行为列名。"""
+        redis_client = self.module.get_benchmark_redis()
+        results = [
+            self.module.run_drain_benchmark(
+                redis_client,
+                item_count=10,
+                max_workers=max_workers,
+                workload=self.module.SyntheticWorkload(latency_ms=0, distribution="fixed"),
+            )
+            for max_workers in (1, 2)
+        ]
+
+        lines = self.module.format_benchmark_table(results)
+
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].strip().startswith("max_workers"))
+        self.assertEqual(len({len(line) for line in lines}), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,7 @@
 
 import importlib.util
 import sys
+import tempfile
 import types
 import unittest
 import uuid
@@ -13,6 +14,7 @@ from unittest.mock import Mock, patch
 import requests
 
 MODULE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "gd_downloader.py"
+HTTP_SESSION_PATH = Path(__file__).resolve().parents[2] / "my_module" / "module_use" / "build_http_session.py"
 
 
 class FakeSession:
@@ -29,6 +31,40 @@ class FakeSession:
         raise AssertionError("session.get should be patched in tests")
 
 
+class FakeStreamResponse:
+    """最小流式响应，``fail_after`` 字节后模拟连接中断。"""
+
+    def __init__(self, status_code: int, body: bytes, headers: dict | None = None, fail_after: int | None = None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+        self.url = "https://drive.usercontent.google.com/download?id=file123&confirm=t"
+        self.fail_after = fail_after
+        self.closed = False
+
+    @property
+    def text(self) -> str:
+        return self.body.decode("utf-8")
+
+    def iter_content(self, chunk_size: int = 1):
+        sent = 0
+        for start in range(0, len(self.body), 4):
+            if self.fail_after is not None and sent >= self.fail_after:
+                raise requests.ConnectionError("connection reset")
+            chunk = self.body[start:start + 4]
+            sent += len(chunk)
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        self.close()
+
+
 def fake_retry(*args, **kwargs):
     """最小 retry 装饰器实现，支持按最大次数重试。"""
     max_attempts = kwargs.get("stop_max_attempt_number", 1)
@@ -52,12 +88,24 @@ def load_scrapy_gd_downloader():
     """在隔离环境中加载 ``scrapy_gd_downloader`` 模块。"""
     fake_retrying = types.ModuleType("retrying")
     fake_retrying.retry = fake_retry
+
+    http_session_spec = importlib.util.spec_from_file_location(
+        f"build_http_session_test_{uuid.uuid4().hex}",
+        HTTP_SESSION_PATH,
+    )
+    http_session_module = importlib.util.module_from_spec(http_session_spec)
+    http_session_spec.loader.exec_module(http_session_module)
+    fake_my_module = types.ModuleType("my_module")
+    fake_my_module.build_http_session = http_session_module.build_http_session
+
     spec = importlib.util.spec_from_file_location(
         f"scrapy_gd_downloader_test_{uuid.uuid4().hex}",
         MODULE_PATH,
     )
     module = importlib.util.module_from_spec(spec)
-    with patch.dict(sys.modules, {"retrying": fake_retrying}), patch.object(requests, "Session", FakeSession):
+    with patch.dict(sys.modules, {"retrying": fake_retrying, "my_module": fake_my_module}), patch.object(
+        requests, "Session", FakeSession
+    ):
         spec.loader.exec_module(module)
 
     return module
@@ -148,5 +196,197 @@ class TestDownloadGdUrl(unittest.TestCase):
         self.assertEqual(result.suggested_suffix, ".nzb")
 
 
+class TestStreamGdUrl(unittest.TestCase):
+    """验证流式下载和断点续传。"""
+
+    VIEW_HTML = (
+        '<meta itemprop="name" content="Movie.nzb">'
+        'https://drive.usercontent.google.com/uc?id=file123&export=download'
+    )
+    BODY = b'<?xml version="1.0"?><nzb>' + b"x" * 40 + b"</nzb>"
+
+    def setUp(self):
+        self.module = load_scrapy_gd_downloader()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.part_path = Path(self.temp_dir.name) / "Movie.part.download"
+        self.view_response = Mock(status_code=200, text=self.VIEW_HTML, headers={"Content-Type": "text/html"})
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def run_stream(self, responses: list):
+        """按顺序返回查看页和各次下载响应，返回结果和每次请求的请求头。"""
+        with patch.object(self.module.session, "get", side_effect=[self.view_response, *responses]) as mock_get, \
+                patch.object(self.module.time, "sleep"):
+            result = self.module.stream_gd_url("https://drive.google.com/file/d/file123/view?usp=sharing", self.part_path)
+        return result, [call.kwargs["headers"] for call in mock_get.call_args_list[1:]]
+
+    def test_stream_writes_part_file_and_sniffs_suffix(self):
+        """内容直接写入 .part 文件，后缀只根据文件开头判断。"""
+        response = FakeStreamResponse(200, self.BODY, {"Content-Type": "application/octet-stream", "Content-Length": str(len(self.BODY))})
+
+        result, _headers = self.run_stream([response])
+
+        self.assertEqual(self.part_path.read_bytes(), self.BODY)
+        self.assertEqual(result.size, len(self.BODY))
+        self.assertEqual(result.suggested_suffix, ".nzb")
+        self.assertTrue(response.closed)
+
+    def test_interrupted_stream_resumes_with_range(self):
+        """传输中断后按已写入的字节数发 Range 请求，追加剩余内容。"""
+        total = len(self.BODY)
+        first = FakeStreamResponse(200, self.BODY, {"Content-Type": "application/octet-stream", "Content-Length": str(total)}, fail_after=20)
+        rest = FakeStreamResponse(206, self.BODY[20:], {"Content-Range": f"bytes 20-{total - 1}/{total}"})
+
+        result, headers = self.run_stream([first, rest])
+
+        self.assertEqual(self.part_path.read_bytes(), self.BODY)
+        self.assertEqual(result.size, total)
+        self.assertNotIn("Range", headers[0])
+        self.assertEqual(headers[1]["Range"], "bytes=20-")
+
+    def test_existing_part_file_is_resumed(self):
+        """上次留下的 .part 文件从末尾续传；服务器不支持续传时从头重写。"""
+        self.part_path.write_bytes(self.BODY[:10])
+        total = len(self.BODY)
+        ignored_range = FakeStreamResponse(200, self.BODY, {"Content-Type": "application/octet-stream", "Content-Length": str(total)})
+
+        _result, headers = self.run_stream([ignored_range])
+
+        self.assertEqual(headers[0]["Range"], "bytes=10-")
+        self.assertEqual(self.part_path.read_bytes(), self.BODY)
+
+    def test_warning_page_is_confirmed_before_streaming(self):
+        """大文件告警页提交确认表单后再流式下载，并使用告警页中的文件名。"""
+        warning = FakeStreamResponse(
+            200,
+            (
+                "Virus scan warning"
+                '<span class="uc-name-size"><a href="/x">Big.rar</a></span>'
+                '<form id="download-form" action="https://drive.usercontent.google.com/download">'
+                '<input type="hidden" name="id" value="file123">'
+                '<input type="hidden" name="confirm" value="t">'
+                "</form>"
+            ).encode("utf-8"),
+            {"Content-Type": "text/html; charset=utf-8"},
+        )
+        payload = FakeStreamResponse(200, b"Rar!" + b"\x00" * 20, {"Content-Type": "application/octet-stream"})
+
+        result, _headers = self.run_stream([warning, payload])
+
+        self.assertEqual(result.drive_name, "Big.rar")
+        self.assertEqual(result.suggested_suffix, ".rar")
+        self.assertTrue(warning.closed)
+
+    def test_size_mismatch_raises(self):
+        """实际大小与响应头声明不一致时报错，不把残缺文件当成完成。"""
+        response = FakeStreamResponse(200, self.BODY, {"Content-Type": "application/octet-stream", "Content-Length": "999"})
+
+        with self.assertRaisesRegex(RuntimeError, "下载大小不符"):
+            self.run_stream([response])
+
+
+class TestSegmentedDownload(unittest.TestCase):
+    """验证分段并发下载。"""
+
+    BODY = b'<?xml version="1.0"?><nzb>' + bytes(range(256)) * 4 + b"</nzb>"
+
+    def setUp(self):
+        self.module = load_scrapy_gd_downloader()
+        self.module.SEGMENT_MIN_SIZE = 100
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.part_path = Path(self.temp_dir.name) / "Movie.part.download"
+        self.ranges = []
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def fake_get(self, url: str, supports_range: bool = True, **kwargs):
+        """查看页返回 HTML，下载请求按 Range 头返回对应区间。"""
+        if "/file/d/" in url:
+            return Mock(
+                status_code=200,
+                text='https://drive.usercontent.google.com/uc?id=file123&export=download',
+                headers={"Content-Type": "text/html"},
+            )
+        total = len(self.BODY)
+        range_header = kwargs["headers"].get("Range")
+        if not range_header or not supports_range:
+            return FakeStreamResponse(200, self.BODY, {"Content-Type": "application/octet-stream", "Content-Length": str(total)})
+        start, end = (int(value) for value in range_header[len("bytes="):].split("-"))
+        self.ranges.append((start, end))
+        return FakeStreamResponse(206, self.BODY[start:end + 1], {"Content-Range": f"bytes {start}-{end}/{total}"})
+
+    def test_split_byte_ranges_covers_file_without_gaps(self):
+        """区间首尾相接覆盖整个文件，段数受最小段大小限制。"""
+        ranges = self.module.split_byte_ranges(1050, 4)
+
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], 1049)
+        self.assertTrue(all(prev[1] + 1 == cur[0] for prev, cur in zip(ranges, ranges[1:])))
+        self.assertEqual(len(self.module.split_byte_ranges(250, 8)), 2)
+
+    def test_segments_are_fetched_concurrently_and_reassembled(self):
+        """各段写回原位置，拼出的文件与原文件一致。"""
+        with patch.object(self.module.session, "get", side_effect=self.fake_get):
+            result = self.module.stream_gd_url("https://drive.google.com/file/d/file123/view", self.part_path, segments=4)
+
+        self.assertEqual(len(self.ranges), 4)
+        self.assertEqual(self.part_path.read_bytes(), self.BODY)
+        self.assertEqual(result.size, len(self.BODY))
+        self.assertEqual(result.suggested_suffix, ".nzb")
+
+    def test_falls_back_to_single_stream_when_ranges_are_refused(self):
+        """服务器对 Range 返回 200 时退回单连接，结果仍然完整。"""
+        with patch.object(
+                self.module.session,
+                "get",
+                side_effect=lambda url, **kwargs: self.fake_get(url, supports_range=False, **kwargs),
+        ):
+            result = self.module.stream_gd_url("https://drive.google.com/file/d/file123/view", self.part_path, segments=4)
+
+        self.assertEqual(self.part_path.read_bytes(), self.BODY)
+        self.assertEqual(result.size, len(self.BODY))
+
+    def test_failed_segment_removes_part_file(self):
+        """分段失败后删除预分配的临时文件，也不会留下 ``.part`` 文件。"""
+
+        def broken_get(url: str, **kwargs):
+            if kwargs["headers"].get("Range", "").startswith("bytes=0-"):
+                return FakeStreamResponse(500, b"")
+            return self.fake_get(url, **kwargs)
+
+        with patch.object(self.module.session, "get", side_effect=broken_get):
+            with self.assertRaises(RuntimeError):
+                self.module.stream_gd_url("https://drive.google.com/file/d/file123/view", self.part_path, segments=4)
+
+        self.assertFalse(self.part_path.exists())
+        self.assertFalse(self.module.get_segment_path(self.part_path).exists())
+
+    def test_interrupted_segments_never_become_a_resumable_part_file(self):
+        """分段下载中断时不产生 ``.part`` 文件；下次运行覆盖残留的临时文件重新分段下载。"""
+        segment_path = self.module.get_segment_path(self.part_path)
+
+        def interrupted_get(url: str, **kwargs):
+            if kwargs["headers"].get("Range", "").startswith("bytes=0-"):
+                self.assertFalse(self.part_path.exists())
+                raise KeyboardInterrupt
+            return self.fake_get(url, **kwargs)
+
+        with patch.object(self.module.session, "get", side_effect=interrupted_get):
+            with self.assertRaises(KeyboardInterrupt):
+                self.module.stream_gd_url("https://drive.google.com/file/d/file123/view", self.part_path, segments=4)
+        self.assertFalse(self.part_path.exists())
+
+        # 进程被强制结束时临时文件会留下，模拟一个全是空洞的残留文件
+        segment_path.write_bytes(b"\0" * len(self.BODY))
+        with patch.object(self.module.session, "get", side_effect=self.fake_get):
+            result = self.module.stream_gd_url("https://drive.google.com/file/d/file123/view", self.part_path, segments=4)
+
+        self.assertEqual(self.part_path.read_bytes(), self.BODY)
+        self.assertEqual(result.size, len(self.BODY))
+        self.assertFalse(segment_path.exists())
+
+
 if __name__ == "__main__":
     unittest.main()
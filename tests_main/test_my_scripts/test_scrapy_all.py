@@ -0,0 +1,144 @@
+"""
+针对 ``my_scripts.scrapy_all`` 的测试。
+
+站点入口用内存函数代替，验证并发运行、失败隔离和全局预算在各站点线程内生效。
+"""
+
+import copy
+import importlib.util
+import sys
+import threading
+import types
+import unittest
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+MODULE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "scrapy_all.py"
+REDIS_HELPER_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "scrapy_redis.py"
+
+
+def load_scrapy_all():
+    """在隔离依赖环境中加载多站点运行器，``scrapy_redis`` 使用真实实现。"""
+    helper_config = {"redis_host": "127.0.0.1"}
+    fake_my_module = types.ModuleType("my_module")
+    fake_my_module.read_json_to_dict = lambda _path: copy.deepcopy(helper_config)
+
+    helper_spec = importlib.util.spec_from_file_location(
+        f"scrapy_redis_test_{uuid.uuid4().hex}",
+        REDIS_HELPER_PATH,
+    )
+    helper_module = importlib.util.module_from_spec(helper_spec)
+    with patch.dict(sys.modules, {"my_module": fake_my_module}):
+        helper_spec.loader.exec_module(helper_module)
+
+    spec = importlib.util.spec_from_file_location(
+        f"scrapy_all_test_{uuid.uuid4().hex}",
+        MODULE_PATH,
+    )
+    module = importlib.util.module_from_spec(spec)
+    with patch.dict(sys.modules, {"my_module": fake_my_module, "scrapy_redis": helper_module}):
+        spec.loader.exec_module(module)
+    return module, helper_module
+
+
+class TestRunSitesConcurrently(unittest.TestCase):
+    """验证多站点并发运行。"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.module, cls.helper_module = load_scrapy_all()
+
+    def test_sites_run_in_parallel(self):
+        """所有站点同时处于运行中，说明没有串行执行。"""
+        barrier = threading.Barrier(3, timeout=5)
+        jobs = [self.module.SiteJob(name, barrier.wait) for name in ("A", "B", "C")]
+
+        results = self.module.run_sites_concurrently(jobs, total_workers=4, report_seconds=1)
+
+        self.assertEqual(sorted(result["name"] for result in results), ["A", "B", "C"])
+        self.assertTrue(all(result["status"] == "success" for result in results))
+
+    def test_failed_site_does_not_stop_others(self):
+        """单个站点抛出异常时记录为失败，其他站点照常完成。"""
+        finished = []
+
+        def broken() -> None:
+            raise RuntimeError("cookie expired")
+
+        jobs = [
+            self.module.SiteJob("BAD", broken),
+            self.module.SiteJob("GOOD", lambda: finished.append("GOOD")),
+        ]
+
+        results = {result["name"]: result for result in self.module.run_sites_concurrently(jobs, report_seconds=1)}
+
+        self.assertEqual(results["BAD"]["status"], "failed")
+        self.assertIn("cookie expired", results["BAD"]["error"])
+        self.assertEqual(results["GOOD"]["status"], "success")
+        self.assertEqual(finished, ["GOOD"])
+
+    def test_site_calling_sys_exit_is_recorded_as_aborted(self):
+        """站点调用 ``sys.exit`` 时记为中止，不会结束整个批量运行。"""
+        def blocked() -> None:
+            sys.exit("被墙了 403")
+
+        jobs = [
+            self.module.SiteJob("RLS", blocked),
+            self.module.SiteJob("GOOD", lambda: None),
+        ]
+
+        results = {result["name"]: result for result in self.module.run_sites_concurrently(jobs, report_seconds=1)}
+
+        self.assertEqual(results["RLS"]["status"], "aborted")
+        self.assertIn("403", results["RLS"]["error"])
+        self.assertEqual(results["GOOD"]["status"], "success")
+
+    def test_own_thread_pool_joins_budget_through_apply_worker_budget(self):
+        """不走队列的站点用 ``apply_worker_budget`` 包装自己的线程池，并发收紧到站点上限，返回值照常传出。"""
+        collected = {}
+
+        def own_pool_site() -> None:
+            worker, max_workers = self.helper_module.apply_worker_budget(lambda item: item * 2, 32)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                collected["max_workers"] = max_workers
+                collected["results"] = sorted(executor.map(worker, range(5)))
+
+        results = self.module.run_sites_concurrently(
+            [self.module.SiteJob("BDS", own_pool_site, max_workers=3)], total_workers=10, report_seconds=1
+        )
+
+        self.assertEqual(results[0]["status"], "success")
+        self.assertEqual(collected, {"max_workers": 3, "results": [0, 2, 4, 6, 8]})
+        self.assertEqual(self.helper_module.apply_worker_budget(len, 7), (len, 7))
+
+    def test_site_job_runs_inside_its_budget(self):
+        """站点入口内可以取到带站点上限的预算，``drain_queue`` 据此收紧并发。"""
+        seen = {}
+
+        def probe(name: str) -> None:
+            seen[name] = self.helper_module._CURRENT_BUDGET.get().get_max_workers(32)
+
+        jobs = [
+            self.module.SiteJob("A", lambda: probe("A"), max_workers=4),
+            self.module.SiteJob("B", lambda: probe("B")),
+        ]
+
+        self.module.run_sites_concurrently(jobs, total_workers=10, report_seconds=1)
+
+        self.assertEqual(seen, {"A": 4, "B": 10})
+
+    def test_format_budget_progress_lists_sites(self):
+        """进度行包含占用并发和各站点计数。"""
+        budget = self.helper_module.WorkerBudget(5)
+        budget.acquire("A")
+
+        line = self.module.format_budget_progress(budget, ["A"])
+
+        self.assertIn("占用并发 1/5", line)
+        self.assertIn("A 执行中 1 / 已完成 0", line)
+
+
+if __name__ == "__main__":
+    unittest.main()
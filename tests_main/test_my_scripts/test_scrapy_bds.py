@@ -28,6 +28,7 @@ except ImportError:  # pragma: no cover - 由依赖安装状态决定
     fakeredis = None
 
 MODULE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "scrapy_bds.py"
+HTTP_SESSION_PATH = Path(__file__).resolve().parents[2] / "my_module" / "module_use" / "build_http_session.py"
 
 
 class FakeRetry:
@@ -162,6 +163,13 @@ def load_scrapy_bds(config: dict | None = None):
     Path(module_config["output_dir"]).mkdir(parents=True, exist_ok=True)
 
     fake_my_module = types.ModuleType("my_module")
+    http_session_spec = importlib.util.spec_from_file_location(
+        f"build_http_session_test_{uuid.uuid4().hex}",
+        HTTP_SESSION_PATH,
+    )
+    http_session_module = importlib.util.module_from_spec(http_session_spec)
+    http_session_spec.loader.exec_module(http_session_module)
+    fake_my_module.build_http_session = http_session_module.build_http_session
     fake_my_module.read_json_to_dict = lambda _path: copy.deepcopy(module_config)
     fake_my_module.sanitize_filename = lambda filename: filename
     fake_my_module.update_json_config = lambda _file_path, _key, _value: None
@@ -172,6 +180,7 @@ def load_scrapy_bds(config: dict | None = None):
     fake_redis_client = FakeRedis()
     fake_scrapy_redis = types.ModuleType("scrapy_redis")
     fake_scrapy_redis.get_redis_client = lambda: fake_redis_client
+    fake_scrapy_redis.apply_worker_budget = lambda worker, max_workers: (worker, max_workers)
 
     spec = importlib.util.spec_from_file_location(
         f"scrapy_bds_test_{uuid.uuid4().hex}",
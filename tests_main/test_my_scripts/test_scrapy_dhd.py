@@ -9,6 +9,7 @@
 """
 
 import copy
+import gzip
 import importlib.util
 import sys
 import tempfile
@@ -27,6 +28,9 @@ except ImportError:  # pragma: no cover - 由依赖安装状态决定
 requests.packages.urllib3.disable_warnings()
 
 MODULE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "scrapy_dhd.py"
+FIXTURE_DIR = Path(__file__).resolve().parents[2] / "tests_main" / "fixtures" / "parsers"
+HTTP_SESSION_PATH = Path(__file__).resolve().parents[2] / "my_module" / "module_use" / "build_http_session.py"
+PARSE_HTML_PATH = Path(__file__).resolve().parents[2] / "my_module" / "module_use" / "parse_html.py"
 REDIS_HELPER_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "scrapy_redis.py"
 
 
@@ -63,6 +67,21 @@ def load_scrapy_dhd(config: dict | None = None):
                 helper_config[key] = config[key]
 
     fake_my_module = types.ModuleType("my_module")
+    http_session_spec = importlib.util.spec_from_file_location(
+        f"build_http_session_test_{uuid.uuid4().hex}",
+        HTTP_SESSION_PATH,
+    )
+    http_session_module = importlib.util.module_from_spec(http_session_spec)
+    http_session_spec.loader.exec_module(http_session_module)
+    fake_my_module.build_http_session = http_session_module.build_http_session
+    parse_html_spec = importlib.util.spec_from_file_location(
+        f"parse_html_test_{uuid.uuid4().hex}",
+        PARSE_HTML_PATH,
+    )
+    parse_html_module = importlib.util.module_from_spec(parse_html_spec)
+    parse_html_spec.loader.exec_module(parse_html_module)
+    fake_my_module.parse_html = parse_html_module.parse_html
+    fake_my_module.build_strainer = parse_html_module.build_strainer
 
     def fake_read_json_to_dict(path: str):
         if path == "config/scrapy_redis.json":
@@ -308,7 +327,7 @@ class TestGetDhdResponse(unittest.TestCase):
         """请求成功时应返回按 GBK 解码后的文本。"""
         response = Mock(status_code=200, text="页面内容")
 
-        with patch.object(self.module.requests, "get", return_value=response) as mock_get:
+        with patch.object(self.module.session, "get", return_value=response) as mock_get:
             result = self.module.get_dhd_response("https://example.com/topic/1")
 
         self.assertEqual(result, "页面内容")
@@ -324,7 +343,7 @@ class TestGetDhdResponse(unittest.TestCase):
         """状态码持续异常时，应按重试次数耗尽后抛错。"""
         bad_response = Mock(status_code=503, text="")
 
-        with patch.object(self.module.requests, "get", return_value=bad_response) as mock_get:
+        with patch.object(self.module.session, "get", return_value=bad_response) as mock_get:
             with self.assertRaisesRegex(Exception, "请求失败，状态码：503"):
                 self.module.get_dhd_response("https://example.com/topic/1")
 
@@ -340,6 +359,41 @@ class TestParseDhdResponse(unittest.TestCase):
     def tearDown(self):
         self.temp_dir.cleanup()
 
+    def test_parse_dhd_response_parses_full_benchmark_page(self):
+        """基准测试用的整页样本应能完整解析，样本和解析函数保持同步。"""
+        with gzip.open(FIXTURE_DIR / "dhd_list.html.gz", "rt", encoding="utf-8") as f:
+            page = f.read()
+
+        result = self.module.parse_dhd_response(page)
+
+        self.assertEqual(len(result), 50)
+        self.assertTrue(all(item["url"].endswith("_11.html") for item in result))
+
+    def test_parse_dhd_response_partial_parse_matches_full_page(self):
+        """只解析目标容器和整页解析的结果一致。"""
+        with gzip.open(FIXTURE_DIR / "dhd_list.html.gz", "rt", encoding="utf-8") as f:
+            page = f.read()
+
+        partial = self.module.parse_dhd_response(page)
+        with patch.object(self.module, "DHD_LIST_STRAINER", None):
+            full = self.module.parse_dhd_response(page)
+
+        self.assertEqual(partial, full)
+
+    def test_parse_dhd_response_matches_across_html_parsers(self):
+        """lxml 和 html.parser 解析同一页面，结果应一致。"""
+        html = build_page_html(
+            build_topic_html(topic_id="123", title="电影标题"),
+            build_topic_html(topic_id="456", title="Movie & Title"),
+        )
+        results = {}
+        for parser in ("lxml", "html.parser"):
+            with patch.object(self.module, "HTML_PARSER", parser):
+                results[parser] = self.module.parse_dhd_response(html)
+
+        self.assertTrue(results["lxml"])
+        self.assertEqual(results["lxml"], results["html.parser"])
+
     def test_parse_dhd_response_returns_structured_items(self):
         """结构完整的帖子块应被解析成名称、链接和 ID。"""
         html = build_page_html(build_topic_html(topic_id="123", title="电影标题"))
@@ -562,6 +616,19 @@ class TestWorkingDhd(unittest.TestCase):
             "https://example.com/topic/123\nhttps://example.com/download.php?id=123",
         )
 
+    def test_working_dhd_uses_single_attempt_request_when_retry_in_queue(self):
+        """开启队列重试后，详情页请求失败应直接抛出交给队列重试。"""
+        info = {"name": "Title", "url": "https://example.com/topic/123"}
+
+        with patch.object(self.module, "RETRY_IN_QUEUE", True), patch.object(
+            self.module, "request_dhd_page", side_effect=RuntimeError("boom")
+        ) as mock_request, patch.object(self.module, "get_dhd_response") as mock_get:
+            with self.assertRaisesRegex(RuntimeError, "boom"):
+                self.module.working_dhd(info)
+
+        mock_request.assert_called_once_with("https://example.com/topic/123")
+        mock_get.assert_not_called()
+
 
 class TestScrapyDhd(unittest.TestCase):
     """验证 Redis 两阶段抓取流程的编排逻辑。"""
@@ -6,6 +6,7 @@
 """
 
 import copy
+import gzip
 import importlib.util
 import json
 import sys
@@ -23,6 +24,10 @@ except ImportError:  # pragma: no cover - 由依赖安装状态决定
     fakeredis = None
 
 MODULE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "scrapy_hde.py"
+FIXTURE_DIR = Path(__file__).resolve().parents[2] / "tests_main" / "fixtures" / "parsers"
+HTTP_SESSION_PATH = Path(__file__).resolve().parents[2] / "my_module" / "module_use" / "build_http_session.py"
+PARSE_HTML_PATH = Path(__file__).resolve().parents[2] / "my_module" / "module_use" / "parse_html.py"
+SITE_ENGINE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "scrapy_site.py"
 
 
 class _FallbackFakeRedis:
@@ -101,6 +106,7 @@ def fake_push_items_to_queue(
         pending_key: str,
         unique_value,
         serializer,
+        bloom=None,
 ) -> int:
     """最小入队实现，使用 set 去重后写入列表。"""
     enqueued_count = 0
@@ -129,6 +135,21 @@ def load_scrapy_hde(config: dict | None = None):
         module_config.update(config)
 
     fake_my_module = types.ModuleType("my_module")
+    http_session_spec = importlib.util.spec_from_file_location(
+        f"build_http_session_test_{uuid.uuid4().hex}",
+        HTTP_SESSION_PATH,
+    )
+    http_session_module = importlib.util.module_from_spec(http_session_spec)
+    http_session_spec.loader.exec_module(http_session_module)
+    fake_my_module.build_http_session = http_session_module.build_http_session
+    parse_html_spec = importlib.util.spec_from_file_location(
+        f"parse_html_test_{uuid.uuid4().hex}",
+        PARSE_HTML_PATH,
+    )
+    parse_html_module = importlib.util.module_from_spec(parse_html_spec)
+    parse_html_spec.loader.exec_module(parse_html_module)
+    fake_my_module.parse_html = parse_html_module.parse_html
+    fake_my_module.build_strainer = parse_html_module.build_strainer
     fake_my_module.read_json_to_dict = lambda _path: copy.deepcopy(module_config)
     fake_my_module.normalize_release_title_for_filename = lambda title: title.replace("/", "｜")
     fake_my_module.sanitize_filename = lambda name: name.replace(":", "_")
@@ -164,9 +185,57 @@ def load_scrapy_hde(config: dict | None = None):
     fake_scrapy_redis.serialize_payload = fake_serialize_payload
     fake_scrapy_redis.deserialize_payload = fake_deserialize_payload
     fake_scrapy_redis.push_items_to_queue = fake_push_items_to_queue
+    fake_scrapy_redis.build_page_fingerprint = lambda values, headers=None: "ids:" + ",".join(sorted(values))
+    fake_scrapy_redis.is_page_processed = (
+        lambda redis_client, key, page, fingerprint: redis_client.hget(key, str(page)) == fingerprint
+    )
+    fake_scrapy_redis.stage_page_fingerprint = (
+        lambda redis_client, key, page, fingerprint: redis_client.hset(f"{key}:next", str(page), fingerprint)
+    )
+
+    def fake_commit_page_fingerprints(redis_client, key):
+        staged = redis_client.hgetall(f"{key}:next")
+        if staged:
+            redis_client.hset(key, mapping=staged)
+        redis_client.delete(f"{key}:next")
+        return len(staged)
+
+    fake_scrapy_redis.commit_page_fingerprints = fake_commit_page_fingerprints
+    fake_scrapy_redis.build_seen_bloom = lambda _config: None
     fake_scrapy_redis.get_redis_client = lambda: FakeRedis()
+    def fake_move_processing_to_pending(redis_client, *, processing_key, pending_key):
+        moved_count = 0
+        while redis_client.rpoplpush(processing_key, pending_key):
+            moved_count += 1
+        return moved_count
+
+    fake_scrapy_redis.move_processing_to_pending = fake_move_processing_to_pending
     fake_scrapy_redis.drain_queue = lambda *args, **kwargs: {"processed": 0, "success": 0, "failed": 0}
 
+    def fake_prefetch_pages(fetch_page, start_page, prefetch=1):
+        page = start_page
+        while True:
+            yield page, fetch_page(page)
+            page += 1
+
+    def fake_run_scan_and_drain(scan, drain, *, overlap=False):
+        scan()
+        return drain()
+
+    fake_scrapy_redis.prefetch_pages = fake_prefetch_pages
+    fake_scrapy_redis.run_scan_and_drain = fake_run_scan_and_drain
+    fake_scrapy_redis.AdaptiveConcurrencyLimiter = type("AdaptiveConcurrencyLimiter", (), {})
+    fake_scrapy_redis.BloomFilter = type("BloomFilter", (), {})
+    fake_scrapy_redis.RetryPolicy = type("RetryPolicy", (), {})
+
+    site_spec = importlib.util.spec_from_file_location(
+        f"scrapy_site_test_{uuid.uuid4().hex}",
+        SITE_ENGINE_PATH,
+    )
+    site_module = importlib.util.module_from_spec(site_spec)
+    with patch.dict(sys.modules, {"scrapy_redis": fake_scrapy_redis}):
+        site_spec.loader.exec_module(site_module)
+
     fake_redis = types.ModuleType("redis")
     fake_redis.Redis = FakeRedis
 
@@ -181,6 +250,7 @@ def load_scrapy_hde(config: dict | None = None):
             "my_module": fake_my_module,
             "retrying": fake_retrying,
             "scrapy_redis": fake_scrapy_redis,
+            "scrapy_site": site_module,
             "redis": fake_redis,
             "sort_movie_ops": fake_sort_movie_ops,
         },
@@ -454,6 +524,43 @@ class TestParseHdeResponse(unittest.TestCase):
     def tearDown(self):
         self.temp_dir.cleanup()
 
+    def test_parse_hde_response_parses_full_benchmark_page(self):
+        """基准测试用的整页样本应能完整解析，样本和解析函数保持同步。"""
+        with gzip.open(FIXTURE_DIR / "hde_list.html.gz", "rt", encoding="utf-8") as f:
+            page = f.read()
+
+        result = self.module.parse_hde_response(Mock(text=page))
+
+        self.assertEqual(len(result), 40)
+        self.assertTrue(all(item["size"].endswith("B") for item in result))
+
+    def test_parse_hde_response_partial_parse_matches_full_page(self):
+        """只解析目标容器和整页解析的结果一致。"""
+        with gzip.open(FIXTURE_DIR / "hde_list.html.gz", "rt", encoding="utf-8") as f:
+            page = f.read()
+
+        partial = self.module.parse_hde_response(Mock(text=page))
+        with patch.object(self.module, "HDE_LIST_STRAINER", None):
+            full = self.module.parse_hde_response(Mock(text=page))
+
+        self.assertEqual(partial, full)
+
+    def test_parse_hde_response_matches_across_html_parsers(self):
+        """lxml 和 html.parser 解析同一页面，结果应一致。"""
+        response = Mock(
+            text=build_list_page(
+                build_fit_item(title="Movie Title – 1.2 GB", href="https://example.com/post-1"),
+                build_fit_item(title="Other Movie – 700 MB", href="https://example.com/post-2"),
+            )
+        )
+        results = {}
+        for parser in ("lxml", "html.parser"):
+            with patch.object(self.module, "HTML_PARSER", parser):
+                results[parser] = self.module.parse_hde_response(response)
+
+        self.assertTrue(results["lxml"])
+        self.assertEqual(results["lxml"], results["html.parser"])
+
     def test_parse_hde_response_extracts_title_and_url(self):
         """应从列表页提取标题、链接和体积。"""
         response = Mock(
@@ -589,7 +696,7 @@ class TestVisitHdeUrl(unittest.TestCase):
             self.module.visit_hde_url(result_item)
 
         self.assertEqual(result_item["imdb"], "tt1234567")
-        mock_session.assert_called_once_with()
+        mock_session.assert_called_once_with(pool_from=self.module.session)
         mock_get.assert_called_once_with("https://example.com/post", session=detail_session)
         mock_unlock.assert_called_once_with("https://example.com/post", ANY, detail_session)
         mock_normalize.assert_called_once_with("Movie / Title: 2026")
@@ -695,12 +802,12 @@ class TestEnqueueHdePosts(unittest.TestCase):
         self.assertEqual(self.redis_client.get(self.module.REDIS_SCAN_COMPLETE_KEY), "1")
         self.assertEqual(self.redis_client.get(self.module.REDIS_SCAN_PAGE_KEY), "4")
         self.assertEqual(
-            self.module.deserialize_payload(self.redis_client.get(self.module.REDIS_NEXT_END_TITLES_KEY))["titles"],
+            fake_deserialize_payload(self.redis_client.get(self.module.REDIS_NEXT_END_TITLES_KEY))["titles"],
             ["Old Movie – 1.0 GB", "Older Movie – 0.9 GB"],
         )
         self.assertEqual(self.redis_client.llen(self.module.REDIS_PENDING_KEY), 2)
         self.assertEqual(
-            self.module.deserialize_payload(self.redis_client.lrange(self.module.REDIS_PENDING_KEY, 0, 0)[0]),
+            fake_deserialize_payload(self.redis_client.lrange(self.module.REDIS_PENDING_KEY, 0, 0)[0]),
             {"size": "1.0GB", "title": "Old Movie – 1.0 GB", "url": "https://example.com/post-1"},
         )
 
@@ -734,7 +841,7 @@ class TestEnqueueHdePosts(unittest.TestCase):
         )
         self.assertEqual(mock_parse.call_args_list, [call(first_response), call(second_response)])
         self.assertEqual(
-            self.module.deserialize_payload(self.redis_client.get(self.module.REDIS_NEXT_END_TITLES_KEY))["titles"],
+            fake_deserialize_payload(self.redis_client.get(self.module.REDIS_NEXT_END_TITLES_KEY))["titles"],
             ["New Movie – 2.0 GB", "Second Movie – 1.8 GB"],
         )
         self.assertEqual(self.redis_client.get(self.module.REDIS_SCAN_COMPLETE_KEY), "1")
@@ -762,22 +869,19 @@ class TestRecoverAndDrainHdeQueue(unittest.TestCase):
         self.assertEqual(self.redis_client.llen(self.module.REDIS_PROCESSING_KEY), 0)
         self.assertEqual(self.redis_client.lrange(self.module.REDIS_PENDING_KEY, 0, -1), ["task-1", "task-2"])
 
-    def test_drain_hde_queue_delegates_to_shared_drain_queue_helper(self):
-        """消费阶段应把队列参数和 worker 函数交给共享 helper。"""
-        with patch.object(self.module, "drain_queue") as mock_drain:
+    def test_drain_hde_queue_delegates_to_site_engine(self):
+        """消费阶段应把站点描述交给 ``scrapy_site`` 引擎，队列参数和 worker 保持不变。"""
+        with patch.object(self.module, "drain_site_queue") as mock_drain:
             self.module.drain_hde_queue(redis_client=self.redis_client)
 
-        mock_drain.assert_called_once_with(
-            self.redis_client,
-            pending_key=self.module.REDIS_PENDING_KEY,
-            processing_key=self.module.REDIS_PROCESSING_KEY,
-            max_workers=self.module.DEFAULT_MAX_WORKERS,
-            worker=self.module.visit_hde_url,
-            logger=self.module.logger,
-            queue_label="HDE",
-            identify_item=ANY,
-            recover_processing_on_start=False,
-        )
+        site, redis_client = mock_drain.call_args.args
+        self.assertIs(redis_client, self.redis_client)
+        self.assertEqual(site.label, "HDE")
+        self.assertEqual(site.pending_key, self.module.REDIS_PENDING_KEY)
+        self.assertEqual(site.processing_key, self.module.REDIS_PROCESSING_KEY)
+        self.assertEqual(site.max_workers, self.module.DEFAULT_MAX_WORKERS)
+        self.assertIs(site.worker, self.module.visit_hde_url)
+        self.assertIs(site.logger, self.module.logger)
 
 
 class TestFinalizeHdeRun(unittest.TestCase):
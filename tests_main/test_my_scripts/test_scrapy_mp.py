@@ -6,6 +6,7 @@
 """
 
 import copy
+import gzip
 import importlib.util
 import sys
 import tempfile
@@ -22,7 +23,10 @@ except ImportError:  # pragma: no cover - 由依赖安装状态决定
     fakeredis = None
 
 MODULE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "scrapy_mp.py"
+FIXTURE_DIR = Path(__file__).resolve().parents[2] / "tests_main" / "fixtures" / "parsers"
 REDIS_HELPER_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "scrapy_redis.py"
+PARSE_HTML_PATH = Path(__file__).resolve().parents[2] / "my_module" / "module_use" / "parse_html.py"
+HTTP_SESSION_PATH = Path(__file__).resolve().parents[2] / "my_module" / "module_use" / "build_http_session.py"
 
 
 def load_scrapy_mp(config: dict | None = None):
@@ -53,6 +57,21 @@ def load_scrapy_mp(config: dict | None = None):
                 helper_config[key] = config[key]
 
     fake_my_module = types.ModuleType("my_module")
+    http_session_spec = importlib.util.spec_from_file_location(
+        f"build_http_session_test_{uuid.uuid4().hex}",
+        HTTP_SESSION_PATH,
+    )
+    http_session_module = importlib.util.module_from_spec(http_session_spec)
+    http_session_spec.loader.exec_module(http_session_module)
+    fake_my_module.build_http_session = http_session_module.build_http_session
+    parse_html_spec = importlib.util.spec_from_file_location(
+        f"parse_html_test_{uuid.uuid4().hex}",
+        PARSE_HTML_PATH,
+    )
+    parse_html_module = importlib.util.module_from_spec(parse_html_spec)
+    parse_html_spec.loader.exec_module(parse_html_module)
+    fake_my_module.parse_html = parse_html_module.parse_html
+    fake_my_module.build_strainer = parse_html_module.build_strainer
 
     def fake_read_json_to_dict(path: str):
         if path == "config/scrapy_redis.json":
@@ -290,7 +309,7 @@ class TestModuleLoad(unittest.TestCase):
             status_code=403,
             text='<!DOCTYPE html><html><head><title>Just a moment...</title></head><body>cf_chl</body></html>',
         )
-        with patch.object(module.requests, "get", return_value=response):
+        with patch.object(module.session, "get", return_value=response):
             with self.assertRaisesRegex(module.MpCloudflareError, "the-ikon-of-elijah"):
                 module.request_mp_page("https://example.com/post")
 
@@ -310,7 +329,7 @@ class TestGetMpResponse(unittest.TestCase):
         expected_headers = dict(self.module.REQUEST_HEAD)
         expected_headers["Cookie"] = "cookie=value"
 
-        with patch.object(self.module.requests, "get", return_value=response) as mock_get:
+        with patch.object(self.module.session, "get", return_value=response) as mock_get:
             result = self.module.get_mp_response("https://example.com/post")
 
         self.assertIs(result, response)
@@ -321,13 +340,23 @@ class TestGetMpResponse(unittest.TestCase):
         """请求返回非 200 状态码时应抛出异常。"""
         response = Mock(status_code=503)
 
-        with patch.object(self.module.requests, "get", return_value=response):
+        with patch.object(self.module.session, "get", return_value=response):
             with self.assertRaisesRegex(Exception, "503"):
                 self.module.get_mp_response("https://example.com/post")
 
+    def test_get_mp_response_raises_throttled_error_for_429(self):
+        """429 应抛出限流异常，供自适应并发收缩。"""
+        response = Mock(status_code=429)
+
+        with patch.object(self.module.session, "get", return_value=response):
+            with self.assertRaises(self.module.ThrottledError) as context:
+                self.module.get_mp_response("https://example.com/post")
+
+        self.assertEqual(context.exception.status_code, 429)
+
     def test_get_mp_response_propagates_request_exception(self):
         """底层请求异常时应直接抛出，交给重试装饰器处理。"""
-        with patch.object(self.module.requests, "get", side_effect=requests.Timeout("timed out")):
+        with patch.object(self.module.session, "get", side_effect=requests.Timeout("timed out")):
             with self.assertRaisesRegex(requests.Timeout, "timed out"):
                 self.module.get_mp_response("https://example.com/post")
 
@@ -340,7 +369,7 @@ class TestGetMpResponse(unittest.TestCase):
         expected_headers = dict(self.module.REQUEST_HEAD)
         expected_headers["Cookie"] = "cookie=value"
 
-        with patch.object(self.module.requests, "get", return_value=response) as mock_get:
+        with patch.object(self.module.session, "get", return_value=response) as mock_get:
             with self.assertRaisesRegex(self.module.MpCloudflareError, "Cloudflare"):
                 self.module.get_mp_response("https://example.com/post")
         mock_get.assert_called_once_with("https://example.com/post", headers=expected_headers, timeout=20)
@@ -352,10 +381,30 @@ class TestGetMpResponse(unittest.TestCase):
             text='<!DOCTYPE html><html><head><title>Just a moment...</title></head><body>cf_chl</body></html>',
         )
 
-        with patch.object(self.module.requests, "get", return_value=cf_response):
+        with patch.object(self.module.session, "get", return_value=cf_response):
             with self.assertRaisesRegex(self.module.MpCloudflareError, "Cloudflare"):
                 self.module.get_mp_response("https://example.com/post")
 
+    def test_detail_request_leaves_throttle_to_queue_when_adaptive(self):
+        """开启自适应并发时，详情页限流不在线程内重试；列表页和其他失败照常重试。"""
+        throttled = self.module.ThrottledError("429", 429)
+        cloudflare = self.module.MpCloudflareError("Cloudflare")
+
+        self.assertTrue(self.module.should_retry_mp_detail_request(throttled))
+        with patch.object(self.module, "ADAPTIVE_CONCURRENCY", True):
+            self.assertFalse(self.module.should_retry_mp_detail_request(throttled))
+            self.assertFalse(self.module.should_retry_mp_detail_request(cloudflare))
+            self.assertTrue(self.module.should_retry_mp_detail_request(RuntimeError("boom")))
+            self.assertTrue(self.module.should_retry_mp_request(throttled))
+
+    def test_concurrency_limiter_only_counts_throttled_responses(self):
+        """Cloudflare 验证页会直接终止本轮，不计入限流信号。"""
+        with patch.object(self.module, "ADAPTIVE_CONCURRENCY", True):
+            limiter = self.module.build_mp_concurrency_limiter()
+
+        self.assertTrue(limiter.is_throttled(self.module.ThrottledError("429", 429)))
+        self.assertFalse(limiter.is_throttled(self.module.MpCloudflareError("Cloudflare")))
+
 
 class TestParseMpResponse(unittest.TestCase):
     """验证列表页解析逻辑。"""
@@ -366,6 +415,43 @@ class TestParseMpResponse(unittest.TestCase):
     def tearDown(self):
         self.temp_dir.cleanup()
 
+    def test_parse_mp_response_parses_full_benchmark_page(self):
+        """基准测试用的整页样本应能完整解析，样本和解析函数保持同步。"""
+        with gzip.open(FIXTURE_DIR / "mp_list.html.gz", "rt", encoding="utf-8") as f:
+            page = f.read()
+
+        result = self.module.parse_mp_response(Mock(text=page))
+
+        self.assertEqual(len(result), 30)
+        self.assertTrue(all(item["link"].startswith("https://example.com/movies/") for item in result))
+
+    def test_parse_mp_response_partial_parse_matches_full_page(self):
+        """只解析目标容器和整页解析的结果一致。"""
+        with gzip.open(FIXTURE_DIR / "mp_list.html.gz", "rt", encoding="utf-8") as f:
+            page = f.read()
+
+        partial = self.module.parse_mp_response(Mock(text=page))
+        with patch.object(self.module, "MP_LIST_STRAINER", None):
+            full = self.module.parse_mp_response(Mock(text=page))
+
+        self.assertEqual(partial, full)
+
+    def test_parse_mp_response_matches_across_html_parsers(self):
+        """lxml 和 html.parser 解析同一页面，结果应一致。"""
+        response = Mock(
+            text=build_archive_page(
+                build_archive_article(title="Movie Title", link="https://example.com/post-1", span_text="Jul. 20, 1990"),
+                build_archive_article(title="Film &amp; Title", link="https://example.com/post-2", span_text="Unknown date"),
+            )
+        )
+        results = {}
+        for parser in ("lxml", "html.parser"):
+            with patch.object(self.module, "HTML_PARSER", parser):
+                results[parser] = self.module.parse_mp_response(response)
+
+        self.assertTrue(results["lxml"])
+        self.assertEqual(results["lxml"], results["html.parser"])
+
     def test_parse_mp_response_extracts_title_link_and_year(self):
         """应从列表页提取标题、链接和年份。"""
         response = Mock(
@@ -469,7 +555,7 @@ class TestParseMpArticle(unittest.TestCase):
                 )
             )
         )
-        article = self.module.BeautifulSoup(response.text, "html.parser").find("article")
+        article = self.module.parse_html(response.text, "html.parser").find("article")
 
         result = self.module.parse_mp_article(article)
 
@@ -484,7 +570,7 @@ class TestParseMpArticle(unittest.TestCase):
 
     def test_parse_mp_article_returns_none_when_h3_anchor_is_missing(self):
         """条目缺少标题链接时应返回 ``None``。"""
-        article = self.module.BeautifulSoup(
+        article = self.module.parse_html(
             '<article class="item movies"><div class="data"><span>1990</span></div></article>',
             "html.parser",
         ).find("article")
@@ -497,7 +583,7 @@ class TestParseMpArticle(unittest.TestCase):
 
     def test_parse_mp_article_keeps_empty_year_without_warning(self):
         """条目缺少年份时仍保留标题和链接，年份留空。"""
-        article = self.module.BeautifulSoup(
+        article = self.module.parse_html(
             build_archive_article(
                 title="Movie Title",
                 link="https://example.com/post-1",
@@ -610,7 +696,7 @@ class TestMpQueueHelpers(unittest.TestCase):
             Mock(status_code=404),
         ]
 
-        with patch.object(self.module.requests, "get", side_effect=responses):
+        with patch.object(self.module.session, "get", side_effect=responses):
             with self.assertRaisesRegex(ValueError, "404"):
                 self.module.validate_mp_end_urls(
                     {"https://example.com/end-a", "https://example.com/end-b"}
@@ -623,7 +709,7 @@ class TestMpQueueHelpers(unittest.TestCase):
             text='<!DOCTYPE html><html><head><title>Just a moment...</title></head><body>cf_chl</body></html>',
         )
 
-        with patch.object(self.module.requests, "get", return_value=response):
+        with patch.object(self.module.session, "get", return_value=response):
             with self.assertRaisesRegex(self.module.MpCloudflareError, "Cloudflare"):
                 self.module.validate_mp_end_urls({"https://example.com/end-a"})
 
@@ -977,7 +1063,7 @@ class TestVisitMpUrl(unittest.TestCase):
             "year": "1990",
         }
 
-        with patch.object(self.module, "get_mp_response", return_value=response) as mock_get, patch.object(
+        with patch.object(self.module, "get_mp_detail_response", return_value=response) as mock_get, patch.object(
             self.module,
             "parse_mp_detail",
             return_value={"file_name": "sample.rare", "content": "line 1\nline 2"},
@@ -1005,7 +1091,7 @@ class TestVisitMpUrl(unittest.TestCase):
             "year": "1990",
         }
 
-        with patch.object(self.module, "get_mp_response", return_value=response), patch.object(
+        with patch.object(self.module, "get_mp_detail_response", return_value=response), patch.object(
             self.module,
             "parse_mp_detail",
             return_value="",
@@ -1035,7 +1121,7 @@ class TestMpRedisFlow(unittest.TestCase):
         with patch.object(self.module, "validate_mp_end_urls") as mock_validate, patch.object(
             self.module,
             "get_mp_response",
-            side_effect=[Mock(), Mock()],
+            side_effect=[Mock(headers={}), Mock(headers={})],
         ) as mock_get, patch.object(
             self.module,
             "parse_mp_response",
@@ -1092,7 +1178,7 @@ class TestMpRedisFlow(unittest.TestCase):
         )
 
         with patch.object(self.module, "validate_mp_end_urls") as mock_validate, patch.object(
-            self.module, "get_mp_response", return_value=Mock()
+            self.module, "get_mp_response", return_value=Mock(headers={})
         ) as mock_get, patch.object(
             self.module,
             "parse_mp_response",
@@ -1124,7 +1210,7 @@ class TestMpRedisFlow(unittest.TestCase):
         with patch.object(self.module, "validate_mp_end_urls"), patch.object(
             self.module,
             "get_mp_response",
-            return_value=Mock(),
+            return_value=Mock(headers={}),
         ), patch.object(
             self.module,
             "parse_mp_response",
@@ -1158,7 +1244,7 @@ class TestMpRedisFlow(unittest.TestCase):
         with patch.object(self.module, "validate_mp_end_urls") as mock_validate, patch.object(
             self.module,
             "get_mp_response",
-            return_value=Mock(),
+            return_value=Mock(headers={}),
         ) as mock_get, patch.object(
             self.module,
             "parse_mp_response",
@@ -1177,6 +1263,30 @@ class TestMpRedisFlow(unittest.TestCase):
         mock_get.assert_called_once_with("https://example.com/movies/page/5/")
         self.assertEqual(self.redis_client.get(self.module.REDIS_SCAN_COMPLETE_KEY), "1")
 
+    def test_enqueue_mp_posts_stops_at_page_with_unchanged_etag(self):
+        """列表页 ETag 与上一轮完成时相同，应直接结束扫描，不再等截止 URL。"""
+        self.redis_client.hset(self.module.REDIS_PAGE_FINGERPRINT_KEY, "3", 'etag:"p3"')
+        with patch.object(self.module, "validate_mp_end_urls"), patch.object(
+            self.module,
+            "get_mp_response",
+            side_effect=[Mock(headers={"ETag": '"p2-new"'}), Mock(headers={"ETag": '"p3"'})],
+        ) as mock_get, patch.object(
+            self.module,
+            "parse_mp_response",
+            side_effect=[
+                [{"title": "Movie 1", "link": "https://example.com/new-1", "year": "2026"}],
+                [{"title": "Movie 2", "link": "https://example.com/new-2", "year": "2026"}],
+            ],
+        ):
+            self.module.enqueue_mp_posts(start_page=2, end=["https://example.com/end-a"], redis_client=self.redis_client)
+
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(self.redis_client.get(self.module.REDIS_SCAN_COMPLETE_KEY), "1")
+        self.assertEqual(self.redis_client.get(self.module.REDIS_SCAN_PAGE_KEY), "4")
+        self.assertEqual(self.redis_client.llen(self.module.REDIS_PENDING_KEY), 1)
+        staged_key = self.module._scrapy_redis.get_fingerprint_staging_key(self.module.REDIS_PAGE_FINGERPRINT_KEY)
+        self.assertEqual(self.redis_client.hgetall(staged_key), {"2": 'etag:"p2-new"'})
+
     def test_enqueue_mp_posts_returns_immediately_when_scan_is_already_complete(self):
         """扫描已完成且准备续跑详情时，应跳过入队阶段。"""
         self.redis_client.set(self.module.REDIS_SCAN_COMPLETE_KEY, "1")
@@ -1231,6 +1341,16 @@ class TestMpRedisFlow(unittest.TestCase):
         self.assertFalse(mock_drain_queue.call_args.kwargs["recover_processing_on_start"])
         self.assertNotIn("failed_key", mock_drain_queue.call_args.kwargs)
 
+    def test_drain_mp_queue_requeues_throttled_items_when_adaptive(self):
+        """开启自适应并发时，详情阶段使用 Redis 延迟重试队列接住被限流的任务。"""
+        with patch.object(self.module, "drain_queue") as mock_drain_queue:
+            self.module.drain_mp_queue(redis_client=self.redis_client)
+        self.assertIsNone(mock_drain_queue.call_args.kwargs["retry_policy"])
+
+        with patch.object(self.module, "ADAPTIVE_CONCURRENCY", True), patch.object(self.module, "drain_queue") as mock_drain_queue:
+            self.module.drain_mp_queue(redis_client=self.redis_client)
+        self.assertEqual(mock_drain_queue.call_args.kwargs["retry_policy"].retry_key, "mp_retry")
+
     def test_drain_mp_queue_aborts_and_requeues_when_cookie_expires(self):
         """详情阶段若命中 Cloudflare 验证页，应终止本轮并把任务放回 pending。"""
         self.redis_client.rpush(
@@ -1273,9 +1393,11 @@ class TestFinalizeMpRun(unittest.TestCase):
         """扫描完成且所有队列清空后，应删除扫描状态。"""
         self.redis_client.set(self.module.REDIS_SCAN_COMPLETE_KEY, "1")
         self.redis_client.set(self.module.REDIS_SCAN_PAGE_KEY, "9")
+        self.redis_client.hset(f"{self.module.REDIS_PAGE_FINGERPRINT_KEY}:next", "8", "ids:abc")
 
         self.module.finalize_mp_run(redis_client=self.redis_client)
 
+        self.assertEqual(self.redis_client.hgetall(self.module.REDIS_PAGE_FINGERPRINT_KEY), {"8": "ids:abc"})
         self.assertIsNone(self.redis_client.get(self.module.REDIS_SCAN_COMPLETE_KEY))
         self.assertIsNone(self.redis_client.get(self.module.REDIS_SCAN_PAGE_KEY))
 
@@ -1297,6 +1419,17 @@ class TestFinalizeMpRun(unittest.TestCase):
         self.assertEqual(self.redis_client.llen(self.module.REDIS_PENDING_KEY), 0)
         self.assertIn("已保留处理中队列，请直接重跑", logs.output[0])
 
+    def test_finalize_mp_run_waits_for_retry_queue(self):
+        """延迟重试队列仍有任务时，不应提交指纹或清理扫描状态。"""
+        self.redis_client.set(self.module.REDIS_SCAN_COMPLETE_KEY, "1")
+        self.redis_client.hset(f"{self.module.REDIS_PAGE_FINGERPRINT_KEY}:next", "8", "ids:abc")
+        self.redis_client.zadd(self.module.REDIS_RETRY_KEY, {"task": 1})
+
+        self.module.finalize_mp_run(redis_client=self.redis_client)
+
+        self.assertEqual(self.redis_client.get(self.module.REDIS_SCAN_COMPLETE_KEY), "1")
+        self.assertEqual(self.redis_client.hgetall(self.module.REDIS_PAGE_FINGERPRINT_KEY), {})
+
     def test_recover_mp_processing_when_pending_is_empty_moves_processing_back(self):
         """启动时若 pending 为空且 processing 有残留，应回退到 pending。"""
         processing_payload = self.module._scrapy_redis.serialize_payload(
@@ -26,6 +26,7 @@ import requests
 requests.packages.urllib3.disable_warnings()
 
 MODULE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "scrapy_mt.py"
+HTTP_SESSION_PATH = Path(__file__).resolve().parents[2] / "my_module" / "module_use" / "build_http_session.py"
 
 
 class DummyRetry:
@@ -65,6 +66,13 @@ def load_scrapy_mt(config: dict | None = None):
         module_config.update(config)
 
     fake_my_module = types.ModuleType("my_module")
+    http_session_spec = importlib.util.spec_from_file_location(
+        f"build_http_session_test_{uuid.uuid4().hex}",
+        HTTP_SESSION_PATH,
+    )
+    http_session_module = importlib.util.module_from_spec(http_session_spec)
+    http_session_spec.loader.exec_module(http_session_module)
+    fake_my_module.build_http_session = http_session_module.build_http_session
     fake_my_module.read_json_to_dict = lambda _path: copy.deepcopy(module_config)
     fake_my_module.format_size = lambda value: f"{value} B"
     fake_my_module.normalize_release_title_for_filename = lambda title, **_kwargs: title.replace("/", "｜")
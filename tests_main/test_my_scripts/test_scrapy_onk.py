@@ -18,6 +18,7 @@ from unittest.mock import Mock, call, patch
 import requests
 
 MODULE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "scrapy_onk.py"
+HTTP_SESSION_PATH = Path(__file__).resolve().parents[2] / "my_module" / "module_use" / "build_http_session.py"
 
 
 class FakeSession:
@@ -168,6 +169,13 @@ def load_scrapy_onk(config: dict | None = None):
         module_config.update(config)
 
     fake_my_module = types.ModuleType("my_module")
+    http_session_spec = importlib.util.spec_from_file_location(
+        f"build_http_session_test_{uuid.uuid4().hex}",
+        HTTP_SESSION_PATH,
+    )
+    http_session_module = importlib.util.module_from_spec(http_session_spec)
+    http_session_spec.loader.exec_module(http_session_module)
+    fake_my_module.build_http_session = http_session_module.build_http_session
     fake_my_module.normalize_release_title_for_filename = lambda title: title.replace("/", "｜")
     fake_my_module.read_file_to_list = lambda path: Path(path).read_text(encoding="utf-8").splitlines()
     fake_my_module.read_json_to_dict = lambda _path: copy.deepcopy(module_config)
@@ -186,8 +194,8 @@ def load_scrapy_onk(config: dict | None = None):
 
     fake_gd_downloader = types.ModuleType("gd_downloader")
     fake_gd_downloader.extract_drive_urls = fake_extract_drive_urls
-    fake_gd_downloader.download_gd_url = lambda _url: (_ for _ in ()).throw(
-        AssertionError("download_gd_url should be patched in tests")
+    fake_gd_downloader.stream_gd_url = lambda _url, _part_path, **_kwargs: (_ for _ in ()).throw(
+        AssertionError("stream_gd_url should be patched in tests")
     )
 
     fake_redis_module = types.ModuleType("scrapy_redis")
@@ -197,6 +205,19 @@ def load_scrapy_onk(config: dict | None = None):
     fake_redis_module.recover_processing_queue = fake_recover_processing_queue
     fake_redis_module.drain_queue = fake_drain_queue
 
+    def fake_prefetch_pages(fetch_page, start_page, prefetch=1):
+        page = start_page
+        while True:
+            yield page, fetch_page(page)
+            page += 1
+
+    def fake_run_scan_and_drain(scan, drain, *, overlap=False):
+        scan()
+        return drain()
+
+    fake_redis_module.prefetch_pages = fake_prefetch_pages
+    fake_redis_module.run_scan_and_drain = fake_run_scan_and_drain
+
     fake_sort_movie_ops = types.ModuleType("sort_movie_ops")
     fake_sort_movie_ops.extract_imdb_id = lambda text: next(
         (match.group(0).lower() for match in re.finditer(r"\btt\d+\b", text, re.IGNORECASE)),
@@ -504,14 +525,18 @@ class TestVisitAndDownload(unittest.TestCase):
     def test_download_drive_artifact_handles_single_and_multiple_outputs(self):
         onk_path = Path(self.module.OUTPUT_DIR) / "Movie(NZB)[tt7654321].onk"
         onk_path.write_text("https://onk.example/threads/1", encoding="utf-8")
-        download_result = types.SimpleNamespace(
-            drive_name="Movie.nzb",
-            payload=b'<?xml version="1.0"?><nzb></nzb>',
-            content_type="application/octet-stream",
-            suggested_suffix=".nzb",
-        )
 
-        with patch.object(self.module, "download_gd_url", return_value=download_result):
+        def fake_stream_gd_url(_url: str, part_path: Path, segments: int = 1):
+            part_path.write_bytes(b'<?xml version="1.0"?><nzb></nzb>')
+            return types.SimpleNamespace(
+                drive_name="Movie.nzb",
+                path=part_path,
+                size=part_path.stat().st_size,
+                content_type="application/octet-stream",
+                suggested_suffix=".nzb",
+            )
+
+        with patch.object(self.module, "stream_gd_url", side_effect=fake_stream_gd_url):
             single_output = self.module.download_drive_artifact("https://drive.google.com/file/d/file123/view?usp=sharing", str(onk_path))
             multi_output = self.module.download_drive_artifact(
                 "https://drive.google.com/file/d/file456/view?usp=sharing",
@@ -522,6 +547,8 @@ class TestVisitAndDownload(unittest.TestCase):
 
         self.assertEqual(Path(single_output).name, "Movie(NZB)[tt7654321].nzb")
         self.assertEqual(Path(multi_output).name, "Movie(NZB)[tt7654321].02.nzb")
+        self.assertEqual(Path(single_output).read_bytes(), b'<?xml version="1.0"?><nzb></nzb>')
+        self.assertEqual(list(onk_path.parent.glob("*.part.download")), [])
 
     def test_visit_onk_url_writes_non_nzb_file_without_visiting_detail_page(self):
         result_item = {
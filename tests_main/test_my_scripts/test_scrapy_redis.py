@@ -8,11 +8,15 @@
 ``SCRAPY_REDIS_RUN_REAL=1``。
 """
 
+import asyncio
 import copy
 import importlib.util
 import json
 import os
 import sys
+import tempfile
+import threading
+import time
 import types
 import unittest
 import uuid
@@ -221,6 +225,337 @@ class TestQueueHelpers(FakeredisTestCase):
         self.assertEqual(self.redis_client.lrange(self.processing_key, 0, -1), ["payload-b"])
 
 
+    def test_claim_payloads_moves_up_to_count_items_in_pop_order(self):
+        """批量领取应按 RPOPLPUSH 顺序一次移动最多 ``count`` 个任务。"""
+        for payload in ("payload-a", "payload-b", "payload-c"):
+            self.redis_client.rpush(self.pending_key, payload)
+
+        claimed = self.module.claim_payloads(
+            self.redis_client,
+            pending_key=self.pending_key,
+            processing_key=self.processing_key,
+            count=2,
+        )
+
+        self.assertEqual(claimed, ["payload-c", "payload-b"])
+        self.assertEqual(self.redis_client.lrange(self.pending_key, 0, -1), ["payload-a"])
+        self.assertEqual(self.redis_client.lrange(self.processing_key, 0, -1), ["payload-b", "payload-c"])
+        self.assertEqual(
+            self.module.claim_payloads(
+                self.redis_client,
+                pending_key=self.pending_key,
+                processing_key=self.processing_key,
+                count=5,
+            ),
+            ["payload-a"],
+        )
+
+    def test_acknowledge_payloads_removes_items_in_one_pipeline_and_clears_buffer(self):
+        """批量确认应一次移除所有 payload，并清空缓冲列表。"""
+        for payload in ("payload-a", "payload-b", "payload-c"):
+            self.redis_client.rpush(self.processing_key, payload)
+        acknowledged = ["payload-a", "payload-c"]
+
+        with patch.object(self.redis_client, "pipeline", wraps=self.redis_client.pipeline) as mock_pipeline:
+            self.module.acknowledge_payloads(
+                self.redis_client,
+                processing_key=self.processing_key,
+                payloads=acknowledged,
+            )
+
+        mock_pipeline.assert_called_once_with(transaction=False)
+        self.assertEqual(acknowledged, [])
+        self.assertEqual(self.redis_client.lrange(self.processing_key, 0, -1), ["payload-b"])
+
+    def test_claim_pending_tasks_returns_unsubmitted_batch_items_when_deserialize_fails(self):
+        """同批次坏 payload 之后的任务应按原顺序放回 pending 尾部。"""
+        logger = Mock()
+        payload_good_1 = self.module.serialize_payload({"id": "good-1"})
+        payload_good_2 = self.module.serialize_payload({"id": "good-2"})
+        payload_good_3 = self.module.serialize_payload({"id": "good-3"})
+        for payload in (payload_good_1, payload_good_2, "not json", payload_good_3):
+            self.redis_client.rpush(self.pending_key, payload)
+
+        tasks, exc = self.module.claim_pending_tasks(
+            self.redis_client,
+            pending_key=self.pending_key,
+            processing_key=self.processing_key,
+            limit=4,
+            logger=logger,
+            queue_label="TEST",
+        )
+
+        self.assertIsInstance(exc, json.JSONDecodeError)
+        self.assertEqual([info["id"] for _payload, info in tasks], ["good-3"])
+        self.assertEqual(
+            self.redis_client.lrange(self.pending_key, 0, -1),
+            ["not json", payload_good_1, payload_good_2],
+        )
+        self.assertEqual(self.redis_client.lrange(self.processing_key, 0, -1), [payload_good_3])
+
+
+class TestBloomSeenStore(FakeredisTestCase):
+    """验证布隆过滤器 seen 存储可以替代 set 去重。"""
+
+    def setUp(self):
+        super().setUp()
+        self.bloom = self.module.BloomFilter(1000, 0.001)
+
+    def test_bloom_filter_sizes_bitmap_from_capacity_and_error_rate(self):
+        """位数和哈希个数按标准公式计算，偏移稳定且落在位图范围内。"""
+        self.assertEqual(self.bloom.bit_count, 14378)
+        self.assertEqual(self.bloom.hash_count, 10)
+        offsets = self.bloom.get_offsets("https://example.com/topic/1")
+        self.assertEqual(offsets, self.bloom.get_offsets("https://example.com/topic/1"))
+        self.assertTrue(all(0 <= offset < self.bloom.bit_count for offset in offsets))
+
+    def test_build_seen_bloom_reads_site_config(self):
+        """未配置容量时不启用，配置后按误判率创建。"""
+        self.assertIsNone(self.module.build_seen_bloom({}))
+        self.assertEqual(
+            self.module.build_seen_bloom({"seen_bloom_capacity": 5000, "seen_bloom_error_rate": 0.01}),
+            self.module.BloomFilter(5000, 0.01),
+        )
+
+    def test_push_items_to_queue_with_bloom_deduplicates_within_and_across_batches(self):
+        """使用布隆过滤器时，同批次和跨批次的重复项都不应重复入队。"""
+        items = [{"id": "1"}, {"id": "2"}, {"id": "1"}]
+
+        first_count = self.module.push_items_to_queue(
+            self.redis_client,
+            items,
+            seen_key=self.seen_key,
+            pending_key=self.pending_key,
+            unique_value=lambda item: item["id"],
+            bloom=self.bloom,
+        )
+        second_count = self.module.push_items_to_queue(
+            self.redis_client,
+            [{"id": "2"}, {"id": "3"}],
+            seen_key=self.seen_key,
+            pending_key=self.pending_key,
+            unique_value=lambda item: item["id"],
+            bloom=self.bloom,
+        )
+
+        self.assertEqual((first_count, second_count), (2, 1))
+        self.assertEqual(self.redis_client.type(self.seen_key), "string")
+        self.assertEqual(
+            [self.module.deserialize_payload(payload)["id"] for payload in self.redis_client.lrange(self.pending_key, 0, -1)],
+            ["1", "2", "3"],
+        )
+
+    def test_push_items_to_queue_with_bloom_keeps_using_existing_set(self):
+        """seen 键仍是旧的 set 时继续按 set 去重，不会因类型不同报错。"""
+        self.redis_client.sadd(self.seen_key, "1")
+
+        enqueued_count = self.module.push_items_to_queue(
+            self.redis_client,
+            [{"id": "1"}, {"id": "2"}],
+            seen_key=self.seen_key,
+            pending_key=self.pending_key,
+            unique_value=lambda item: item["id"],
+            bloom=self.bloom,
+        )
+
+        self.assertEqual(enqueued_count, 1)
+        self.assertEqual(self.redis_client.smembers(self.seen_key), {"1", "2"})
+
+    def test_add_and_contains_seen_values_support_set_and_bloom(self):
+        """批量写入返回是否新值，批量查询与写入结果一致。"""
+        for bloom in (None, self.bloom):
+            self.redis_client.delete(self.seen_key)
+            with self.subTest(bloom=bloom):
+                added = self.module.add_seen_values(self.redis_client, self.seen_key, ["a", "b", "a"], bloom=bloom)
+                found = self.module.contains_seen_values(self.redis_client, self.seen_key, ["a", "c"], bloom=bloom)
+
+                self.assertEqual(added, [True, True, False])
+                self.assertEqual(found, [True, False])
+
+    def test_migrate_seen_set_to_bloom_replaces_set_with_bitmap(self):
+        """迁移后原键变为位图，原有成员仍被视为已见过。"""
+        values = [f"https://example.com/{index}" for index in range(25)]
+        self.redis_client.sadd(self.seen_key, *values)
+
+        migrated_count = self.module.migrate_seen_set_to_bloom(
+            self.redis_client,
+            self.seen_key,
+            bloom=self.bloom,
+            batch_size=10,
+        )
+
+        self.assertEqual(migrated_count, 25)
+        self.assertEqual(self.redis_client.type(self.seen_key), "string")
+        self.assertTrue(all(self.module.contains_seen_values(self.redis_client, self.seen_key, values, bloom=self.bloom)))
+        self.assertEqual(self.module.migrate_seen_set_to_bloom(self.redis_client, self.seen_key, bloom=self.bloom), 0)
+        self.assertEqual(
+            self.redis_client.hgetall(self.module.get_bloom_params_key(self.seen_key)),
+            {"hash_count": str(self.bloom.hash_count), "bit_count": str(self.bloom.bit_count)},
+        )
+
+    def test_bloom_params_change_is_refused_until_bitmap_is_cleared(self):
+        """已有位图的位数或哈希个数与配置不一致时拒绝读写；清空 seen 键后按新参数重建。"""
+        resized = self.module.BloomFilter(50000, 0.001)
+        items = [{"url": "https://example.com/new"}]
+        self.module.add_seen_values(self.redis_client, self.seen_key, ["a"], bloom=self.bloom)
+
+        with self.assertRaisesRegex(redis.exceptions.ResponseError, "bloom params mismatch"):
+            self.module.add_seen_values(self.redis_client, self.seen_key, ["b"], bloom=resized)
+        with self.assertRaisesRegex(redis.exceptions.ResponseError, "bloom params mismatch"):
+            self.module.contains_seen_values(self.redis_client, self.seen_key, ["a"], bloom=resized)
+        with self.assertRaisesRegex(redis.exceptions.ResponseError, "bloom params mismatch"):
+            self.module.push_items_to_queue(
+                self.redis_client,
+                items,
+                seen_key=self.seen_key,
+                pending_key=self.pending_key,
+                unique_value=lambda item: item["url"],
+                bloom=resized,
+            )
+        self.assertEqual(self.redis_client.llen(self.pending_key), 0)
+
+        self.redis_client.delete(self.seen_key)
+        self.assertEqual(self.module.add_seen_values(self.redis_client, self.seen_key, ["a"], bloom=resized), [True])
+        self.assertEqual(self.module.contains_seen_values(self.redis_client, self.seen_key, ["a"], bloom=resized), [True])
+
+
+class TestPageFingerprintStore(FakeredisTestCase):
+    """验证列表页指纹的生成、暂存和提交。"""
+
+    def setUp(self):
+        super().setUp()
+        self.fingerprint_key = f"{self.seen_key}:page_fingerprints"
+
+    def tearDown(self):
+        super().tearDown()
+        self.redis_client.delete(
+            self.fingerprint_key,
+            self.module.get_fingerprint_staging_key(self.fingerprint_key),
+        )
+
+    def test_build_page_fingerprint_prefers_validators_and_ignores_order(self):
+        """有 ETag 时用 ETag，其次 Last-Modified，都没有时按帖子集合哈希，与顺序无关。"""
+        build = self.module.build_page_fingerprint
+
+        self.assertEqual(build(["a"], {"ETag": '"v1"', "Last-Modified": "Mon"}), 'etag:"v1"')
+        self.assertEqual(build(["a"], {"Last-Modified": "Mon"}), "last-modified:Mon")
+        self.assertEqual(build(["a", "b"], {}), build(["b", "a"]))
+        self.assertNotEqual(build(["a", "b"]), build(["a", "c"]))
+
+    def test_staged_fingerprints_only_count_after_commit(self):
+        """本轮暂存的指纹在提交前不生效，提交后合并进正式指纹并保留旧页。"""
+        self.redis_client.hset(self.fingerprint_key, mapping={"1": "ids:old", "5": "ids:deep"})
+        self.module.stage_page_fingerprint(self.redis_client, self.fingerprint_key, 1, "ids:new")
+
+        self.assertFalse(self.module.is_page_processed(self.redis_client, self.fingerprint_key, 1, "ids:new"))
+        self.assertEqual(self.module.commit_page_fingerprints(self.redis_client, self.fingerprint_key), 1)
+        self.assertTrue(self.module.is_page_processed(self.redis_client, self.fingerprint_key, 1, "ids:new"))
+        self.assertTrue(self.module.is_page_processed(self.redis_client, self.fingerprint_key, 5, "ids:deep"))
+        self.assertEqual(self.module.commit_page_fingerprints(self.redis_client, self.fingerprint_key), 0)
+
+
+class TestListPagePipeline(FakeredisTestCase):
+    """验证列表页预取和边扫描边消费。"""
+
+    def test_prefetch_pages_returns_pages_in_order_and_stops_fetching_after_close(self):
+        """后面的页面完成得更早也按页码顺序返回，停止迭代后不再请求新页面。"""
+        fetched = []
+        lock = threading.Lock()
+
+        def fetch_page(page: int) -> str:
+            time.sleep(0.02 * (5 - page) if page < 5 else 0)
+            with lock:
+                fetched.append(page)
+            return f"page-{page}"
+
+        results = []
+        for page, result in self.module.prefetch_pages(fetch_page, 1, prefetch=3):
+            results.append((page, result))
+            if page == 3:
+                break
+        time.sleep(0.1)
+
+        self.assertEqual(results, [(1, "page-1"), (2, "page-2"), (3, "page-3")])
+        self.assertLessEqual(max(fetched), 5)
+
+    def test_prefetch_pages_raises_failed_page_after_earlier_pages(self):
+        """某页请求失败时，前面的页面照常返回，轮到失败页时才抛出异常。"""
+
+        def fetch_page(page: int) -> int:
+            if page == 2:
+                raise RuntimeError("page 2 failed")
+            return page
+
+        pages = self.module.prefetch_pages(fetch_page, 1, prefetch=4)
+
+        self.assertEqual(next(pages), (1, 1))
+        with self.assertRaisesRegex(RuntimeError, "page 2 failed"):
+            next(pages)
+
+    def test_run_scan_and_drain_overlaps_and_drains_late_items(self):
+        """重叠模式下扫描期间就开始处理任务，扫描最后入队的任务也会被处理。"""
+        processed = []
+        first_processed = threading.Event()
+
+        def scan() -> None:
+            self.redis_client.rpush(self.pending_key, self.module.serialize_payload({"id": "1"}))
+            # 第一条任务处理完之前不继续入队，证明消费与扫描同时进行
+            self.assertTrue(first_processed.wait(5))
+            self.redis_client.rpush(self.pending_key, self.module.serialize_payload({"id": "2"}))
+
+        def worker(info: dict) -> None:
+            processed.append(info["id"])
+            first_processed.set()
+
+        def drain(**kwargs) -> dict:
+            return self.module.drain_queue(
+                self.redis_client,
+                pending_key=self.pending_key,
+                processing_key=self.processing_key,
+                failed_key=self.failed_key,
+                max_workers=2,
+                worker=worker,
+                logger=Mock(),
+                queue_label="TEST",
+                identify_item=lambda info: info["id"],
+                **kwargs,
+            )
+
+        with patch.object(self.module, "PRODUCER_POLL_SECONDS", 0.01):
+            result = self.module.run_scan_and_drain(scan, drain, overlap=True)
+
+        self.assertEqual(processed, ["1", "2"])
+        self.assertEqual(result, {"processed": 2, "success": 2, "failed": 0})
+        self.assertEqual(self.redis_client.llen(self.pending_key), 0)
+
+    def test_run_scan_and_drain_reraises_scan_error_after_draining(self):
+        """扫描出错时，已入队的任务仍被处理，之后再抛出扫描的异常。"""
+        processed = []
+
+        def scan() -> None:
+            self.redis_client.rpush(self.pending_key, self.module.serialize_payload({"id": "1"}))
+            raise RuntimeError("scan failed")
+
+        def drain(**kwargs) -> dict:
+            return self.module.drain_queue(
+                self.redis_client,
+                pending_key=self.pending_key,
+                processing_key=self.processing_key,
+                max_workers=1,
+                worker=lambda info: processed.append(info["id"]),
+                logger=Mock(),
+                queue_label="TEST",
+                identify_item=lambda info: info["id"],
+                **kwargs,
+            )
+
+        with patch.object(self.module, "PRODUCER_POLL_SECONDS", 0.01):
+            with self.assertRaisesRegex(RuntimeError, "scan failed"):
+                self.module.run_scan_and_drain(scan, drain, overlap=True)
+
+        self.assertEqual(processed, ["1"])
+
+
 class TestDrainQueue(FakeredisTestCase):
     """验证消费队列时的成功、失败与停止策略。"""
 
@@ -243,6 +578,32 @@ class TestDrainQueue(FakeredisTestCase):
         self.assertEqual(result, {"processed": 0, "success": 0, "failed": 0})
         logger.info.assert_called_once_with("TEST 队列为空，没有待处理任务")
 
+    def test_drain_queue_claims_batches_with_single_script_call(self):
+        """空闲槽位应通过一次脚本调用批量领取，而不是逐条 RPOPLPUSH。"""
+        logger = Mock()
+        for index in range(4):
+            self.redis_client.rpush(self.pending_key, self.module.serialize_payload({"id": str(index)}))
+
+        with patch.object(self.redis_client, "eval", wraps=self.redis_client.eval) as mock_eval, \
+                patch.object(self.redis_client, "rpoplpush", wraps=self.redis_client.rpoplpush) as mock_rpoplpush:
+            result = self.module.drain_queue(
+                self.redis_client,
+                pending_key=self.pending_key,
+                processing_key=self.processing_key,
+                failed_key=self.failed_key,
+                max_workers=4,
+                worker=lambda _info: None,
+                logger=logger,
+                queue_label="TEST",
+                identify_item=lambda info: info["id"],
+                recover_processing_on_start=False,
+            )
+
+        self.assertEqual(result, {"processed": 4, "success": 4, "failed": 0})
+        self.assertEqual(mock_eval.call_args_list[0].args[-1], 4)
+        mock_rpoplpush.assert_not_called()
+        self.assertEqual(self.redis_client.llen(self.processing_key), 0)
+
     def test_drain_queue_recovers_processing_items_before_consuming(self):
         """消费前应先把 processing 残留任务恢复回 pending 并继续处理。"""
         logger = Mock()
@@ -433,6 +794,809 @@ class TestDrainQueue(FakeredisTestCase):
         self.assertIn("TEST 任务反序列化失败，已放回待处理队列", logger.error.call_args[0][0])
 
 
+class TestLeasedQueue(FakeredisTestCase):
+    """验证租约模式下多个消费者可以安全共享同一个队列。"""
+
+    def setUp(self):
+        super().setUp()
+        self.lease_key = self.module.get_lease_key(self.processing_key)
+
+    def tearDown(self):
+        self.redis_client.delete(self.lease_key)
+        super().tearDown()
+
+    def test_claim_payloads_registers_lease_deadline_for_each_claimed_item(self):
+        """租约模式领取任务时，应同时登记每个任务的到期时间。"""
+        self.redis_client.rpush(self.pending_key, "payload-a", "payload-b")
+
+        claimed = self.module.claim_payloads(
+            self.redis_client,
+            pending_key=self.pending_key,
+            processing_key=self.processing_key,
+            count=2,
+            lease_seconds=30,
+        )
+
+        self.assertEqual(claimed, ["payload-b", "payload-a"])
+        leases = dict(self.redis_client.zrange(self.lease_key, 0, -1, withscores=True))
+        self.assertEqual(set(leases), {"payload-a", "payload-b"})
+        for deadline in leases.values():
+            self.assertGreater(deadline, time.time() + 20)
+
+    def test_recover_processing_queue_only_moves_expired_or_unleased_items(self):
+        """启用租约后，启动恢复不应抢走其他消费者仍持有租约的任务。"""
+        logger = Mock()
+        self.redis_client.rpush(self.processing_key, "payload-live", "payload-expired", "payload-orphan")
+        self.redis_client.zadd(self.lease_key, {"payload-live": time.time() + 60, "payload-expired": 0})
+
+        recovered_count = self.module.recover_processing_queue(
+            self.redis_client,
+            processing_key=self.processing_key,
+            pending_key=self.pending_key,
+            logger=logger,
+            queue_label="TEST",
+            lease_seconds=30,
+        )
+
+        self.assertEqual(recovered_count, 2)
+        self.assertEqual(self.redis_client.lrange(self.processing_key, 0, -1), ["payload-live"])
+        self.assertEqual(self.redis_client.lrange(self.pending_key, 0, -1), ["payload-expired", "payload-orphan"])
+        self.assertEqual(self.redis_client.zrange(self.lease_key, 0, -1), ["payload-live"])
+        logger.warning.assert_called_once_with("恢复 2 条未完成的 TEST 任务回待处理队列")
+
+    def test_reap_expired_leases_ignores_unleased_items_and_live_leases(self):
+        """运行中的回收只处理过期租约，不动失去租约的失败任务。"""
+        self.redis_client.rpush(self.processing_key, "payload-live", "payload-expired", "payload-kept-failure")
+        self.redis_client.zadd(self.lease_key, {"payload-live": time.time() + 60, "payload-expired": 0})
+
+        reaped_count = self.module.reap_expired_leases(
+            self.redis_client,
+            processing_key=self.processing_key,
+            pending_key=self.pending_key,
+        )
+
+        self.assertEqual(reaped_count, 1)
+        self.assertEqual(self.redis_client.lrange(self.pending_key, 0, -1), ["payload-expired"])
+        self.assertEqual(
+            self.redis_client.lrange(self.processing_key, 0, -1),
+            ["payload-live", "payload-kept-failure"],
+        )
+
+    def test_renew_leases_extends_live_leases_without_resurrecting_reaped_items(self):
+        """续租只延长仍存在的租约，已被回收的任务不会重新登记。"""
+        self.redis_client.zadd(self.lease_key, {"payload-live": time.time() + 1})
+
+        renewed_count = self.module.renew_leases(
+            self.redis_client,
+            processing_key=self.processing_key,
+            payloads=["payload-live", "payload-reaped"],
+            lease_seconds=60,
+        )
+
+        self.assertEqual(renewed_count, 1)
+        self.assertEqual(self.redis_client.zrange(self.lease_key, 0, -1), ["payload-live"])
+        self.assertGreater(self.redis_client.zscore(self.lease_key, "payload-live"), time.time() + 50)
+
+    def test_drain_queue_with_leases_keeps_other_consumer_items_and_releases_own_leases(self):
+        """租约模式消费结束后，应释放自身租约，并保留其他消费者的在途任务。"""
+        logger = Mock()
+        other_payload = self.module.serialize_payload({"id": "other"})
+        self.redis_client.rpush(self.processing_key, other_payload)
+        self.redis_client.zadd(self.lease_key, {other_payload: time.time() + 60})
+        self.redis_client.rpush(self.pending_key, self.module.serialize_payload({"id": "1"}))
+        self.redis_client.rpush(self.pending_key, self.module.serialize_payload({"id": "2"}))
+        processed_ids = []
+
+        def fake_worker(info: dict) -> None:
+            processed_ids.append(info["id"])
+            if info["id"] == "2":
+                raise RuntimeError("boom")
+
+        result = self.module.drain_queue(
+            self.redis_client,
+            pending_key=self.pending_key,
+            processing_key=self.processing_key,
+            max_workers=2,
+            worker=fake_worker,
+            logger=logger,
+            queue_label="TEST",
+            identify_item=lambda info: info["id"],
+            lease_seconds=30,
+        )
+
+        self.assertEqual(result, {"processed": 2, "success": 1, "failed": 1})
+        self.assertCountEqual(processed_ids, ["1", "2"])
+        self.assertCountEqual(
+            [self.module.deserialize_payload(payload)["id"] for payload in self.redis_client.lrange(self.processing_key, 0, -1)],
+            ["other", "2"],
+        )
+        self.assertEqual(self.redis_client.zrange(self.lease_key, 0, -1), [other_payload])
+
+    def test_drain_queue_heartbeat_renews_leases_of_slow_workers(self):
+        """耗时超过租约的任务应靠心跳续租，不会被自己的回收逻辑重新入队。"""
+        logger = Mock()
+        self.redis_client.rpush(self.pending_key, self.module.serialize_payload({"id": "slow"}))
+        call_count = 0
+
+        def slow_worker(_info: dict) -> None:
+            nonlocal call_count
+            call_count += 1
+            time.sleep(0.5)
+
+        result = self.module.drain_queue(
+            self.redis_client,
+            pending_key=self.pending_key,
+            processing_key=self.processing_key,
+            failed_key=self.failed_key,
+            max_workers=1,
+            worker=slow_worker,
+            logger=logger,
+            queue_label="TEST",
+            identify_item=lambda info: info["id"],
+            lease_seconds=0.3,
+        )
+
+        self.assertEqual(result, {"processed": 1, "success": 1, "failed": 0})
+        self.assertEqual(call_count, 1)
+        self.assertEqual(self.redis_client.llen(self.pending_key), 0)
+        self.assertEqual(self.redis_client.llen(self.processing_key), 0)
+        self.assertEqual(self.redis_client.zcard(self.lease_key), 0)
+
+
+class TestRetryQueue(FakeredisTestCase):
+    """验证失败任务通过 Redis 延迟重试，而不是在线程里睡眠。"""
+
+    def setUp(self):
+        super().setUp()
+        self.retry_key = f"{self.pending_key}:retry"
+
+    def tearDown(self):
+        self.redis_client.delete(self.retry_key)
+        super().tearDown()
+
+    def drain(self, worker, retry_policy, **kwargs):
+        """用默认参数调用 ``drain_queue``。"""
+        return self.module.drain_queue(
+            self.redis_client,
+            pending_key=self.pending_key,
+            processing_key=self.processing_key,
+            failed_key=self.failed_key,
+            max_workers=2,
+            worker=worker,
+            logger=Mock(),
+            queue_label="TEST",
+            identify_item=lambda info: info["id"],
+            retry_policy=retry_policy,
+            **kwargs,
+        )
+
+    def test_retry_policy_get_delay_backs_off_exponentially_up_to_max_delay(self):
+        """重试间隔按指数增长，并受 ``max_delay`` 限制。"""
+        policy = self.module.RetryPolicy("retry", base_delay=2, max_delay=10)
+
+        self.assertEqual([policy.get_delay(attempt) for attempt in range(1, 5)], [2, 4, 8, 10])
+
+    def test_schedule_task_retry_records_attempt_and_due_time(self):
+        """排队重试时应记录尝试次数，并按服务器时间计算到期时间。"""
+        delay = self.module.schedule_task_retry(
+            self.redis_client,
+            retry_policy=self.module.RetryPolicy(self.retry_key, base_delay=15),
+            info={"id": "1", "_retry_attempt": 1},
+        )
+
+        self.assertEqual(delay, 30)
+        [(payload, due_at)] = self.redis_client.zrange(self.retry_key, 0, -1, withscores=True)
+        self.assertEqual(self.module.deserialize_payload(payload), {"id": "1", "_retry_attempt": 2})
+        self.assertEqual(self.module.get_task_attempt(self.module.deserialize_payload(payload)), 2)
+        self.assertGreater(due_at, time.time() + 20)
+
+    def test_promote_due_retries_only_moves_due_items(self):
+        """只有到期的重试任务会回到待处理队列。"""
+        self.redis_client.zadd(self.retry_key, {"payload-due": 0, "payload-later": time.time() + 60})
+
+        promoted_count = self.module.promote_due_retries(
+            self.redis_client,
+            retry_key=self.retry_key,
+            pending_key=self.pending_key,
+        )
+
+        self.assertEqual(promoted_count, 1)
+        self.assertEqual(self.redis_client.lrange(self.pending_key, 0, -1), ["payload-due"])
+        self.assertEqual(self.redis_client.zrange(self.retry_key, 0, -1), ["payload-later"])
+
+    def test_drain_queue_retries_failed_task_until_it_succeeds(self):
+        """失败任务进入延迟队列，到期后重新领取并最终成功。"""
+        self.redis_client.rpush(self.pending_key, self.module.serialize_payload({"id": "1"}))
+        attempts = []
+
+        def flaky_worker(info: dict) -> None:
+            attempts.append(self.module.get_task_attempt(info))
+            if len(attempts) < 3:
+                raise RuntimeError("boom")
+
+        result = self.drain(flaky_worker, self.module.RetryPolicy(self.retry_key, base_delay=0.05, poll_seconds=0.05))
+
+        self.assertEqual(result, {"processed": 3, "success": 1, "failed": 0})
+        self.assertEqual(attempts, [0, 1, 2])
+        self.assertEqual(self.redis_client.llen(self.pending_key), 0)
+        self.assertEqual(self.redis_client.llen(self.processing_key), 0)
+        self.assertEqual(self.redis_client.llen(self.failed_key), 0)
+        self.assertEqual(self.redis_client.zcard(self.retry_key), 0)
+
+    def test_drain_queue_moves_task_to_failed_after_max_attempts(self):
+        """重试次数用尽后，任务按原有逻辑进入失败队列。"""
+        self.redis_client.rpush(self.pending_key, self.module.serialize_payload({"id": "1"}))
+        worker = Mock(side_effect=RuntimeError("boom"))
+
+        result = self.drain(worker, self.module.RetryPolicy(self.retry_key, max_attempts=2, base_delay=0.01))
+
+        self.assertEqual(result, {"processed": 2, "success": 0, "failed": 1})
+        self.assertEqual(worker.call_count, 2)
+        self.assertEqual(
+            [self.module.deserialize_payload(payload) for payload in self.redis_client.lrange(self.failed_key, 0, -1)],
+            [{"id": "1", "_retry_attempt": 1}],
+        )
+        self.assertEqual(self.redis_client.zcard(self.retry_key), 0)
+
+    def test_drain_queue_does_not_retry_aborting_exception(self):
+        """``abort_on_exception`` 命中的异常不进入重试队列。"""
+        self.redis_client.rpush(self.pending_key, self.module.serialize_payload({"id": "1"}))
+
+        with self.assertRaisesRegex(RuntimeError, "fatal"):
+            self.drain(
+                Mock(side_effect=RuntimeError("fatal")),
+                self.module.RetryPolicy(self.retry_key, base_delay=0.01),
+                abort_on_exception=lambda exc: True,
+            )
+
+        self.assertEqual(self.redis_client.zcard(self.retry_key), 0)
+        self.assertEqual(self.redis_client.lrange(self.processing_key, 0, -1), [])
+
+
+class TestAdaptiveConcurrencyLimiter(unittest.TestCase):
+    """验证按主机划分的 AIMD 并发控制。"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.module = load_scrapy_redis()
+
+    def finish(self, limiter, host: str, error: BaseException | None = None) -> None:
+        """占用并立即释放一个名额。"""
+        started_at = limiter.try_acquire(host)
+        self.assertIsNotNone(started_at)
+        limiter.release(host, started_at, error)
+
+    def test_try_acquire_stops_at_current_limit_per_host(self):
+        """同一主机名额用完后拒绝，其他主机不受影响。"""
+        limiter = self.module.AdaptiveConcurrencyLimiter(max_limit=8, initial_limit=2)
+
+        self.assertIsNotNone(limiter.try_acquire("a.example"))
+        self.assertIsNotNone(limiter.try_acquire("a.example"))
+        self.assertIsNone(limiter.try_acquire("a.example"))
+        self.assertIsNotNone(limiter.try_acquire("b.example"))
+
+    def test_successes_grow_limit_additively_up_to_max_limit(self):
+        """每完成约一个窗口的成功任务，上限加一，且不超过 ``max_limit``。"""
+        limiter = self.module.AdaptiveConcurrencyLimiter(max_limit=4, initial_limit=2)
+
+        self.finish(limiter, "a.example")
+        self.assertEqual(limiter.get_limit("a.example"), 2)
+
+        for _ in range(2):
+            self.finish(limiter, "a.example")
+        self.assertEqual(limiter.get_limit("a.example"), 3)
+
+        for _ in range(20):
+            self.finish(limiter, "a.example")
+        self.assertEqual(limiter.get_limit("a.example"), 4)
+
+    def test_throttle_shrinks_limit_once_per_burst(self):
+        """同一批已发出的任务被限流时只收缩一次，新任务再被限流时继续收缩。"""
+        limiter = self.module.AdaptiveConcurrencyLimiter(max_limit=16, initial_limit=8)
+        throttled = self.module.ThrottledError("429", 429)
+        started = [limiter.try_acquire("a.example") for _ in range(4)]
+
+        for started_at in started:
+            limiter.release("a.example", started_at, throttled)
+        self.assertEqual(limiter.get_limit("a.example"), 4)
+
+        self.finish(limiter, "a.example", throttled)
+        self.assertEqual(limiter.get_limit("a.example"), 2)
+
+    def test_ordinary_errors_keep_limit_and_slow_tasks_shrink_it(self):
+        """普通失败不改变上限，耗时超过 ``latency_target`` 视为拥塞。"""
+        limiter = self.module.AdaptiveConcurrencyLimiter(max_limit=8, initial_limit=4, latency_target=10)
+
+        self.finish(limiter, "a.example", RuntimeError("boom"))
+        self.assertEqual(limiter.get_limit("a.example"), 4)
+
+        started_at = limiter.try_acquire("a.example")
+        limiter.release("a.example", started_at - 30)
+        self.assertEqual(limiter.get_limit("a.example"), 2)
+
+    def test_is_throttle_error_checks_exception_type_and_response_status(self):
+        """``ThrottledError`` 和携带 429 / 503 响应的异常都视为限流。"""
+        http_error = RuntimeError("http")
+        http_error.response = Mock(status_code=503)
+
+        self.assertTrue(self.module.is_throttle_error(self.module.ThrottledError("slow down")))
+        self.assertTrue(self.module.is_throttle_error(http_error))
+        self.assertFalse(self.module.is_throttle_error(RuntimeError("boom")))
+
+    def test_get_host_groups_urls_by_hostname(self):
+        """URL 按主机名分组，非 URL 原样返回。"""
+        get_host = self.module.AdaptiveConcurrencyLimiter.get_host
+
+        self.assertEqual(get_host("https://www.example.com/post/1"), "www.example.com")
+        self.assertEqual(get_host("item-1"), "item-1")
+
+
+class TestDrainQueueWithConcurrencyLimiter(FakeredisTestCase):
+    """验证 ``drain_queue`` 按并发控制器限制同时执行的任务数。"""
+
+    def drain(self, worker, limiter, **kwargs):
+        """用默认参数调用 ``drain_queue``。"""
+        return self.module.drain_queue(
+            self.redis_client,
+            pending_key=self.pending_key,
+            processing_key=self.processing_key,
+            failed_key=self.failed_key,
+            max_workers=8,
+            worker=worker,
+            logger=Mock(),
+            queue_label="TEST",
+            identify_item=lambda info: info["url"],
+            concurrency_limiter=limiter,
+            **kwargs,
+        )
+
+    def test_drain_queue_keeps_in_flight_tasks_within_host_limit(self):
+        """同一主机同时执行的任务数不超过控制器当前上限，全部任务最终完成。"""
+        for index in range(6):
+            self.redis_client.rpush(
+                self.pending_key,
+                self.module.serialize_payload({"url": f"https://a.example/{index}"}),
+            )
+        limiter = self.module.AdaptiveConcurrencyLimiter(max_limit=2, initial_limit=2)
+        lock = threading.Lock()
+        in_flight = 0
+        peak = 0
+
+        def worker(_info: dict) -> None:
+            nonlocal in_flight, peak
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.02)
+            with lock:
+                in_flight -= 1
+
+        result = self.drain(worker, limiter)
+
+        self.assertEqual(result, {"processed": 6, "success": 6, "failed": 0})
+        self.assertEqual(peak, 2)
+        self.assertEqual(self.redis_client.llen(self.pending_key), 0)
+        self.assertEqual(self.redis_client.llen(self.processing_key), 0)
+
+    def test_drain_queue_returns_deferred_tasks_to_pending_on_fatal_error(self):
+        """致命错误中止时，暂存未提交的任务应放回 pending。"""
+        for index in range(3):
+            self.redis_client.rpush(
+                self.pending_key,
+                self.module.serialize_payload({"url": f"https://a.example/{index}"}),
+            )
+        limiter = self.module.AdaptiveConcurrencyLimiter(max_limit=1)
+
+        with self.assertRaisesRegex(RuntimeError, "fatal"):
+            self.drain(
+                Mock(side_effect=RuntimeError("fatal")),
+                limiter,
+                abort_on_exception=lambda exc: True,
+            )
+
+        self.assertEqual(self.redis_client.llen(self.pending_key), 3)
+        self.assertEqual(self.redis_client.llen(self.processing_key), 0)
+
+    def test_drain_queue_renews_leases_of_deferred_tasks_while_limiter_is_saturated(self):
+        """共享名额被其他队列占满、本队列没有在途任务时，延后任务的租约也要按时续租。"""
+        payload = self.module.serialize_payload({"url": "https://a.example/1"})
+        self.redis_client.rpush(self.pending_key, payload)
+        limiter = self.module.AdaptiveConcurrencyLimiter(max_limit=1, poll_seconds=0.02)
+        started_at = limiter.try_acquire("a.example")
+        threading.Timer(0.5, limiter.release, args=("a.example", started_at)).start()
+        worker_started = threading.Event()
+        heartbeats_before_worker = []
+        maintain_leases = self.module.maintain_leases
+
+        def record_heartbeat(*args, payloads, **kwargs):
+            if not worker_started.is_set():
+                heartbeats_before_worker.append(list(payloads))
+            return maintain_leases(*args, payloads=payloads, **kwargs)
+
+        with patch.object(self.module, "maintain_leases", side_effect=record_heartbeat):
+            result = self.drain(lambda _info: worker_started.set(), limiter, lease_seconds=0.3)
+
+        self.assertEqual(result, {"processed": 1, "success": 1, "failed": 0})
+        self.assertIn([payload], heartbeats_before_worker)
+        self.assertEqual(self.redis_client.llen(self.processing_key), 0)
+
+
+class TestWorkerBudget(FakeredisTestCase):
+    """验证多站点共享的全局并发预算。"""
+
+    def push_tasks(self, pending_key: str, count: int) -> None:
+        """写入 ``count`` 个任务。"""
+        for index in range(count):
+            self.redis_client.rpush(pending_key, self.module.serialize_payload({"url": f"https://a.example/{index}"}))
+
+    def test_site_budget_clamps_max_workers_to_site_and_global_limits(self):
+        """队列并发取自身、站点和全局上限中的最小值。"""
+        budget = self.module.WorkerBudget(10)
+
+        self.assertEqual(self.module.SiteBudget(budget, "A").get_max_workers(32), 10)
+        self.assertEqual(self.module.SiteBudget(budget, "A", max_workers=4).get_max_workers(32), 4)
+        self.assertEqual(self.module.SiteBudget(budget, "A", max_workers=4).get_max_workers(2), 2)
+
+    def test_drain_queues_in_parallel_share_global_budget(self):
+        """两个站点同时消费时，合计执行中的任务数不超过全局上限，并按站点统计完成数。"""
+        budget = self.module.WorkerBudget(3)
+        second_pending_key = f"{self.pending_key}:second"
+        second_processing_key = f"{self.processing_key}:second"
+        self.push_tasks(self.pending_key, 6)
+        self.push_tasks(second_pending_key, 6)
+        lock = threading.Lock()
+        in_flight = 0
+        peak = 0
+
+        def worker(_info: dict) -> None:
+            nonlocal in_flight, peak
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.02)
+            with lock:
+                in_flight -= 1
+
+        def run_site(site: str, pending_key: str, processing_key: str) -> None:
+            with self.module.use_worker_budget(budget, site, max_workers=8):
+                self.module.drain_queue(
+                    self.redis_client,
+                    pending_key=pending_key,
+                    processing_key=processing_key,
+                    max_workers=8,
+                    worker=worker,
+                    logger=Mock(),
+                    queue_label=site,
+                    identify_item=lambda info: info["url"],
+                )
+
+        threads = [
+            threading.Thread(target=run_site, args=("A", self.pending_key, self.processing_key)),
+            threading.Thread(target=run_site, args=("B", second_pending_key, second_processing_key)),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.redis_client.delete(second_pending_key, second_processing_key)
+
+        self.assertLessEqual(peak, 3)
+        self.assertEqual(
+            budget.get_snapshot(),
+            {"A": {"active": 0, "completed": 6}, "B": {"active": 0, "completed": 6}},
+        )
+
+    def test_drain_queue_async_waits_for_budget_without_blocking_loop(self):
+        """协程 worker 也受全局预算约束。"""
+        budget = self.module.WorkerBudget(2)
+        self.push_tasks(self.pending_key, 5)
+        in_flight = 0
+        peak = 0
+
+        async def worker(_info: dict) -> None:
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+        async def run() -> dict:
+            with self.module.use_worker_budget(budget, "ASYNC"):
+                return await self.module.drain_queue_async(
+                    self.redis_client,
+                    pending_key=self.pending_key,
+                    processing_key=self.processing_key,
+                    max_concurrency=5,
+                    worker=worker,
+                    logger=Mock(),
+                    queue_label="ASYNC",
+                    identify_item=lambda info: info["url"],
+                )
+
+        result = asyncio.run(run())
+
+        self.assertEqual(result["success"], 5)
+        self.assertEqual(peak, 2)
+
+
+class TestQueueMetrics(FakeredisTestCase):
+    """验证队列指标的收集、汇总和输出。"""
+
+    def tearDown(self):
+        self.redis_client.delete("scrapy_metrics:TEST", "scrapy_metrics:TEST:history")
+        super().tearDown()
+
+    def test_get_quantile_uses_nearest_rank(self):
+        """分位数按最近秩法计算，空序列返回 0。"""
+        values = [float(value) for value in range(1, 101)]
+
+        self.assertEqual(self.module.get_quantile(values, 0.5), 50.0)
+        self.assertEqual(self.module.get_quantile(values, 0.99), 99.0)
+        self.assertEqual(self.module.get_quantile([], 0.5), 0.0)
+
+    def test_measure_phase_is_noop_outside_metrics_worker(self):
+        """未启用指标时，``measure_phase`` 不应影响 worker 的执行。"""
+        with self.module.measure_phase("http"):
+            result = 1 + 1
+
+        self.assertEqual(result, 2)
+
+    def test_summarize_reports_throughput_quantiles_and_phases(self):
+        """汇总应包含计数、吞吐、任务耗时分位数和各分段耗时。"""
+        metrics = self.module.QueueMetrics("TEST")
+        for seconds in (0.1, 0.2, 0.3, 0.4):
+            metrics.record_task(seconds)
+        metrics.record_phase("http", 0.5)
+        metrics.record_phase("http", 0.25)
+        metrics.started_at -= 2
+        metrics.finish({"processed": 4, "success": 3, "failed": 1, "retried": 2})
+
+        summary = metrics.summarize()
+
+        self.assertEqual(summary["processed"], 4)
+        self.assertEqual(summary["retried"], 2)
+        self.assertAlmostEqual(summary["tasks_per_second"], 2.0, places=1)
+        self.assertEqual(summary["task_p50_seconds"], 0.2)
+        self.assertEqual(summary["task_p99_seconds"], 0.4)
+        self.assertEqual(summary["http_seconds"], 0.75)
+        prometheus_text = metrics.to_prometheus()
+        self.assertIn('scrapy_queue_tasks_total{queue="TEST",result="failed"} 1', prometheus_text)
+        self.assertIn('scrapy_queue_task_seconds{queue="TEST",quantile="0.95"} 0.4', prometheus_text)
+        self.assertIn('scrapy_queue_phase_seconds_total{queue="TEST",phase="http"} 0.75', prometheus_text)
+
+    def test_drain_queue_collects_metrics_and_publishes_hash_history_and_textfile(self):
+        """启用指标后，消费结束应写入 Redis 哈希、历史列表和 Prometheus 文本文件。"""
+        for index in range(3):
+            self.redis_client.rpush(self.pending_key, self.module.serialize_payload({"id": str(index)}))
+
+        def worker(_info: dict) -> None:
+            with self.module.measure_phase("http"):
+                time.sleep(0.01)
+            with self.module.measure_phase("disk"):
+                pass
+
+        metrics = self.module.QueueMetrics("TEST")
+        with tempfile.TemporaryDirectory() as temp_dir, patch.object(self.module, "METRICS_DIR", temp_dir):
+            result = self.module.drain_queue(
+                self.redis_client,
+                pending_key=self.pending_key,
+                processing_key=self.processing_key,
+                failed_key=self.failed_key,
+                max_workers=2,
+                worker=worker,
+                logger=Mock(),
+                queue_label="TEST",
+                identify_item=lambda info: info["id"],
+                metrics=metrics,
+            )
+            prometheus_text = Path(temp_dir, "test.prom").read_text(encoding="utf-8")
+
+        self.assertEqual(result, {"processed": 3, "success": 3, "failed": 0})
+        self.assertEqual(len(metrics.task_seconds), 3)
+        self.assertGreaterEqual(metrics.phase_seconds["http"], 0.03)
+        self.assertIn("disk", metrics.phase_seconds)
+        self.assertGreater(metrics.phase_seconds["redis"], 0)
+        stored = self.redis_client.hgetall("scrapy_metrics:TEST")
+        self.assertEqual(stored["processed"], "3")
+        self.assertIn("task_p95_seconds", stored)
+        self.assertEqual(self.redis_client.llen("scrapy_metrics:TEST:history"), 1)
+        self.assertIn('scrapy_queue_tasks_total{queue="TEST",result="success"} 3', prometheus_text)
+
+    def test_drain_queue_async_records_coroutine_worker_phases(self):
+        """协程版消费同样记录任务耗时和 ``measure_phase`` 分段。"""
+        self.redis_client.rpush(self.pending_key, self.module.serialize_payload({"id": "1"}))
+
+        async def worker(_info: dict) -> None:
+            with self.module.measure_phase("http"):
+                await asyncio.sleep(0.01)
+
+        metrics = self.module.QueueMetrics("TEST")
+        asyncio.run(
+            self.module.drain_queue_async(
+                self.redis_client,
+                pending_key=self.pending_key,
+                processing_key=self.processing_key,
+                max_concurrency=2,
+                worker=worker,
+                logger=Mock(),
+                queue_label="TEST",
+                identify_item=lambda info: info["id"],
+                metrics=metrics,
+            )
+        )
+
+        self.assertEqual(len(metrics.task_seconds), 1)
+        self.assertGreaterEqual(metrics.phase_seconds["http"], 0.01)
+
+
+class TestDrainQueueAsync(FakeredisTestCase):
+    """验证协程版消费与线程池版保持相同的队列语义。"""
+
+    def test_drain_queue_async_runs_coroutine_workers_concurrently(self):
+        """协程 worker 应在同一事件循环内并发执行，并清空 processing。"""
+        logger = Mock()
+        for index in range(5):
+            self.redis_client.rpush(self.pending_key, self.module.serialize_payload({"id": str(index)}))
+        running = 0
+        max_running = 0
+
+        async def fake_worker(_info: dict) -> None:
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        result = asyncio.run(
+            self.module.drain_queue_async(
+                self.redis_client,
+                pending_key=self.pending_key,
+                processing_key=self.processing_key,
+                failed_key=self.failed_key,
+                max_concurrency=3,
+                worker=fake_worker,
+                logger=logger,
+                queue_label="TEST",
+                identify_item=lambda info: info["id"],
+            )
+        )
+
+        self.assertEqual(result, {"processed": 5, "success": 5, "failed": 0})
+        self.assertEqual(max_running, 3)
+        self.assertEqual(self.redis_client.llen(self.pending_key), 0)
+        self.assertEqual(self.redis_client.llen(self.processing_key), 0)
+
+    def test_drain_queue_async_accepts_sync_worker_and_records_failures(self):
+        """普通函数 worker 也应可用，失败任务写入 failed 队列。"""
+        logger = Mock()
+        self.redis_client.rpush(self.pending_key, self.module.serialize_payload({"id": "1"}))
+        self.redis_client.rpush(self.pending_key, self.module.serialize_payload({"id": "2"}))
+
+        def fake_worker(info: dict) -> None:
+            if info["id"] == "2":
+                raise RuntimeError("boom")
+
+        result = asyncio.run(
+            self.module.drain_queue_async(
+                self.redis_client,
+                pending_key=self.pending_key,
+                processing_key=self.processing_key,
+                failed_key=self.failed_key,
+                max_concurrency=2,
+                worker=fake_worker,
+                logger=logger,
+                queue_label="TEST",
+                identify_item=lambda info: info["id"],
+            )
+        )
+
+        self.assertEqual(result, {"processed": 2, "success": 1, "failed": 1})
+        self.assertEqual(self.redis_client.llen(self.processing_key), 0)
+        self.assertEqual(
+            [self.module.deserialize_payload(payload)["id"] for payload in self.redis_client.lrange(self.failed_key, 0, -1)],
+            ["2"],
+        )
+        self.assertIn("抓取出错：2，错误：boom", logger.error.call_args[0][0])
+
+    def test_drain_queue_async_requeues_fatal_item_and_raises(self):
+        """致命异常应把当前任务放回 pending 并在收尾后抛出。"""
+        logger = Mock()
+        payload_fail = self.module.serialize_payload({"id": "fatal"})
+        self.redis_client.rpush(self.pending_key, payload_fail)
+
+        async def fake_worker(_info: dict) -> None:
+            raise RuntimeError("fatal boom")
+
+        with self.assertRaisesRegex(RuntimeError, "fatal boom"):
+            asyncio.run(
+                self.module.drain_queue_async(
+                    self.redis_client,
+                    pending_key=self.pending_key,
+                    processing_key=self.processing_key,
+                    failed_key=self.failed_key,
+                    max_concurrency=2,
+                    worker=fake_worker,
+                    logger=logger,
+                    queue_label="TEST",
+                    identify_item=lambda info: info["id"],
+                    abort_on_exception=lambda exc: isinstance(exc, RuntimeError),
+                )
+            )
+
+        self.assertEqual(self.redis_client.lrange(self.pending_key, 0, -1), [payload_fail])
+        self.assertEqual(self.redis_client.llen(self.processing_key), 0)
+        self.assertEqual(self.redis_client.llen(self.failed_key), 0)
+
+    def test_drain_queue_async_keeps_in_flight_tasks_within_host_limit(self):
+        """配置并发控制器时，同一主机同时执行的协程数不超过控制器上限。"""
+        for index in range(6):
+            self.redis_client.rpush(self.pending_key, self.module.serialize_payload({"url": f"https://a.example/{index}"}))
+        limiter = self.module.AdaptiveConcurrencyLimiter(max_limit=2, initial_limit=2)
+        running = 0
+        max_running = 0
+
+        async def fake_worker(_info: dict) -> None:
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        result = asyncio.run(
+            self.module.drain_queue_async(
+                self.redis_client,
+                pending_key=self.pending_key,
+                processing_key=self.processing_key,
+                failed_key=self.failed_key,
+                max_concurrency=8,
+                worker=fake_worker,
+                logger=Mock(),
+                queue_label="TEST",
+                identify_item=lambda info: info["url"],
+                concurrency_limiter=limiter,
+            )
+        )
+
+        self.assertEqual(result, {"processed": 6, "success": 6, "failed": 0})
+        self.assertEqual(max_running, 2)
+        self.assertEqual(self.redis_client.llen(self.processing_key), 0)
+
+    def test_drain_queue_async_waits_for_tasks_enqueued_while_producer_is_active(self):
+        """列表扫描仍在进行时队列暂空也不退出，扫描结束后处理完新入队的任务再返回。"""
+        scan_done = threading.Event()
+
+        def produce() -> None:
+            time.sleep(0.05)
+            self.redis_client.rpush(self.pending_key, self.module.serialize_payload({"id": "late"}))
+            scan_done.set()
+
+        visited = []
+
+        async def fake_worker(info: dict) -> None:
+            visited.append(info["id"])
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        with patch.object(self.module, "PRODUCER_POLL_SECONDS", 0.01):
+            result = asyncio.run(
+                self.module.drain_queue_async(
+                    self.redis_client,
+                    pending_key=self.pending_key,
+                    processing_key=self.processing_key,
+                    max_concurrency=2,
+                    worker=fake_worker,
+                    logger=Mock(),
+                    queue_label="TEST",
+                    identify_item=lambda info: info["id"],
+                    producer_active=lambda: not scan_done.is_set(),
+                )
+            )
+        producer.join()
+
+        self.assertEqual(result, {"processed": 1, "success": 1, "failed": 0})
+        self.assertEqual(visited, ["late"])
+
+
 @unittest.skipUnless(
     os.environ.get(RUN_REAL_REDIS_ENV) == "1",
     f"set {RUN_REAL_REDIS_ENV}=1 to run real Redis integration tests",
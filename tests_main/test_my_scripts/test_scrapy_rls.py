@@ -8,17 +8,20 @@
 3. 详情页 IMDb 提取、文件名组装和最终配置回写。
 """
 
+import asyncio
 import copy
 import importlib.util
 import json
 import sys
 import tempfile
+import threading
 import types
 import unittest
 import uuid
 from pathlib import Path
 from unittest.mock import Mock, call, patch
 
+import httpx
 import requests
 try:
     import fakeredis
@@ -28,6 +31,7 @@ except ImportError:  # pragma: no cover - 由依赖安装状态决定
 requests.packages.urllib3.disable_warnings()
 
 MODULE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "scrapy_rls.py"
+HTTP_SESSION_PATH = Path(__file__).resolve().parents[2] / "my_module" / "module_use" / "build_http_session.py"
 
 
 class _FallbackFakeRedis:
@@ -142,6 +146,16 @@ def load_scrapy_rls(config: dict | None = None):
         module_config.update(config)
 
     fake_my_module = types.ModuleType("my_module")
+    http_session_spec = importlib.util.spec_from_file_location(
+        f"build_http_session_test_{uuid.uuid4().hex}",
+        HTTP_SESSION_PATH,
+    )
+    http_session_module = importlib.util.module_from_spec(http_session_spec)
+    http_session_spec.loader.exec_module(http_session_module)
+    fake_my_module.build_http_session = http_session_module.build_http_session
+    fake_my_module.build_httpx_client = Mock(
+        side_effect=lambda pool_size, *, headers=None, async_client=False, **kwargs: httpx.AsyncClient(headers=headers)
+    )
     fake_my_module.read_json_to_dict = lambda _path: copy.deepcopy(module_config)
     fake_my_module.normalize_release_title_for_filename = lambda title: title
     fake_my_module.sanitize_filename = lambda name: name
@@ -166,7 +180,7 @@ def load_scrapy_rls(config: dict | None = None):
     fake_scrapy_redis.serialize_payload = lambda payload: json.dumps(payload, ensure_ascii=False, sort_keys=True)
     fake_scrapy_redis.deserialize_payload = lambda payload: json.loads(payload)
 
-    def fake_push_items_to_queue(redis_client, items, *, seen_key, pending_key, unique_value, serializer):
+    def fake_push_items_to_queue(redis_client, items, *, seen_key, pending_key, unique_value, serializer, bloom=None):
         if not items:
             return 0
         added_count = 0
@@ -177,8 +191,55 @@ def load_scrapy_rls(config: dict | None = None):
         return added_count
 
     fake_scrapy_redis.push_items_to_queue = fake_push_items_to_queue
+    fake_scrapy_redis.build_page_fingerprint = lambda values, headers=None: "ids:" + ",".join(sorted(values))
+    fake_scrapy_redis.is_page_processed = (
+        lambda redis_client, key, page, fingerprint: redis_client.hget(key, str(page)) == fingerprint
+    )
+    fake_scrapy_redis.stage_page_fingerprint = (
+        lambda redis_client, key, page, fingerprint: redis_client.hset(f"{key}:next", str(page), fingerprint)
+    )
+
+    def fake_commit_page_fingerprints(redis_client, key):
+        staged = redis_client.hgetall(f"{key}:next")
+        if staged:
+            redis_client.hset(key, mapping=staged)
+        redis_client.delete(f"{key}:next")
+        return len(staged)
+
+    fake_scrapy_redis.commit_page_fingerprints = fake_commit_page_fingerprints
+    fake_scrapy_redis.build_seen_bloom = lambda _config: None
+    def fake_move_processing_to_pending(redis_client, *, processing_key, pending_key):
+        moved_count = 0
+        while redis_client.rpoplpush(processing_key, pending_key):
+            moved_count += 1
+        return moved_count
+
+    fake_scrapy_redis.move_processing_to_pending = fake_move_processing_to_pending
     fake_scrapy_redis.drain_queue = lambda *args, **kwargs: {"processed": 0, "success": 0, "failed": 0}
 
+    async def fake_drain_queue_async(*args, **kwargs):
+        return {"processed": 0, "success": 0, "failed": 0}
+
+    fake_scrapy_redis.drain_queue_async = fake_drain_queue_async
+
+    class FakeThrottledError(RuntimeError):
+        def __init__(self, message, status_code=None):
+            super().__init__(message)
+            self.status_code = status_code
+
+    fake_scrapy_redis.THROTTLE_STATUS_CODES = (429, 503)
+    fake_scrapy_redis.ThrottledError = FakeThrottledError
+    class FakeAdaptiveConcurrencyLimiter(types.SimpleNamespace):
+        pass
+
+    fake_scrapy_redis.AdaptiveConcurrencyLimiter = FakeAdaptiveConcurrencyLimiter
+
+    class FakeRetryPolicy:
+        def __init__(self, retry_key, **kwargs):
+            self.retry_key = retry_key
+
+    fake_scrapy_redis.RetryPolicy = FakeRetryPolicy
+
     fake_sort_movie_ops = types.ModuleType("sort_movie_ops")
 
     def fake_extract_imdb_id_from_links(hrefs):
@@ -308,7 +369,7 @@ class TestGetRlsResponse(unittest.TestCase):
         """请求成功时应返回响应对象，并统一设置 UTF-8 编码。"""
         response = Mock(status_code=200)
 
-        with patch.object(self.module.requests, "get", return_value=response) as mock_get:
+        with patch.object(self.module.session, "get", return_value=response) as mock_get:
             result = self.module.get_rls_response("https://example.com/page/1")
 
         self.assertIs(result, response)
@@ -324,7 +385,7 @@ class TestGetRlsResponse(unittest.TestCase):
         response = Mock(status_code=403)
         response.text = ""
 
-        with patch.object(self.module.requests, "get", return_value=response):
+        with patch.object(self.module.session, "get", return_value=response):
             with self.assertRaisesRegex(SystemExit, "403"):
                 self.module.get_rls_response("https://example.com/page/1")
 
@@ -333,16 +394,27 @@ class TestGetRlsResponse(unittest.TestCase):
         response = Mock(status_code=200)
         response.text = "<title>Just a moment...</title>"
 
-        with patch.object(self.module.requests, "get", return_value=response):
+        with patch.object(self.module.session, "get", return_value=response):
             with self.assertRaisesRegex(self.module.RlsCloudflareError, "https://example.com/verify"):
                 self.module.get_rls_response("https://example.com/page/1")
 
+    def test_get_rls_response_raises_throttled_error_for_429(self):
+        """429 应抛出限流异常，供自适应并发收缩。"""
+        response = Mock(status_code=429)
+        response.text = ""
+
+        with patch.object(self.module.session, "get", return_value=response):
+            with self.assertRaises(self.module.ThrottledError) as context:
+                self.module.get_rls_response("https://example.com/page/1")
+
+        self.assertEqual(context.exception.status_code, 429)
+
     def test_get_rls_response_raises_exception_for_non_200_status(self):
         """普通非 200 状态码应抛异常，交给重试逻辑处理。"""
         response = Mock(status_code=500)
         response.text = ""
 
-        with patch.object(self.module.requests, "get", return_value=response):
+        with patch.object(self.module.session, "get", return_value=response):
             with self.assertRaisesRegex(Exception, "500"):
                 self.module.get_rls_response("https://example.com/page/1")
 
@@ -369,7 +441,7 @@ class TestVisitRlsUrl(unittest.TestCase):
             )
         )
 
-        with patch.object(self.module, "get_rls_response", return_value=response):
+        with patch.object(self.module, "get_rls_detail_response", return_value=response):
             self.module.visit_rls_url(result_item)
 
         output_path = Path(self.temp_dir.name) / "Movie.Title.2026 - rls [tt7654321].rls"
@@ -385,7 +457,7 @@ class TestVisitRlsUrl(unittest.TestCase):
         }
         response = Mock(text=build_detail_page_html("https://example.com/jump?target=tt1234567"))
 
-        with patch.object(self.module, "get_rls_response", return_value=response):
+        with patch.object(self.module, "get_rls_detail_response", return_value=response):
             self.module.visit_rls_url(result_item)
 
         output_path = Path(self.temp_dir.name) / "Loose.Match.2026 - rls [tt1234567].rls"
@@ -415,7 +487,7 @@ class TestEnqueueRlsPosts(unittest.TestCase):
             {"title": "Foreign.Stop.2026", "url": "u2"},
         ]
 
-        with patch.object(self.module, "get_rls_response", return_value=Mock(text="html")) as mock_get, patch.object(
+        with patch.object(self.module, "get_rls_response", return_value=Mock(text="html", headers={})) as mock_get, patch.object(
             self.module, "parse_rls_response", side_effect=[[], parsed_page]
         ) as mock_parse, patch.object(
             self.module.time, "sleep"
@@ -453,7 +525,7 @@ class TestEnqueueRlsPosts(unittest.TestCase):
 
     def test_enqueue_rls_single_mode_stops_after_reaching_empty_page_retry_limit(self):
         """同一页连续空结果达到上限后，应抛错停止而不是无限重试。"""
-        with patch.object(self.module, "get_rls_response", return_value=Mock(text="html")) as mock_get, patch.object(
+        with patch.object(self.module, "get_rls_response", return_value=Mock(text="html", headers={})) as mock_get, patch.object(
             self.module, "parse_rls_response", side_effect=[[], [], []]
         ), patch.object(
             self.module.time, "sleep"
@@ -474,7 +546,7 @@ class TestEnqueueRlsPosts(unittest.TestCase):
             {"title": "Movie.New.2026", "url": "u3"},
         ]
 
-        with patch.object(self.module, "get_rls_response", return_value=Mock(text="html")) as mock_get, patch.object(
+        with patch.object(self.module, "get_rls_response", return_value=Mock(text="html", headers={})) as mock_get, patch.object(
             self.module, "parse_rls_response", return_value=parsed_page
         ):
             self.module.enqueue_rls_single_mode(1, False, self.redis_client)
@@ -483,6 +555,63 @@ class TestEnqueueRlsPosts(unittest.TestCase):
         self.assertEqual(self.redis_client.get(self.module.REDIS_MOVIE_SCAN_PAGE_KEY), "6")
         self.assertEqual(self.redis_client.get(self.module.REDIS_MOVIE_SCAN_COMPLETE_KEY), "1")
 
+    def test_enqueue_rls_single_mode_stops_at_page_unchanged_since_last_run(self):
+        """列表页指纹与上一轮完成时相同，应提前结束扫描，不必翻到截止标题。"""
+        self.redis_client.hset(self.module.REDIS_MOVIE_PAGE_FINGERPRINT_KEY, "2", "ids:u5,u6")
+        pages = [
+            [{"title": "Movie.New.2026", "url": "u4"}],
+            [{"title": "Movie.Old.2026", "url": "u6"}, {"title": "Movie.Older.2026", "url": "u5"}],
+        ]
+
+        with patch.object(self.module, "get_rls_response", return_value=Mock(text="html", headers={})) as mock_get, patch.object(
+            self.module, "parse_rls_response", side_effect=pages
+        ):
+            self.module.enqueue_rls_single_mode(1, False, self.redis_client)
+
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(self.redis_client.get(self.module.REDIS_MOVIE_SCAN_COMPLETE_KEY), "1")
+        self.assertEqual(self.redis_client.get(self.module.REDIS_MOVIE_SCAN_PAGE_KEY), "3")
+        queued_payloads = self.redis_client.lrange(self.module.REDIS_PENDING_KEY, 0, -1)
+        self.assertEqual([self.module.deserialize_payload(payload)["url"] for payload in queued_payloads], ["u4"])
+        self.assertEqual(
+            self.redis_client.hgetall(f"{self.module.REDIS_MOVIE_PAGE_FINGERPRINT_KEY}:next"),
+            {"1": "ids:u4"},
+        )
+
+    def test_first_page_unchanged_still_records_end_titles_so_next_run_scans_again(self):
+        """首页即与上一轮相同时也应记录下一轮截止标题，收尾能清理扫描状态，下一轮照常翻页。"""
+        self.redis_client.hset(self.module.REDIS_FOREIGN_PAGE_FINGERPRINT_KEY, "1", "ids:u1")
+        self.redis_client.hset(self.module.REDIS_MOVIE_PAGE_FINGERPRINT_KEY, "1", "ids:u2")
+        pages = [
+            [{"title": "Foreign.Stop.2026", "url": "u1"}],
+            [{"title": "Movie.Stop.2026", "url": "u2"}],
+        ]
+
+        with patch.object(self.module, "get_rls_response", return_value=Mock(text="html", headers={})) as mock_get, patch.object(
+            self.module, "parse_rls_response", side_effect=pages
+        ):
+            self.module.enqueue_rls_posts(start_page=1, redis_client=self.redis_client)
+
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(self.redis_client.llen(self.module.REDIS_PENDING_KEY), 0)
+        self.assertEqual(
+            self.module.deserialize_payload(self.redis_client.get(self.module.REDIS_FOREIGN_NEXT_END_TITLES_KEY)),
+            {"titles": ["Foreign.Stop.2026"]},
+        )
+
+        with patch.object(self.module, "update_json_config"):
+            self.module.finalize_rls_run(redis_client=self.redis_client)
+
+        self.assertIsNone(self.redis_client.get(self.module.REDIS_FOREIGN_SCAN_COMPLETE_KEY))
+        self.assertIsNone(self.redis_client.get(self.module.REDIS_MOVIE_SCAN_COMPLETE_KEY))
+
+        with patch.object(self.module, "get_rls_response", return_value=Mock(text="html", headers={})) as mock_get, patch.object(
+            self.module, "parse_rls_response", side_effect=pages
+        ):
+            self.module.enqueue_rls_posts(start_page=1, redis_client=self.redis_client)
+
+        self.assertEqual(mock_get.call_count, 2)
+
     def test_enqueue_rls_posts_runs_both_modes_and_deduplicates_urls_in_shared_queue(self):
         """两条列表流程应顺序入同一个队列，重复 URL 只保留一份。"""
         foreign_page = [
@@ -494,7 +623,7 @@ class TestEnqueueRlsPosts(unittest.TestCase):
             {"title": "Movie.New.2026", "url": "u3"},
         ]
 
-        with patch.object(self.module, "get_rls_response", return_value=Mock(text="html")), patch.object(
+        with patch.object(self.module, "get_rls_response", return_value=Mock(text="html", headers={})), patch.object(
             self.module, "parse_rls_response", side_effect=[foreign_page, movie_page]
         ):
             self.module.enqueue_rls_posts(start_page=1, redis_client=self.redis_client)
@@ -558,12 +687,141 @@ class TestDrainRlsQueue(unittest.TestCase):
             identify_item=unittest.mock.ANY,
             abort_on_exception=unittest.mock.ANY,
             recover_processing_on_start=False,
+            retry_policy=None,
+            concurrency_limiter=None,
         )
 
         abort_on_exception = mock_drain.call_args.kwargs["abort_on_exception"]
         self.assertTrue(abort_on_exception(self.module.RlsCloudflareError("cf")))
         self.assertFalse(abort_on_exception(RuntimeError("boom")))
 
+    def test_build_rls_concurrency_limiter_caps_at_thread_number_and_only_counts_throttle(self):
+        """开启自适应并发后，上限取 ``thread_number``；只有限流收缩并发，Cloudflare 验证页会直接终止本轮。"""
+        self.temp_dir.cleanup()
+        self.module, self.temp_dir = load_scrapy_rls({"adaptive_concurrency": True, "latency_target": 8})
+
+        limiter = self.module.build_rls_concurrency_limiter()
+
+        self.assertEqual(limiter.max_limit, self.module.THREAD_NUMBER)
+        self.assertEqual(limiter.latency_target, 8)
+        self.assertFalse(limiter.is_throttled(self.module.RlsCloudflareError("cf")))
+        self.assertTrue(limiter.is_throttled(self.module.ThrottledError("429", 429)))
+        self.assertFalse(limiter.is_throttled(RuntimeError("boom")))
+
+    def test_adaptive_concurrency_requeues_throttled_details_instead_of_retrying_in_thread(self):
+        """开启自适应并发后，详情页限流直接交给队列延迟重试；列表页请求和其他失败照常在线程内重试。"""
+        throttled = self.module.ThrottledError("429", 429)
+        self.assertTrue(self.module.should_retry_rls_detail_request(throttled))
+
+        self.temp_dir.cleanup()
+        self.module, self.temp_dir = load_scrapy_rls({"adaptive_concurrency": True})
+        throttled = self.module.ThrottledError("429", 429)
+
+        self.assertFalse(self.module.should_retry_rls_detail_request(throttled))
+        self.assertFalse(self.module.should_retry_rls_detail_request(self.module.RlsCloudflareError("cf")))
+        self.assertTrue(self.module.should_retry_rls_detail_request(RuntimeError("boom")))
+        self.assertTrue(self.module.should_retry_rls_request(throttled))
+        with patch.object(self.module, "drain_queue") as mock_drain:
+            self.module.drain_rls_queue(redis_client=self.redis_client)
+        self.assertEqual(mock_drain.call_args.kwargs["retry_policy"].retry_key, "rls_retry")
+
+
+class TestDrainRlsQueueAsync(unittest.TestCase):
+    """验证协程消费模式的开关与请求重试。"""
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_drain_rls_queue_uses_async_drain_when_enabled(self):
+        """开启 ``async_drain`` 后应改用协程消费，并沿用相同的队列参数。"""
+        self.module, self.temp_dir = load_scrapy_rls({"async_drain": True, "async_concurrency": 8})
+        redis_client = FakeRedis()
+        captured = {}
+
+        async def fake_drain_queue_async(client, **kwargs):
+            captured["client"] = client
+            captured.update(kwargs)
+
+        with patch.object(self.module, "drain_queue") as mock_drain, \
+                patch.object(self.module, "drain_queue_async", side_effect=fake_drain_queue_async):
+            self.module.drain_rls_queue(redis_client=redis_client)
+
+        mock_drain.assert_not_called()
+        self.assertIs(captured["client"], redis_client)
+        self.assertEqual(captured["pending_key"], self.module.REDIS_PENDING_KEY)
+        self.assertEqual(captured["processing_key"], self.module.REDIS_PROCESSING_KEY)
+        self.assertEqual(captured["max_concurrency"], 8)
+        self.assertFalse(captured["recover_processing_on_start"])
+        self.assertTrue(captured["abort_on_exception"](self.module.RlsCloudflareError("cf")))
+        self.module.build_httpx_client.assert_called_once_with(8, headers=self.module.REQUEST_HEAD, async_client=True)
+        self.assertIsNone(captured["retry_policy"])
+        self.assertIsNone(captured["concurrency_limiter"])
+
+    def test_async_drain_keeps_adaptive_concurrency_and_delayed_retry(self):
+        """协程消费同样使用延迟重试和以 ``async_concurrency`` 为上限的自适应并发，限流异常不在协程内重试。"""
+        self.module, self.temp_dir = load_scrapy_rls(
+            {"async_drain": True, "async_concurrency": 8, "adaptive_concurrency": True}
+        )
+        captured = {}
+
+        async def fake_drain_queue_async(client, **kwargs):
+            captured.update(kwargs)
+
+        with patch.object(self.module, "drain_queue_async", side_effect=fake_drain_queue_async):
+            self.module.drain_rls_queue(redis_client=FakeRedis())
+
+        self.assertEqual(captured["retry_policy"].retry_key, self.module.REDIS_RETRY_KEY)
+        self.assertEqual(captured["concurrency_limiter"].max_limit, 8)
+
+        client = Mock()
+        client.get = unittest.mock.AsyncMock(return_value=Mock(status_code=429, text="<html>slow down</html>"))
+        with self.assertRaises(self.module.ThrottledError):
+            asyncio.run(self.module.get_rls_response_async(client, "https://example.com/post/1"))
+        self.assertEqual(client.get.await_count, 1)
+
+    def test_get_rls_response_async_retries_until_success_without_blocking(self):
+        """普通失败应在协程内等待后重试，Cloudflare 页面直接抛出。"""
+        self.module, self.temp_dir = load_scrapy_rls()
+        ok_response = Mock(status_code=200, text="<html>ok</html>")
+        bad_response = Mock(status_code=500, text="<html>oops</html>")
+        client = Mock()
+        client.get = unittest.mock.AsyncMock(side_effect=[bad_response, ok_response])
+
+        with patch.object(self.module.asyncio, "sleep", new=unittest.mock.AsyncMock()) as mock_sleep:
+            response = asyncio.run(self.module.get_rls_response_async(client, "https://example.com/post/1"))
+
+        self.assertIs(response, ok_response)
+        self.assertEqual(client.get.await_count, 2)
+        mock_sleep.assert_awaited_once()
+
+        client.get = unittest.mock.AsyncMock(return_value=Mock(status_code=200, text="<title>Just a moment</title>"))
+        with self.assertRaises(self.module.RlsCloudflareError):
+            asyncio.run(self.module.get_rls_response_async(client, "https://example.com/post/2"))
+        self.assertEqual(client.get.await_count, 1)
+
+    def test_visit_rls_url_async_writes_same_output_as_sync_worker(self):
+        """协程详情 worker 应与同步版本写出相同文件，解析和写文件不占用事件循环线程。"""
+        self.module, self.temp_dir = load_scrapy_rls()
+        result_item = {"title": "Async.Movie.2026", "url": "https://example.com/post/3"}
+        response = Mock(text=build_detail_page_html("https://www.imdb.com/title/tt1112223/"))
+
+        main_thread = threading.get_ident()
+        write_threads = []
+        write_rls_detail = self.module.write_rls_detail
+
+        def record_write_thread(*args):
+            write_threads.append(threading.get_ident())
+            write_rls_detail(*args)
+
+        with patch.object(self.module, "get_rls_response_async", new=unittest.mock.AsyncMock(return_value=response)), \
+                patch.object(self.module, "write_rls_detail", side_effect=record_write_thread):
+            asyncio.run(self.module.visit_rls_url_async(result_item, Mock()))
+
+        self.assertEqual(len(write_threads), 1)
+        self.assertNotEqual(write_threads[0], main_thread)
+        output_path = Path(self.temp_dir.name) / "Async.Movie.2026 - rls [tt1112223].rls"
+        self.assertEqual(output_path.read_text(encoding="utf-8"), "https://example.com/post/3")
+
 
 class TestFinalizeRlsRun(unittest.TestCase):
     """验证最终配置回写和状态清理。"""
@@ -590,6 +848,7 @@ class TestFinalizeRlsRun(unittest.TestCase):
         self.redis_client.set(self.module.REDIS_FOREIGN_SCAN_PAGE_KEY, "3")
         self.redis_client.set(self.module.REDIS_MOVIE_SCAN_PAGE_KEY, "4")
         self.redis_client.sadd(self.module.REDIS_SEEN_KEY, "u1")
+        self.redis_client.hset(f"{self.module.REDIS_FOREIGN_PAGE_FINGERPRINT_KEY}:next", "1", "ids:u1")
 
         with patch.object(self.module, "update_json_config") as mock_update:
             self.module.finalize_rls_run(redis_client=self.redis_client)
@@ -604,6 +863,7 @@ class TestFinalizeRlsRun(unittest.TestCase):
         self.assertIsNone(self.redis_client.get(self.module.REDIS_FOREIGN_SCAN_COMPLETE_KEY))
         self.assertIsNone(self.redis_client.get(self.module.REDIS_MOVIE_SCAN_COMPLETE_KEY))
         self.assertEqual(self.redis_client.smembers(self.module.REDIS_SEEN_KEY), {"u1"})
+        self.assertEqual(self.redis_client.hgetall(self.module.REDIS_FOREIGN_PAGE_FINGERPRINT_KEY), {"1": "ids:u1"})
 
     def test_finalize_rls_run_skips_update_when_scan_is_incomplete(self):
         """任一列表流程未完成时，不应提前回写配置。"""
@@ -626,6 +886,22 @@ class TestFinalizeRlsRun(unittest.TestCase):
         mock_update.assert_not_called()
         self.assertEqual(self.redis_client.llen(self.module.REDIS_PENDING_KEY), 1)
 
+    def test_finalize_rls_run_waits_for_retry_queue(self):
+        """延迟重试队列仍有任务时，不应回写截止标题、提交指纹或清理扫描状态。"""
+        self.redis_client.set(self.module.REDIS_FOREIGN_SCAN_COMPLETE_KEY, "1")
+        self.redis_client.set(self.module.REDIS_MOVIE_SCAN_COMPLETE_KEY, "1")
+        self.redis_client.set(self.module.REDIS_FOREIGN_NEXT_END_TITLES_KEY, self.module.serialize_payload({"titles": ["F1"]}))
+        self.redis_client.set(self.module.REDIS_MOVIE_NEXT_END_TITLES_KEY, self.module.serialize_payload({"titles": ["M1"]}))
+        self.redis_client.hset(f"{self.module.REDIS_FOREIGN_PAGE_FINGERPRINT_KEY}:next", "1", "ids:u1")
+        self.redis_client.zadd(self.module.REDIS_RETRY_KEY, {"task": 1})
+
+        with patch.object(self.module, "update_json_config") as mock_update:
+            self.module.finalize_rls_run(redis_client=self.redis_client)
+
+        mock_update.assert_not_called()
+        self.assertEqual(self.redis_client.get(self.module.REDIS_FOREIGN_SCAN_COMPLETE_KEY), "1")
+        self.assertEqual(self.redis_client.hgetall(self.module.REDIS_FOREIGN_PAGE_FINGERPRINT_KEY), {})
+
     def test_finalize_rls_run_warns_when_processing_tasks_remain(self):
         """待处理已空但 processing 仍有任务时，应保留 processing 并提示直接重跑。"""
         self.redis_client.set(self.module.REDIS_FOREIGN_SCAN_COMPLETE_KEY, "1")
@@ -0,0 +1,288 @@
+"""
+针对 ``my_scripts.scrapy_site`` 的单元测试。
+
+``scrapy_redis`` 使用真实实现，Redis 由 fakeredis 提供，站点的列表页和详情页都用内存数据模拟。
+"""
+
+import copy
+import importlib.util
+import logging
+import sys
+import types
+import unittest
+import uuid
+from pathlib import Path
+from unittest.mock import patch
+
+try:
+    import fakeredis
+except ImportError:  # pragma: no cover - 由依赖安装状态决定
+    fakeredis = None
+
+MODULE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "scrapy_site.py"
+REDIS_HELPER_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "scrapy_redis.py"
+
+
+def load_scrapy_site():
+    """在隔离依赖环境中加载站点引擎，``scrapy_redis`` 使用真实实现。"""
+    helper_config = {"redis_host": "127.0.0.1"}
+    fake_my_module = types.ModuleType("my_module")
+    fake_my_module.read_json_to_dict = lambda _path: copy.deepcopy(helper_config)
+
+    helper_spec = importlib.util.spec_from_file_location(
+        f"scrapy_redis_test_{uuid.uuid4().hex}",
+        REDIS_HELPER_PATH,
+    )
+    helper_module = importlib.util.module_from_spec(helper_spec)
+    with patch.dict(sys.modules, {"my_module": fake_my_module}):
+        helper_spec.loader.exec_module(helper_module)
+
+    spec = importlib.util.spec_from_file_location(
+        f"scrapy_site_test_{uuid.uuid4().hex}",
+        MODULE_PATH,
+    )
+    module = importlib.util.module_from_spec(spec)
+    with patch.dict(sys.modules, {"my_module": fake_my_module, "scrapy_redis": helper_module}):
+        spec.loader.exec_module(module)
+    return module, helper_module
+
+
+class FakeSite:
+    """用内存分页数据模拟一个站点，记录访问过的页面、处理过的详情和提交的截止状态。"""
+
+    def __init__(self, pages: dict[int, list[dict]], end_titles: list[str], failing_urls: set[str] | None = None):
+        self.pages = pages
+        self.end_titles = end_titles
+        self.failing_urls = failing_urls or set()
+        self.fetched_urls: list[str] = []
+        self.visited_urls: list[str] = []
+        self.committed_states: list[dict] = []
+
+    def fetch_page(self, url: str) -> int:
+        self.fetched_urls.append(url)
+        return int(url.rsplit("/", 1)[-1])
+
+    def parse_page(self, page_number: int) -> list[dict]:
+        return self.pages.get(page_number, [])
+
+    def worker(self, info: dict) -> None:
+        if info["url"] in self.failing_urls:
+            raise RuntimeError(f"detail failed: {info['url']}")
+        self.visited_urls.append(info["url"])
+
+    def build_spec(self, module, helper_module, **overrides):
+        fields = {
+            "label": "FAKE",
+            "logger": logging.getLogger("scrapy_site_test"),
+            "pending_key": "fake_pending",
+            "processing_key": "fake_processing",
+            "seen_key": "fake_seen",
+            "scan_page_key": "fake_scan_page",
+            "scan_complete_key": "fake_scan_complete",
+            "next_state_key": "fake_next_end_titles",
+            "build_page_url": lambda page_number: f"https://fake.example/page/{page_number}",
+            "fetch_page": self.fetch_page,
+            "parse_page": self.parse_page,
+            "unique_value": lambda item: item["url"],
+            "serializer": helper_module.serialize_payload,
+            "should_stop": lambda result_list: any(item["title"] in self.end_titles for item in result_list),
+            "select_next_state": lambda result_list: {"titles": [item["title"] for item in result_list[:2]]},
+            "commit_next_state": self.committed_states.append,
+            "worker": self.worker,
+            "identify_item": lambda info: info["url"],
+            "max_workers": 2,
+        }
+        fields.update(overrides)
+        return module.SiteSpec(**fields)
+
+
+def build_pages() -> dict[int, list[dict]]:
+    """三页数据，第三页出现截止标题。"""
+    return {
+        1: [{"title": "New 1", "url": "https://fake.example/1"}, {"title": "New 2", "url": "https://fake.example/2"}],
+        2: [{"title": "New 3", "url": "https://fake.example/3"}],
+        3: [{"title": "Old", "url": "https://fake.example/old"}],
+    }
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis[lua] is not installed")
+class TestEnqueueSitePosts(unittest.TestCase):
+    """验证翻页入队、断点续扫和停止条件。"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.module, cls.helper_module = load_scrapy_site()
+
+    def setUp(self):
+        self.redis_client = fakeredis.FakeRedis(decode_responses=True)
+        self.site = FakeSite(build_pages(), end_titles=["Old"])
+        self.spec = self.site.build_spec(self.module, self.helper_module)
+
+    def test_enqueue_site_posts_pages_until_stop_condition(self):
+        """应从起始页翻到命中截止标题为止，只在第一页记录下一轮截止状态。"""
+        self.module.enqueue_site_posts(self.spec, self.redis_client, start_page=1)
+
+        self.assertEqual(self.site.fetched_urls, [f"https://fake.example/page/{page}" for page in (1, 2, 3)])
+        self.assertEqual(self.redis_client.llen("fake_pending"), 4)
+        self.assertEqual(self.redis_client.get("fake_scan_complete"), "1")
+        self.assertEqual(self.redis_client.get("fake_scan_page"), "4")
+        self.assertEqual(
+            self.helper_module.deserialize_payload(self.redis_client.get("fake_next_end_titles")),
+            {"titles": ["New 1", "New 2"]},
+        )
+
+    def test_enqueue_site_posts_resumes_from_saved_page(self):
+        """存在翻页断点时应从断点继续，且不覆盖已记录的截止状态。"""
+        self.redis_client.set("fake_scan_page", "2")
+        self.redis_client.set("fake_next_end_titles", self.helper_module.serialize_payload({"titles": ["Kept"]}))
+
+        self.module.enqueue_site_posts(self.spec, self.redis_client, start_page=1)
+
+        self.assertEqual(self.site.fetched_urls, [f"https://fake.example/page/{page}" for page in (2, 3)])
+        self.assertEqual(
+            self.helper_module.deserialize_payload(self.redis_client.get("fake_next_end_titles")),
+            {"titles": ["Kept"]},
+        )
+
+    def test_enqueue_site_posts_prefetch_commits_pages_in_order(self):
+        """并发预取时入队顺序和断点与逐页扫描一致，多取的页面不入队。"""
+        spec = self.site.build_spec(self.module, self.helper_module, prefetch_pages=3)
+
+        self.module.enqueue_site_posts(spec, self.redis_client, start_page=1)
+
+        pending_urls = [
+            self.helper_module.deserialize_payload(payload)["url"]
+            for payload in self.redis_client.lrange("fake_pending", 0, -1)
+        ]
+        self.assertEqual(
+            pending_urls,
+            ["https://fake.example/1", "https://fake.example/2", "https://fake.example/3", "https://fake.example/old"],
+        )
+        self.assertEqual(self.redis_client.get("fake_scan_page"), "4")
+        self.assertEqual(self.redis_client.get("fake_scan_complete"), "1")
+
+    def test_enqueue_site_posts_stops_at_page_unchanged_since_last_run(self):
+        """某页指纹与上一轮相同即停止翻页，只暂存之前页面的指纹。"""
+        spec = self.site.build_spec(self.module, self.helper_module, page_fingerprint_key="fake_page_fingerprints")
+        unchanged = self.helper_module.build_page_fingerprint(["https://fake.example/3"])
+        self.redis_client.hset("fake_page_fingerprints", "2", unchanged)
+
+        self.module.enqueue_site_posts(spec, self.redis_client, start_page=1)
+
+        self.assertEqual(self.site.fetched_urls, ["https://fake.example/page/1", "https://fake.example/page/2"])
+        self.assertEqual(self.redis_client.llen("fake_pending"), 2)
+        self.assertEqual(self.redis_client.get("fake_scan_complete"), "1")
+        self.assertEqual(self.redis_client.get("fake_scan_page"), "3")
+        self.assertEqual(list(self.redis_client.hgetall("fake_page_fingerprints:next")), ["1"])
+
+    def test_enqueue_site_posts_skips_when_scan_is_complete(self):
+        """扫描完成标记存在时不应再请求列表页。"""
+        self.redis_client.set("fake_scan_complete", "1")
+
+        self.module.enqueue_site_posts(self.spec, self.redis_client)
+
+        self.assertEqual(self.site.fetched_urls, [])
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis[lua] is not installed")
+class TestRunSite(unittest.TestCase):
+    """验证引擎的完整流程和收尾条件。"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.module, cls.helper_module = load_scrapy_site()
+
+    def setUp(self):
+        self.redis_client = fakeredis.FakeRedis(decode_responses=True)
+
+    def test_run_site_processes_all_items_and_commits_next_state(self):
+        """全部详情成功后应提交下一轮截止状态，并清理运行状态键。"""
+        site = FakeSite(build_pages(), end_titles=["Old"])
+        spec = site.build_spec(self.module, self.helper_module)
+
+        self.module.run_site(spec, redis_client=self.redis_client)
+
+        self.assertCountEqual(
+            site.visited_urls,
+            ["https://fake.example/1", "https://fake.example/2", "https://fake.example/3", "https://fake.example/old"],
+        )
+        self.assertEqual(site.committed_states, [{"titles": ["New 1", "New 2"]}])
+        for key in ("fake_pending", "fake_processing", "fake_scan_page", "fake_scan_complete", "fake_next_end_titles"):
+            self.assertFalse(self.redis_client.exists(key), key)
+        self.assertEqual(self.redis_client.scard("fake_seen"), 4)
+
+    def test_run_site_drains_while_scanning(self):
+        """边扫描边消费时同样处理全部详情，并在收尾时提交下一轮截止状态。"""
+        site = FakeSite(build_pages(), end_titles=["Old"])
+        spec = site.build_spec(self.module, self.helper_module, prefetch_pages=2, drain_while_scanning=True)
+
+        with patch.object(self.helper_module, "PRODUCER_POLL_SECONDS", 0.01):
+            self.module.run_site(spec, redis_client=self.redis_client)
+
+        self.assertEqual(len(site.visited_urls), 4)
+        self.assertEqual(site.committed_states, [{"titles": ["New 1", "New 2"]}])
+        self.assertFalse(self.redis_client.exists("fake_scan_complete"))
+
+    def test_run_site_keeps_state_when_detail_fails(self):
+        """详情失败残留在处理中队列时，不应提交截止状态，保留现场等待重跑。"""
+        site = FakeSite(build_pages(), end_titles=["Old"], failing_urls={"https://fake.example/2"})
+        spec = site.build_spec(self.module, self.helper_module)
+
+        self.module.run_site(spec, redis_client=self.redis_client)
+
+        self.assertEqual(site.committed_states, [])
+        self.assertEqual(self.redis_client.llen("fake_processing"), 1)
+        self.assertEqual(self.redis_client.get("fake_scan_complete"), "1")
+
+    def test_finalize_site_run_waits_for_retry_queue(self):
+        """配置了延迟重试时，重试队列非空也不应提交截止状态。"""
+        site = FakeSite(build_pages(), end_titles=["Old"])
+        spec = site.build_spec(
+            self.module,
+            self.helper_module,
+            retry_policy=self.helper_module.RetryPolicy("fake_retry"),
+        )
+        self.redis_client.set("fake_scan_complete", "1")
+        self.redis_client.set("fake_next_end_titles", self.helper_module.serialize_payload({"titles": ["New 1"]}))
+        self.redis_client.zadd("fake_retry", {"task": 1})
+
+        self.assertFalse(self.module.finalize_site_run(spec, self.redis_client))
+        self.assertEqual(site.committed_states, [])
+
+        self.redis_client.delete("fake_retry")
+        self.assertTrue(self.module.finalize_site_run(spec, self.redis_client))
+        self.assertEqual(site.committed_states, [{"titles": ["New 1"]}])
+
+    def test_run_site_stops_at_unchanged_first_page_and_still_finalizes(self):
+        """首页与上一轮完成时指纹相同，只请求一页即结束，收尾照常提交状态，下一轮不会卡在扫描完成标记上。"""
+        site = FakeSite(build_pages(), end_titles=["Old"])
+        spec = site.build_spec(self.module, self.helper_module, page_fingerprint_key="fake_page_fingerprints")
+
+        self.module.run_site(spec, redis_client=self.redis_client)
+
+        self.assertEqual(len(site.fetched_urls), 3)
+        self.assertEqual(self.redis_client.hlen("fake_page_fingerprints"), 3)
+        self.assertFalse(self.redis_client.exists("fake_page_fingerprints:next"))
+
+        site.fetched_urls.clear()
+        self.module.run_site(spec, redis_client=self.redis_client)
+        self.module.run_site(spec, redis_client=self.redis_client)
+
+        self.assertEqual(site.fetched_urls, ["https://fake.example/page/1", "https://fake.example/page/1"])
+        self.assertEqual(len(site.committed_states), 3)
+        self.assertFalse(self.redis_client.exists("fake_scan_complete"))
+
+    def test_recover_site_processing_when_pending_is_empty_moves_payloads_back(self):
+        """待处理为空且处理中有残留时，应回退到待处理队列。"""
+        site = FakeSite(build_pages(), end_titles=["Old"])
+        spec = site.build_spec(self.module, self.helper_module)
+        self.redis_client.rpush("fake_processing", "task-1", "task-2")
+
+        recovered = self.module.recover_site_processing_when_pending_is_empty(spec, self.redis_client)
+
+        self.assertEqual(recovered, 2)
+        self.assertEqual(self.redis_client.llen("fake_pending"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,6 +9,7 @@
 """
 
 import copy
+import gzip
 import importlib.util
 import re
 import sys
@@ -29,6 +30,9 @@ except ImportError:  # pragma: no cover - 由依赖安装状态决定
 requests.packages.urllib3.disable_warnings()
 
 MODULE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "scrapy_sk.py"
+FIXTURE_DIR = Path(__file__).resolve().parents[2] / "tests_main" / "fixtures" / "parsers"
+HTTP_SESSION_PATH = Path(__file__).resolve().parents[2] / "my_module" / "module_use" / "build_http_session.py"
+PARSE_HTML_PATH = Path(__file__).resolve().parents[2] / "my_module" / "module_use" / "parse_html.py"
 REDIS_HELPER_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "scrapy_redis.py"
 
 
@@ -87,6 +91,21 @@ def load_scrapy_sk(config: dict | None = None):
                 helper_config[key] = config[key]
 
     fake_my_module = types.ModuleType("my_module")
+    http_session_spec = importlib.util.spec_from_file_location(
+        f"build_http_session_test_{uuid.uuid4().hex}",
+        HTTP_SESSION_PATH,
+    )
+    http_session_module = importlib.util.module_from_spec(http_session_spec)
+    http_session_spec.loader.exec_module(http_session_module)
+    fake_my_module.build_http_session = http_session_module.build_http_session
+    parse_html_spec = importlib.util.spec_from_file_location(
+        f"parse_html_test_{uuid.uuid4().hex}",
+        PARSE_HTML_PATH,
+    )
+    parse_html_module = importlib.util.module_from_spec(parse_html_spec)
+    parse_html_spec.loader.exec_module(parse_html_module)
+    fake_my_module.parse_html = parse_html_module.parse_html
+    fake_my_module.build_strainer = parse_html_module.build_strainer
 
     def fake_read_json_to_dict(path: str):
         if path == "config/scrapy_redis.json":
@@ -362,7 +381,7 @@ class TestGetSkResponse(unittest.TestCase):
         """请求成功时应返回响应对象，并统一设置 UTF-8 编码。"""
         response = Mock(status_code=200)
 
-        with patch.object(self.module.requests, "get", return_value=response) as mock_get:
+        with patch.object(self.module.session, "get", return_value=response) as mock_get:
             result = self.module.get_sk_response("https://example.com/page")
 
         self.assertIs(result, response)
@@ -377,13 +396,13 @@ class TestGetSkResponse(unittest.TestCase):
         """请求返回非 200 状态码时应抛出异常。"""
         response = Mock(status_code=503)
 
-        with patch.object(self.module.requests, "get", return_value=response):
+        with patch.object(self.module.session, "get", return_value=response):
             with self.assertRaisesRegex(Exception, "503"):
                 self.module.get_sk_response("https://example.com/page")
 
     def test_get_sk_response_propagates_request_exception(self):
         """底层请求异常时应直接抛出，交给重试装饰器处理。"""
-        with patch.object(self.module.requests, "get", side_effect=requests.Timeout("timed out")):
+        with patch.object(self.module.session, "get", side_effect=requests.Timeout("timed out")):
             with self.assertRaisesRegex(requests.Timeout, "timed out"):
                 self.module.get_sk_response("https://example.com/page")
 
@@ -595,6 +614,53 @@ class TestParseSkResponse(unittest.TestCase):
     def tearDown(self):
         self.temp_dir.cleanup()
 
+    def test_parse_sk_response_parses_full_benchmark_page(self):
+        """基准测试用的整页样本应能完整解析，样本和解析函数保持同步。"""
+        with gzip.open(FIXTURE_DIR / "sk_list.html.gz", "rt", encoding="utf-8") as f:
+            page = f.read()
+
+        result = self.module.parse_sk_response(Mock(text=page))
+
+        self.assertEqual(len(result), 45)
+        self.assertTrue(all(item["url"].startswith("https://example.com/torrent/details.php") for item in result))
+
+    def test_parse_sk_response_partial_parse_matches_full_page(self):
+        """只解析目标容器和整页解析的结果一致。"""
+        with gzip.open(FIXTURE_DIR / "sk_list.html.gz", "rt", encoding="utf-8") as f:
+            page = f.read()
+
+        partial = self.module.parse_sk_response(Mock(text=page))
+        with patch.object(self.module, "SK_LIST_STRAINER", None):
+            full = self.module.parse_sk_response(Mock(text=page))
+
+        self.assertEqual(partial, full)
+
+    def test_parse_sk_response_matches_across_html_parsers(self):
+        """lxml 和 html.parser 解析同一页面，结果应一致。"""
+        response = Mock(
+            text=build_sk_page_html(
+                build_sk_item_html(
+                    group="2160p",
+                    title="Valid Title",
+                    detail_href="details.php?name=movie&id=123",
+                    metadata="Velkost 8 GB | Pridany 24/04/2026",
+                ),
+                build_sk_item_html(
+                    group="1080p",
+                    title="Další Film",
+                    detail_href="details.php?name=movie&id=456",
+                    metadata="Velkost 10 GB | Pridany 23/04/2026",
+                ),
+            )
+        )
+        results = {}
+        for parser in ("lxml", "html.parser"):
+            with patch.object(self.module, "HTML_PARSER", parser):
+                results[parser] = self.module.parse_sk_response(response)
+
+        self.assertTrue(results["lxml"])
+        self.assertEqual(results["lxml"], results["html.parser"])
+
     def test_parse_sk_response_collects_only_valid_rows(self):
         """整页解析时应收集有效行并跳过无效行。"""
         response = Mock(
@@ -664,6 +730,13 @@ class TestParseSkResponse(unittest.TestCase):
 
         self.assertEqual(self.module.parse_sk_response(response), [])
 
+    def test_parse_sk_response_finds_filtered_notice_outside_result_table(self):
+        """过滤提示不在结果表格里时，只解析表格会漏掉它，应回退到整页检查。"""
+        notice = '<div><a href="index.php">Nenasli ste co ste hladali???...Napiste nam to na nastenku</a></div>'
+        response = Mock(text=notice + build_sk_page_html('<td class="lista"></td>'))
+
+        self.assertEqual(self.module.parse_sk_response(response), [])
+
     def test_parse_sk_response_skips_excluded_groups_and_keeps_movies(self):
         """混合页面里应排除书籍分组，仅保留电影帖子。"""
         response = Mock(
@@ -872,6 +945,19 @@ class TestVisitSkUrl(unittest.TestCase):
             ["https://example.com/torrent/details.php?name=movie&id=654"],
         )
 
+    def test_visit_sk_url_uses_single_attempt_request_when_retry_in_queue(self):
+        """开启队列重试后，详情页请求不应再走阻塞线程的 ``@retry``。"""
+        result_item = {"title": "Movie Title", "size": "6 GB", "url": "https://example.com/details.php?id=654"}
+
+        with patch.object(self.module, "RETRY_IN_QUEUE", True), patch.object(
+            self.module, "request_sk_page", side_effect=RuntimeError("boom")
+        ) as mock_request, patch.object(self.module, "get_sk_response") as mock_get:
+            with self.assertRaisesRegex(RuntimeError, "boom"):
+                self.module.visit_sk_url(result_item)
+
+        mock_request.assert_called_once_with(result_item["url"])
+        mock_get.assert_not_called()
+
 
 class TestSkRedisHelpers(unittest.TestCase):
     """验证 SK 的 Redis 辅助逻辑。"""
@@ -978,11 +1064,13 @@ class TestSkRedisHelpers(unittest.TestCase):
         self.redis_client.set(self.module.REDIS_SCAN_PAGE_KEY, "3")
         self.redis_client.sadd(self.module.REDIS_SEEN_KEY, "u1")
         self.redis_client.rpush(self.module.REDIS_FAILED_KEY, failed_payload)
+        self.redis_client.hset(f"{self.module.REDIS_PAGE_FINGERPRINT_KEY}:next", "0", "ids:abc")
 
         with patch.object(self.module, "update_json_config") as mock_update:
             self.module.finalize_sk_run(redis_client=self.redis_client)
 
         mock_update.assert_called_once_with("config/scrapy_sk.json", "end_data", "24/04/2026")
+        self.assertEqual(self.redis_client.hgetall(self.module.REDIS_PAGE_FINGERPRINT_KEY), {"0": "ids:abc"})
         self.assertIsNone(self.redis_client.get(self.module.REDIS_SCAN_COMPLETE_KEY))
         self.assertIsNone(self.redis_client.get(self.module.REDIS_NEXT_END_DATA_KEY))
         self.assertEqual(self.redis_client.llen(self.module.REDIS_FAILED_KEY), 1)
@@ -1001,6 +1089,17 @@ class TestSkRedisHelpers(unittest.TestCase):
 
         mock_update.assert_not_called()
 
+    def test_finalize_sk_run_skips_update_when_retry_tasks_remain(self):
+        """延迟重试队列中仍有任务时，不应提前回写 end_data。"""
+        self.redis_client.set(self.module.REDIS_SCAN_COMPLETE_KEY, "1")
+        self.redis_client.set(self.module.REDIS_NEXT_END_DATA_KEY, "24/04/2026")
+        self.redis_client.zadd(self.module.REDIS_RETRY_KEY, {"payload": 0})
+
+        with patch.object(self.module, "update_json_config") as mock_update:
+            self.module.finalize_sk_run(redis_client=self.redis_client)
+
+        mock_update.assert_not_called()
+
     def test_finalize_sk_run_skips_update_when_scan_is_incomplete(self):
         """列表扫描未完成时，不应提前回写 end_data。"""
         self.redis_client.set(self.module.REDIS_SCAN_COMPLETE_KEY, "0")
@@ -1164,6 +1263,25 @@ class TestEnqueueSkPosts(unittest.TestCase):
         pending_urls = [self.module._scrapy_redis.deserialize_payload(payload)["url"] for payload in pending_payloads]
         self.assertEqual(pending_urls, ["u9"])
 
+    def test_enqueue_sk_posts_stops_at_page_unchanged_since_last_run(self):
+        """列表页指纹与上一轮完成时相同，应立即结束扫描，不再翻到截止日期。"""
+        page_0 = [{"group": "A", "url": "u0", "title": "Movie N", "size": "1 GB", "date": "02/05/2026"}]
+        page_1 = [{"group": "B", "url": "u1", "title": "Movie A", "size": "1 GB", "date": "25/04/2026"}]
+        redis_helpers = self.module._scrapy_redis
+        fingerprint_key = self.module.REDIS_PAGE_FINGERPRINT_KEY
+        self.redis_client.hset(fingerprint_key, "1", redis_helpers.build_page_fingerprint(["u1"]))
+
+        with patch.object(self.module, "fetch_sk_page", side_effect=[page_0, page_1]) as mock_fetch:
+            self.module.enqueue_sk_posts(start_page=0, end_data="15/10/2013", redis_client=self.redis_client)
+
+        self.assertEqual(mock_fetch.call_args_list, [call(0), call(1)])
+        self.assertEqual(self.redis_client.get(self.module.REDIS_SCAN_COMPLETE_KEY), "1")
+        self.assertEqual(self.redis_client.get(self.module.REDIS_NEXT_END_DATA_KEY), "01/05/2026")
+        pending_payloads = self.redis_client.lrange(self.module.REDIS_PENDING_KEY, 0, -1)
+        self.assertEqual([redis_helpers.deserialize_payload(payload)["url"] for payload in pending_payloads], ["u0"])
+        staged = self.redis_client.hgetall(redis_helpers.get_fingerprint_staging_key(fingerprint_key))
+        self.assertEqual(list(staged), ["0"])
+
     def test_enqueue_sk_posts_raises_after_too_many_empty_pages(self):
         """连续空页超过上限时，应停止扫描避免无限翻页。"""
         module, temp_dir = load_scrapy_sk({"max_empty_pages": 3})
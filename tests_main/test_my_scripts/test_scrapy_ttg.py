@@ -25,6 +25,8 @@ from bs4 import BeautifulSoup
 requests.packages.urllib3.disable_warnings()
 
 MODULE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "scrapy_ttg.py"
+HTTP_SESSION_PATH = Path(__file__).resolve().parents[2] / "my_module" / "module_use" / "build_http_session.py"
+PARSE_HTML_PATH = Path(__file__).resolve().parents[2] / "my_module" / "module_use" / "parse_html.py"
 
 
 def fake_normalize_release_title_for_filename(
@@ -75,6 +77,20 @@ def load_scrapy_ttg(config: dict | None = None):
         module_config.update(config)
 
     fake_my_module = types.ModuleType("my_module")
+    http_session_spec = importlib.util.spec_from_file_location(
+        f"build_http_session_test_{uuid.uuid4().hex}",
+        HTTP_SESSION_PATH,
+    )
+    http_session_module = importlib.util.module_from_spec(http_session_spec)
+    http_session_spec.loader.exec_module(http_session_module)
+    fake_my_module.build_http_session = http_session_module.build_http_session
+    parse_html_spec = importlib.util.spec_from_file_location(
+        f"parse_html_test_{uuid.uuid4().hex}",
+        PARSE_HTML_PATH,
+    )
+    parse_html_module = importlib.util.module_from_spec(parse_html_spec)
+    parse_html_spec.loader.exec_module(parse_html_module)
+    fake_my_module.parse_html = parse_html_module.parse_html
     fake_my_module.read_json_to_dict = lambda _path: copy.deepcopy(module_config)
     fake_my_module.normalize_release_title_for_filename = fake_normalize_release_title_for_filename
     fake_my_module.sanitize_filename = lambda name: name
@@ -174,7 +190,7 @@ class TestGetTtgResponse(unittest.TestCase):
         """请求成功时应返回响应对象，并统一设置 UTF-8 编码。"""
         response = Mock(status_code=200)
 
-        with patch.object(self.module.requests, "get", return_value=response) as mock_get:
+        with patch.object(self.module.session, "get", return_value=response) as mock_get:
             result = self.module.get_ttg_response("https://example.com/page")
 
         self.assertIs(result, response)
@@ -185,13 +201,13 @@ class TestGetTtgResponse(unittest.TestCase):
         """请求返回非 200 状态码时应抛出异常。"""
         response = Mock(status_code=503)
 
-        with patch.object(self.module.requests, "get", return_value=response):
+        with patch.object(self.module.session, "get", return_value=response):
             with self.assertRaisesRegex(Exception, "503"):
                 self.module.get_ttg_response("https://example.com/page")
 
     def test_get_ttg_response_propagates_request_exception(self):
         """底层请求异常时应直接抛出，交给重试装饰器处理。"""
-        with patch.object(self.module.requests, "get", side_effect=requests.Timeout("timed out")):
+        with patch.object(self.module.session, "get", side_effect=requests.Timeout("timed out")):
             with self.assertRaisesRegex(requests.Timeout, "timed out"):
                 self.module.get_ttg_response("https://example.com/page")
 
@@ -290,6 +306,22 @@ class TestParseTtgResponse(unittest.TestCase):
     def tearDown(self):
         self.temp_dir.cleanup()
 
+    def test_parse_ttg_response_matches_across_html_parsers(self):
+        """lxml 和 html.parser 解析同一页面，结果应一致。"""
+        response = Mock(
+            text=build_page_html(
+                build_torrent_row(torrent_id="200", torrent_name="Valid Row", size_text="1 GB"),
+                build_torrent_row(torrent_id="201", torrent_name="Other Row", size_text="2 GB"),
+            )
+        )
+        results = {}
+        for parser in ("lxml", "html.parser"):
+            with patch.object(self.module, "HTML_PARSER", parser):
+                results[parser] = self.module.parse_ttg_response(response)
+
+        self.assertTrue(results["lxml"])
+        self.assertEqual(results["lxml"], results["html.parser"])
+
     def test_parse_ttg_response_collects_only_valid_rows(self):
         """整页解析时应收集有效行并跳过无效行。"""
         response = Mock(
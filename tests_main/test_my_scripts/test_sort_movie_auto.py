@@ -10,6 +10,7 @@ import os
 import re
 import sys
 import tempfile
+import threading
 import types
 import unittest
 import uuid
@@ -17,6 +18,7 @@ from pathlib import Path
 from unittest.mock import Mock, patch
 
 MODULE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "sort_movie_auto.py"
+PARSE_HTML_PATH = Path(__file__).resolve().parents[2] / "my_module" / "module_use" / "parse_html.py"
 
 
 def fake_write_dict_to_json(target_path: str | os.PathLike, content: dict) -> bool:
@@ -101,6 +103,13 @@ def load_sort_movie_auto():
     fake_retrying.retry = lambda *args, **kwargs: (lambda func: func)
 
     fake_my_module = types.ModuleType("my_module")
+    parse_html_spec = importlib.util.spec_from_file_location(
+        f"parse_html_test_{uuid.uuid4().hex}",
+        PARSE_HTML_PATH,
+    )
+    parse_html_module = importlib.util.module_from_spec(parse_html_spec)
+    parse_html_spec.loader.exec_module(parse_html_module)
+    fake_my_module.parse_html = parse_html_module.parse_html
     fake_my_module.read_file_to_list = lambda _path: []
     fake_my_module.read_json_to_dict = lambda _path: {}
     fake_my_module.sanitize_filename = fake_sanitize_filename
@@ -140,6 +149,7 @@ def load_sort_movie_auto():
     fake_video_tools.get_video_probe = lambda _path: None
 
     fake_sort_movie_request = types.ModuleType("sort_movie_request")
+    fake_sort_movie_request.HTML_PARSER = None
     fake_sort_movie_request.get_tmdb_search_response = lambda _search_id: {}
     fake_sort_movie_request.get_douban_response = lambda _query, _mode: None
     fake_sort_movie_request.get_douban_search_details = lambda _response: None
@@ -1741,5 +1751,90 @@ class TestDownloadLinkExtraction(unittest.TestCase):
         self.assertEqual((movie_dir / "source.log").read_text(encoding="utf-8"), magnet)
 
 
+class TestSortMoviePipeline(unittest.TestCase):
+    """验证多目录分阶段并行整理。"""
+
+    def setUp(self):
+        self.module = load_sort_movie_auto()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name) / "Director Name"
+        self.folders = []
+        for name in ("Movie A", "Movie B", "Movie C"):
+            folder = self.root / name
+            folder.mkdir(parents=True)
+            self.folders.append(str(folder))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def run_pipeline(self, fetch, probe) -> tuple[list, list]:
+        """用假阶段函数跑流水线，返回入库记录和失败目录。"""
+        committed = []
+        failed = []
+
+        def fake_commit(job):
+            committed.append((Path(job.path).name, threading.current_thread() is threading.main_thread()))
+            return True
+
+        with patch.object(self.module, "AUTO_PIPELINE", True), patch.dict(
+            self.module.PIPELINE_WORKERS, {"metadata": 3, "probe": 2, "screenshot": 1}
+        ), patch.object(self.module, "prepare_movie_folder", return_value=True), patch.object(
+            self.module, "fetch_movie_metadata", side_effect=fetch
+        ), patch.object(self.module, "probe_movie_video", side_effect=probe), patch.object(
+            self.module, "render_movie_screenshots", return_value=True
+        ), patch.object(self.module, "commit_movie_folder", side_effect=fake_commit), patch.object(
+            self.module, "handle_failed_movie_folder", side_effect=lambda path, _root: failed.append(Path(path).name)
+        ):
+            self.module.sort_movie_auto(str(self.root))
+        return committed, failed
+
+    def test_metadata_runs_concurrently_and_commit_stays_on_main_thread(self):
+        """多个目录同时抓取元数据，失败目录单独隔离，其余目录在主线程逐个入库。"""
+        barrier = threading.Barrier(3, timeout=5)
+
+        def fetch(_job):
+            # 三个目录都进入抓取阶段后才会放行，串行执行时这里会超时
+            barrier.wait()
+            return True
+
+        committed, failed = self.run_pipeline(fetch, lambda job: not job.path.endswith("Movie B"))
+
+        self.assertEqual(sorted(committed), [("Movie A", True), ("Movie C", True)])
+        self.assertEqual(failed, ["Movie B"])
+
+    def test_stage_exception_moves_folder_and_exit_propagates(self):
+        """阶段抛出普通异常时按失败目录处理；豆瓣验证页导致的退出会向上抛出。"""
+        def fetch(job):
+            if job.path.endswith("Movie A"):
+                raise RuntimeError("network error")
+            return True
+
+        committed, failed = self.run_pipeline(fetch, lambda _job: True)
+
+        self.assertEqual(sorted(name for name, _main in committed), ["Movie B", "Movie C"])
+        self.assertEqual(failed, ["Movie A"])
+
+        def exit_on_fetch(_job):
+            sys.exit("豆瓣弹出验证页！")
+
+        with self.assertRaises(SystemExit):
+            self.run_pipeline(exit_on_fetch, lambda _job: True)
+
+    def test_sort_movie_runs_stages_in_order_and_stops_at_failure(self):
+        """串行整理按顺序执行各阶段，某阶段失败后不再执行后续阶段。"""
+        calls = []
+        with patch.object(self.module, "fetch_movie_metadata", side_effect=lambda job: calls.append("fetch") or True), patch.object(
+            self.module, "probe_movie_video", side_effect=lambda job: calls.append("probe") or False
+        ), patch.object(self.module, "render_movie_screenshots") as mock_render, patch.object(
+            self.module, "commit_movie_folder"
+        ) as mock_commit:
+            result = self.module.sort_movie(f" {self.folders[0]} ")
+
+        self.assertEqual(result, (False, self.folders[0]))
+        self.assertEqual(calls, ["fetch", "probe"])
+        mock_render.assert_not_called()
+        mock_commit.assert_not_called()
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,205 @@
+"""
+针对 ``my_scripts.sort_movie_cache`` 的测试。
+
+验证有效期、条件请求、LRU 淘汰、绕过开关和返回值缓存。
+"""
+
+import importlib.util
+import os
+import tempfile
+import time
+import unittest
+import uuid
+from pathlib import Path
+from unittest.mock import Mock
+
+import requests
+
+MODULE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "sort_movie_cache.py"
+
+
+def load_sort_movie_cache():
+    """按文件路径加载缓存模块，模块不读取配置，无需注入假依赖。"""
+    spec = importlib.util.spec_from_file_location(f"sort_movie_cache_test_{uuid.uuid4().hex}", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_response(status_code: int = 200, text: str = "ok", headers: dict | None = None) -> requests.Response:
+    """构造真实的响应对象。"""
+    response = requests.Response()
+    response.status_code = status_code
+    response.url = "https://example.com/item"
+    response.encoding = "utf-8"
+    response.headers.update(headers or {})
+    response._content = text.encode("utf-8")
+    return response
+
+
+class TestCachedGet(unittest.TestCase):
+    """验证 HTTP 响应缓存。"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.module = load_sort_movie_cache()
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = self.module.ResponseCache(self.temp_dir.name, ttl={"api": 60})
+        self.session = Mock()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def expire_all(self) -> None:
+        """把所有端点的有效期改成负数，模拟条目过期。"""
+        for endpoint_key in list(self.cache.ttl):
+            self.cache.ttl[endpoint_key] = -1
+
+    def test_fresh_entry_is_served_from_disk(self):
+        """有效期内的第二次请求不访问网络，内容和编码保持一致。"""
+        self.session.get.return_value = build_response(text="电影")
+
+        first = self.module.cached_get(self.cache, self.session, "api", "https://example.com/item", timeout=5)
+        second = self.module.cached_get(self.cache, self.session, "api", "https://example.com/item", timeout=5)
+
+        self.session.get.assert_called_once_with("https://example.com/item", timeout=5)
+        self.assertEqual(second.text, first.text)
+        self.assertEqual(second.status_code, 200)
+
+    def test_params_are_part_of_key(self):
+        """查询参数不同视为不同请求。"""
+        self.session.get.side_effect = lambda *_args, **_kwargs: build_response()
+
+        self.module.cached_get(self.cache, self.session, "api", "https://example.com/s", params={"kw": "a"})
+        self.module.cached_get(self.cache, self.session, "api", "https://example.com/s", params={"kw": "b"})
+
+        self.assertEqual(self.session.get.call_count, 2)
+
+    def test_expired_entry_revalidates_with_etag(self):
+        """过期条目带 ETag 时发条件请求，304 时沿用本地内容。"""
+        self.session.get.return_value = build_response(text="v1", headers={"ETag": '"abc"'})
+        self.module.cached_get(self.cache, self.session, "api", "https://example.com/item")
+        self.expire_all()
+
+        self.session.get.reset_mock()
+        self.session.get.return_value = build_response(status_code=304, text="")
+        result = self.module.cached_get(self.cache, self.session, "api", "https://example.com/item", headers={"A": "1"})
+
+        self.session.get.assert_called_once_with(
+            "https://example.com/item",
+            headers={"A": "1", "If-None-Match": '"abc"'},
+        )
+        self.assertEqual(result.text, "v1")
+        self.assertEqual(result.status_code, 200)
+
+    def test_failed_or_rejected_response_is_not_cached(self):
+        """非 200 响应和 ``cacheable`` 拒绝的响应都不写入缓存。"""
+        self.session.get.side_effect = [build_response(status_code=500), build_response(text="captcha"), build_response()]
+
+        for _ in range(3):
+            self.module.cached_get(
+                self.cache,
+                self.session,
+                "api",
+                "https://example.com/item",
+                cacheable=lambda r: "captcha" not in r.text,
+            )
+        self.module.cached_get(self.cache, self.session, "api", "https://example.com/item")
+
+        self.assertEqual(self.session.get.call_count, 3)
+
+    def test_bypass_reads_and_writes_nothing(self):
+        """绕过缓存时每次都请求网络，目录里也不留下文件。"""
+        self.cache.bypass = True
+        self.session.get.side_effect = lambda *_args, **_kwargs: build_response()
+
+        self.module.cached_get(self.cache, self.session, "api", "https://example.com/item")
+        self.module.cached_get(self.cache, self.session, "api", "https://example.com/item")
+
+        self.assertEqual(self.session.get.call_count, 2)
+        self.assertEqual(self.cache.list_entries(), [])
+
+
+class TestResponseCacheEviction(unittest.TestCase):
+    """验证大小上限和 LRU 淘汰。"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.module = load_sort_movie_cache()
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """超过上限时先淘汰最久没有读过的条目。"""
+        cache = self.module.ResponseCache(self.temp_dir.name, max_bytes=0)
+        payload = os.urandom(2000).hex()
+        for key in ("a", "b", "c"):
+            cache.put("api", key, {"data": payload})
+        total_size = sum(size for _mtime, size, _path in cache.list_entries())
+
+        # 按 a、c、b 的顺序设置访问时间，b 最新，a 最旧
+        now = time.time()
+        for offset, key in ((300, "a"), (200, "c"), (100, "b")):
+            path = cache.get_entry_path("api", key)
+            os.utime(path, (now - offset, now - offset))
+
+        # 上限只够放下一个半条目，淘汰后只剩最近访问的 b
+        cache.max_bytes = total_size // 2
+        cache.put("api", "b", {"data": payload})
+
+        self.assertIsNone(cache.get("api", "a"))
+        self.assertIsNone(cache.get("api", "c"))
+        self.assertIsNotNone(cache.get("api", "b"))
+
+
+class TestCachedResult(unittest.TestCase):
+    """验证函数返回值缓存。"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.module = load_sort_movie_cache()
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = self.module.ResponseCache(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_result_is_cached_by_bound_arguments(self):
+        """位置参数和关键字参数写法不同，只要绑定结果一致就命中同一条缓存。"""
+        calls = []
+
+        @self.module.cached_result(self.cache, "tmdb")
+        def fetch(movie_id: str, tv: bool = False) -> dict:
+            calls.append((movie_id, tv))
+            return {"id": movie_id, "tv": tv}
+
+        self.assertEqual(fetch("1"), {"id": "1", "tv": False})
+        self.assertEqual(fetch(movie_id="1", tv=False), {"id": "1", "tv": False})
+        fetch("1", True)
+
+        self.assertEqual(calls, [("1", False), ("1", True)])
+
+    def test_empty_result_is_not_cached(self):
+        """返回 None 时不缓存，下次继续请求。"""
+        fetch = Mock(return_value=None)
+
+        def lookup(search_id: str):
+            return fetch(search_id)
+
+        wrapped = self.module.cached_result(self.cache, "kpk")(lookup)
+        wrapped("tt1")
+        wrapped("tt1")
+
+        self.assertEqual(fetch.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
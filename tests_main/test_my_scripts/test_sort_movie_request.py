@@ -22,6 +22,9 @@ requests = __import__("requests")
 requests.packages.urllib3.disable_warnings()
 
 MODULE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "sort_movie_request.py"
+HTTP_SESSION_PATH = Path(__file__).resolve().parents[2] / "my_module" / "module_use" / "build_http_session.py"
+PARSE_HTML_PATH = Path(__file__).resolve().parents[2] / "my_module" / "module_use" / "parse_html.py"
+CACHE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "sort_movie_cache.py"
 
 
 def load_sort_movie_request(config: dict | None = None):
@@ -50,11 +53,26 @@ def load_sort_movie_request(config: dict | None = None):
         "kpk_header": {"User-Agent": "unit-test"},
         "jackett_search_url": "https://example.com/jackett/search",
         "jackett_api_key": "jackett-key",
+        "cache_path": temp_dir.name,
     }
     if config:
         module_config.update(config)
 
     fake_my_module = types.ModuleType("my_module")
+    http_session_spec = importlib.util.spec_from_file_location(
+        f"build_http_session_test_{uuid.uuid4().hex}",
+        HTTP_SESSION_PATH,
+    )
+    http_session_module = importlib.util.module_from_spec(http_session_spec)
+    http_session_spec.loader.exec_module(http_session_module)
+    fake_my_module.build_http_session = http_session_module.build_http_session
+    parse_html_spec = importlib.util.spec_from_file_location(
+        f"parse_html_test_{uuid.uuid4().hex}",
+        PARSE_HTML_PATH,
+    )
+    parse_html_module = importlib.util.module_from_spec(parse_html_spec)
+    parse_html_spec.loader.exec_module(parse_html_module)
+    fake_my_module.parse_html = parse_html_module.parse_html
     fake_my_module.read_json_to_dict = lambda _path: copy.deepcopy(module_config)
 
     fake_retrying = types.ModuleType("retrying")
@@ -101,6 +119,10 @@ def load_sort_movie_request(config: dict | None = None):
     fake_tmdbv3api_exceptions = types.ModuleType("tmdbv3api.exceptions")
     fake_tmdbv3api_exceptions.TMDbException = Exception
 
+    cache_spec = importlib.util.spec_from_file_location(f"sort_movie_cache_test_{uuid.uuid4().hex}", CACHE_PATH)
+    cache_module = importlib.util.module_from_spec(cache_spec)
+    cache_spec.loader.exec_module(cache_module)
+
     spec = importlib.util.spec_from_file_location(
         f"sort_movie_request_test_{uuid.uuid4().hex}",
         MODULE_PATH,
@@ -115,6 +137,7 @@ def load_sort_movie_request(config: dict | None = None):
             "tmdbv3api": fake_tmdbv3api,
             "tmdbv3api.as_obj": fake_tmdbv3api_as_obj,
             "tmdbv3api.exceptions": fake_tmdbv3api_exceptions,
+            "sort_movie_cache": cache_module,
         },
     ):
         spec.loader.exec_module(module)
@@ -226,6 +249,24 @@ class TestGetDoubanSearchDetails(unittest.TestCase):
     def tearDown(self):
         self.temp_dir.cleanup()
 
+    def test_get_douban_search_details_matches_across_html_parsers(self):
+        """lxml 和 html.parser 解析同一页面，结果应一致。"""
+        response = Mock(
+            text=build_douban_search_html(
+                [
+                    ("It's Hard to be Nice", "https://movie.douban.com/subject/1111111/"),
+                    ("Real Movie", "https://movie.douban.com/subject/2222222/"),
+                ]
+            )
+        )
+        results = {}
+        for parser in ("lxml", "html.parser"):
+            with patch.object(self.module, "HTML_PARSER", parser):
+                results[parser] = self.module.get_douban_search_details(response)
+
+        self.assertTrue(results["lxml"])
+        self.assertEqual(results["lxml"], results["html.parser"])
+
     def test_get_douban_search_details_skips_known_noise_first_result(self):
         """遇到已知噪声项时，应返回第二条真实目标链接。"""
         response = Mock(
@@ -242,5 +283,54 @@ class TestGetDoubanSearchDetails(unittest.TestCase):
         self.assertEqual(result, "https://movie.douban.com/subject/2222222/")
 
 
+class TestResponseCache(unittest.TestCase):
+    """验证查询函数接入磁盘缓存。"""
+
+    def setUp(self):
+        self.module, self.temp_dir = load_sort_movie_request()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    @staticmethod
+    def build_response(text: str) -> requests.Response:
+        """构造真实的 200 响应。"""
+        response = requests.Response()
+        response.status_code = 200
+        response.url = "https://example.com/douban/movie/1/"
+        response.encoding = "utf-8"
+        response._content = text.encode("utf-8")
+        return response
+
+    def test_get_douban_response_reuses_cached_page(self):
+        """同一个编号第二次查询直接读缓存，不再发请求。"""
+        with patch.object(self.module.session, "get", return_value=self.build_response("<html>电影</html>")) as mock_get:
+            first = self.module.get_douban_response("1", "movie_response")
+            second = self.module.get_douban_response("1", "movie_response")
+
+        mock_get.assert_called_once()
+        self.assertEqual(second.text, first.text)
+
+    def test_get_douban_response_does_not_cache_verify_page(self):
+        """验证页状态码同样是 200，但不能写入缓存。"""
+        responses = [self.build_response("登录跳转"), self.build_response("<html>电影</html>")]
+        with patch.object(self.module.session, "get", side_effect=responses) as mock_get:
+            with self.assertRaises(SystemExit):
+                self.module.get_douban_response("1", "movie_response")
+            result = self.module.get_douban_response("1", "movie_response")
+
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(result.text, "<html>电影</html>")
+
+    def test_bypass_skips_cache(self):
+        """打开 ``bypass`` 后每次都请求网络。"""
+        self.module.RESPONSE_CACHE.bypass = True
+        with patch.object(self.module.session, "get", side_effect=lambda *_a, **_k: self.build_response("ok")) as mock_get:
+            self.module.get_douban_response("1", "movie_response")
+            self.module.get_douban_response("1", "movie_response")
+
+        self.assertEqual(mock_get.call_count, 2)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,127 @@
+"""
+针对 ``my_scripts.video_probe_cache`` 的测试。
+
+验证按路径命中、改名后按文件指纹命中、内容变化后重新探测、失败结果不缓存和绕过开关。
+"""
+
+import importlib.util
+import os
+import sqlite3
+import tempfile
+import unittest
+import uuid
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+MODULE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "video_probe_cache.py"
+
+
+def load_video_probe_cache():
+    """按文件路径加载缓存模块，模块不读取配置，无需注入假依赖。"""
+    spec = importlib.util.spec_from_file_location(f"video_probe_cache_test_{uuid.uuid4().hex}", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestProbeCache(unittest.TestCase):
+    """验证探测结果缓存。"""
+
+    def setUp(self):
+        self.module = load_video_probe_cache()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.cache = self.module.ProbeCache(str(self.root / "cache" / "probe.sqlite3"))
+        self.video = self.root / "Movie.mkv"
+        self.video.write_bytes(os.urandom(self.module.FINGERPRINT_CHUNK_BYTES * 3))
+
+    def tearDown(self):
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    def test_unchanged_file_hits_by_path_without_reading_content(self):
+        """路径、大小和修改时间不变时直接命中，不再读取文件计算指纹。"""
+        probe = Mock(return_value={"streams": [{"codec_type": "video"}]})
+
+        first = self.cache.cached("ffprobe", self.video, probe)
+        with patch.object(self.module, "get_file_fingerprint") as fingerprint:
+            second = self.cache.cached("ffprobe", self.video, probe)
+
+        self.assertEqual(first, second)
+        probe.assert_called_once()
+        fingerprint.assert_not_called()
+
+    def test_moved_file_hits_by_fingerprint_and_records_new_path(self):
+        """文件移动到别的目录后按指纹命中，之后按新路径直接命中。"""
+        probe = Mock(return_value="x265.crf18")
+        self.cache.cached("mediainfo_codec", self.video, probe)
+        moved_dir = self.root / "Director" / "Movie"
+        moved_dir.mkdir(parents=True)
+        moved = self.video.rename(moved_dir / "Movie.2024.mkv")
+
+        self.assertEqual(self.cache.cached("mediainfo_codec", moved, probe), "x265.crf18")
+        with patch.object(self.module, "get_file_fingerprint") as fingerprint:
+            self.assertEqual(self.cache.cached("mediainfo_codec", moved, probe), "x265.crf18")
+
+        probe.assert_called_once()
+        fingerprint.assert_not_called()
+
+    def test_changed_content_or_kind_probes_again(self):
+        """文件头尾内容变化或探测类型不同时重新探测。"""
+        probe = Mock(side_effect=[{"n": 1}, {"n": 2}, "x264"])
+        self.cache.cached("ffprobe", self.video, probe)
+        with open(self.video, "r+b") as f:
+            f.seek(-4, os.SEEK_END)
+            f.write(b"tail")
+
+        self.assertEqual(self.cache.cached("ffprobe", self.video, probe), {"n": 2})
+        self.assertEqual(self.cache.cached("mediainfo_codec", self.video, probe), "x264")
+        self.assertEqual(probe.call_count, 3)
+
+    def test_failed_probe_and_missing_file_are_not_cached(self):
+        """探测失败返回 None 时不缓存；文件不存在时照常探测，不写缓存。"""
+        probe = Mock(side_effect=[None, {"ok": True}])
+        self.assertIsNone(self.cache.cached("ffprobe", self.video, probe))
+        self.assertEqual(self.cache.cached("ffprobe", self.video, probe), {"ok": True})
+
+        missing_probe = Mock(return_value={"ok": True})
+        self.cache.cached("ffprobe", self.root / "missing.mkv", missing_probe)
+        self.cache.cached("ffprobe", self.root / "missing.mkv", missing_probe)
+        self.assertEqual(missing_probe.call_count, 2)
+
+    def test_bypass_and_empty_path_never_touch_database(self):
+        """绕过缓存或数据库路径为空时每次都探测，也不创建数据库文件。"""
+        for cache in (self.module.ProbeCache(str(self.root / "bypass.sqlite3"), bypass=True), self.module.ProbeCache("")):
+            probe = Mock(return_value={"ok": True})
+            cache.cached("ffprobe", self.video, probe)
+            cache.cached("ffprobe", self.video, probe)
+            self.assertEqual(probe.call_count, 2)
+        self.assertFalse((self.root / "bypass.sqlite3").exists())
+
+    def test_database_errors_fall_back_to_probe(self):
+        """数据库读写出错时只记录警告，返回实际探测结果。"""
+        probe = Mock(return_value={"ok": True})
+        with patch.object(self.cache, "connect", side_effect=sqlite3.OperationalError("database is locked")), patch.object(self.module.logger, "warning") as warning:
+            self.assertEqual(self.cache.cached("ffprobe", self.video, probe), {"ok": True})
+
+        probe.assert_called_once()
+        warning.assert_called_once()
+
+    def test_unusable_cache_path_disables_cache(self):
+        """缓存路径落在普通文件下时照常探测，只警告一次，之后不再尝试建库。"""
+        blocker = self.root / "not_a_dir"
+        blocker.write_text("file", encoding="utf-8")
+        cache = self.module.ProbeCache(str(blocker / "probe.sqlite3"))
+        probe = Mock(return_value={"ok": True})
+
+        with patch.object(self.module.logger, "warning") as warning:
+            self.assertEqual(cache.cached("ffprobe", self.video, probe), {"ok": True})
+            self.assertEqual(cache.cached("ffprobe", self.video, probe), {"ok": True})
+
+        self.assertTrue(cache.bypass)
+        self.assertEqual(probe.call_count, 2)
+        warning.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -13,6 +13,7 @@ from pathlib import Path
 from unittest.mock import patch
 
 MODULE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "video_tools.py"
+PROBE_CACHE_PATH = Path(__file__).resolve().parents[2] / "my_scripts" / "video_probe_cache.py"
 
 
 def load_video_tools():
@@ -35,7 +36,12 @@ def load_video_tools():
         "ffmpeg_path": "",
         "mtn_path": "",
         "mediainfo_path": "",
+        "probe_cache_path": "",
+        "video_contact_renderer": "moviepy",
     }
+    cache_spec = importlib.util.spec_from_file_location(f"video_probe_cache_test_{uuid.uuid4().hex}", PROBE_CACHE_PATH)
+    cache_module = importlib.util.module_from_spec(cache_spec)
+    cache_spec.loader.exec_module(cache_module)
 
     spec = importlib.util.spec_from_file_location(
         f"video_tools_test_{uuid.uuid4().hex}",
@@ -48,6 +54,7 @@ def load_video_tools():
             "PIL": fake_pil,
             "moviepy": fake_moviepy,
             "my_module": fake_my_module,
+            "video_probe_cache": cache_module,
         },
     ):
         spec.loader.exec_module(module)
@@ -136,6 +143,7 @@ class TestVideoTools(unittest.TestCase):
         fake_image = types.SimpleNamespace(
             fromarray=lambda _frame: FakeFrameImage(),
             new=fake_new,
+            frombytes=lambda mode, size, _data: fake_new(mode, size),
             Resampling=types.SimpleNamespace(LANCZOS="lanczos"),
         )
         fake_image_draw = types.SimpleNamespace(Draw=lambda image, _mode=None: FakeDraw(image))
@@ -478,6 +486,139 @@ class TestVideoTools(unittest.TestCase):
         self.assertEqual(frame.mode, "RGB")
         mock_run.assert_called_once()
 
+    def test_ffmpeg_contact_command_seeks_each_time_point_and_stacks_grid(self):
+        """ffmpeg 拼图命令每个时间点一路输入，只解码一帧，HDR 时先 tone-map 再缩放。"""
+        times = self.module.get_video_contact_times(170)
+        sdr_cmd = self.module.build_video_contact_ffmpeg_command("movie.mkv", times, 1920, 800, False)
+        hdr_cmd = self.module.build_video_contact_ffmpeg_command("movie.mkv", times, 1920, 800, True)
+
+        self.assertEqual(sdr_cmd.count("-i"), 16)
+        self.assertEqual(sdr_cmd.count("-noaccurate_seek"), 16)
+        self.assertEqual(sdr_cmd[sdr_cmd.index("-ss") + 1], "10.000")
+        filter_complex = sdr_cmd[sdr_cmd.index("-filter_complex") + 1]
+        self.assertIn("[0:v:0]trim=end_frame=1,setpts=PTS-STARTPTS,scale=1920:800:flags=lanczos", filter_complex)
+        self.assertIn("xstack=inputs=16:layout=0_0|1920_0|3840_0|5760_0|0_800|", filter_complex)
+        self.assertIn("|5760_2400[grid]", filter_complex)
+        self.assertNotIn("tonemap", filter_complex)
+        self.assertIn(f"{self.module.VIDEO_CONTACT_HDR_TONEMAP_FILTER},scale=1920:800", hdr_cmd[hdr_cmd.index("-filter_complex") + 1])
+        self.assertEqual(sdr_cmd[-5:], ["-f", "rawvideo", "-pix_fmt", "rgb24", "-"])
+
+    def test_generate_video_contact_renders_grid_in_one_ffmpeg_call(self):
+        """ffmpeg 模式只调用一次 ffmpeg，不打开 MoviePy，时间戳画在成品网格的每一格上。"""
+        video_path = self.root / "movie sample.mkv"
+        output_path = self.root / "movie sample_s.jpg"
+        fake_image, fake_image_draw, fake_image_font, resized_sizes, grid_sizes, timestamp_texts = self.make_fake_contact_image_api(output_path)
+        video_stream = {"codec_type": "video", "width": 1920, "height": 800, "color_transfer": "bt709"}
+        grid_bytes = b"\0" * (7680 * 3200 * 3)
+
+        with patch.object(self.module, "VIDEO_CONTACT_RENDERER", "ffmpeg"), patch.object(self.module, "VideoFileClip") as video_file_clip:
+            with patch.object(self.module, "Image", fake_image), patch.object(self.module, "ImageDraw", fake_image_draw), patch.object(self.module, "ImageFont", fake_image_font):
+                with patch.object(self.module, "run_ffprobe", return_value={"format": {"duration": "170"}}):
+                    with patch.object(self.module.subprocess, "run", return_value=types.SimpleNamespace(returncode=0, stdout=grid_bytes, stderr=b"")) as mock_run:
+                        self.module.generate_video_contact(video_path, video_info={"dar": 2.4}, video_stream=video_stream)
+
+        mock_run.assert_called_once()
+        video_file_clip.assert_not_called()
+        self.assertTrue(output_path.exists())
+        self.assertEqual(grid_sizes, [(7680, 3200)])
+        self.assertEqual(resized_sizes, [])
+        self.assertEqual(len(timestamp_texts), 16)
+        self.assertEqual(timestamp_texts[0], "0:10.00")
+        self.assertEqual(timestamp_texts[-1], "2:40.00")
+
+    def test_generate_video_contact_falls_back_to_moviepy_when_ffmpeg_fails(self):
+        """ffmpeg 拼图失败时记录 warning，改用 MoviePy 逐帧生成。"""
+        video_path = self.root / "movie.mkv"
+        output_path = self.root / "movie_s.jpg"
+        clip = self.make_fake_contact_clip(size=(1920, 800), duration=170, aspect_ratio=2.4)
+        fake_image, fake_image_draw, fake_image_font, resized_sizes, grid_sizes, _timestamp_texts = self.make_fake_contact_image_api(output_path)
+        video_stream = {"codec_type": "video", "width": 1920, "height": 800, "duration": "170"}
+
+        with patch.object(self.module, "VIDEO_CONTACT_RENDERER", "ffmpeg"), patch.object(self.module, "VideoFileClip", return_value=clip):
+            with patch.object(self.module, "Image", fake_image), patch.object(self.module, "ImageDraw", fake_image_draw), patch.object(self.module, "ImageFont", fake_image_font):
+                with patch.object(self.module.subprocess, "run", return_value=types.SimpleNamespace(returncode=1, stdout=b"", stderr=b"No such filter: 'zscale'")):
+                    with patch.object(self.module.logger, "warning") as mock_warning:
+                        self.module.generate_video_contact(video_path, video_info={"dar": 2.4}, video_stream=video_stream)
+
+        self.assertIn("zscale", str(mock_warning.call_args_list[0]))
+        self.assertTrue(clip.closed)
+        self.assertEqual(len(clip.times), 16)
+        self.assertEqual(resized_sizes, [(1920, 800)] * 16)
+        self.assertEqual(grid_sizes, [(7680, 3200)])
+
+    def test_draw_video_contact_timestamp_stays_inside_grid_cell(self):
+        """在网格上画时间戳时，背景框位于指定格子的右下角。"""
+        rectangles = []
+
+        class FakeDraw:
+            def textbbox(self, _xy, text, font=None, stroke_width=0):
+                return 0, 0, len(text) * 8, 16
+
+            def rectangle(self, xy, fill=None):
+                rectangles.append(xy)
+
+            def text(self, *_args, **_kwargs):
+                pass
+
+        grid = types.SimpleNamespace(size=(7680, 3200))
+        with patch.object(self.module, "ImageDraw", types.SimpleNamespace(Draw=lambda _image, _mode=None: FakeDraw())):
+            self.module.draw_video_contact_timestamp(grid, 10, object(), 80, (1920, 800, 1920, 800))
+
+        x1, y1, x2, y2 = rectangles[0]
+        self.assertEqual((x2, y2), (1920 + 1920 - 1920 // 25, 800 + 800 - 800 // 16))
+        self.assertGreater(x1, 1920)
+        self.assertGreater(y1, 800)
+
+    def run_parallel_contact(self, cell_side_effect):
+        """开启并行抽帧跑一遍截图，返回 clip、预分配的网格和时间戳。"""
+        video_path = self.root / "movie.mkv"
+        output_path = self.root / "movie_s.jpg"
+        clip = self.make_fake_contact_clip(size=(1920, 800), duration=170, aspect_ratio=2.4)
+        fake_image, fake_image_draw, fake_image_font, _resized_sizes, _grid_sizes, timestamp_texts = self.make_fake_contact_image_api(output_path)
+        canvases = []
+        fake_new = fake_image.new
+
+        def record_new(mode, size):
+            canvas = fake_new(mode, size)
+            canvases.append(canvas)
+            return canvas
+
+        fake_image.new = record_new
+
+        with patch.object(self.module, "VIDEO_CONTACT_FRAME_WORKERS", 4):
+            with patch.object(self.module, "VideoFileClip", return_value=clip):
+                with patch.object(self.module, "Image", fake_image), patch.object(self.module, "ImageDraw", fake_image_draw), patch.object(self.module, "ImageFont", fake_image_font):
+                    with patch.object(self.module, "extract_video_contact_cell", side_effect=cell_side_effect) as mock_cell:
+                        with patch.object(self.module.logger, "warning"):
+                            self.module.generate_video_contact(video_path, video_info={"dar": 2.4}, video_stream={})
+        return clip, canvases, timestamp_texts, mock_cell
+
+    def test_generate_video_contact_extracts_cells_in_parallel_into_preallocated_grid(self):
+        """并行抽帧时每格由线程池抽取，直接贴到预先分配的网格上，不再逐帧解码。"""
+        clip, canvases, timestamp_texts, mock_cell = self.run_parallel_contact(
+            lambda _path, seconds, size, _hdr: types.SimpleNamespace(size=size, data=f"{seconds:.0f}".encode())
+        )
+
+        self.assertEqual(mock_cell.call_count, 16)
+        self.assertEqual(mock_cell.call_args_list[0].args[1:], (10, (1920, 800), False))
+        self.assertEqual(clip.times, [])
+        self.assertTrue(clip.closed)
+        self.assertEqual(len(canvases), 1)
+        positions = {img.data: position for img, position in canvases[0].pastes}
+        self.assertEqual(len(positions), 16)
+        self.assertEqual(positions[b"10"], (0, 0))
+        self.assertEqual(positions[b"50"], (0, 800))
+        self.assertEqual(positions[b"160"], (5760, 2400))
+        self.assertEqual(len(timestamp_texts), 16)
+
+    def test_generate_video_contact_falls_back_to_sequential_when_parallel_extraction_fails(self):
+        """并行抽帧失败时退回同一解码器逐帧抽取，仍只分配一张网格。"""
+        clip, canvases, timestamp_texts, _mock_cell = self.run_parallel_contact(RuntimeError("ffmpeg 抽帧失败"))
+
+        self.assertEqual(len(clip.times), 16)
+        self.assertEqual(len(canvases), 1)
+        self.assertEqual(len(timestamp_texts), 16)
+
     def test_generate_video_contact_closes_clip_when_video_metadata_is_invalid(self):
         """视频尺寸或时长异常时应抛出明确错误，并仍然关闭 clip。"""
         video_path = self.root / "movie.mkv"
@@ -547,6 +688,36 @@ class TestVideoTools(unittest.TestCase):
         self.assertEqual(result["format"], ffprobe["format"])
         mock_run.assert_called_once()
 
+    def test_probe_consumers_share_cache_across_rename(self):
+        """完整探测和截图读取视频流元数据共用缓存，文件改名后也不再重复运行 ffprobe 和 MediaInfo。"""
+        video_stream = {
+            "codec_type": "video",
+            "width": 1920,
+            "height": 1080,
+            "codec_tag_string": "avc1",
+            "bit_rate": "6000000",
+            "duration": "3600",
+        }
+        ffprobe = {"streams": [video_stream], "format": {"duration": "3600"}}
+        video = self.root / "Movie.WEB.mkv"
+        video.write_bytes(b"video" * 1000)
+        self.module.PROBE_CACHE = self.module.ProbeCache(str(self.root / "cache" / "probe.sqlite3"))
+        self.addCleanup(self.module.PROBE_CACHE.close)
+
+        with patch.object(self.module.subprocess, "run", return_value=types.SimpleNamespace(returncode=0, stdout=json.dumps(ffprobe), stderr="")) as mock_run:
+            with patch.object(self.module, "check_video_codec", return_value="x264") as mock_codec:
+                first = self.module.extract_video_probe(video)
+                self.assertEqual(self.module.get_video_contact_stream_metadata(video), video_stream)
+                renamed = video.rename(self.root / "Movie.BluRay.mkv")
+                second = self.module.extract_video_probe(renamed)
+
+        mock_run.assert_called_once()
+        mock_codec.assert_called_once()
+        self.assertEqual(first["file_info"]["codec"], "x264")
+        self.assertEqual(first["file_info"]["source"], "WEB")
+        self.assertEqual(second["file_info"]["source"], "BluRay")
+        self.assertEqual(second["video_path"], str(renamed))
+
     def test_extract_video_probe_returns_none_when_ffprobe_fails_or_outputs_bad_json(self):
         """ffprobe 执行失败、超时或输出非 JSON 时应返回 None。"""
         filename = self.root / "Movie.mkv"